@@ -5,11 +5,15 @@ from pymongo import MongoClient
 from app.services.db_service import DatabaseService
 from app.services.oracle_db_service import OracleDatabaseService
 from app.services.sql_db_service import SQLDatabaseService
+from app.ml.model_registry import ModelRegistry
+from app.ml.prediction_log import PredictionLogger
+from app.services.fila_jobs import FilaJobs
 from app.routes.web_routes import web_bp
 from app.routes.api_routes import api_bp
 from app.routes.ml_routes import ml_bp
 from app.routes.catalogo_routes import catalogo_bp
 from app.routes.sensor_routes import sensor_bp  # Nova rota para sensores
+from app.routes.job_routes import job_bp
 from app.utils.filters import configure_template_filters
 from app.services.init_db import inicializar_banco_dados, inicializar_banco_dados_relacional
 import os
@@ -17,18 +21,55 @@ import os
 db_service = None
 sql_db_service = None
 oracle_db_service = None
+model_registry = None
+prediction_logger = None
+fila_jobs = None
 
 def create_app(config_object='config.Config'):
     app = Flask(__name__)
     app.config.from_object(config_object)
     
-    # Iniciar conexão com MongoDB
+    # Iniciar conexão com MongoDB (pool compartilhado pelas rotas)
     global db_service
-    db_service = DatabaseService(app.config['MONGO_URI'])
+    db_service = DatabaseService(
+        app.config['MONGO_URI'],
+        max_pool_size=app.config.get('MONGO_MAX_POOL_SIZE', 50)
+    )
     
-    # Iniciar conexão com banco relacional
+    # Iniciar conexão com banco relacional (pool compartilhado pelas rotas)
     global sql_db_service
-    sql_db_service = SQLDatabaseService(app.config['SQL_DATABASE_URI'])
+    sql_db_service = SQLDatabaseService(
+        app.config['SQL_DATABASE_URI'],
+        pool_size=app.config.get('SQL_POOL_SIZE', 10),
+        max_overflow=app.config.get('SQL_MAX_OVERFLOW', 20),
+        pool_timeout=app.config.get('SQL_POOL_TIMEOUT', 30),
+        pool_recycle=app.config.get('SQL_POOL_RECYCLE', 1800)
+    )
+    
+    # Fila de jobs em segundo plano (executados por app/scripts/worker_jobs.py)
+    global fila_jobs
+    fila_jobs = FilaJobs(sql_db_service)
+    
+    # Registro de modelos de ML residente no processo (carga sob demanda, hot-swap por versão)
+    global model_registry
+    model_registry = ModelRegistry(
+        app.config.get('ML_MODEL_PATH_PREFIX', 'models/farmtech'),
+        check_interval=app.config.get('ML_MODEL_CHECK_INTERVAL', 2.0),
+        mmap_mode=app.config.get('ML_MODEL_MMAP_MODE'),
+        compiled=app.config.get('ML_COMPILED_INFERENCE', False)
+    )
+    
+    # Registro das predições servidas (gravação em lote em segundo plano, com spool local)
+    global prediction_logger
+    if app.config.get('ML_PREDICTION_LOG', True):
+        prediction_logger = PredictionLogger(
+            sql_db_service,
+            spool_dir=app.config.get('ML_PREDICTION_LOG_SPOOL_DIR', 'spool/predictions'),
+            batch_size=app.config.get('ML_PREDICTION_LOG_BATCH_SIZE', 500),
+            flush_interval=app.config.get('ML_PREDICTION_LOG_FLUSH_INTERVAL', 5.0),
+            fsync=app.config.get('ML_PREDICTION_LOG_FSYNC', False)
+        )
+        prediction_logger.start()
     
     # Iniciar conexão com Oracle
     global oracle_db_service
@@ -56,8 +97,14 @@ def create_app(config_object='config.Config'):
     app.register_blueprint(sensor_bp, url_prefix='/sensores')
     app.register_blueprint(catalogo_bp, url_prefix='/catalogo')
     app.register_blueprint(ml_bp, url_prefix='/api/ml')
+    app.register_blueprint(job_bp, url_prefix='/api/jobs')
+    
     
     
+    # Devolver a sessão da thread ao pool ao final de cada requisição
+    @app.teardown_appcontext
+    def remover_sessao_sql(exception=None):
+        sql_db_service.remover_sessao()
     
     # Configurar filtros de template
     configure_template_filters(app)
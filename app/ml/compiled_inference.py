@@ -0,0 +1,225 @@
+# app/ml/compiled_inference.py
+
+"""
+Inferência compilada (Numba) das florestas de irrigação
+
+Para uma única condição, quase todo o tempo de predict_irrigation_need é
+overhead: DataFrame de uma linha, engineer_features, scaler.transform e três
+chamadas às florestas. CompiledForestEngine monta o vetor de features direto
+do dict da condição e percorre as árvores (nos arrays planos do formato
+compacto de model_bundle.py) com funções compiladas pelo Numba.
+
+O StandardScaler é incorporado aos thresholds: no scikit-learn cada split
+testa float32((x - mean) / scale) <= threshold, uma função crescente de x, então
+existe um maior valor bruto t tal que o teste vale exatamente quando x <= t.
+Esse t é encontrado por bisseção em float64, reproduzindo as mesmas operações
+do scaler, e as predições saem idênticas às do caminho com o scikit-learn.
+Só florestas (RandomForest/ExtraTrees, originais ou compactas) são suportadas.
+"""
+
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+from numba import njit
+
+from app.ml.model_bundle import CompactForestClassifier, CompactForestRegressor, compact_model
+
+EPOCH = datetime(1970, 1, 1)
+
+@njit(cache=True)
+def _leaf(x, root, feature, threshold, children_left, children_right, missing_go_to_left):
+    node = root
+    while children_left[node] >= 0:
+        value = x[feature[node]]
+        if math.isnan(value):
+            go_left = missing_go_to_left[node]
+        else:
+            go_left = value <= threshold[node]
+        node = children_left[node] if go_left else children_right[node]
+    return node
+
+@njit(cache=True)
+def _predict_rows(X, roots, feature, threshold, children_left, children_right, missing_go_to_left, values, out):
+    """Média dos valores das folhas somando na ordem das árvores, como o scikit-learn"""
+    n_trees = roots.shape[0]
+    for row in range(X.shape[0]):
+        for tree in range(n_trees):
+            leaf = _leaf(X[row], roots[tree], feature, threshold, children_left, children_right, missing_go_to_left)
+            for column in range(values.shape[1]):
+                out[row, column] += values[leaf, column]
+        for column in range(values.shape[1]):
+            out[row, column] /= n_trees
+
+def fold_scaler_thresholds(forest, mean, scale):
+    """
+    Thresholds no espaço das features brutas
+
+    Para cada nó interno, o maior x (float64) com
+    float32((x - mean) / scale) <= threshold, por bisseção vetorizada.
+    """
+    internal = forest.children_left >= 0
+    folded = np.zeros(len(forest.threshold), dtype=np.float64)
+    if not internal.any():
+        return folded
+
+    threshold = forest.threshold[internal]
+    node_mean = mean[forest.feature[internal]]
+    node_scale = scale[forest.feature[internal]]
+
+    def passes(x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            return ((x - node_mean) / node_scale).astype(np.float32) <= threshold
+
+    # Intervalo inicial em volta de threshold * scale + mean, ampliado até conter a fronteira
+    center = threshold * node_scale + node_mean
+    width = (np.abs(center) + np.abs(node_mean) + np.abs(threshold * node_scale)) * 2.0 ** -16 + 1e-300
+    low, high = center - width, center + width
+    while True:
+        low_fails = ~passes(low)
+        high_passes = passes(high)
+        if not (low_fails.any() or high_passes.any()):
+            break
+        low = np.where(low_fails, low - width, low)
+        high = np.where(high_passes, high + width, high)
+        width = width * 2.0
+
+    # passes(low) e não passes(high): estreita até serem floats vizinhos
+    while True:
+        middle = low + (high - low) / 2.0
+        active = (middle > low) & (middle < high)
+        if not active.any():
+            break
+        ok = passes(middle)
+        low = np.where(active & ok, middle, low)
+        high = np.where(active & ~ok, middle, high)
+
+    folded[internal] = low
+    return folded
+
+class CompiledForestEngine:
+    """
+    Predições do IrrigationPredictor com as árvores compiladas
+
+    Construída a partir de um predictor já treinado/carregado; não acompanha
+    um retreino posterior (IrrigationPredictor descarta a engine ao treinar
+    ou carregar modelos).
+
+    Raises:
+        ValueError: os modelos não são florestas
+    """
+
+    def __init__(self, predictor):
+        irrigation = compact_model(predictor.irrigation_classifier)
+        humidity = compact_model(predictor.humidity_regressor)
+        if not isinstance(irrigation, CompactForestClassifier) or not isinstance(humidity, CompactForestRegressor):
+            raise ValueError("Inferência compilada disponível apenas para florestas (RandomForest/ExtraTrees)")
+
+        scaler = predictor.scaler
+        n_features = len(predictor.feature_columns)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std and scaler.scale_ is not None else np.ones(n_features)
+
+        self.feature_columns = list(predictor.feature_columns)
+        self.category_codes = predictor.category_codes
+        self.classes_ = irrigation.classes_
+        self._irrigation = self._forest_arrays(irrigation, mean, scale, irrigation.value)
+        self._humidity = self._forest_arrays(humidity, mean, scale, humidity.value[:, np.newaxis])
+
+        # Compila (ou lê do cache do Numba) já na construção, não na primeira requisição
+        self.predict_features(np.zeros((1, n_features)))
+
+    @staticmethod
+    def _forest_arrays(forest, mean, scale, values):
+        return (
+            np.ascontiguousarray(forest.roots),
+            np.ascontiguousarray(forest.feature),
+            fold_scaler_thresholds(forest, mean, scale),
+            np.ascontiguousarray(forest.children_left),
+            np.ascontiguousarray(forest.children_right),
+            np.ascontiguousarray(forest.missing_go_to_left),
+            np.ascontiguousarray(values, dtype=np.float64)
+        )
+
+    def _run(self, arrays, X):
+        out = np.zeros((X.shape[0], arrays[-1].shape[1]), dtype=np.float64)
+        _predict_rows(X, *arrays, out)
+        return out
+
+    def predict_features(self, X):
+        """
+        Predições para features brutas (antes do scaler), na ordem de feature_columns
+
+        Returns:
+            tuple: (probabilidades (n, n_classes), classes previstas, umidade prevista)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        proba = self._run(self._irrigation, X)
+        humidity = self._run(self._humidity, X)[:, 0]
+        return proba, self.classes_[proba.argmax(axis=1)], humidity
+
+    def features_from_conditions(self, conditions):
+        """
+        Vetor de features de uma condição, igual à linha de engineer_features
+        para um DataFrame de um registro (janelas móveis reduzidas à própria
+        linha, colunas ausentes e NaN viram 0)
+        """
+        def number(key):
+            value = conditions.get(key)
+            return np.nan if value is None else float(value)
+
+        umidade = number('umidade')
+        ph = number('ph')
+        fosforo = int(conditions['fosforo'])
+        potassio = int(conditions['potassio'])
+        momento = EPOCH + timedelta(milliseconds=int(conditions['timestamp']))
+
+        features = {
+            'umidade_atual': umidade,
+            'ph_atual': ph,
+            'fosforo': fosforo,
+            'potassio': potassio,
+            'hora_do_dia': momento.hour,
+            'dia_da_semana': momento.weekday(),
+            'mes_ano': momento.month,
+            'umidade_tendencia': umidade,
+            'ph_tendencia': ph,
+            'umidade_variacao': 0.0
+        }
+        for key in ('temperature', 'humidity_air', 'precipitation', 'wind_speed', 'pressure'):
+            features[key] = number(key) if key in conditions else 0
+        if 'temperature' in conditions:
+            features['estresse_termico'] = int(features['temperature'] > 30)
+            features['temp_tendencia'] = features['temperature']
+        if 'precipitation' in conditions:
+            features['chuva_recente'] = int(features['precipitation'] > 0)
+            features['precipitacao_acumulada'] = features['precipitation']
+
+        codes = self.category_codes
+        hora = features['hora_do_dia']
+        periodo = 'manha' if 5 <= hora < 12 else 'tarde' if 12 <= hora < 18 else 'noite' if 18 <= hora < 22 else 'madrugada'
+        # Mesma tabela de _encode_estacao, indexada pelo mês (posição 0 não usada)
+        estacao = ('verao', 'verao', 'verao', 'outono', 'outono', 'outono', 'inverno',
+                   'inverno', 'inverno', 'primavera', 'primavera', 'primavera', 'verao')[momento.month]
+        nutrientes = fosforo + potassio
+        necessidade = 'alta' if nutrientes >= 2 else 'media' if nutrientes == 1 else 'baixa'
+        # NaN cai em 'alcalino', como em _encode_ph
+        ph_categoria = 'acido' if ph < 6.0 else 'ideal' if ph <= 7.5 else 'alcalino'
+        features['periodo_dia_encoded'] = codes['periodo_dia'].index(periodo)
+        features['estacao_encoded'] = codes['estacao'].index(estacao)
+        features['necessidade_nutrientes_encoded'] = codes['necessidade_nutrientes'].index(necessidade)
+        features['ph_categoria_encoded'] = codes['ph_categoria'].index(ph_categoria)
+
+        row = np.array([features.get(column, 0) for column in self.feature_columns], dtype=np.float64)
+        row[np.isnan(row)] = 0.0
+        return row
+
+    def predict_conditions(self, conditions):
+        """
+        Predição de uma condição
+
+        Returns:
+            tuple: (probabilidades das classes, classe prevista, umidade prevista)
+        """
+        proba, classes, humidity = self.predict_features(self.features_from_conditions(conditions)[np.newaxis, :])
+        return proba[0], classes[0], humidity[0]
@@ -3,7 +3,7 @@
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import accuracy_score, mean_absolute_error, classification_report
 import joblib
@@ -11,6 +11,8 @@ import json
 from datetime import datetime, timedelta
 import logging
 
+from app.ml.model_bundle import BUNDLE_FORMAT, CompactForestClassifier, save_bundle, load_bundle
+
 class IrrigationPredictor:
     """
     CLASSE CONSOLIDADA - Inclui todas as funcionalidades:
@@ -24,6 +26,16 @@ class IrrigationPredictor:
     - prediction_service.py (métodos incluídos aqui)
     """
     
+    # Códigos fixos das features categóricas (posição na lista = código).
+    # Ordem alfabética, igual à do LabelEncoder usado antes quando todas as
+    # categorias aparecem no lote, para manter compatíveis os modelos já salvos.
+    DEFAULT_CATEGORY_CODES = {
+        'periodo_dia': ['madrugada', 'manha', 'noite', 'tarde'],
+        'estacao': ['inverno', 'outono', 'primavera', 'verao'],
+        'necessidade_nutrientes': ['alta', 'baixa', 'media'],
+        'ph_categoria': ['acido', 'alcalino', 'ideal']
+    }
+    
     def __init__(self):
         # Modelos MENOS complexos para evitar overfitting
         self.irrigation_classifier = RandomForestClassifier(
@@ -46,6 +58,10 @@ class IrrigationPredictor:
         # Preprocessadores consolidados
         self.scaler = StandardScaler()
         self.feature_columns = []
+        self.category_codes = {k: list(v) for k, v in self.DEFAULT_CATEGORY_CODES.items()}
+        self.model_version = None
+        # Inferência compilada opcional (enable_compiled_inference)
+        self.compiled_engine = None
         
         # Métricas do modelo
         self.model_metrics = {
@@ -67,7 +83,7 @@ class IrrigationPredictor:
         SUBSTITUI: data_preprocessor.py
         """
         try:
-            if not raw_data:
+            if raw_data is None or len(raw_data) == 0:
                 return None
             
             # Converter para DataFrame se necessário
@@ -99,12 +115,20 @@ class IrrigationPredictor:
             self.logger.error(f"Erro no preprocessamento: {str(e)}")
             return None
     
-    def engineer_features(self, data):
+    def engineer_features(self, data, independent_rows=False):
         """
         Engenharia de features avançada
         SUBSTITUI: funcionalidades do data_preprocessor.py
+        
+        Totalmente vetorizada (np.select/lookup por mês) e com códigos
+        categóricos fixos (self.category_codes, salvos nos metadados), então o
+        mesmo valor gera o mesmo código no treino, em lote e em uma única linha.
+        
+        Com independent_rows=True cada linha é uma condição isolada (predição
+        em lote de vários sensores): as janelas móveis se reduzem à própria
+        linha, como em uma predição de um único registro.
         """
-        features = pd.DataFrame()
+        features = {}
         
         # Features básicas dos sensores
         features['umidade_atual'] = data['umidade']
@@ -115,207 +139,338 @@ class IrrigationPredictor:
         # Features climáticas (se disponíveis)
         climate_features = ['temperature', 'humidity_air', 'precipitation', 'wind_speed', 'pressure']
         for feat in climate_features:
-            features[feat] = data.get(feat, 0)
+            features[feat] = data[feat] if feat in data.columns else 0
         
         # Features temporais
-        data['datetime'] = pd.to_datetime(data['timestamp'], unit='ms')
-        features['hora_do_dia'] = data['datetime'].dt.hour
-        features['dia_da_semana'] = data['datetime'].dt.dayofweek
-        features['mes_ano'] = data['datetime'].dt.month
+        timestamps = pd.to_datetime(data['timestamp'], unit='ms')
+        features['hora_do_dia'] = timestamps.dt.hour
+        features['dia_da_semana'] = timestamps.dt.dayofweek
+        features['mes_ano'] = timestamps.dt.month
         
         # Features de tendência (rolling)
-        features['umidade_tendencia'] = data['umidade'].rolling(window=3, min_periods=1).mean()
-        features['ph_tendencia'] = data['ph'].rolling(window=3, min_periods=1).mean()
-        features['umidade_variacao'] = data['umidade'].rolling(window=3, min_periods=1).std().fillna(0)
+        if independent_rows:
+            features['umidade_tendencia'] = data['umidade']
+            features['ph_tendencia'] = data['ph']
+            features['umidade_variacao'] = 0.0
+        else:
+            features['umidade_tendencia'] = data['umidade'].rolling(window=3, min_periods=1).mean()
+            features['ph_tendencia'] = data['ph'].rolling(window=3, min_periods=1).mean()
+            features['umidade_variacao'] = data['umidade'].rolling(window=3, min_periods=1).std().fillna(0)
         
         # Features derivadas climáticas
         if 'temperature' in data.columns:
-            features['estresse_termico'] = (features['temperature'] > 30).astype(int)
-            features['temp_tendencia'] = data['temperature'].rolling(window=3, min_periods=1).mean()
+            features['estresse_termico'] = (data['temperature'] > 30).astype(int)
+            features['temp_tendencia'] = (
+                data['temperature'] if independent_rows
+                else data['temperature'].rolling(window=3, min_periods=1).mean()
+            )
         
         if 'precipitation' in data.columns:
-            features['chuva_recente'] = (features['precipitation'] > 0).astype(int)
-            features['precipitacao_acumulada'] = data['precipitation'].rolling(window=6, min_periods=1).sum()
-        
-        # Features categóricas
-        features['periodo_dia'] = features['hora_do_dia'].apply(self._get_periodo_dia)
-        features['estacao'] = features['mes_ano'].apply(self._get_estacao)
-        features['necessidade_nutrientes'] = (features['fosforo'] + features['potassio']).apply(
-            lambda x: 'alta' if x >= 2 else 'media' if x == 1 else 'baixa'
-        )
-        features['ph_categoria'] = features['ph_atual'].apply(self._categorize_ph)
-        
-        # Codificação de categóricas
-        le_periodo = LabelEncoder()
-        le_estacao = LabelEncoder()
-        le_nutrientes = LabelEncoder()
-        le_ph = LabelEncoder()
-        
-        features['periodo_dia_encoded'] = le_periodo.fit_transform(features['periodo_dia'])
-        features['estacao_encoded'] = le_estacao.fit_transform(features['estacao'])
-        features['necessidade_nutrientes_encoded'] = le_nutrientes.fit_transform(features['necessidade_nutrientes'])
-        features['ph_categoria_encoded'] = le_ph.fit_transform(features['ph_categoria'])
+            features['chuva_recente'] = (data['precipitation'] > 0).astype(int)
+            features['precipitacao_acumulada'] = (
+                data['precipitation'] if independent_rows
+                else data['precipitation'].rolling(window=6, min_periods=1).sum()
+            )
         
-        # Remover categóricas originais
-        features = features.drop(['periodo_dia', 'estacao', 'necessidade_nutrientes', 'ph_categoria'], axis=1)
+        # Features categóricas já codificadas
+        features['periodo_dia_encoded'] = self._encode_periodo_dia(features['hora_do_dia'].to_numpy())
+        features['estacao_encoded'] = self._encode_estacao(features['mes_ano'].to_numpy())
+        features['necessidade_nutrientes_encoded'] = self._encode_necessidade_nutrientes(
+            (features['fosforo'] + features['potassio']).to_numpy()
+        )
+        features['ph_categoria_encoded'] = self._encode_ph(features['ph_atual'].to_numpy(dtype=float))
         
-        return features.fillna(0)
+        return pd.DataFrame(features, index=data.index).fillna(0)
     
     # ========== PREDICTION SERVICES (substituindo prediction_service.py) ==========
     
-    def predict_irrigation_batch(self, conditions_list):
+    BATCH_REQUIRED_FIELDS = ['umidade', 'ph', 'fosforo', 'potassio']
+    BATCH_NUMERIC_FIELDS = ['temperature', 'humidity_air', 'precipitation', 'wind_speed', 'pressure']
+    
+    def predict_irrigation_batch(self, conditions_list, horizon_hours=4):
         """
         Predições em lote
         SUBSTITUI: prediction_service.py
+        
+        Monta uma única matriz de features para todos os registros válidos e
+        chama cada modelo uma vez (predict_proba no classificador, predict no
+        regressor); a classe vem da maior probabilidade. Cada registro é
+        tratado como uma condição independente, com o mesmo resultado de
+        predict_irrigation_need. Registros inválidos recebem um item com
+        'error' na mesma posição, sem afetar os demais.
         """
-        predictions = []
+        predictions, valid_positions, valid_conditions = self._validate_batch(conditions_list)
+        if not valid_conditions:
+            return predictions
         
-        for conditions in conditions_list:
-            try:
-                pred = self.predict_irrigation_need(conditions)
-                predictions.append(pred)
-            except Exception as e:
-                self.logger.error(f"Erro na predição: {str(e)}")
-                predictions.append({'error': str(e), 'irrigation_needed': False})
+        try:
+            features_scaled = self._scale_batch(valid_conditions)
+            irrigation_prob = self.irrigation_classifier.predict_proba(features_scaled)
+            irrigation_need = self.irrigation_classifier.classes_[irrigation_prob.argmax(axis=1)]
+            humidity_forecast = self.humidity_regressor.predict(features_scaled)
+            positive_column = list(self.irrigation_classifier.classes_).index(1)
+        except Exception as e:
+            self.logger.error(f"Erro na predição em lote: {str(e)}")
+            for position in valid_positions:
+                predictions[position] = self._batch_error(e)
+            return predictions
+        
+        prediction_time = datetime.now().isoformat()
+        for row, (position, conditions) in enumerate(zip(valid_positions, valid_conditions)):
+            trend_analysis = self._analyze_trend(conditions)
+            predictions[position] = {
+                'irrigation_needed': bool(irrigation_need[row]),
+                'irrigation_probability': float(irrigation_prob[row, positive_column]),
+                'confidence': float(irrigation_prob[row].max()),
+                'predicted_humidity_next_hour': float(humidity_forecast[row]),
+                'current_humidity': float(conditions['umidade']),
+                'trend_analysis': trend_analysis,
+                'recommendations': self._generate_recommendations(
+                    conditions, irrigation_need[row], humidity_forecast[row], trend_analysis
+                ),
+                'prediction_time': prediction_time,
+                'horizon_hours': horizon_hours
+            }
         
         return predictions
     
+    def _validate_batch(self, conditions_list):
+        """
+        Separa os registros válidos do lote
+        
+        Returns:
+            tuple: (lista de resultados com os erros já posicionados,
+                    posições dos registros válidos, registros válidos convertidos)
+        """
+        predictions = [None] * len(conditions_list)
+        valid_positions = []
+        valid_conditions = []
+        now_ms = int(datetime.now().timestamp() * 1000)
+        
+        for position, conditions in enumerate(conditions_list):
+            try:
+                valid_conditions.append(self._validate_batch_conditions(conditions, now_ms))
+                valid_positions.append(position)
+            except (TypeError, ValueError, KeyError) as e:
+                predictions[position] = self._batch_error(e)
+        
+        return predictions, valid_positions, valid_conditions
+    
+    def _batch_error(self, error):
+        return {
+            'error': str(error),
+            'irrigation_needed': False,
+            'irrigation_probability': 0.0,
+            'confidence': 0.0
+        }
+    
+    def _scale_batch(self, valid_conditions):
+        """Matriz de features já normalizada para registros independentes"""
+        batch_df = pd.DataFrame(valid_conditions)
+        features = self.engineer_features(batch_df, independent_rows=True)
+        features = features.reindex(columns=self.feature_columns, fill_value=0)
+        return self.scaler.transform(features)
+    
+    def _validate_batch_conditions(self, conditions, default_timestamp):
+        """Valida e converte um registro do lote (timestamp ausente usa o horário atual)"""
+        if not isinstance(conditions, dict):
+            raise TypeError('registro deve ser um objeto')
+        
+        for field in self.BATCH_REQUIRED_FIELDS:
+            if conditions.get(field) is None:
+                raise ValueError(f'{field} é obrigatório')
+        
+        validated = {
+            'umidade': float(conditions['umidade']),
+            'ph': float(conditions['ph']),
+            'fosforo': int(conditions['fosforo']),
+            'potassio': int(conditions['potassio']),
+            'timestamp': int(conditions.get('timestamp') or default_timestamp)
+        }
+        for field in self.BATCH_NUMERIC_FIELDS:
+            if conditions.get(field) is not None:
+                validated[field] = float(conditions[field])
+        
+        return validated
+    
     def predict_with_confidence_intervals(self, current_conditions, n_estimators=100):
         """
         Predições com intervalos de confiança
         SUBSTITUI: funcionalidades avançadas do prediction_service.py
         """
+        result = self.predict_with_confidence_intervals_batch([current_conditions])[0]
+        if 'error' in result:
+            return {'error': result['error']}
+        return result
+    
+    def predict_tree_probabilities(self, features_scaled, n_jobs=None):
+        """
+        Probabilidade de irrigação de cada árvore do classificador para uma matriz inteira
+        
+        Uma chamada por árvore sobre todas as linhas (e não uma por árvore e
+        por linha), distribuídas em threads como o próprio RandomForest faz
+        em predict_proba. Classificadores que não são florestas (ex.:
+        GradientBoosting escolhido pela busca de hiperparâmetros) não têm
+        árvores independentes: retornam uma única coluna, com desvio zero.
+        Florestas compactas (model_bundle.py) percorrem todas as árvores de uma vez.
+        
+        Returns:
+            np.ndarray: matriz (n_linhas, n_árvores)
+        """
+        from joblib import Parallel, delayed
+        
+        positive_column = list(self.irrigation_classifier.classes_).index(1)
+        if isinstance(self.irrigation_classifier, CompactForestClassifier):
+            return self.irrigation_classifier.predict_tree_proba(features_scaled, positive_column)
+        if not isinstance(self.irrigation_classifier, RandomForestClassifier):
+            return self.irrigation_classifier.predict_proba(features_scaled)[:, [positive_column]]
+        
+        X = np.ascontiguousarray(features_scaled, dtype=np.float32)
+        estimators = self.irrigation_classifier.estimators_
+        tree_probabilities = np.empty((X.shape[0], len(estimators)), dtype=np.float64)
+        
+        def fill_column(index, estimator):
+            tree_probabilities[:, index] = estimator.predict_proba(X, check_input=False)[:, positive_column]
+        
+        Parallel(n_jobs=n_jobs or self.irrigation_classifier.n_jobs, prefer='threads')(
+            delayed(fill_column)(index, estimator) for index, estimator in enumerate(estimators)
+        )
+        return tree_probabilities
+    
+    def predict_with_confidence_intervals_batch(self, conditions_list, quantiles=(0.025, 0.5, 0.975), n_jobs=None):
+        """
+        Intervalos de confiança em lote a partir da dispersão entre as árvores
+        
+        Para cada registro: média e desvio padrão das probabilidades das
+        árvores, intervalo normal de 95% (média ± 1,96·desvio) e quantis
+        empíricos. Registros inválidos recebem 'error' na mesma posição.
+        """
+        predictions, valid_positions, valid_conditions = self._validate_batch(conditions_list)
+        if not valid_conditions:
+            return predictions
+        
         try:
-            # Preparar dados
-            current_df = pd.DataFrame([current_conditions])
-            features = self.engineer_features(current_df)
-            
-            if len(features.columns) != len(self.feature_columns):
-                features = features.reindex(columns=self.feature_columns, fill_value=0)
-            
-            features_scaled = self.scaler.transform(features)
-            
-            # Predições de todos os estimadores
-            tree_predictions = []
-            for estimator in self.irrigation_classifier.estimators_:
-                pred = estimator.predict_proba(features_scaled)[0][1]
-                tree_predictions.append(pred)
-            
-            # Calcular estatísticas
-            mean_pred = np.mean(tree_predictions)
-            std_pred = np.std(tree_predictions)
-            
-            # Intervalos de confiança (95%)
-            ci_lower = max(0, mean_pred - 1.96 * std_pred)
-            ci_upper = min(1, mean_pred + 1.96 * std_pred)
-            
-            return {
-                'irrigation_probability': float(mean_pred),
+            features_scaled = self._scale_batch(valid_conditions)
+            tree_probabilities = self.predict_tree_probabilities(features_scaled, n_jobs=n_jobs)
+        except Exception as e:
+            self.logger.error(f"Erro na predição com IC: {str(e)}")
+            for position in valid_positions:
+                predictions[position] = self._batch_error(e)
+            return predictions
+        
+        mean_pred = tree_probabilities.mean(axis=1)
+        std_pred = tree_probabilities.std(axis=1)
+        ci_lower = np.clip(mean_pred - 1.96 * std_pred, 0, 1)
+        ci_upper = np.clip(mean_pred + 1.96 * std_pred, 0, 1)
+        quantile_values = np.quantile(tree_probabilities, quantiles, axis=1) if len(quantiles) else None
+        
+        for row, position in enumerate(valid_positions):
+            predictions[position] = {
+                'irrigation_probability': float(mean_pred[row]),
                 'confidence_interval': {
-                    'lower': float(ci_lower),
-                    'upper': float(ci_upper)
+                    'lower': float(ci_lower[row]),
+                    'upper': float(ci_upper[row])
                 },
-                'prediction_std': float(std_pred),
-                'irrigation_needed': mean_pred > 0.5
+                'prediction_std': float(std_pred[row]),
+                'quantiles': {
+                    str(q): float(quantile_values[i, row]) for i, q in enumerate(quantiles)
+                },
+                'irrigation_needed': bool(mean_pred[row] > 0.5)
             }
-            
-        except Exception as e:
-            self.logger.error(f"Erro na predição com IC: {str(e)}")
-            return {'error': str(e)}
+        
+        return predictions
     
     def store_prediction_result(self, prediction, actual_result, sql_db_service, sensor_id):
         """
         Armazena resultado da predição para avaliação futura
         SUBSTITUI: funcionalidades do prediction_service.py
+        
+        Grava uma predição já com o resultado real. As predições servidas
+        pela API são registradas em lote por app/ml/prediction_log.py.
         """
+        from app.models.sensor_models import MLPrediction
+        
+        session = sql_db_service.get_session()
         try:
-            session = sql_db_service.get_session()
-            
-            # Importar modelo da tabela de predições
-            from app.models.sensor_models import Base
-            from sqlalchemy import Column, Integer, Boolean, Float, DateTime, ForeignKey
-            
-            class MLPrediction(Base):
-                __tablename__ = 'ml_predictions'
-                
-                id = Column(Integer, primary_key=True)
-                sensor_id = Column(Integer, ForeignKey('sensor.id'), nullable=False)
-                predicted_irrigation = Column(Boolean, nullable=False)
-                irrigation_probability = Column(Float)
-                confidence = Column(Float)
-                actual_irrigation = Column(Boolean)
-                prediction_time = Column(DateTime, default=datetime.now)
-                horizon_hours = Column(Integer, default=4)
-            
-            # Criar registro
-            ml_pred = MLPrediction(
+            session.add(MLPrediction(
                 sensor_id=sensor_id,
                 predicted_irrigation=prediction.get('irrigation_needed', False),
                 irrigation_probability=prediction.get('irrigation_probability', 0.0),
                 confidence=prediction.get('confidence', 0.0),
+                predicted_humidity=prediction.get('predicted_humidity_next_hour'),
                 actual_irrigation=actual_result,
-                prediction_time=datetime.now()
-            )
-            
-            session.add(ml_pred)
+                prediction_time=datetime.now(),
+                horizon_hours=prediction.get('horizon_hours', 4),
+                model_version=self.model_version
+            ))
             session.commit()
-            session.close()
             
             self.logger.info("Resultado da predição armazenado com sucesso")
             return True
             
         except Exception as e:
+            session.rollback()
             self.logger.error(f"Erro ao armazenar resultado: {str(e)}")
             return False
+        finally:
+            session.close()
     
     # ========== MÉTODOS AUXILIARES ==========
     
-    def _get_periodo_dia(self, hora):
-        """Categoriza hora do dia em períodos"""
-        if 5 <= hora < 12:
-            return 'manha'
-        elif 12 <= hora < 18:
-            return 'tarde'
-        elif 18 <= hora < 22:
-            return 'noite'
-        else:
-            return 'madrugada'
-    
-    def _get_estacao(self, mes):
-        """Determina estação do ano (Hemisfério Sul)"""
-        if mes in [12, 1, 2]:
-            return 'verao'
-        elif mes in [3, 4, 5]:
-            return 'outono'
-        elif mes in [6, 7, 8]:
-            return 'inverno'
-        else:
-            return 'primavera'
-    
-    def _categorize_ph(self, ph):
-        """Categoriza valores de pH"""
-        if ph < 6.0:
-            return 'acido'
-        elif 6.0 <= ph <= 7.5:
-            return 'ideal'
-        else:
-            return 'alcalino'
+    def _encode_periodo_dia(self, horas):
+        """Categoriza horas do dia em períodos (vetorizado)"""
+        codes = self.category_codes['periodo_dia']
+        return np.select(
+            [(horas >= 5) & (horas < 12), (horas >= 12) & (horas < 18), (horas >= 18) & (horas < 22)],
+            [codes.index('manha'), codes.index('tarde'), codes.index('noite')],
+            default=codes.index('madrugada')
+        )
+    
+    def _encode_estacao(self, meses):
+        """Determina a estação do ano (Hemisfério Sul) por tabela indexada pelo mês"""
+        codes = self.category_codes['estacao']
+        estacao_por_mes = ['verao', 'verao', 'verao', 'outono', 'outono', 'outono', 'inverno',
+                           'inverno', 'inverno', 'primavera', 'primavera', 'primavera', 'verao']
+        return np.array([codes.index(e) for e in estacao_por_mes])[meses]
+    
+    def _encode_necessidade_nutrientes(self, soma_nutrientes):
+        """Categoriza a soma P + K em necessidade de nutrientes"""
+        codes = self.category_codes['necessidade_nutrientes']
+        return np.select(
+            [soma_nutrientes >= 2, soma_nutrientes == 1],
+            [codes.index('alta'), codes.index('media')],
+            default=codes.index('baixa')
+        )
+    
+    def _encode_ph(self, ph):
+        """Categoriza valores de pH (NaN cai em 'alcalino', como na versão por linha)"""
+        codes = self.category_codes['ph_categoria']
+        return np.select(
+            [ph < 6.0, ph <= 7.5],
+            [codes.index('acido'), codes.index('ideal')],
+            default=codes.index('alcalino')
+        )
     
     # ========== MÉTODOS PRINCIPAIS (mantidos da implementação anterior) ==========
     
     def enrich_with_climate_data(self, sensor_data, lat=-3.763081, lon=-38.524465):
         """
         Enriquece dados dos sensores com informações climáticas históricas
+        
+        Aceita lista de dicts ou DataFrame e devolve o mesmo tipo (ver merge_climate_data).
         """
         from app.services.climate_service import ClimateDataService
         
         climate_service = ClimateDataService()
         
-        if not sensor_data:
+        if sensor_data is None or len(sensor_data) == 0:
             return []
         
         # Determinar período dos dados
-        timestamps = [d['timestamp'] for d in sensor_data]
+        if isinstance(sensor_data, pd.DataFrame):
+            timestamps = sensor_data['timestamp']
+        else:
+            timestamps = [d['timestamp'] for d in sensor_data]
         start_date = datetime.fromtimestamp(min(timestamps) / 1000)
         end_date = datetime.fromtimestamp(max(timestamps) / 1000)
         
@@ -328,53 +483,80 @@ class IrrigationPredictor:
             self.logger.warning("Não foi possível obter dados climáticos, usando dados apenas dos sensores")
             return sensor_data
         
-        # Criar índice por timestamp para busca rápida
-        climate_index = {c['timestamp']: c for c in climate_data}
-        
-        enriched_data = []
-        
-        for sensor_point in sensor_data:
-            enriched_point = sensor_point.copy()
-            
-            # Encontrar dados climáticos mais próximos (tolerância de 1 hora = 3600000 ms)
-            sensor_timestamp = sensor_point['timestamp']
-            closest_climate = None
-            min_diff = float('inf')
-            
-            for climate_timestamp, climate_point in climate_index.items():
-                diff = abs(climate_timestamp - sensor_timestamp)
-                if diff < min_diff and diff <= 3600000:  # 1 hora de tolerância
-                    min_diff = diff
-                    closest_climate = climate_point
-            
-            # Adicionar dados climáticos se encontrados
-            if closest_climate:
-                enriched_point.update({
-                    'temperature': closest_climate.get('temperature', 25.0),
-                    'humidity_air': closest_climate.get('humidity_air', 70.0),
-                    'precipitation': closest_climate.get('precipitation', 0.0),
-                    'wind_speed': closest_climate.get('wind_speed', 0.0),
-                    'pressure': closest_climate.get('pressure', 1013.0),
-                    'soil_temperature': closest_climate.get('soil_temperature', 25.0),
-                    'soil_moisture_ref': closest_climate.get('soil_moisture_ref', 50.0)
-                })
-            else:
-                # Usar valores padrão se não houver dados climáticos
-                enriched_point.update({
-                    'temperature': 25.0,
-                    'humidity_air': 70.0,
-                    'precipitation': 0.0,
-                    'wind_speed': 0.0,
-                    'pressure': 1013.0,
-                    'soil_temperature': 25.0,
-                    'soil_moisture_ref': 50.0
-                })
-            
-            enriched_data.append(enriched_point)
+        enriched_data = self.merge_climate_data(sensor_data, climate_data)
         
         self.logger.info(f"Dados enriquecidos: {len(enriched_data)} pontos com informações climáticas")
         return enriched_data
     
+    # Valores usados quando não há ponto climático dentro da tolerância (ou o campo falta)
+    CLIMATE_DEFAULTS = {
+        'temperature': 25.0,
+        'humidity_air': 70.0,
+        'precipitation': 0.0,
+        'wind_speed': 0.0,
+        'pressure': 1013.0,
+        'soil_temperature': 25.0,
+        'soil_moisture_ref': 50.0
+    }
+    
+    def merge_climate_data(self, sensor_data, climate_data, tolerance_ms=3600000):
+        """
+        Junta a cada leitura o ponto climático de timestamp mais próximo
+        
+        Join as-of por np.searchsorted sobre os timestamps climáticos ordenados:
+        O((N + M) log M) em vez de comparar cada leitura com todo o clima.
+        Empates ficam com o ponto mais antigo; sem ponto dentro da tolerância
+        (1 hora por padrão) entram os CLIMATE_DEFAULTS.
+        
+        Args:
+            sensor_data: lista de dicts ou DataFrame com 'timestamp' (ms)
+            climate_data: lista de dicts com 'timestamp' (ms) e as variáveis climáticas
+            
+        Returns:
+            O mesmo tipo de sensor_data, na mesma ordem, com as colunas climáticas
+        """
+        is_frame = isinstance(sensor_data, pd.DataFrame)
+        if is_frame:
+            sensor_ts = sensor_data['timestamp'].to_numpy(dtype=np.int64)
+        else:
+            sensor_ts = np.fromiter((d['timestamp'] for d in sensor_data), dtype=np.int64, count=len(sensor_data))
+        
+        climate = pd.DataFrame(climate_data)
+        if 'timestamp' in climate.columns:
+            climate = climate.dropna(subset=['timestamp'])
+            climate['timestamp'] = climate['timestamp'].astype(np.int64)
+            climate = climate.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp')
+        
+        columns = {}
+        if len(climate):
+            climate_ts = climate['timestamp'].to_numpy()
+            
+            # Vizinhos à esquerda e à direita de cada leitura; fica o mais próximo
+            right = np.searchsorted(climate_ts, sensor_ts, side='left')
+            left = np.clip(right - 1, 0, len(climate_ts) - 1)
+            right = np.clip(right, 0, len(climate_ts) - 1)
+            left_diff = np.abs(sensor_ts - climate_ts[left])
+            right_diff = np.abs(climate_ts[right] - sensor_ts)
+            nearest = np.where(right_diff < left_diff, right, left)
+            matched = np.minimum(left_diff, right_diff) <= tolerance_ms
+        else:
+            nearest = np.zeros(len(sensor_ts), dtype=np.int64)
+            matched = np.zeros(len(sensor_ts), dtype=bool)
+        
+        for field, default in self.CLIMATE_DEFAULTS.items():
+            if field in climate.columns:
+                values = pd.to_numeric(climate[field], errors='coerce').fillna(default).to_numpy(dtype=float)
+                columns[field] = np.where(matched, values[nearest], default)
+            else:
+                columns[field] = np.full(len(sensor_ts), default)
+        
+        if is_frame:
+            return sensor_data.assign(**columns)
+        
+        fields = list(columns)
+        rows = zip(*(columns[field].tolist() for field in fields))
+        return [{**point, **dict(zip(fields, values))} for point, values in zip(sensor_data, rows)]
+    
     def prepare_training_data(self, sensor_data):
         """
         Prepara dados para treinamento dos modelos
@@ -404,6 +586,7 @@ class IrrigationPredictor:
         """
         try:
             self.logger.info("Iniciando treinamento dos modelos ML...")
+            self.compiled_engine = None
             
             # Preparar dados
             X, y_irrigation, y_humidity = self.prepare_training_data(sensor_data)
@@ -538,21 +721,29 @@ class IrrigationPredictor:
     def predict_irrigation_need(self, current_conditions, horizon_hours=4):
         """
         Prediz necessidade de irrigação para as próximas horas
+        
+        Com a inferência compilada ativa (enable_compiled_inference) as
+        features e as árvores são avaliadas sem pandas nem scikit-learn, com
+        o mesmo resultado.
         """
         try:
-            # Preparar dados atuais
-            current_df = pd.DataFrame([current_conditions])
-            features = self.engineer_features(current_df)
-            
-            if len(features.columns) != len(self.feature_columns):
-                features = features.reindex(columns=self.feature_columns, fill_value=0)
-            
-            features_scaled = self.scaler.transform(features)
-            
-            # Predições
-            irrigation_prob = self.irrigation_classifier.predict_proba(features_scaled)[0]
-            irrigation_need = self.irrigation_classifier.predict(features_scaled)[0]
-            humidity_forecast = self.humidity_regressor.predict(features_scaled)[0]
+            if self.compiled_engine is not None:
+                irrigation_prob, irrigation_need, humidity_forecast = \
+                    self.compiled_engine.predict_conditions(current_conditions)
+            else:
+                # Preparar dados atuais
+                current_df = pd.DataFrame([current_conditions])
+                features = self.engineer_features(current_df)
+                
+                if len(features.columns) != len(self.feature_columns):
+                    features = features.reindex(columns=self.feature_columns, fill_value=0)
+                
+                features_scaled = self.scaler.transform(features)
+                
+                # Predições
+                irrigation_prob = self.irrigation_classifier.predict_proba(features_scaled)[0]
+                irrigation_need = self.irrigation_classifier.predict(features_scaled)[0]
+                humidity_forecast = self.humidity_regressor.predict(features_scaled)[0]
             
             # Análise de tendência
             trend_analysis = self._analyze_trend(current_conditions)
@@ -585,6 +776,22 @@ class IrrigationPredictor:
                 'confidence': 0.0
             }
     
+    def enable_compiled_inference(self):
+        """
+        Ativa a inferência compilada (Numba) em predict_irrigation_need
+        
+        Disponível só para florestas e com o numba instalado; caso contrário
+        mantém o caminho do scikit-learn e retorna False.
+        """
+        try:
+            from app.ml.compiled_inference import CompiledForestEngine
+            self.compiled_engine = CompiledForestEngine(self)
+            return True
+        except (ImportError, ValueError) as e:
+            self.logger.warning(f"Inferência compilada indisponível: {str(e)}")
+            self.compiled_engine = None
+            return False
+    
     def predict_irrigation_with_weather(self, current_conditions, current_weather, forecast_data=None):
         """
         Predição avançada considerando condições climáticas atuais e previsão
@@ -670,42 +877,82 @@ class IrrigationPredictor:
             'humidity_model': dict(zip(self.feature_columns, self.humidity_regressor.feature_importances_))
         }
     
-    def save_models(self, path_prefix='models/farmtech'):
-        """Salva os modelos treinados"""
+    def save_models(self, path_prefix='models/farmtech', compact=False):
+        """
+        Salva os modelos treinados
+        
+        Modelos, scaler, features, códigos das categorias e métricas vão em um
+        único bundle versionado (<prefixo>_bundle.joblib, ver model_bundle.py);
+        com compact=True as florestas são exportadas no formato compacto. O
+        bundle é gravado em um temporário e renomeado (os.replace), e o
+        metadata com o carimbo 'version' é gravado por último: quem observa o
+        metadata (ModelRegistry) só vê uma versão nova com os artefatos completos.
+        """
         try:
             import os
             os.makedirs(os.path.dirname(path_prefix), exist_ok=True)
             
-            joblib.dump(self.irrigation_classifier, f"{path_prefix}_irrigation.pkl")
-            joblib.dump(self.humidity_regressor, f"{path_prefix}_humidity.pkl")
-            joblib.dump(self.scaler, f"{path_prefix}_scaler.pkl")
+            self.model_version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+            bundle_file = save_bundle(
+                path_prefix, self.model_version,
+                self.irrigation_classifier, self.humidity_regressor, self.scaler,
+                self.feature_columns, self.category_codes, self.model_metrics,
+                compact=compact
+            )
             
             # Salvar metadados
-            with open(f"{path_prefix}_metadata.json", 'w') as f:
+            metadata_path = f"{path_prefix}_metadata.json"
+            with open(f"{metadata_path}.tmp", 'w') as f:
                 json.dump({
+                    'version': self.model_version,
+                    'bundle': {
+                        'file': os.path.basename(bundle_file),
+                        'format': BUNDLE_FORMAT,
+                        'compact': bool(compact)
+                    },
                     'feature_columns': self.feature_columns,
+                    'category_codes': self.category_codes,
                     'metrics': self.model_metrics
                 }, f, indent=2)
+            os.replace(f"{metadata_path}.tmp", metadata_path)
             
-            self.logger.info(f"Modelos salvos em {path_prefix}")
+            self.logger.info(f"Modelos salvos em {path_prefix} (versão {self.model_version})")
             return True
             
         except Exception as e:
             self.logger.error(f"Erro ao salvar modelos: {str(e)}")
             return False
     
-    def load_models(self, path_prefix='models/farmtech'):
-        """Carrega modelos salvos"""
+    def load_models(self, path_prefix='models/farmtech', mmap_mode=None):
+        """
+        Carrega modelos salvos
+        
+        Lê o bundle quando o metadata aponta para um (mmap_mode='r' mapeia os
+        arrays em vez de copiá-los); modelos salvos antes do bundle são lidos
+        dos arquivos separados (_irrigation.pkl, _humidity.pkl, _scaler.pkl).
+        Modelos mapeados são somente leitura: não use mmap_mode para retreinar.
+        """
         try:
-            self.irrigation_classifier = joblib.load(f"{path_prefix}_irrigation.pkl")
-            self.humidity_regressor = joblib.load(f"{path_prefix}_humidity.pkl")
-            self.scaler = joblib.load(f"{path_prefix}_scaler.pkl")
-            
-            # Carregar metadados
+            self.compiled_engine = None
             with open(f"{path_prefix}_metadata.json", 'r') as f:
                 metadata = json.load(f)
-                self.feature_columns = metadata['feature_columns']
-                self.model_metrics = metadata['metrics']
+            
+            if 'bundle' in metadata:
+                bundle = load_bundle(path_prefix, mmap_mode=mmap_mode)
+                self.irrigation_classifier = bundle['irrigation_model']
+                self.humidity_regressor = bundle['humidity_model']
+                self.scaler = bundle['scaler']
+                metadata = bundle
+            else:
+                self.irrigation_classifier = joblib.load(f"{path_prefix}_irrigation.pkl")
+                self.humidity_regressor = joblib.load(f"{path_prefix}_humidity.pkl")
+                self.scaler = joblib.load(f"{path_prefix}_scaler.pkl")
+            
+            self.feature_columns = metadata['feature_columns']
+            self.model_metrics = metadata['metrics']
+            # Modelos antigos não salvavam os códigos: usam a ordem padrão (alfabética)
+            self.category_codes = metadata.get('category_codes', self.DEFAULT_CATEGORY_CODES)
+            self.model_version = metadata.get('version')
             
             self.logger.info(f"Modelos carregados de {path_prefix}")
             return True
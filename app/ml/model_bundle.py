@@ -0,0 +1,186 @@
+# app/ml/model_bundle.py
+
+"""
+Bundle versionado dos modelos de irrigação
+
+Um único arquivo joblib (<prefixo>_bundle.joblib) com os dois modelos, o
+scaler, as colunas de features, os códigos das categorias e as métricas,
+gravado sem compressão para poder ser carregado com mmap_mode='r': os arrays
+ficam no page cache e são compartilhados entre os workers do gunicorn em vez
+de copiados para a memória de cada processo.
+
+As árvores do scikit-learn copiam seus nós para memória própria ao serem
+desserializadas, então só o formato compacto (compact=True) aproveita o
+mmap de verdade: cada floresta vira poucos arrays planos com os nós de todas
+as árvores (CompactForestClassifier / CompactForestRegressor), com as mesmas
+predições da floresta original e uma fração da memória. Modelos que não são
+florestas (GradientBoosting da busca, SGD do treino incremental) são
+gravados como estão.
+"""
+
+import os
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor
+
+BUNDLE_FORMAT = 1
+
+class CompactForest:
+    """
+    Nós de todas as árvores de uma floresta em arrays planos
+
+    children_left/children_right usam índices globais (-1 nas folhas) e
+    roots guarda o nó raiz de cada árvore. value traz, por nó, a predição da
+    árvore naquele nó (probabilidades no classificador, média no regressor).
+    """
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        def children(tree, offset, side):
+            nodes = getattr(tree, side)
+            return np.where(nodes < 0, -1, nodes + offset)
+
+        self.roots = offsets.astype(np.int32)
+        self.children_left = np.concatenate([children(t, o, 'children_left') for t, o in zip(trees, offsets)]).astype(np.int32)
+        self.children_right = np.concatenate([children(t, o, 'children_right') for t, o in zip(trees, offsets)]).astype(np.int32)
+        # Folhas apontam para a feature 0 (o resultado da comparação é ignorado nelas)
+        self.feature = np.concatenate([np.maximum(t.feature, 0) for t in trees]).astype(np.int32)
+        self.threshold = np.concatenate([t.threshold for t in trees]).astype(np.float64)
+        self.missing_go_to_left = np.concatenate([
+            getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=np.uint8)) for t in trees
+        ]).astype(bool)
+        self.value = np.concatenate([self._node_values(t) for t in trees])
+        self.max_depth = max(t.max_depth for t in trees)
+        self.n_features_in_ = forest.n_features_in_
+        self.feature_importances_ = np.asarray(forest.feature_importances_)
+        self.n_jobs = None
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in (
+            'roots', 'children_left', 'children_right', 'feature', 'threshold', 'missing_go_to_left', 'value'
+        ))
+
+    def apply(self, X):
+        """
+        Folha alcançada por cada linha em cada árvore: matriz (n_linhas, n_árvores) de índices globais
+
+        Percorre todas as árvores ao mesmo tempo, um nível por iteração, com a
+        mesma regra do scikit-learn: X em float32, x <= threshold vai para a
+        esquerda e NaN segue missing_go_to_left.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+
+        for _ in range(self.max_depth):
+            left = self.children_left[nodes]
+            internal = left >= 0
+            if not internal.any():
+                break
+            x = X[rows, self.feature[nodes]]
+            go_left = (x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_go_to_left[nodes])
+            nodes = np.where(internal, np.where(go_left, left, self.children_right[nodes]), nodes)
+        return nodes
+
+    def _average(self, leaves):
+        """Média das árvores somando na ordem das árvores, como o predict_proba/predict da floresta"""
+        total = np.zeros((leaves.shape[0],) + self.value.shape[1:], dtype=np.float64)
+        for column in range(leaves.shape[1]):
+            total += self.value[leaves[:, column]]
+        total /= leaves.shape[1]
+        return total
+
+class CompactForestClassifier(CompactForest):
+
+    def __init__(self, forest):
+        super().__init__(forest)
+        self.classes_ = np.asarray(forest.classes_)
+
+    @staticmethod
+    def _node_values(tree):
+        # Mesma normalização de DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        return value / normalizer
+
+    def predict_proba(self, X):
+        return self._average(self.apply(X))
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    def predict_tree_proba(self, X, column):
+        """Probabilidade da classe na posição column em cada árvore: matriz (n_linhas, n_árvores)"""
+        return self.value[self.apply(X), column]
+
+class CompactForestRegressor(CompactForest):
+
+    @staticmethod
+    def _node_values(tree):
+        return tree.value[:, 0, 0].astype(np.float64)
+
+    def predict(self, X):
+        return self._average(self.apply(X))
+
+def compact_model(model):
+    """Versão compacta de uma floresta ou o próprio modelo quando não é uma floresta"""
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        return CompactForestClassifier(model)
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        return CompactForestRegressor(model)
+    return model
+
+def bundle_path(path_prefix):
+    return f"{path_prefix}_bundle.joblib"
+
+def save_bundle(path_prefix, version, irrigation_model, humidity_model, scaler,
+                feature_columns, category_codes, metrics, compact=False):
+    """
+    Grava o bundle em um temporário e renomeia (os.replace)
+
+    Processos que já mapearam o arquivo anterior continuam lendo o inode
+    antigo até recarregarem.
+
+    Returns:
+        str: caminho do bundle gravado
+    """
+    if compact:
+        irrigation_model = compact_model(irrigation_model)
+        humidity_model = compact_model(humidity_model)
+
+    path = bundle_path(path_prefix)
+    joblib.dump({
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'compact': bool(compact),
+        'irrigation_model': irrigation_model,
+        'humidity_model': humidity_model,
+        'scaler': scaler,
+        'feature_columns': list(feature_columns),
+        'category_codes': category_codes,
+        'metrics': metrics
+    }, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    return path
+
+def load_bundle(path_prefix, mmap_mode=None):
+    """
+    Lê o bundle (mmap_mode='r' mapeia os arrays em vez de copiá-los)
+
+    Raises:
+        ValueError: formato de bundle desconhecido
+    """
+    bundle = joblib.load(bundle_path(path_prefix), mmap_mode=mmap_mode)
+    if bundle.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Formato de bundle não suportado: {bundle.get('format')}")
+    return bundle
@@ -0,0 +1,112 @@
+# app/ml/model_registry.py
+
+"""
+Registro de modelos residente no processo
+
+Carrega os artefatos salvos por IrrigationPredictor.save_models uma única vez e
+os mantém em memória. A cada consulta (no máximo uma vez por check_interval
+segundos) compara o carimbo da versão em disco (campo 'version' e mtime de
+<prefixo>_metadata.json); quando muda, carrega a nova versão em um predictor
+novo e troca a referência de forma atômica. Requisições em andamento seguem
+usando o predictor antigo, que nunca é alterado depois de carregado.
+
+Com mmap_mode='r' o bundle (app/ml/model_bundle.py) é mapeado em memória e
+os workers do gunicorn compartilham os arrays pelo page cache. Com
+compiled=True cada versão carregada já ativa a inferência compilada.
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from datetime import datetime
+
+from app.ml.irrigation_predictor import IrrigationPredictor
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+
+    def __init__(self, path_prefix='models/farmtech', check_interval=2.0, mmap_mode=None, compiled=False):
+        self.path_prefix = path_prefix
+        self.check_interval = check_interval
+        self.mmap_mode = mmap_mode
+        self.compiled = compiled
+
+        self._lock = threading.Lock()
+        self._predictor = None
+        self._stamp = None
+        self._version = None
+        self._loaded_at = None
+        self._load_seconds = None
+        self._last_check = 0.0
+        self._last_error = None
+        self._reloads = 0
+
+    @property
+    def metadata_path(self):
+        return f"{self.path_prefix}_metadata.json"
+
+    def _read_stamp(self):
+        """Carimbo da versão em disco: (version do metadata, mtime) ou None se não há modelo"""
+        try:
+            mtime = os.path.getmtime(self.metadata_path)
+            with open(self.metadata_path, 'r') as f:
+                version = json.load(f).get('version')
+        except (OSError, ValueError):
+            return None
+        return (version, mtime)
+
+    def get_predictor(self):
+        """
+        Retorna o predictor carregado (ou None se não há modelo treinado)
+
+        Recarrega automaticamente quando uma nova versão é salva em disco.
+        """
+        if time.monotonic() - self._last_check >= self.check_interval or self._predictor is None:
+            self.refresh()
+        return self._predictor
+
+    def refresh(self, force=False):
+        """Verifica o carimbo em disco e recarrega os modelos se a versão mudou"""
+        with self._lock:
+            self._last_check = time.monotonic()
+            stamp = self._read_stamp()
+            if stamp is None or (stamp == self._stamp and not force):
+                return self._predictor is not None
+
+            inicio = time.perf_counter()
+            predictor = IrrigationPredictor()
+            if not predictor.load_models(self.path_prefix, mmap_mode=self.mmap_mode):
+                # Mantém a versão anterior (ex.: arquivos ainda sendo gravados) e tenta de novo depois
+                self._last_error = f"Falha ao carregar modelos de {self.path_prefix}"
+                return self._predictor is not None
+            if self.compiled:
+                predictor.enable_compiled_inference()
+
+            # Troca atômica: leitores pegam a referência antiga ou a nova, nunca um estado parcial
+            self._predictor = predictor
+            self._stamp = stamp
+            self._version = stamp[0] or datetime.fromtimestamp(stamp[1]).strftime('%Y%m%d%H%M%S')
+            self._loaded_at = datetime.now()
+            self._load_seconds = time.perf_counter() - inicio
+            self._last_error = None
+            self._reloads += 1
+
+            logger.info(f"Modelo {self._version} carregado em {self._load_seconds:.3f}s")
+            return True
+
+    def status(self):
+        """Versão carregada, horário e duração da carga"""
+        return {
+            'loaded': self._predictor is not None,
+            'version': self._version,
+            'loaded_at': self._loaded_at.isoformat() if self._loaded_at else None,
+            'load_seconds': round(self._load_seconds, 4) if self._load_seconds is not None else None,
+            'reloads': self._reloads,
+            'path_prefix': self.path_prefix,
+            'mmap_mode': self.mmap_mode,
+            'compiled_inference': self._predictor is not None and self._predictor.compiled_engine is not None,
+            'last_error': self._last_error
+        }
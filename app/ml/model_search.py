@@ -0,0 +1,240 @@
+# app/ml/model_search.py
+
+"""
+Busca de hiperparâmetros dos modelos de irrigação
+
+Validação cruzada de configurações de RandomForest e GradientBoosting para o
+classificador de irrigação e o regressor de umidade, usando todos os núcleos:
+cada par (candidato, fold) é um ajuste independente executado em um pool de
+processos do joblib (loky), com um único núcleo por modelo para não haver
+disputa entre processos.
+
+As features são extraídas uma única vez e os folds (matrizes normalizadas de
+treino e teste) são montados antes da busca e compartilhados por todos os
+candidatos; o joblib repassa as matrizes grandes aos processos por memmap,
+sem cópia por tarefa.
+
+O vencedor de cada modelo é reajustado com todos os dados e instalado no
+IrrigationPredictor, então save_models grava o layout de sempre
+(models/farmtech_*) e load_models/ModelRegistry continuam funcionando.
+"""
+
+import os
+import time
+import logging
+from itertools import product
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import (
+    RandomForestClassifier, RandomForestRegressor, GradientBoostingClassifier, GradientBoostingRegressor
+)
+from sklearn.metrics import accuracy_score, mean_absolute_error
+from sklearn.model_selection import StratifiedKFold, KFold
+from sklearn.preprocessing import StandardScaler
+from datetime import datetime
+
+from app.ml.irrigation_predictor import IrrigationPredictor
+
+# Parâmetros fixos de cada família (os da busca se somam a estes)
+BASE_PARAMS = {
+    'random_forest': {'random_state': 42, 'max_features': 'sqrt', 'min_samples_split': 10, 'n_jobs': 1},
+    'gradient_boosting': {'random_state': 42, 'subsample': 0.8}
+}
+
+DEFAULT_PARAM_GRID = {
+    'random_forest': {
+        'n_estimators': [50, 100, 200],
+        'max_depth': [5, 10, None],
+        'min_samples_leaf': [1, 5]
+    },
+    'gradient_boosting': {
+        'n_estimators': [100, 200],
+        'learning_rate': [0.05, 0.1],
+        'max_depth': [2, 3]
+    }
+}
+
+ESTIMATORS = {
+    'irrigation': {'random_forest': RandomForestClassifier, 'gradient_boosting': GradientBoostingClassifier},
+    'humidity': {'random_forest': RandomForestRegressor, 'gradient_boosting': GradientBoostingRegressor}
+}
+
+def expand_grid(param_grid):
+    """Lista de candidatos (família, parâmetros) a partir da grade"""
+    candidates = []
+    for family, grid in param_grid.items():
+        names = sorted(grid)
+        for values in product(*(grid[name] for name in names)):
+            candidates.append((family, dict(zip(names, values))))
+    return candidates
+
+def _fit_and_score(task, estimator, X_train, y_train, X_test, y_test):
+    """Ajusta um candidato em um fold (executado nos processos do pool)"""
+    start = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    predicted = estimator.predict(X_test)
+    if task == 'irrigation':
+        score = accuracy_score(y_test, predicted)
+    else:
+        score = -mean_absolute_error(y_test, predicted)
+    return score, time.perf_counter() - start
+
+class ModelSearch:
+
+    def __init__(self, predictor=None, param_grid=None, cv=5, n_jobs=-1, random_state=42):
+        """
+        Args:
+            predictor: IrrigationPredictor que recebe os vencedores (novo se None)
+            param_grid: {'random_forest': {...}, 'gradient_boosting': {...}} (padrão: DEFAULT_PARAM_GRID)
+            cv: número de folds
+            n_jobs: processos do pool (-1 = todos os núcleos)
+        """
+        self.predictor = predictor or IrrigationPredictor()
+        self.param_grid = param_grid or DEFAULT_PARAM_GRID
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.logger = logging.getLogger(__name__)
+
+    def _build_estimator(self, task, family, params, class_weight=None):
+        estimator_params = {**BASE_PARAMS[family], **params}
+        if task == 'irrigation' and family == 'random_forest' and class_weight:
+            estimator_params['class_weight'] = class_weight
+        return ESTIMATORS[task][family](**estimator_params)
+
+    def _build_folds(self, X, y_irrigation, y_humidity):
+        """
+        Folds normalizados uma única vez e reaproveitados por todos os candidatos
+
+        O scaler de cada fold é ajustado só com o treino do fold.
+        """
+        min_class_size = int(pd.Series(y_irrigation).value_counts().min())
+        splits = {
+            'irrigation': StratifiedKFold(n_splits=max(2, min(self.cv, min_class_size)), shuffle=True,
+                                          random_state=self.random_state).split(X, y_irrigation),
+            'humidity': KFold(n_splits=self.cv, shuffle=True, random_state=self.random_state).split(X)
+        }
+        targets = {'irrigation': y_irrigation, 'humidity': y_humidity}
+
+        folds = {}
+        for task, split in splits.items():
+            folds[task] = []
+            for train_index, test_index in split:
+                scaler = StandardScaler().fit(X[train_index])
+                folds[task].append((
+                    scaler.transform(X[train_index]), targets[task][train_index],
+                    scaler.transform(X[test_index]), targets[task][test_index]
+                ))
+        return folds
+
+    def run(self, sensor_data):
+        """
+        Executa a busca, instala os vencedores no predictor e retorna o relatório
+
+        Returns:
+            dict: candidatos com pontuação média/desvio e tempo (wall-clock) por modelo,
+                  vencedores e as métricas gravadas em predictor.model_metrics
+        """
+        start = time.perf_counter()
+        predictor = self.predictor
+
+        # Features extraídas uma vez para toda a busca
+        X_frame, y_irrigation, y_humidity = predictor.prepare_training_data(sensor_data)
+        if y_irrigation.nunique() < 2:
+            self.logger.warning("⚠️ APENAS UMA CLASSE DETECTADA - Criando dados balanceados")
+            X_frame, y_irrigation, y_humidity = predictor._create_balanced_data(X_frame, y_irrigation, y_humidity)
+            if y_irrigation.nunique() < 2:
+                raise ValueError("Impossível treinar modelo de classificação com apenas uma classe")
+
+        class_counts = y_irrigation.value_counts()
+        class_weight = 'balanced' if class_counts.max() / class_counts.min() > 5 else None
+
+        X = X_frame.to_numpy(dtype=np.float64)
+        targets = {'irrigation': y_irrigation.to_numpy(), 'humidity': y_humidity.to_numpy(dtype=np.float64)}
+        folds = self._build_folds(X, targets['irrigation'], targets['humidity'])
+
+        candidates = expand_grid(self.param_grid)
+        tasks = [
+            (task, index, fold_index)
+            for task in ('irrigation', 'humidity')
+            for index in range(len(candidates))
+            for fold_index in range(len(folds[task]))
+        ]
+        self.logger.info(f"Busca: {len(candidates)} candidatos x {len(tasks)} ajustes em {self.n_jobs} processos")
+
+        results = Parallel(n_jobs=self.n_jobs, backend='loky')(
+            delayed(_fit_and_score)(
+                task,
+                self._build_estimator(task, *candidates[index], class_weight=class_weight),
+                *folds[task][fold_index]
+            )
+            for task, index, fold_index in tasks
+        )
+
+        report = {'irrigation': [], 'humidity': []}
+        scores = {}
+        for (task, index, _), (score, seconds) in zip(tasks, results):
+            entry = scores.setdefault((task, index), {'scores': [], 'seconds': 0.0})
+            entry['scores'].append(score)
+            entry['seconds'] += seconds
+
+        for (task, index), entry in scores.items():
+            family, params = candidates[index]
+            fold_scores = np.array(entry['scores'])
+            report[task].append({
+                'family': family,
+                'params': params,
+                'score_mean': float(fold_scores.mean()),
+                'score_std': float(fold_scores.std()),
+                'seconds': round(entry['seconds'], 3)
+            })
+        for task in report:
+            report[task].sort(key=lambda c: c['score_mean'], reverse=True)
+
+        # Vencedores reajustados com todos os dados, usando todos os núcleos
+        # Scaler ajustado no DataFrame, como em train_models (guarda os nomes das features)
+        predictor.scaler = StandardScaler()
+        X_scaled = predictor.scaler.fit_transform(X_frame)
+        best = {}
+        for task, attribute in (('irrigation', 'irrigation_classifier'), ('humidity', 'humidity_regressor')):
+            winner = report[task][0]
+            estimator = self._build_estimator(task, winner['family'], winner['params'], class_weight=class_weight)
+            if 'n_jobs' in estimator.get_params():
+                estimator.set_params(n_jobs=-1)
+            estimator.fit(X_scaled, targets[task])
+            setattr(predictor, attribute, estimator)
+            best[task] = winner
+
+        predicted_classes = np.unique(predictor.irrigation_classifier.predict(X_scaled))
+        feature_columns = predictor.feature_columns
+        predictor.model_metrics = {
+            'irrigation_accuracy': best['irrigation']['score_mean'],
+            'irrigation_cv_mean': best['irrigation']['score_mean'],
+            'irrigation_cv_std': best['irrigation']['score_std'],
+            'humidity_mae': -best['humidity']['score_mean'],
+            'humidity_cv_mean': -best['humidity']['score_mean'],
+            'humidity_cv_std': best['humidity']['score_std'],
+            'last_trained': datetime.now().isoformat(),
+            'training_samples': len(X),
+            'class_distribution': class_counts.to_dict(),
+            'predicted_classes': predicted_classes.tolist(),
+            'feature_importance_irrigation': dict(zip(feature_columns, predictor.irrigation_classifier.feature_importances_)),
+            'feature_importance_humidity': dict(zip(feature_columns, predictor.humidity_regressor.feature_importances_)),
+            'search': {
+                'irrigation': {'family': best['irrigation']['family'], 'params': best['irrigation']['params']},
+                'humidity': {'family': best['humidity']['family'], 'params': best['humidity']['params']},
+                'candidates': len(candidates),
+                'folds': {task: len(folds[task]) for task in folds}
+            }
+        }
+
+        return {
+            'candidates': report,
+            'best': best,
+            'metrics': predictor.model_metrics,
+            'fits': len(tasks),
+            'n_jobs': self.n_jobs if self.n_jobs > 0 else os.cpu_count(),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
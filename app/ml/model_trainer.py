@@ -7,6 +7,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 from app.ml.irrigation_predictor import IrrigationPredictor
 from app.services.sql_db_service import SQLDatabaseService
 from datetime import datetime, timedelta
+from sqlalchemy import select, case, or_, type_coerce, String
+import pandas as pd
 import logging
 
 class ModelTrainer:
@@ -19,91 +21,147 @@ class ModelTrainer:
         self.predictor = IrrigationPredictor()
         self.logger = logging.getLogger(__name__)
     
-    def collect_training_data(self, days_back=30, min_samples=50):
+    # Valores de uma métrica ausente no intervalo (mesmos padrões do agrupamento anterior)
+    TRAINING_DEFAULTS = {
+        'umidade': 0.0,
+        'ph': 7.0,
+        'fosforo': 0,
+        'potassio': 0,
+        'irrigacao': 0
+    }
+    
+    def collect_training_frame(self, days_back=30, min_samples=50, time_bucket='1min', chunksize=50000,
+                               after_id=None, until_id=None):
         """
-        Coleta dados de treinamento do banco de dados
+        Coleta dados de treinamento em formato colunar
+        
+        Uma única consulta para todos os sensores ativos, lida em blocos
+        direto para DataFrames. As leituras de cada sensor são agrupadas por intervalo de
+        tempo (time_bucket, alias de frequência do pandas) em vez do timestamp
+        exato, então umidade e pH gravados com microssegundos de diferença
+        caem no mesmo registro. Dentro de um intervalo vale a leitura mais
+        recente de cada métrica.
         
         Args:
             days_back (int): Dias anteriores para coletar dados
             min_samples (int): Número mínimo de amostras necessárias
+            time_bucket (str): Tamanho do intervalo de agrupamento (ex.: '1min', '5min')
+            chunksize (int): Linhas lidas do banco por bloco
+            after_id (int): Só leituras com id maior que este (treino incremental)
+            until_id (int): Só leituras com id até este
             
         Returns:
-            list: Dados formatados para treinamento
+            DataFrame: timestamp (ms, início do intervalo), sensor_id e as métricas,
+                       pronto para IrrigationPredictor.prepare_training_data
+                       (vazio se não há dados suficientes)
         """
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_back)
+        from app.models.sensor_models import Sensor, LeituraSensor
         
-        # Buscar leituras de todos os sensores ativos
-        all_data = []
+        columns = ['timestamp', 'sensor_id'] + list(self.TRAINING_DEFAULTS)
+        
+        # Texto original só das linhas legadas (sem valor tipado), que precisam ser normalizadas
+        legacy = or_(LeituraSensor.metrica.is_(None), LeituraSensor.valor_numerico.is_(None))
+        query = select(
+            # data_hora sem o conversor linha a linha do SQLAlchemy: vem como o driver entrega
+            # (datetime ou texto ISO no SQLite) e é convertida de uma vez por pd.to_datetime
+            LeituraSensor.sensor_id, type_coerce(LeituraSensor.data_hora, String).label('data_hora'),
+            LeituraSensor.metrica, LeituraSensor.valor_numerico,
+            case((legacy, LeituraSensor.valor)).label('valor'),
+            case((legacy, LeituraSensor.unidade)).label('unidade')
+        ).join(Sensor, Sensor.id == LeituraSensor.sensor_id).where(Sensor.ativo == True)
+        
+        # Janela de dias (days_back=None: sem limite de data) e/ou faixa de ids
+        if days_back is not None:
+            end_date = datetime.now()
+            query = query.where(LeituraSensor.data_hora >= end_date - timedelta(days=days_back),
+                                LeituraSensor.data_hora <= end_date)
+        if after_id is not None:
+            query = query.where(LeituraSensor.id > after_id)
+        if until_id is not None:
+            query = query.where(LeituraSensor.id <= until_id)
         
         try:
-            # Obter sensores ativos
-            session = self.sql_db.get_session()
-            from app.models.sensor_models import Sensor, LeituraSensor
-            
-            sensors = session.query(Sensor).filter_by(ativo=True).all()
+            parts = []
+            with self.sql_db.engine.connect() as conn:
+                # Cursor no servidor, lido em blocos de chunksize linhas (equivalente ao
+                # pd.read_sql(chunksize=...), sem depender da versão mínima do SQLAlchemy exigida pelo pandas)
+                result = conn.execution_options(stream_results=True, yield_per=chunksize).execute(query)
+                fields = list(result.keys())
+                for rows in result.partitions():
+                    chunk = pd.DataFrame.from_records(rows, columns=fields)
+                    parts.append(self._typed_readings(chunk, time_bucket))
             
-            for sensor in sensors:
-                leituras = session.query(LeituraSensor).filter(
-                    LeituraSensor.sensor_id == sensor.id,
-                    LeituraSensor.data_hora >= start_date,
-                    LeituraSensor.data_hora <= end_date
-                ).order_by(LeituraSensor.data_hora).all()
+            readings = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+            if readings.empty:
+                frame = pd.DataFrame(columns=columns)
+            else:
+                # Última leitura de cada métrica por sensor e intervalo
+                readings = readings.sort_values('data_hora', kind='stable')
+                frame = readings.groupby(['sensor_id', 'bucket', 'metrica'], sort=True)['valor_numerico'].last().unstack('metrica')
+                frame = frame.reindex(columns=list(self.TRAINING_DEFAULTS)).fillna(self.TRAINING_DEFAULTS).reset_index()
                 
-                # Agrupar leituras por timestamp (assumindo que cada timestamp tem múltiplas leituras)
-                grouped_data = {}
-                
-                for leitura in leituras:
-                    timestamp = int(leitura.data_hora.timestamp() * 1000)
-                    
-                    if timestamp not in grouped_data:
-                        grouped_data[timestamp] = {
-                            'timestamp': timestamp,
-                            'umidade': 0,
-                            'ph': 7.0,
-                            'fosforo': 0,
-                            'potassio': 0,
-                            'irrigacao': 0
-                        }
-                    
-                    # Mapear leituras por unidade
-                    if leitura.unidade == '%':
-                        grouped_data[timestamp]['umidade'] = float(leitura.valor)
-                    elif leitura.unidade == 'pH':
-                        grouped_data[timestamp]['ph'] = float(leitura.valor)
-                    elif leitura.unidade == 'ppm':
-                        try:
-                            import json
-                            nutrientes = json.loads(leitura.valor)
-                            grouped_data[timestamp]['fosforo'] = nutrientes.get('P', 0)
-                            grouped_data[timestamp]['potassio'] = nutrientes.get('K', 0)
-                        except:
-                            pass
-                
-                # Adicionar dados agrupados
-                all_data.extend(list(grouped_data.values()))
-            
-            session.close()
+                # Mesmo instante em ms usado no restante do pipeline (hora local, como datetime.timestamp())
+                epoch_ms = {bucket: int(bucket.to_pydatetime().timestamp() * 1000) for bucket in frame['bucket'].unique()}
+                frame['timestamp'] = frame['bucket'].map(epoch_ms).astype('int64')
+                frame = frame[columns]
             
-            if len(all_data) < min_samples:
-                self.logger.warning(f"Dados insuficientes: {len(all_data)} < {min_samples}")
-                return []
+            if len(frame) < min_samples:
+                self.logger.warning(f"Dados insuficientes: {len(frame)} < {min_samples}")
+                return pd.DataFrame(columns=columns)
             
-            self.logger.info(f"Coletados {len(all_data)} registros para treinamento")
-            return all_data
+            self.logger.info(f"Coletados {len(frame)} registros para treinamento")
+            return frame
             
         except Exception as e:
             self.logger.error(f"Erro ao coletar dados de treinamento: {str(e)}")
-            return []
+            return pd.DataFrame(columns=columns)
+    
+    def _typed_readings(self, chunk, time_bucket):
+        """Reduz um bloco de leituras a (sensor_id, data_hora, bucket, metrica, valor_numerico)"""
+        from app.models.sensor_models import expandir_leitura
+        
+        chunk['data_hora'] = pd.to_datetime(chunk['data_hora'], format='ISO8601')
+        typed = chunk['metrica'].notna() & chunk['valor_numerico'].notna()
+        readings = chunk.loc[typed, ['sensor_id', 'data_hora', 'metrica', 'valor_numerico']]
+        
+        # Linhas legadas (só texto) ainda não migradas: normalizadas uma a uma
+        legacy = chunk.loc[~typed]
+        if len(legacy):
+            expanded = []
+            for sensor_id, data_hora, valor, unidade in legacy[['sensor_id', 'data_hora', 'valor', 'unidade']].itertuples(index=False):
+                try:
+                    linhas = expandir_leitura(valor, unidade)
+                except (ValueError, SyntaxError):
+                    continue
+                expanded.extend((sensor_id, data_hora, metrica, numero) for metrica, numero, _ in linhas)
+            if expanded:
+                readings = pd.concat([readings, pd.DataFrame(expanded, columns=readings.columns)], ignore_index=True)
+        
+        readings = readings[readings['metrica'].isin(list(self.TRAINING_DEFAULTS))]
+        return readings.assign(bucket=readings['data_hora'].dt.floor(time_bucket))
+    
+    def collect_training_data(self, days_back=30, min_samples=50, time_bucket='1min'):
+        """
+        Coleta dados de treinamento do banco de dados
+        
+        Args:
+            days_back (int): Dias anteriores para coletar dados
+            min_samples (int): Número mínimo de amostras necessárias
+            time_bucket (str): Tamanho do intervalo de agrupamento (ver collect_training_frame)
+            
+        Returns:
+            list: Dados formatados para treinamento
+        """
+        return self.collect_training_frame(days_back, min_samples, time_bucket).to_dict('records')
     
     def train_with_climate_data(self, days_back=30):
         """
         Treina modelos incluindo dados climáticos históricos
         """
         # Coletar dados dos sensores
-        sensor_data = self.collect_training_data(days_back)
+        sensor_data = self.collect_training_frame(days_back)
         
-        if not sensor_data:
+        if sensor_data.empty:
             raise ValueError("Nenhum dado de sensor disponível para treinamento")
         
         # Enriquecer com dados climáticos
@@ -0,0 +1,228 @@
+# app/ml/online_learning.py
+
+"""
+Treinamento incremental (online) dos modelos de irrigação
+
+Alternativa ao retreinamento completo: em vez de reler 30 dias de leituras e
+ajustar tudo do zero, cada atualização consome só as leituras gravadas desde
+o último checkpoint (faixa de ids de leitura_sensor) e ajusta modelos que
+aprendem por partial_fit:
+
+    - irrigação: SGDClassifier (regressão logística, com predict_proba)
+    - umidade: SGDRegressor
+    - normalização: StandardScaler.partial_fit (média/variância acumuladas)
+
+O custo de cada atualização é proporcional às leituras novas, não ao tamanho
+do histórico. Antes de aprender com um lote o modelo é avaliado nele
+(validação progressiva), e essas métricas acumuladas vão para o metadata.
+
+O checkpoint usa o mesmo layout de IrrigationPredictor.save_models com o
+prefixo ML_ONLINE_MODEL_PATH_PREFIX (padrão models/farmtech_online); o estado
+incremental (último id consumido, amostras, contagem de classes) fica em
+metrics['online']. Para servir o modelo incremental, aponte
+ML_MODEL_PATH_PREFIX para o mesmo prefixo: o ModelRegistry recarrega cada
+checkpoint novo.
+
+Execução periódica: app/scripts/online_update.py --interval <segundos>.
+"""
+
+import os
+import time
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.metrics import accuracy_score, mean_absolute_error
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import select, func
+
+from app.ml.irrigation_predictor import IrrigationPredictor
+from app.ml.model_trainer import ModelTrainer
+
+IRRIGATION_CLASSES = np.array([0, 1])
+
+class OnlineTrainer:
+
+    def __init__(self, sql_db_service, path_prefix=None, time_bucket='1min', bootstrap_days=30,
+                 min_samples=10, batch_size=5000, epochs=1, random_state=42):
+        """
+        Args:
+            sql_db_service: SQLDatabaseService de onde vêm as leituras
+            path_prefix: prefixo do checkpoint (padrão: ML_ONLINE_MODEL_PATH_PREFIX)
+            time_bucket: intervalo que agrupa as leituras de um sensor (ver ModelTrainer.collect_training_frame)
+            bootstrap_days: dias de histórico usados na primeira atualização (sem checkpoint)
+            min_samples: registros mínimos para uma atualização; com menos, as leituras
+                         ficam para a próxima execução
+            batch_size: linhas por chamada de partial_fit
+            epochs: passadas sobre as leituras novas em cada atualização
+        """
+        self.sql_db = sql_db_service
+        self.path_prefix = path_prefix or os.getenv('ML_ONLINE_MODEL_PATH_PREFIX') or 'models/farmtech_online'
+        self.time_bucket = time_bucket
+        self.bootstrap_days = bootstrap_days
+        self.min_samples = max(int(min_samples), 10)  # mínimo de prepare_training_data
+        self.batch_size = max(int(batch_size), 1)
+        self.epochs = max(int(epochs), 1)
+        self.random_state = random_state
+        self.trainer = ModelTrainer(sql_db_service)
+        self.logger = logging.getLogger(__name__)
+
+    def new_predictor(self):
+        """Predictor com modelos incrementais ainda não ajustados"""
+        predictor = IrrigationPredictor()
+        predictor.irrigation_classifier = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=self.random_state)
+        predictor.humidity_regressor = SGDRegressor(alpha=1e-4, random_state=self.random_state)
+        predictor.scaler = StandardScaler()
+        predictor.model_metrics = {
+            'irrigation_accuracy': 0.0,
+            'humidity_mae': 0.0,
+            'last_trained': None,
+            'training_samples': 0,
+            'online': {
+                'last_reading_id': None,
+                'updates': 0,
+                'evaluated_samples': 0,
+                'class_counts': {'0': 0, '1': 0}
+            }
+        }
+        return predictor
+
+    def load_checkpoint(self):
+        """Último checkpoint incremental (ou um predictor novo se ainda não existe)"""
+        if os.path.exists(f"{self.path_prefix}_metadata.json"):
+            predictor = IrrigationPredictor()
+            if predictor.load_models(self.path_prefix) and 'online' in predictor.model_metrics:
+                return predictor
+            self.logger.warning(f"Checkpoint em {self.path_prefix} não é incremental ou está incompleto, recomeçando")
+        return self.new_predictor()
+
+    def _watermark(self, after_id):
+        """
+        Maior id de leitura a consumir agora
+
+        Leituras do intervalo de tempo ainda aberto ficam para a próxima
+        execução, para que um registro não seja partido entre duas atualizações.
+        """
+        from app.models.sensor_models import LeituraSensor
+
+        open_bucket = pd.Timestamp(datetime.now()).floor(self.time_bucket).to_pydatetime()
+        query = select(func.max(LeituraSensor.id)).where(LeituraSensor.data_hora < open_bucket)
+        if after_id is not None:
+            query = query.where(LeituraSensor.id > after_id)
+        with self.sql_db.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def _sample_weights(self, y, class_counts):
+        """Pesos inversos à frequência acumulada de cada classe (equivalente online de class_weight='balanced')"""
+        present = {int(c): n for c, n in class_counts.items() if n}
+        total = sum(present.values())
+        weights = {c: total / (len(present) * n) for c, n in present.items()}
+        return np.array([weights[int(c)] for c in y])
+
+    def update(self):
+        """
+        Consome as leituras novas, atualiza os modelos e grava o checkpoint
+
+        Returns:
+            dict: updated, motivo (se não atualizou), amostras do lote, faixa de ids,
+                  métricas progressivas do lote e tempo total
+        """
+        start = time.perf_counter()
+        predictor = self.load_checkpoint()
+        state = predictor.model_metrics['online']
+        after_id = state['last_reading_id']
+
+        until_id = self._watermark(after_id)
+        if until_id is None:
+            return {'updated': False, 'reason': 'no new readings', 'last_reading_id': after_id,
+                    'seconds': round(time.perf_counter() - start, 3)}
+
+        # Primeira atualização: parte do histórico recente; depois, só a faixa de ids nova
+        frame = self.trainer.collect_training_frame(
+            days_back=self.bootstrap_days if after_id is None else None,
+            min_samples=0,
+            time_bucket=self.time_bucket,
+            after_id=after_id,
+            until_id=until_id
+        )
+
+        report = {'updated': False, 'samples': len(frame), 'after_id': after_id, 'until_id': until_id}
+        if 0 < len(frame) < self.min_samples:
+            # Poucas leituras: ficam para a próxima execução (o checkpoint não avança)
+            report['reason'] = f'insufficient samples ({len(frame)} < {self.min_samples})'
+            report['seconds'] = round(time.perf_counter() - start, 3)
+            return report
+
+        if len(frame):
+            try:
+                self._partial_fit(predictor, frame, report)
+            except ValueError as e:
+                report['reason'] = str(e)
+                report['seconds'] = round(time.perf_counter() - start, 3)
+                return report
+
+        # Leituras sem registros aproveitáveis (ex.: sensores inativos) também são marcadas como consumidas
+        state['last_reading_id'] = until_id
+        if not predictor.save_models(self.path_prefix):
+            raise RuntimeError(f"Falha ao gravar o checkpoint em {self.path_prefix}")
+
+        report['version'] = predictor.model_version
+        report['seconds'] = round(time.perf_counter() - start, 3)
+        self.logger.info(
+            f"Atualização incremental: {report['samples']} registros (ids {after_id}..{until_id}) "
+            f"em {report['seconds']:.2f}s"
+        )
+        return report
+
+    def _partial_fit(self, predictor, frame, report):
+        """Avalia o modelo atual no lote novo e aprende com ele"""
+        previous_columns = list(predictor.feature_columns)
+        X, y_irrigation, y_humidity = predictor.prepare_training_data(frame)
+        if previous_columns:
+            # Mesmas colunas do checkpoint, na mesma ordem
+            X = X.reindex(columns=previous_columns, fill_value=0)
+            predictor.feature_columns = previous_columns
+
+        metrics = predictor.model_metrics
+        state = metrics['online']
+        y_irrigation = y_irrigation.to_numpy()
+        y_humidity = y_humidity.to_numpy(dtype=np.float64)
+
+        # Validação progressiva: o lote ainda não foi visto pelo modelo
+        if hasattr(predictor.irrigation_classifier, 'coef_'):
+            X_eval = predictor.scaler.transform(X)
+            accuracy = accuracy_score(y_irrigation, predictor.irrigation_classifier.predict(X_eval))
+            mae = mean_absolute_error(y_humidity, predictor.humidity_regressor.predict(X_eval))
+            evaluated = state['evaluated_samples']
+            metrics['irrigation_accuracy'] = (metrics['irrigation_accuracy'] * evaluated + accuracy * len(X)) / (evaluated + len(X))
+            metrics['humidity_mae'] = (metrics['humidity_mae'] * evaluated + mae * len(X)) / (evaluated + len(X))
+            state['evaluated_samples'] = evaluated + len(X)
+            report['batch_accuracy'] = accuracy
+            report['batch_humidity_mae'] = mae
+
+        # Estatísticas do scaler acumuladas com o lote antes de normalizá-lo
+        predictor.scaler.partial_fit(X)
+        X_scaled = predictor.scaler.transform(X)
+
+        for value, count in zip(*np.unique(y_irrigation, return_counts=True)):
+            state['class_counts'][str(int(value))] = state['class_counts'].get(str(int(value)), 0) + int(count)
+        weights = self._sample_weights(y_irrigation, state['class_counts'])
+
+        rng = np.random.default_rng(self.random_state + state['updates'])
+        for epoch in range(self.epochs):
+            order = rng.permutation(len(X_scaled)) if self.epochs > 1 else np.arange(len(X_scaled))
+            for begin in range(0, len(order), self.batch_size):
+                rows = order[begin:begin + self.batch_size]
+                predictor.irrigation_classifier.partial_fit(
+                    X_scaled[rows], y_irrigation[rows], classes=IRRIGATION_CLASSES, sample_weight=weights[rows]
+                )
+                predictor.humidity_regressor.partial_fit(X_scaled[rows], y_humidity[rows])
+
+        state['updates'] += 1
+        metrics['training_samples'] += len(X)
+        metrics['last_trained'] = datetime.now().isoformat()
+        metrics['class_distribution'] = dict(state['class_counts'])
+        report['updated'] = True
+        report['samples'] = len(X)
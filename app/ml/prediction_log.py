@@ -0,0 +1,324 @@
+# app/ml/prediction_log.py
+
+"""
+Registro das predições servidas pela API (tabela ml_predictions)
+
+As rotas de predição chamam PredictionLogger.log, que apenas acrescenta as
+linhas a um arquivo de spool local e a um buffer em memória. Uma thread em
+segundo plano grava o buffer no banco com um único INSERT (executemany)
+quando ele chega a batch_size linhas ou a cada flush_interval segundos, e
+uma última vez quando o processo termina.
+
+O spool garante que as predições ainda não gravadas sobrevivem a um
+reinício. Cada processo escreve em um segmento próprio
+(<spool_dir>/<host>-<pid>-<id>.jsonl), travado com flock enquanto está em
+uso; a cada gravação o segmento é trocado por um novo e o anterior só é
+apagado depois do commit. Segmentos sem trava (de um processo que terminou
+ou de uma gravação que falhou) são reenviados pelo próximo processo que
+iniciar ou pela thread de gravação, e o uid único de cada linha evita
+duplicatas quando o processo cai entre o commit e a remoção do segmento.
+"""
+
+import os
+import json
+import uuid
+import atexit
+import socket
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from app.models.sensor_models import MLPrediction
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava, a recuperação só é segura com um único processo
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SPOOL_SUFFIX = '.jsonl'
+
+def prediction_rows(predictions, items, model_version, source):
+    """
+    Linhas de ml_predictions para as predições válidas de uma requisição
+
+    items são os registros enviados à API, na mesma ordem das predições; um
+    'sensor_id' opcional em cada registro liga a predição ao sensor (só
+    predições com sensor recebem o resultado real e entram no drift).
+    """
+    rows = []
+    for prediction, item in zip(predictions, items):
+        if 'error' in prediction:
+            continue
+        try:
+            sensor_id = int(item['sensor_id']) if item.get('sensor_id') is not None else None
+        except (TypeError, ValueError, AttributeError):
+            sensor_id = None
+        rows.append({
+            'sensor_id': sensor_id,
+            'predicted_irrigation': bool(prediction['irrigation_needed']),
+            'irrigation_probability': prediction.get('irrigation_probability'),
+            'confidence': prediction.get('confidence'),
+            'predicted_humidity': prediction.get('predicted_humidity_next_hour'),
+            'horizon_hours': int(prediction.get('horizon_hours', 4)),
+            'model_version': model_version,
+            'source': source
+        })
+    return rows
+
+class PredictionLogger:
+
+    def __init__(self, sql_db_service, spool_dir='spool/predictions', batch_size=500, flush_interval=5.0, fsync=False):
+        self.sql_db = sql_db_service
+        self.spool_dir = spool_dir
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._pid = None
+        self._thread = None
+        self._reset_state()
+        self._logged = 0
+        self._written = 0
+        self._recovered = 0
+        self._failures = 0
+        self._last_error = None
+        self._last_flush = None
+
+    def _reset_state(self):
+        """Estado de um processo (também refeito em um processo filho criado por fork)"""
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._buffer = []
+        self._segment = None  # (caminho, arquivo aberto e travado)
+        self._needs_recovery = True
+
+    def start(self):
+        """Inicia a thread de gravação deste processo (a primeira passada recupera spools pendentes)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            # Processo filho (fork): o buffer e o segmento herdados pertencem ao processo pai
+            self._reset_state()
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, rows):
+        """
+        Registra predições (dicts com as colunas de ml_predictions) sem acessar o banco
+
+        As linhas vão para o spool do processo antes de entrar no buffer.
+        """
+        if not rows:
+            return
+        if self._pid != os.getpid():
+            self.start()
+
+        now = datetime.now()
+        records = [{**row, 'uid': uuid.uuid4().hex, 'prediction_time': now} for row in rows]
+        lines = ''.join(
+            json.dumps({**record, 'prediction_time': now.isoformat()}) + '\n' for record in records
+        )
+
+        with self._lock:
+            try:
+                path, segment = self._segment or self._open_segment()
+                segment.write(lines)
+                segment.flush()
+                if self.fsync:
+                    os.fsync(segment.fileno())
+            except OSError as e:
+                logger.error(f"Erro ao gravar spool de predições (mantidas só em memória): {str(e)}")
+            self._buffer.extend(records)
+            self._logged += len(records)
+            full = len(self._buffer) >= self.batch_size
+
+        if full:
+            self._wake.set()
+
+    def _open_segment(self):
+        """Novo segmento travado; o nome final só aparece depois da trava (a recuperação nunca o vê livre)"""
+        name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        temporary = os.path.join(self.spool_dir, f"{name}.tmp")
+        path = os.path.join(self.spool_dir, f"{name}{SPOOL_SUFFIX}")
+        segment = open(temporary, 'a', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(segment, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.replace(temporary, path)
+        self._segment = (path, segment)
+        return self._segment
+
+    @staticmethod
+    def _close_segment(segment, remove):
+        if segment is None:
+            return
+        path, handle = segment
+        try:
+            # Remove ainda com a trava, para nenhum outro processo reenviar o segmento
+            if remove:
+                os.unlink(path)
+        except OSError as e:
+            logger.warning(f"Não foi possível remover spool de predições {path}: {str(e)}")
+        finally:
+            handle.close()
+
+    def flush(self):
+        """
+        Grava o buffer no banco
+
+        Returns:
+            int: linhas gravadas (0 se o buffer estava vazio ou a gravação falhou;
+                 nesse caso as linhas ficam no segmento e voltam na recuperação)
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                segment, self._segment = self._segment, None
+
+            if not rows:
+                self._close_segment(segment, remove=True)
+                return 0
+
+            try:
+                self._insert(rows)
+            except Exception as e:
+                self._failures += 1
+                self._last_error = str(e)
+                logger.error(f"Erro ao gravar {len(rows)} predições: {str(e)}")
+                if segment is None:
+                    # Sem spool (erro de disco): as linhas só existem em memória
+                    with self._lock:
+                        self._buffer[:0] = rows
+                else:
+                    self._close_segment(segment, remove=False)
+                    self._needs_recovery = True
+                return 0
+
+            self._close_segment(segment, remove=True)
+            self._written += len(rows)
+            self._last_flush = datetime.now()
+            return len(rows)
+
+    def _insert(self, rows, skip_existing=False):
+        """INSERT em lote; com skip_existing ignora os uids já gravados (reenvio de spool)"""
+        session = self.sql_db.get_session()
+        try:
+            if skip_existing:
+                existing = set(session.execute(
+                    select(MLPrediction.uid).where(MLPrediction.uid.in_([row['uid'] for row in rows]))
+                ).scalars())
+                rows = [row for row in rows if row['uid'] not in existing]
+            if rows:
+                session.execute(insert(MLPrediction.__table__), rows)
+            session.commit()
+            return len(rows)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def recover(self):
+        """
+        Reenvia ao banco os segmentos de spool sem trava
+
+        Returns:
+            int: predições gravadas a partir dos segmentos
+        """
+        recovered = 0
+        all_ok = True
+        try:
+            names = sorted(os.listdir(self.spool_dir))
+        except OSError:
+            return 0
+
+        for name in names:
+            if not name.endswith(SPOOL_SUFFIX):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                handle = open(path, 'r', encoding='utf-8')
+            except OSError:
+                continue  # removido por quem o gravou
+            try:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # em uso por um processo vivo (ou por este)
+                if os.fstat(handle.fileno()).st_nlink == 0:
+                    continue  # gravado e removido entre a listagem e a trava
+
+                rows = self._read_segment(handle)
+                for start in range(0, len(rows), self.batch_size):
+                    recovered += self._insert(rows[start:start + self.batch_size], skip_existing=True)
+                os.unlink(path)
+            except Exception as e:
+                all_ok = False
+                self._failures += 1
+                self._last_error = str(e)
+                logger.error(f"Erro ao reenviar spool de predições {name}: {str(e)}")
+            finally:
+                handle.close()
+
+        self._needs_recovery = not all_ok
+        self._recovered += recovered
+        if recovered:
+            logger.info(f"{recovered} predições recuperadas do spool")
+        return recovered
+
+    @staticmethod
+    def _read_segment(handle):
+        """Linhas de um segmento (uma linha incompleta no fim, de um processo interrompido, é ignorada)"""
+        rows = []
+        for line in handle:
+            try:
+                row = json.loads(line)
+                row['prediction_time'] = datetime.fromisoformat(row['prediction_time'])
+            except (ValueError, KeyError, TypeError):
+                continue
+            rows.append(row)
+        return rows
+
+    def _run(self):
+        while True:
+            if self._needs_recovery:
+                self.recover()
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.flush()
+
+    def close(self):
+        """Encerra a thread e grava o que ainda está no buffer (registrado em atexit)"""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.flush_interval, 5.0))
+        self.flush()
+
+    def status(self):
+        """Contadores do registro neste processo"""
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            'buffered': buffered,
+            'logged': self._logged,
+            'written': self._written,
+            'recovered_from_spool': self._recovered,
+            'failures': self._failures,
+            'last_error': self._last_error,
+            'last_flush': self._last_flush.isoformat() if self._last_flush else None
+        }
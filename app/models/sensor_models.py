@@ -1,11 +1,71 @@
 # app/models/sensor_models.py
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Date, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import ast
+import json
+import uuid
 
 Base = declarative_base()
 
+# Tipos de métrica das leituras (coluna indexada LeituraSensor.metrica)
+METRICA_UMIDADE = 'umidade'
+METRICA_PH = 'ph'
+METRICA_FOSFORO = 'fosforo'
+METRICA_POTASSIO = 'potassio'
+METRICA_IRRIGACAO = 'irrigacao'
+METRICA_OUTRA = 'outra'
+
+# Unidade gravada para cada métrica (e o caminho inverso, usado na migração)
+UNIDADE_POR_METRICA = {
+    METRICA_UMIDADE: '%',
+    METRICA_PH: 'pH',
+    METRICA_FOSFORO: 'P_ppm',
+    METRICA_POTASSIO: 'K_ppm',
+    METRICA_IRRIGACAO: 'irrigacao'
+}
+METRICA_POR_UNIDADE = {unidade: metrica for metrica, unidade in UNIDADE_POR_METRICA.items()}
+
+# Métrica principal de cada tipo de sensor (base das estatísticas gerais do sensor)
+METRICA_PRINCIPAL_POR_TIPO = {'S1': METRICA_UMIDADE, 'S2': METRICA_PH, 'S3': METRICA_FOSFORO}
+
+# Granularidades dos agregados de leituras (AgregadoLeitura.granularidade)
+GRANULARIDADE_HORA = 'hora'
+GRANULARIDADE_DIA = 'dia'
+
+def expandir_leitura(valor, unidade):
+    """
+    Normaliza um valor de leitura em linhas tipadas
+    
+    Payloads de nutrientes (dict, JSON ou str(dict) como {'P': 1, 'K': 0})
+    viram uma leitura de fósforo e outra de potássio; valores simples viram
+    uma única leitura com a métrica derivada da unidade.
+    
+    Returns:
+        list: tuplas (metrica, valor_numerico, unidade)
+    """
+    if isinstance(valor, str) and valor.strip().startswith('{'):
+        try:
+            valor = json.loads(valor)
+        except json.JSONDecodeError:
+            valor = ast.literal_eval(valor.strip())
+    
+    if isinstance(valor, dict):
+        linhas = []
+        for chave, metrica in (('P', METRICA_FOSFORO), ('K', METRICA_POTASSIO)):
+            if chave in valor:
+                linhas.append((metrica, float(valor[chave]), UNIDADE_POR_METRICA[metrica]))
+        if not linhas:
+            raise ValueError(f"Payload de nutrientes sem P ou K: {valor}")
+        return linhas
+    
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido para o sensor: {valor}")
+    return [(METRICA_POR_UNIDADE.get(unidade, METRICA_OUTRA), numero, unidade)]
+
 class Sensor(Base):
     __tablename__ = 'sensor'
     
@@ -26,6 +86,10 @@ class Sensor(Base):
 
 class PosicaoSensor(Base):
     __tablename__ = 'posicao_sensor'
+    __table_args__ = (
+        # Sensores de um campo (campo_id -> sensor_id sem tocar na tabela)
+        Index('ix_posicao_sensor_campo_sensor', 'campo_id', 'sensor_id'),
+    )
     
     id = Column(Integer, primary_key=True)
     sensor_id = Column(Integer, ForeignKey('sensor.id'))
@@ -41,21 +105,42 @@ class PosicaoSensor(Base):
 
 class LeituraSensor(Base):
     __tablename__ = 'leitura_sensor'
+    __table_args__ = (
+        # Consultas por sensor: filtro sensor_id/valido + intervalo e ordenação por data_hora
+        Index('ix_leitura_sensor_sensor_valido_data', 'sensor_id', 'valido', 'data_hora'),
+        # Janelas de tempo de todos os sensores (treinamento de ML)
+        Index('ix_leitura_sensor_data_hora', 'data_hora'),
+    )
     
     id = Column(Integer, primary_key=True)
     sensor_id = Column(Integer, ForeignKey('sensor.id'))
     data_hora = Column(DateTime, nullable=False, default=datetime.utcnow)
-    valor = Column(Text, nullable=False)
+    valor = Column(Text, nullable=False)  # Representação textual original
+    valor_numerico = Column(Float)  # Valor tipado usado em agregações e ML
+    metrica = Column(String(20), index=True)  # umidade, ph, fosforo, potassio, irrigacao
     unidade = Column(String(20), nullable=False)
     valido = Column(Boolean, default=True)
     
     sensor = relationship("Sensor", back_populates="leituras")
     
+    @property
+    def valor_float(self):
+        """Valor numérico da leitura (com fallback para linhas ainda não migradas)"""
+        if self.valor_numerico is not None:
+            return self.valor_numerico
+        try:
+            return float(self.valor)
+        except (TypeError, ValueError):
+            return None
+    
     def __repr__(self):
         return f"<LeituraSensor(id={self.id}, valor={self.valor}, data_hora='{self.data_hora}')>"
 
 class AplicacaoRecurso(Base):
     __tablename__ = 'aplicacao_recurso'
+    __table_args__ = (
+        Index('ix_aplicacao_recurso_campo_data', 'campo_id', 'data_hora'),
+    )
     
     id = Column(Integer, primary_key=True)
     campo_id = Column(String(50), nullable=False)
@@ -70,6 +155,9 @@ class AplicacaoRecurso(Base):
 
 class RecomendacaoAutomatica(Base):
     __tablename__ = 'recomendacao_automatica'
+    __table_args__ = (
+        Index('ix_recomendacao_automatica_campo_data', 'campo_id', 'data_hora'),
+    )
     
     id = Column(Integer, primary_key=True)
     campo_id = Column(String(50), nullable=False)
@@ -85,6 +173,10 @@ class RecomendacaoAutomatica(Base):
 
 class AlertaSensor(Base):
     __tablename__ = 'alerta_sensor'
+    __table_args__ = (
+        # Alertas ativos de um sensor, mais recentes primeiro
+        Index('ix_alerta_sensor_sensor_resolvido_data', 'sensor_id', 'resolvido', 'data_hora'),
+    )
     
     id = Column(Integer, primary_key=True)
     sensor_id = Column(Integer, ForeignKey('sensor.id'))
@@ -114,4 +206,98 @@ class HistoricoSensor(Base):
     sensor = relationship("Sensor", back_populates="historicos")
     
     def __repr__(self):
-        return f"<HistoricoSensor(id={self.id}, data_inicio='{self.data_inicio}', data_fim='{self.data_fim}')>"
\ No newline at end of file
+        return f"<HistoricoSensor(id={self.id}, data_inicio='{self.data_inicio}', data_fim='{self.data_fim}')>"
+
+class AgregadoLeitura(Base):
+    """Agregado incremental (por hora ou por dia) das leituras de uma métrica de um sensor"""
+    __tablename__ = 'agregado_leitura'
+    __table_args__ = (
+        # Também serve como índice das consultas por sensor/granularidade/período
+        UniqueConstraint('sensor_id', 'granularidade', 'inicio', 'metrica', 'unidade',
+                         name='uq_agregado_leitura_balde'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    sensor_id = Column(Integer, ForeignKey('sensor.id'), nullable=False)
+    granularidade = Column(String(10), nullable=False)  # hora, dia
+    inicio = Column(DateTime, nullable=False)  # Início do balde (hora ou dia truncado)
+    metrica = Column(String(20), nullable=False)
+    unidade = Column(String(20), nullable=False)
+    contagem = Column(Integer, nullable=False, default=0)
+    soma = Column(Float, nullable=False, default=0)
+    soma_quadrados = Column(Float, nullable=False, default=0)
+    minimo = Column(Float)
+    maximo = Column(Float)
+    
+    @property
+    def media(self):
+        return self.soma / self.contagem if self.contagem else None
+    
+    def __repr__(self):
+        return f"<AgregadoLeitura(sensor_id={self.sensor_id}, granularidade='{self.granularidade}', inicio='{self.inicio}', metrica='{self.metrica}')>"
+
+# Situações de um job em segundo plano (ver app/services/fila_jobs.py)
+JOB_PENDENTE = 'pendente'
+JOB_EXECUTANDO = 'executando'
+JOB_CONCLUIDO = 'concluido'
+JOB_ERRO = 'erro'
+JOB_CANCELADO = 'cancelado'
+JOB_ATIVOS = (JOB_PENDENTE, JOB_EXECUTANDO)
+
+class Job(Base):
+    """Job em segundo plano (retreino, importação de CSV, relatórios, drift) executado pelo worker"""
+    __tablename__ = 'job'
+    __table_args__ = (
+        # Próximo job pendente da fila, por horário de execução
+        Index('ix_job_status_executar_apos', 'status', 'executar_apos'),
+    )
+    
+    id = Column(String(32), primary_key=True)  # uuid hex
+    tipo = Column(String(50), nullable=False)
+    parametros = Column(Text, nullable=False, default='{}')  # JSON
+    chave = Column(String(64), nullable=False, index=True)  # hash de tipo + parâmetros
+    # Igual à chave enquanto o job está ativo (NULL depois): a unicidade impede dois jobs idênticos na fila
+    chave_ativa = Column(String(64), unique=True)
+    status = Column(String(20), nullable=False, default=JOB_PENDENTE)
+    progresso = Column(Float, nullable=False, default=0.0)  # 0 a 1
+    mensagem = Column(String(255))
+    detalhes = Column(Text)  # JSON com o progresso específico do tipo (ex.: linhas processadas)
+    resultado = Column(Text)  # JSON
+    erro = Column(Text)
+    cancelamento_solicitado = Column(Boolean, nullable=False, default=False)
+    worker = Column(String(100))
+    criado_em = Column(DateTime, nullable=False, default=datetime.now)
+    executar_apos = Column(DateTime, nullable=False, default=datetime.now)
+    iniciado_em = Column(DateTime)
+    atualizado_em = Column(DateTime)  # heartbeat do worker enquanto executa
+    concluido_em = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<Job(id='{self.id}', tipo='{self.tipo}', status='{self.status}')>"
+
+class MLPrediction(Base):
+    """Predição de irrigação servida pela API (gravada por app/ml/prediction_log.py)"""
+    __tablename__ = 'ml_predictions'
+    __table_args__ = (
+        # Avaliação de drift (período) e preenchimento do resultado real (sensor + período)
+        Index('ix_ml_predictions_prediction_time', 'prediction_time'),
+        Index('ix_ml_predictions_sensor_time', 'sensor_id', 'prediction_time'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    # Gerado antes da gravação: o reenvio de um spool não duplica predições
+    uid = Column(String(32), nullable=False, unique=True, default=lambda: uuid.uuid4().hex)
+    # Sem chave estrangeira: um sensor_id desconhecido vindo da API não pode barrar o lote inteiro
+    sensor_id = Column(Integer)
+    predicted_irrigation = Column(Boolean, nullable=False)
+    irrigation_probability = Column(Float)
+    confidence = Column(Float)
+    predicted_humidity = Column(Float)
+    actual_irrigation = Column(Boolean)  # Preenchido depois do horizonte (evaluate_model.fill_actual_irrigation)
+    prediction_time = Column(DateTime, nullable=False, default=datetime.now)
+    horizon_hours = Column(Integer, nullable=False, default=4)
+    model_version = Column(String(64))
+    source = Column(String(20))  # predict, batch, confidence
+    
+    def __repr__(self):
+        return f"<MLPrediction(id={self.id}, sensor_id={self.sensor_id}, predicted_irrigation={self.predicted_irrigation})>"
@@ -1,7 +1,6 @@
 from flask import Blueprint, jsonify, request, current_app
 from app.models.cultura import Cultura
 from app.models.campo import Campo
-from app.services.db_service import DatabaseService
 from app.services.calculo_area import CalculoArea
 from app.services.calculo_insumos import CalculoInsumos
 from bson import json_util, ObjectId
@@ -9,6 +8,11 @@ import json
 
 api_bp = Blueprint('api', __name__)
 
+# Obter instância de serviço (criada uma vez em create_app)
+def get_mongo_db():
+    from app import db_service
+    return db_service
+
 # Função auxiliar para converter BSON para JSON
 def parse_json(data):
     return json.loads(json_util.dumps(data))
@@ -16,13 +20,13 @@ def parse_json(data):
 # Rotas para culturas
 @api_bp.route('/culturas', methods=['GET'])
 def obter_culturas():
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     culturas = db_service.obter_todas_culturas()
     return jsonify(parse_json(culturas))
 
 @api_bp.route('/culturas/<cultura_id>', methods=['GET'])
 def obter_cultura(cultura_id):
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     cultura = db_service.obter_cultura_por_id(cultura_id)
     if not cultura:
         return jsonify({"erro": "Cultura não encontrada"}), 404
@@ -31,7 +35,7 @@ def obter_cultura(cultura_id):
 @api_bp.route('/culturas', methods=['POST'])
 def adicionar_cultura():
     dados = request.json
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         cultura = Cultura.from_dict(dados)
@@ -43,7 +47,7 @@ def adicionar_cultura():
 @api_bp.route('/culturas/<cultura_id>', methods=['PUT'])
 def atualizar_cultura(cultura_id):
     dados = request.json
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         resultado = db_service.atualizar_cultura(cultura_id, dados)
@@ -55,7 +59,7 @@ def atualizar_cultura(cultura_id):
 
 @api_bp.route('/culturas/<cultura_id>', methods=['DELETE'])
 def remover_cultura(cultura_id):
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         resultado = db_service.remover_cultura(cultura_id)
@@ -68,13 +72,13 @@ def remover_cultura(cultura_id):
 # Rotas para campos
 @api_bp.route('/campos', methods=['GET'])
 def obter_campos():
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     campos = db_service.obter_todos_campos()
     return jsonify(parse_json(campos))
 
 @api_bp.route('/campos/<campo_id>', methods=['GET'])
 def obter_campo(campo_id):
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     campo = db_service.obter_campo_por_id(campo_id)
     if not campo:
         return jsonify({"erro": "Campo não encontrado"}), 404
@@ -83,7 +87,7 @@ def obter_campo(campo_id):
 @api_bp.route('/campos', methods=['POST'])
 def adicionar_campo():
     dados = request.json
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         # Verificar se a cultura existe
@@ -115,7 +119,7 @@ def adicionar_campo():
 @api_bp.route('/campos/<campo_id>', methods=['PUT'])
 def atualizar_campo(campo_id):
     dados = request.json
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         resultado = db_service.atualizar_campo(campo_id, dados)
@@ -127,7 +131,7 @@ def atualizar_campo(campo_id):
 
 @api_bp.route('/campos/<campo_id>', methods=['DELETE'])
 def remover_campo(campo_id):
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         resultado = db_service.remover_campo(campo_id)
@@ -176,7 +180,7 @@ def calcular_area():
 @api_bp.route('/calculos/insumos', methods=['POST'])
 def calcular_insumos():
     dados = request.json
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         # Obter dados do campo
@@ -201,7 +205,7 @@ def calcular_insumos():
 @api_bp.route('/calculos/plantas', methods=['POST'])
 def calcular_plantas():
     dados = request.json
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         area_hectare = float(dados.get('area_hectare', 0))
@@ -227,4 +231,18 @@ def calcular_plantas():
             'quantidade_total_plantas': quantidade_plantas
         })
     except Exception as e:
-        return jsonify({"erro": str(e)}), 400
\ No newline at end of file
+        return jsonify({"erro": str(e)}), 400
+
+# Rotas de monitoramento
+@api_bp.route('/status/pools', methods=['GET'])
+def status_pools():
+    """Retorna a ocupação dos pools de conexão (SQL e MongoDB) deste processo"""
+    from app import sql_db_service
+    
+    try:
+        return jsonify({
+            'sql': sql_db_service.status_pool(),
+            'mongo': get_mongo_db().status_pool()
+        })
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
@@ -0,0 +1,71 @@
+# app/routes/job_routes.py
+
+"""
+Rotas de acompanhamento da fila de jobs em segundo plano
+
+Os jobs são criados pelas rotas de cada funcionalidade (retreino, upload de
+CSV, relatórios, drift) e executados por app/scripts/worker_jobs.py.
+"""
+
+from flask import Blueprint, jsonify, request, url_for
+
+from app.models.sensor_models import JOB_CONCLUIDO, JOB_ERRO, JOB_CANCELADO
+
+job_bp = Blueprint('jobs', __name__)
+
+# Obter instância de serviço (criada uma vez em create_app)
+def get_fila_jobs():
+    from app import fila_jobs
+    return fila_jobs
+
+def resposta_job_enfileirado(job, criado=True, mensagem=None):
+    """Resposta 202 das rotas que enfileiram um job (também usada por outros blueprints)"""
+    return jsonify({
+        "mensagem": mensagem or ("Job enfileirado" if criado else "Job idêntico já está na fila"),
+        "job_id": job['id'],
+        "status": job['status'],
+        "deduplicado": not criado,
+        "executar_apos": job['executar_apos'],
+        "status_url": url_for('jobs.status_job', job_id=job['id']),
+        "resultado_url": url_for('jobs.resultado_job', job_id=job['id'])
+    }), 202
+
+@job_bp.route('', methods=['GET'])
+def listar_jobs():
+    """Jobs mais recentes (filtros opcionais: status, tipo, limite)"""
+    try:
+        limite = min(int(request.args.get('limite', 50)), 500)
+    except ValueError:
+        return jsonify({"erro": "limite deve ser um número"}), 400
+    jobs = get_fila_jobs().listar(request.args.get('status'), request.args.get('tipo'), limite)
+    return jsonify(jobs)
+
+@job_bp.route('/<job_id>', methods=['GET'])
+def status_job(job_id):
+    """Status e progresso de um job (sem o resultado)"""
+    job = get_fila_jobs().obter(job_id)
+    if not job:
+        return jsonify({"erro": "Job não encontrado"}), 404
+    job['resultado_url'] = url_for('jobs.resultado_job', job_id=job_id)
+    return jsonify(job)
+
+@job_bp.route('/<job_id>/resultado', methods=['GET'])
+def resultado_job(job_id):
+    """Resultado de um job concluído (409 enquanto ainda não terminou)"""
+    job = get_fila_jobs().obter(job_id, incluir_resultado=True)
+    if not job:
+        return jsonify({"erro": "Job não encontrado"}), 404
+    if job['status'] in (JOB_ERRO, JOB_CANCELADO):
+        return jsonify({"erro": job['erro'] or job['mensagem'], "status": job['status']}), 409
+    if job['status'] != JOB_CONCLUIDO:
+        return jsonify({"erro": "Job ainda não concluído", "status": job['status'],
+                        "progresso": job['progresso']}), 409
+    return jsonify(job['resultado'])
+
+@job_bp.route('/<job_id>/cancelar', methods=['POST'])
+def cancelar_job(job_id):
+    """Cancela um job pendente ou pede o cancelamento de um em execução"""
+    job = get_fila_jobs().cancelar(job_id)
+    if not job:
+        return jsonify({"erro": "Job não encontrado"}), 404
+    return jsonify(job)
@@ -5,17 +5,60 @@ Rotas Flask para APIs de Machine Learning
 """
 
 from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
-from app.services.sql_db_service import SQLDatabaseService
-from app.ml.irrigation_predictor import IrrigationPredictor
-from app.ml.model_trainer import ModelTrainer
+from app.ml.prediction_log import prediction_rows
+from app.routes.job_routes import get_fila_jobs, resposta_job_enfileirado
 from app.services.climate_service import ClimateDataService
 
 ml_bp = Blueprint('ml', __name__)
 logger = logging.getLogger(__name__)
 
+def get_model_registry():
+    from app import model_registry
+    return model_registry
+
+def get_prediction_logger():
+    from app import prediction_logger
+    return prediction_logger
+
+def log_predictions(predictions, items, predictor, source):
+    """Envia as predições válidas ao registro de predições (ml_predictions) sem afetar a resposta"""
+    prediction_logger = get_prediction_logger()
+    if prediction_logger is None:
+        return
+    try:
+        prediction_logger.log(prediction_rows(predictions, items, predictor.model_version, source))
+    except Exception as e:
+        logger.error(f"Erro ao registrar predições: {str(e)}")
+
+def validate_batch_items(items):
+    """Valida a lista de itens de um lote; retorna a mensagem de erro ou None"""
+    if not isinstance(items, list) or not items:
+        return 'items deve ser uma lista não vazia'
+    
+    max_items = current_app.config.get('ML_PREDICT_BATCH_MAX_ITEMS', 5000)
+    if len(items) > max_items:
+        return f'Máximo de {max_items} itens por lote'
+    return None
+
+def apply_shared_weather(items, location):
+    """Busca o clima atual uma vez e o aplica aos itens sem dados climáticos próprios"""
+    if not location:
+        return items
+    
+    climate_service = ClimateDataService()
+    lat, lon = map(float, location.split(','))
+    current_weather = climate_service.get_current_weather(lat, lon) or {}
+    weather_fields = ('temperature', 'humidity_air', 'precipitation')
+    return [
+        {**current_weather, **item}
+        if isinstance(item, dict) and not any(field in item for field in weather_fields)
+        else item
+        for item in items
+    ]
+
 @ml_bp.route('/train', methods=['POST'])
 def train_model():
     """
@@ -26,54 +69,39 @@ def train_model():
         "sensor_id": 1,
         "days_back": 30,
         "min_samples": 50,
-        "location": "-3.763081,-38.524465"
+        "location": "-3.763081,-38.524465",
+        "time_bucket": "1min"
     }
+    
+    Enfileira um retreino completo imediato (mesmo job de /retrain com
+    immediate=true) e responde 202; a nova versão passa a ser servida quando
+    o worker a salva. Progresso e métricas em status_url/resultado_url.
     """
     try:
-        data = request.get_json()
-        
-        # Parâmetros
-        sensor_id = data.get('sensor_id')
-        days_back = data.get('days_back', 30)
-        min_samples = data.get('min_samples', 50)
-        location = data.get('location', '-3.763081,-38.524465')
+        data = request.get_json() or {}
         
         # Validações
-        if not sensor_id:
+        if not data.get('sensor_id'):
             return jsonify({'error': 'sensor_id é obrigatório'}), 400
         
-        # Inicializar serviços
-        sql_db = SQLDatabaseService(current_app.config['SQL_DATABASE_URI'])
-        predictor = IrrigationPredictor()
-        trainer = ModelTrainer(sql_db)
-        
-        # Coletar dados
-        training_data = trainer.collect_training_data(days_back, min_samples)
-        
-        if not training_data:
-            return jsonify({
-                'error': f'Dados insuficientes: precisa de pelo menos {min_samples} amostras'
-            }), 400
-        
-        # Enriquecer com dados climáticos
+        location = data.get('location', '-3.763081,-38.524465')
         lat, lon = map(float, location.split(','))
-        enriched_data = predictor.enrich_with_climate_data(training_data, lat, lon)
-        
-        # Treinar modelos
-        metrics = predictor.train_models(enriched_data or training_data)
-        
-        # Salvar modelos
-        predictor.save_models()
+        params = {
+            'mode': 'full',
+            'days_back': int(data.get('days_back', 30)),
+            'min_samples': int(data.get('min_samples', 50)),
+            'time_bucket': data.get('time_bucket', '1min'),
+            'location': f"{lat},{lon}"
+        }
         
-        return jsonify({
-            'success': True,
-            'message': 'Modelo treinado com sucesso',
-            'metrics': metrics,
-            'training_samples': len(enriched_data or training_data)
-        })
+        job, created = get_fila_jobs().enfileirar('retreino', params)
+        message = 'Treinamento enfileirado' if created else 'Treinamento idêntico já está na fila'
+        return resposta_job_enfileirado(job, created, message)
         
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Erro no treinamento: {str(e)}")
+        logger.error(f"Erro ao enfileirar treinamento: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @ml_bp.route('/predict', methods=['POST'])
@@ -89,8 +117,12 @@ def predict_irrigation():
         "potassio": 0,
         "temperature": 28.5,
         "humidity_air": 75,
-        "location": "-3.763081,-38.524465"
+        "location": "-3.763081,-38.524465",
+        "sensor_id": 3
     }
+    
+    sensor_id (opcional) liga a predição registrada em ml_predictions ao
+    sensor, para o resultado real ser preenchido e entrar no drift.
     """
     try:
         data = request.get_json()
@@ -101,11 +133,9 @@ def predict_irrigation():
             if field not in data:
                 return jsonify({'error': f'{field} é obrigatório'}), 400
         
-        # Inicializar predictor
-        predictor = IrrigationPredictor()
-        
-        # Carregar modelo
-        if not predictor.load_models():
+        # Modelo residente no processo (recarregado apenas quando há versão nova)
+        predictor = get_model_registry().get_predictor()
+        if predictor is None:
             return jsonify({'error': 'Modelo não treinado'}), 400
         
         # Preparar dados de entrada
@@ -140,6 +170,8 @@ def predict_irrigation():
         else:
             prediction = predictor.predict_irrigation_need(current_conditions)
         
+        log_predictions([prediction], [data], predictor, 'predict')
+        
         return jsonify({
             'success': True,
             'prediction': prediction,
@@ -150,6 +182,113 @@ def predict_irrigation():
         logger.error(f"Erro na predição: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@ml_bp.route('/predict/batch', methods=['POST'])
+def predict_irrigation_batch():
+    """
+    API para predição de irrigação em lote (ex.: todos os sensores de uma fazenda)
+    
+    POST /api/ml/predict/batch
+    {
+        "items": [
+            {"umidade": 25.5, "ph": 6.8, "fosforo": 1, "potassio": 0, "temperature": 28.5, "sensor_id": 3},
+            {"umidade": 61.0, "ph": 5.4, "fosforo": 0, "potassio": 1}
+        ],
+        "location": "-3.763081,-38.524465"
+    }
+    
+    Uma única passada pelos modelos para todos os itens. Os resultados saem na
+    ordem dos itens; itens inválidos trazem 'error' sem derrubar o lote. Com
+    'location', o clima atual é buscado uma vez e usado nos itens sem dados
+    climáticos próprios. sensor_id (opcional) é usado só no registro das
+    predições.
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get('items')
+        
+        batch_error = validate_batch_items(items)
+        if batch_error:
+            return jsonify({'error': batch_error}), 400
+        
+        predictor = get_model_registry().get_predictor()
+        if predictor is None:
+            return jsonify({'error': 'Modelo não treinado'}), 400
+        
+        items = apply_shared_weather(items, data.get('location'))
+        predictions = predictor.predict_irrigation_batch(items)
+        log_predictions(predictions, items, predictor, 'batch')
+        errors = sum(1 for prediction in predictions if 'error' in prediction)
+        
+        return jsonify({
+            'success': True,
+            'predictions': predictions,
+            'total': len(predictions),
+            'errors': errors,
+            'model_version': predictor.model_version,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro na predição em lote: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@ml_bp.route('/predict/confidence', methods=['POST'])
+def predict_confidence_batch():
+    """
+    API para faixas de confiança em lote (dispersão entre as árvores do modelo)
+    
+    POST /api/ml/predict/confidence
+    {
+        "items": [
+            {"umidade": 25.5, "ph": 6.8, "fosforo": 1, "potassio": 0},
+            {"umidade": 61.0, "ph": 5.4, "fosforo": 0, "potassio": 1}
+        ],
+        "quantiles": [0.05, 0.5, 0.95],
+        "location": "-3.763081,-38.524465"
+    }
+    
+    Cada item traz média, desvio padrão, intervalo de 95% e os quantis
+    pedidos (padrão: 0.025, 0.5 e 0.975) das probabilidades das árvores.
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get('items')
+        
+        batch_error = validate_batch_items(items)
+        if batch_error:
+            return jsonify({'error': batch_error}), 400
+        
+        quantiles = data.get('quantiles', [0.025, 0.5, 0.975])
+        try:
+            quantiles = [float(q) for q in quantiles]
+        except (TypeError, ValueError):
+            return jsonify({'error': 'quantiles deve ser uma lista de números'}), 400
+        if not quantiles or any(q < 0 or q > 1 for q in quantiles):
+            return jsonify({'error': 'quantiles devem estar entre 0 e 1'}), 400
+        
+        predictor = get_model_registry().get_predictor()
+        if predictor is None:
+            return jsonify({'error': 'Modelo não treinado'}), 400
+        
+        items = apply_shared_weather(items, data.get('location'))
+        predictions = predictor.predict_with_confidence_intervals_batch(items, quantiles=quantiles)
+        log_predictions(predictions, items, predictor, 'confidence')
+        errors = sum(1 for prediction in predictions if 'error' in prediction)
+        
+        return jsonify({
+            'success': True,
+            'predictions': predictions,
+            'total': len(predictions),
+            'errors': errors,
+            'n_estimators': getattr(predictor.irrigation_classifier, 'n_estimators', 1),
+            'model_version': predictor.model_version,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro na predição com intervalos de confiança: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @ml_bp.route('/status', methods=['GET'])
 def model_status():
     """
@@ -158,12 +297,21 @@ def model_status():
     GET /api/ml/status
     """
     try:
-        predictor = IrrigationPredictor()
+        registry = get_model_registry()
+        predictor = registry.get_predictor()
+        registry_status = registry.status()
+        prediction_logger = get_prediction_logger()
+        prediction_log_status = prediction_logger.status() if prediction_logger is not None else None
         
-        if predictor.load_models():
+        if predictor is not None:
             return jsonify({
                 'success': True,
                 'model_loaded': True,
+                'model_version': registry_status['version'],
+                'loaded_at': registry_status['loaded_at'],
+                'load_seconds': registry_status['load_seconds'],
+                'registry': registry_status,
+                'prediction_log': prediction_log_status,
                 'metrics': predictor.model_metrics,
                 'feature_importance': predictor.get_feature_importance()
             })
@@ -171,6 +319,8 @@ def model_status():
             return jsonify({
                 'success': True,
                 'model_loaded': False,
+                'registry': registry_status,
+                'prediction_log': prediction_log_status,
                 'message': 'Modelo não treinado'
             })
             
@@ -186,40 +336,51 @@ def schedule_retrain():
     POST /api/ml/retrain
     {
         "immediate": true/false,
-        "days_back": 30
+        "days_back": 30,
+        "mode": "full" | "incremental",
+        "search": false
     }
+    
+    O retreino roda como job da fila (worker separado do servidor web).
+    immediate=true enfileira para agora; caso contrário o job fica agendado
+    para a próxima ML_RETRAIN_HOUR. Pedidos idênticos ainda pendentes ou em
+    execução devolvem o mesmo job. mode "incremental" atualiza o checkpoint
+    do treino online só com as leituras novas (ver app/ml/online_learning.py).
     """
     try:
         data = request.get_json() or {}
         immediate = data.get('immediate', False)
+        mode = data.get('mode', 'full')
+        
+        if mode not in ('full', 'incremental'):
+            return jsonify({'error': 'mode deve ser "full" ou "incremental"'}), 400
         
+        params = {'mode': mode}
+        if mode == 'full':
+            params.update(
+                days_back=int(data.get('days_back', 30)),
+                min_samples=int(data.get('min_samples', 50)),
+                time_bucket=data.get('time_bucket', '1min'),
+                search=bool(data.get('search', False))
+            )
+        
+        run_at = None
+        if not immediate:
+            # Próxima ocorrência da hora configurada
+            now = datetime.now()
+            run_at = now.replace(hour=current_app.config.get('ML_RETRAIN_HOUR', 2), minute=0, second=0, microsecond=0)
+            if run_at <= now:
+                run_at += timedelta(days=1)
+        
+        job, created = get_fila_jobs().enfileirar('retreino', params, executar_apos=run_at)
         if immediate:
-            # Retreinamento imediato
-            from app.scripts.train_model import main as train_main
-            import threading
-            
-            def run_training():
-                try:
-                    # Executar treinamento em thread separada
-                    train_main()
-                except Exception as e:
-                    logger.error(f"Erro no retreinamento: {str(e)}")
-            
-            thread = threading.Thread(target=run_training)
-            thread.daemon = True
-            thread.start()
-            
-            return jsonify({
-                'success': True,
-                'message': 'Retreinamento iniciado em background'
-            })
+            message = 'Retreinamento enfileirado' if created else 'Retreinamento idêntico já está na fila'
         else:
-            # Agendar para próxima execução automática
-            return jsonify({
-                'success': True,
-                'message': 'Retreinamento agendado para próxima execução'
-            })
+            message = f"Retreinamento agendado para {job['executar_apos']}"
+        return resposta_job_enfileirado(job, created, message)
             
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro ao agendar retreinamento: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -227,26 +388,29 @@ def schedule_retrain():
 @ml_bp.route('/evaluate', methods=['POST'])
 def evaluate_model():
     """
-    API para avaliar performance do modelo
+    API para avaliar performance do modelo (drift)
     
     POST /api/ml/evaluate
     {
-        "days_back": 7
+        "days_back": 7,
+        "retrain_on_drift": false
     }
+    
+    Compara as predições históricas com os resultados reais em um job da
+    fila; com retrain_on_drift o job enfileira um retreino se detectar drift.
     """
     try:
         data = request.get_json() or {}
-        days_back = data.get('days_back', 7)
-        
-        # Implementar avaliação de performance
-        # (comparar predições históricas com resultados reais)
+        params = {
+            'days_back': int(data.get('days_back', 7)),
+            'retrain_on_drift': bool(data.get('retrain_on_drift', False))
+        }
         
-        return jsonify({
-            'success': True,
-            'message': 'Funcionalidade em desenvolvimento',
-            'evaluation_period': f'{days_back} dias'
-        })
+        job, created = get_fila_jobs().enfileirar('drift', params)
+        return resposta_job_enfileirado(job, created, 'Avaliação de drift enfileirada')
         
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Erro na avaliação: {str(e)}")
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -1,17 +1,22 @@
 # app/routes/sensor_routes.py
 import os
+import math
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
-from app.services.sql_db_service import SQLDatabaseService
-from app.services.db_service import DatabaseService
+from app.models.sensor_models import (
+    expandir_leitura, METRICA_POR_UNIDADE, METRICA_UMIDADE, METRICA_PH, METRICA_FOSFORO, METRICA_POTASSIO
+)
+from app.routes.job_routes import get_fila_jobs, resposta_job_enfileirado
 from datetime import datetime, timedelta
 sensor_bp = Blueprint('sensores', __name__)
 
-# Obter instâncias de serviço
+# Obter instâncias de serviço (criadas uma vez em create_app, com pools compartilhados)
 def get_sql_db():
-    return SQLDatabaseService(current_app.config['SQL_DATABASE_URI'])
+    from app import sql_db_service
+    return sql_db_service
 
 def get_mongo_db():
-    return DatabaseService(current_app.config['MONGO_URI'])
+    from app import db_service
+    return db_service
 
 # Rotas web para sensores
 @sensor_bp.route('/')
@@ -184,6 +189,13 @@ def registrar_leitura():
             return redirect(url_for('sensores.detalhe_sensor', sensor_id=sensor_id))
 
 # API para recomendações
+def _valores_da_metrica(leituras, metrica):
+    """Valores numéricos das leituras de uma métrica (leituras legadas sem métrica usam a unidade)"""
+    return [
+        l.valor_float for l in leituras
+        if (l.metrica or METRICA_POR_UNIDADE.get(l.unidade)) == metrica and l.valor_float is not None
+    ]
+
 @sensor_bp.route('/api/analisar-campo/<campo_id>', methods=['GET'])
 def analisar_campo(campo_id):
     """Analisa os dados dos sensores de um campo e gera recomendações"""
@@ -195,23 +207,29 @@ def analisar_campo(campo_id):
     if not campo:
         return jsonify({"erro": "Campo não encontrado"}), 404
     
-    # Obter todos os sensores do campo
-    sensores = sql_db.obter_sensores_por_campo(campo_id)
+    # Obter todos os sensores do campo, já com as 10 leituras mais recentes de cada um
+    sensores = sql_db.obter_sensores_por_campo(campo_id, ultimas_leituras=10)
     if not sensores:
         return jsonify({"erro": "Nenhum sensor encontrado no campo"}), 404
     
-    # Analisar dados de cada tipo de sensor
+    # Cultura plantada (valores ideais de pH e nutrientes), consultada uma única vez
+    cultura_nome = campo.get('campo', {}).get('cultura_plantada', '')
+    cultura = mongo_db.obter_cultura_por_nome(cultura_nome) if cultura_nome else None
+    
+    # Analisar dados de cada tipo de sensor; recomendações são gravadas juntas no final
     resultado = {"campo_id": campo_id, "recomendacoes": []}
+    recomendacoes_pendentes = []
     
     # 1. Sensor de umidade (S1)
     sensores_umidade = [s for s in sensores if s.tipo == 'S1']
     if sensores_umidade:
         for sensor in sensores_umidade:
             # Obter últimas leituras
-            leituras = sql_db.obter_leituras_por_sensor(sensor.id, limite=10)
+            leituras = sensor.ultimas_leituras
             if leituras:
-                # Calcular média das últimas leituras
-                media_umidade = sum(l.valor for l in leituras) / len(leituras)
+                # Calcular média das últimas leituras de umidade (o nó pode gravar outras métricas)
+                valores = _valores_da_metrica(leituras, METRICA_UMIDADE)
+                media_umidade = sum(valores) / len(valores) if valores else 0
                 
                 # Verificar se precisa de irrigação
                 if media_umidade < 30:  # Valor exemplo, ajustar conforme necessidade
@@ -219,16 +237,15 @@ def analisar_campo(campo_id):
                     area_hectare = campo.get('campo', {}).get('area_total_hectare', 0)
                     agua_recomendada = (30 - media_umidade) * area_hectare * 1000  # Litros
                     
-                    recomendacao_id = sql_db.adicionar_recomendacao(
+                    recomendacoes_pendentes.append((
                         campo_id,
                         "água",
                         agua_recomendada,
                         "L",
                         f"Média de umidade: {media_umidade}% - Abaixo do ideal (30%)"
-                    )
+                    ))
                     
                     resultado["recomendacoes"].append({
-                        "id": recomendacao_id,
                         "tipo": "irrigação",
                         "quantidade": agua_recomendada,
                         "unidade": "L",
@@ -240,14 +257,11 @@ def analisar_campo(campo_id):
     if sensores_ph:
         for sensor in sensores_ph:
             # Obter últimas leituras
-            leituras = sql_db.obter_leituras_por_sensor(sensor.id, limite=10)
+            leituras = sensor.ultimas_leituras
             if leituras:
-                # Calcular média das últimas leituras
-                media_ph = sum(l.valor for l in leituras) / len(leituras)
-                
-                # Obter os valores ideais de pH da cultura plantada
-                cultura_nome = campo.get('campo', {}).get('cultura_plantada', '')
-                cultura = mongo_db.obter_cultura_por_nome(cultura_nome) if cultura_nome else None
+                # Calcular média das últimas leituras de pH
+                valores = _valores_da_metrica(leituras, METRICA_PH)
+                media_ph = sum(valores) / len(valores) if valores else 0
                 
                 if cultura:
                     ph_min = cultura.get('clima_solo', {}).get('ph_ideal', {}).get('minimo', 0)
@@ -259,16 +273,15 @@ def analisar_campo(campo_id):
                         area_hectare = campo.get('campo', {}).get('area_total_hectare', 0)
                         calagem_recomendada = (ph_min - media_ph) * area_hectare * 500  # kg de calcário por hectare
                         
-                        recomendacao_id = sql_db.adicionar_recomendacao(
+                        recomendacoes_pendentes.append((
                             campo_id,
                             "calcário",
                             calagem_recomendada,
                             "kg",
                             f"pH médio: {media_ph} - Abaixo do ideal ({ph_min}-{ph_max})"
-                        )
+                        ))
                         
                         resultado["recomendacoes"].append({
-                            "id": recomendacao_id,
                             "tipo": "calagem",
                             "quantidade": calagem_recomendada,
                             "unidade": "kg",
@@ -279,16 +292,15 @@ def analisar_campo(campo_id):
                         area_hectare = campo.get('campo', {}).get('area_total_hectare', 0)
                         enxofre_recomendado = (media_ph - ph_max) * area_hectare * 300  # kg de enxofre por hectare
                         
-                        recomendacao_id = sql_db.adicionar_recomendacao(
+                        recomendacoes_pendentes.append((
                             campo_id,
                             "enxofre",
                             enxofre_recomendado,
                             "kg",
                             f"pH médio: {media_ph} - Acima do ideal ({ph_min}-{ph_max})"
-                        )
+                        ))
                         
                         resultado["recomendacoes"].append({
-                            "id": recomendacao_id,
                             "tipo": "aplicação de enxofre",
                             "quantidade": enxofre_recomendado,
                             "unidade": "kg",
@@ -301,7 +313,7 @@ def analisar_campo(campo_id):
         for sensor in sensores_nutrientes:
             # Obter últimas leituras - assumindo que são enviadas como JSON
             # Exemplo: {"P": 12.5, "K": 8.3}
-            leituras = sql_db.obter_leituras_por_sensor(sensor.id, limite=10)
+            leituras = sensor.ultimas_leituras
             if leituras:
                 # Extrair os valores de P e K das leituras
                 valores_p = []
@@ -309,29 +321,27 @@ def analisar_campo(campo_id):
                 
                 for leitura in leituras:
                     try:
-                        import json
-                        # Verificar se o valor é um JSON válido
-                        nutrientes = json.loads(leitura.valor) if isinstance(leitura.valor, str) else leitura.valor
-                        if isinstance(nutrientes, dict):
-                            if 'P' in nutrientes:
-                                valores_p.append(float(nutrientes['P']))
-                            if 'K' in nutrientes:
-                                valores_k.append(float(nutrientes['K']))
-                    except (json.JSONDecodeError, ValueError):
-                        # Se não for JSON, tentar interpretar como valor único
-                        if leitura.unidade == 'P_ppm':
-                            valores_p.append(leitura.valor)
-                        elif leitura.unidade == 'K_ppm':
-                            valores_k.append(leitura.valor)
+                        # Leituras legadas em JSON/str(dict) ainda não migradas
+                        if leitura.valor_numerico is None and leitura.valor.startswith('{'):
+                            linhas = expandir_leitura(leitura.valor, leitura.unidade)
+                        else:
+                            metrica = leitura.metrica or METRICA_POR_UNIDADE.get(leitura.unidade)
+                            linhas = [(metrica, leitura.valor_float, leitura.unidade)]
+                    except (ValueError, SyntaxError):
+                        continue
+                    
+                    for metrica, numero, _ in linhas:
+                        if numero is None:
+                            continue
+                        if metrica == METRICA_FOSFORO:
+                            valores_p.append(numero)
+                        elif metrica == METRICA_POTASSIO:
+                            valores_k.append(numero)
                 
                 # Calcular médias (se houver valores)
                 media_p = sum(valores_p) / len(valores_p) if valores_p else 0
                 media_k = sum(valores_k) / len(valores_k) if valores_k else 0
                 
-                # Obter níveis ideais da cultura plantada
-                cultura_nome = campo.get('campo', {}).get('cultura_plantada', '')
-                cultura = mongo_db.obter_cultura_por_nome(cultura_nome) if cultura_nome else None
-                
                 if cultura:
                     # Obter valores de referência de P e K da cultura
                     p_ideal = cultura.get('fertilizantes_insumos', {}).get('adubacao_NPK_por_hectare_kg', {}).get('P2O5', 0)
@@ -347,16 +357,15 @@ def analisar_campo(campo_id):
                     if p_atual_kg_ha < p_ideal * 0.7:  # 70% do ideal
                         p_deficit = (p_ideal * 0.7 - p_atual_kg_ha) * area_hectare
                         
-                        recomendacao_id = sql_db.adicionar_recomendacao(
+                        recomendacoes_pendentes.append((
                             campo_id,
                             "fertilizante P2O5",
                             p_deficit,
                             "kg",
                             f"Nível de P: {media_p} ppm - Abaixo do ideal"
-                        )
+                        ))
                         
                         resultado["recomendacoes"].append({
-                            "id": recomendacao_id,
                             "tipo": "fertilização com fósforo",
                             "quantidade": p_deficit,
                             "unidade": "kg",
@@ -367,22 +376,28 @@ def analisar_campo(campo_id):
                     if k_atual_kg_ha < k_ideal * 0.7:  # 70% do ideal
                         k_deficit = (k_ideal * 0.7 - k_atual_kg_ha) * area_hectare
                         
-                        recomendacao_id = sql_db.adicionar_recomendacao(
+                        recomendacoes_pendentes.append((
                             campo_id,
                             "fertilizante K2O",
                             k_deficit,
                             "kg",
                             f"Nível de K: {media_k} ppm - Abaixo do ideal"
-                        )
+                        ))
                         
                         resultado["recomendacoes"].append({
-                            "id": recomendacao_id,
                             "tipo": "fertilização com potássio",
                             "quantidade": k_deficit,
                             "unidade": "kg",
                             "motivo": f"Nível de potássio está abaixo do ideal"
                         })
     
+    # Gravar todas as recomendações em uma única transação
+    ids = sql_db.adicionar_recomendacoes_em_lote(recomendacoes_pendentes)
+    resultado["recomendacoes"] = [
+        {"id": recomendacao_id, **recomendacao}
+        for recomendacao_id, recomendacao in zip(ids, resultado["recomendacoes"])
+    ]
+    
     return jsonify(resultado)
 
 @sensor_bp.route('/api/aplicar-recomendacao/<int:recomendacao_id>', methods=['POST'])
@@ -432,7 +447,12 @@ def relatorios():
 
 @sensor_bp.route('/api/relatorio/sensor/<int:sensor_id>', methods=['GET'])
 def relatorio_sensor(sensor_id):
-    """Gera um relatório para um sensor específico"""
+    """
+    Enfileira o relatório de um sensor
+    
+    Responde 202 com o job; o relatório fica em /api/jobs/<job_id>/resultado
+    quando o worker terminar (pedidos idênticos em andamento compartilham o job).
+    """
     sql_db = get_sql_db()
     
     # Obter sensor
@@ -447,47 +467,12 @@ def relatorio_sensor(sensor_id):
     except ValueError:
         dias = 30
     
-    data_fim = datetime.now()
-    data_inicio = data_fim - timedelta(days=dias)
-    
-    # Obter leituras do período
-    leituras = sql_db.obter_leituras_por_sensor(sensor_id, data_inicio, data_fim)
-    
-    # Calcular estatísticas
-    estatisticas = sql_db.calcular_estatisticas_leituras(sensor_id, data_inicio, data_fim)
-    
-    # Gerar histórico (se ainda não existir)
-    sql_db.gerar_historico(sensor_id, data_inicio, data_fim)
-    
-    # Formatar dados para o relatório
-    dados_leituras = []
-    for leitura in leituras:
-        dados_leituras.append({
-            "id": leitura.id,
-            "data_hora": leitura.data_hora.isoformat(),
-            "valor": leitura.valor,
-            "unidade": leitura.unidade
-        })
-    
-    return jsonify({
-        "sensor": {
-            "id": sensor.id,
-            "tipo": sensor.tipo,
-            "modelo": sensor.modelo
-        },
-        "periodo": {
-            "inicio": data_inicio.isoformat(),
-            "fim": data_fim.isoformat(),
-            "dias": dias
-        },
-        "estatisticas": estatisticas,
-        "leituras": dados_leituras
-    })
+    job, criado = get_fila_jobs().enfileirar('relatorio_sensor', {'sensor_id': sensor_id, 'dias': dias})
+    return resposta_job_enfileirado(job, criado)
 
 @sensor_bp.route('/api/relatorio/campo/<campo_id>', methods=['GET'])
 def relatorio_campo(campo_id):
-    """Gera um relatório para um campo específico"""
-    sql_db = get_sql_db()
+    """Enfileira o relatório de um campo (ver relatorio_sensor)"""
     mongo_db = get_mongo_db()
     
     # Obter campo
@@ -502,50 +487,8 @@ def relatorio_campo(campo_id):
     except ValueError:
         dias = 30
     
-    data_fim = datetime.now()
-    data_inicio = data_fim - timedelta(days=dias)
-    
-    # Obter sensores do campo
-    sensores = sql_db.obter_sensores_por_campo(campo_id)
-    
-    # Obter aplicações de recursos no período
-    aplicacoes = sql_db.obter_aplicacoes_recurso(campo_id, inicio=data_inicio, fim=data_fim)
-    
-    # Formatar dados para o relatório
-    dados_sensores = []
-    for sensor in sensores:
-        estatisticas = sql_db.calcular_estatisticas_leituras(sensor.id, data_inicio, data_fim)
-        dados_sensores.append({
-            "id": sensor.id,
-            "tipo": sensor.tipo,
-            "estatisticas": estatisticas
-        })
-    
-    dados_aplicacoes = []
-    for aplicacao in aplicacoes:
-        dados_aplicacoes.append({
-            "id": aplicacao.id,
-            "data_hora": aplicacao.data_hora.isoformat(),
-            "tipo_recurso": aplicacao.tipo_recurso,
-            "quantidade": aplicacao.quantidade,
-            "unidade": aplicacao.unidade
-        })
-    
-    return jsonify({
-        "campo": {
-            "id": campo_id,
-            "nome_produtor": campo.get('nome_produtor', ''),
-            "cultura_plantada": campo.get('campo', {}).get('cultura_plantada', ''),
-            "area_hectare": campo.get('campo', {}).get('area_total_hectare', 0)
-        },
-        "periodo": {
-            "inicio": data_inicio.isoformat(),
-            "fim": data_fim.isoformat(),
-            "dias": dias
-        },
-        "sensores": dados_sensores,
-        "aplicacoes": dados_aplicacoes
-    })
+    job, criado = get_fila_jobs().enfileirar('relatorio_campo', {'campo_id': campo_id, 'dias': dias})
+    return resposta_job_enfileirado(job, criado)
 
 # API para simulação de sensores (para testes/desenvolvimento)
 @sensor_bp.route('/api/simular-leituras', methods=['POST'])
@@ -726,7 +669,165 @@ def receber_dados_esp32():
         
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
-    
+
+
+def _interpretar_registro_esp32(registro):
+    """Converte um registro do ESP32 (dict JSON ou colunas CSV) em valores tipados"""
+    if isinstance(registro, dict):
+        campos = [registro.get(c) for c in ('timestamp', 'fosforo', 'potassio', 'ph', 'umidade', 'irrigacao')]
+        if any(v is None for v in campos):
+            raise ValueError("Campos obrigatórios: timestamp, fosforo, potassio, ph, umidade, irrigacao")
+    else:
+        # Formato CSV: timestamp,fosforo,potassio,ph,umidade,irrigacao[,extras ignorados]
+        if len(registro) < 6:
+            raise ValueError("Formato CSV inválido")
+        campos = registro[:6]
+
+    ph = float(campos[3])
+    umidade = float(campos[4])
+    if not 0 <= ph <= 14:
+        raise ValueError(f"pH fora do intervalo (0-14): {ph}")
+    if not 0 <= umidade <= 100:
+        raise ValueError(f"Umidade fora do intervalo (0-100): {umidade}")
+
+    timestamp = float(campos[0])
+    if not math.isfinite(timestamp):
+        raise ValueError(f"Timestamp inválido: {campos[0]}")
+
+    return {
+        'timestamp': int(timestamp),
+        'fosforo': _flag_esp32(campos[1], 'fosforo'),
+        'potassio': _flag_esp32(campos[2], 'potassio'),
+        'ph': ph,
+        'umidade': umidade,
+        'irrigacao': _flag_esp32(campos[5], 'irrigacao')
+    }
+
+
+def _flag_esp32(valor, nome):
+    """Interpreta um campo 0/1 do ESP32 (bool, número ou texto); qualquer outro valor é erro da linha"""
+    original = valor
+    if isinstance(valor, str):
+        texto = valor.strip().lower()
+        if texto in ('true', 'false'):
+            return texto == 'true'
+        try:
+            valor = float(texto)
+        except ValueError:
+            raise ValueError(f"Valor inválido para {nome}: {original}")
+    if isinstance(valor, (bool, int, float)) and valor in (0, 1):
+        return bool(valor)
+    raise ValueError(f"Valor inválido para {nome}: {original}")
+
+
+def _resolver_data_hora_esp32(timestamp, maior_relativo, referencia):
+    """
+    Converte o timestamp do ESP32 em datetime.
+    Timestamps epoch (s ou ms) são usados diretamente; os relativos ao boot
+    (millis()) são ancorados para que a leitura mais recente caia em `referencia`.
+    """
+    if timestamp > 1000000000000:
+        return datetime.fromtimestamp(timestamp / 1000)
+    if timestamp > 1000000000:
+        return datetime.fromtimestamp(timestamp)
+    return referencia - timedelta(milliseconds=maior_relativo - timestamp)
+
+
+@sensor_bp.route('/api/receber-dados-esp32/lote', methods=['POST'])
+def receber_dados_esp32_lote():
+    """
+    Recebe várias leituras do ESP32 em uma única requisição
+
+    JSON: {"sensor_id": 1, "leituras": [{"timestamp": ..., "fosforo": 1, ...}, ...]}
+          ou uma lista de leituras (cada leitura pode trazer o próprio sensor_id)
+    CSV: uma leitura por linha (timestamp,fosforo,potassio,ph,umidade,irrigacao),
+         com sensor_id na query string
+    """
+    try:
+        sensor_padrao = request.args.get('sensor_id')
+
+        if request.content_type and request.content_type.startswith('application/json'):
+            dados = request.get_json(silent=True)
+            if isinstance(dados, dict):
+                sensor_padrao = dados.get('sensor_id', sensor_padrao)
+                registros = dados.get('leituras', [])
+            elif isinstance(dados, list):
+                registros = dados
+            else:
+                return jsonify({"erro": "JSON inválido"}), 400
+        else:
+            linhas = request.data.decode('utf-8').splitlines()
+            registros = [
+                linha.strip().replace(';', ',').split(',')
+                for linha in linhas
+                if linha.strip() and not linha.startswith('#') and not linha.lower().startswith('timestamp')
+            ]
+
+        if not registros:
+            return jsonify({"erro": "Nenhuma leitura recebida"}), 400
+
+        limite = current_app.config.get('ESP32_BATCH_MAX_ROWS', 5000)
+        if len(registros) > limite:
+            return jsonify({"erro": f"Lote excede o limite de {limite} leituras"}), 413
+
+        # Validar cada registro individualmente
+        status = []
+        validos = []
+        for indice, registro in enumerate(registros):
+            try:
+                sensor_id = registro.get('sensor_id', sensor_padrao) if isinstance(registro, dict) else sensor_padrao
+                if sensor_id is None:
+                    raise ValueError("ID do sensor não especificado")
+                leitura = _interpretar_registro_esp32(registro)
+                leitura['sensor_id'] = int(sensor_id)
+                validos.append((indice, leitura))
+                status.append({"indice": indice, "status": "ok", "sensor_id": leitura['sensor_id']})
+            except (ValueError, TypeError, AttributeError, OverflowError) as e:
+                status.append({"indice": indice, "status": "erro", "erro": str(e)})
+
+        # Timestamps relativos (millis) são ancorados por sensor
+        agora = datetime.now()
+        maior_relativo = {}
+        for _, leitura in validos:
+            if leitura['timestamp'] <= 1000000000:
+                atual = maior_relativo.get(leitura['sensor_id'], 0)
+                maior_relativo[leitura['sensor_id']] = max(atual, leitura['timestamp'])
+
+        linhas_insert = []
+        for _, leitura in validos:
+            data_hora = _resolver_data_hora_esp32(
+                leitura['timestamp'], maior_relativo.get(leitura['sensor_id'], 0), agora
+            )
+            base = {'sensor_id': leitura['sensor_id'], 'data_hora': data_hora}
+            linhas_insert.append({**base, 'valor': leitura['umidade'], 'unidade': '%'})
+            linhas_insert.append({**base, 'valor': leitura['ph'], 'unidade': 'pH'})
+            linhas_insert.append({**base, 'valor': int(leitura['fosforo']), 'unidade': 'P_ppm'})
+            linhas_insert.append({**base, 'valor': int(leitura['potassio']), 'unidade': 'K_ppm'})
+            linhas_insert.append({**base, 'valor': int(leitura['irrigacao']), 'unidade': 'irrigacao'})
+
+        # Uma única inserção multi-linha para todo o lote
+        sql_db = get_sql_db()
+        resultado = sql_db.adicionar_leituras_em_lote(linhas_insert)
+
+        invalidos = set(resultado['sensores_invalidos'])
+        for item in status:
+            if item['status'] == 'ok' and item['sensor_id'] in invalidos:
+                item['status'] = 'erro'
+                item['erro'] = f"Sensor com ID {item['sensor_id']} não encontrado"
+
+        aceitos = sum(1 for item in status if item['status'] == 'ok')
+        return jsonify({
+            "mensagem": "Lote processado",
+            "recebidos": len(registros),
+            "aceitos": aceitos,
+            "rejeitados": len(registros) - aceitos,
+            "leituras_inseridas": resultado['inseridas'],
+            "status": status
+        }), 201 if aceitos else 400
+
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
 
 # Adicionar às rotas existentes
 @sensor_bp.route('/api/verificar-irrigacao-clima/<campo_id>', methods=['GET'])
@@ -755,6 +856,52 @@ def verificar_irrigacao_clima(campo_id):
     return jsonify(resultado)
 
 
+@sensor_bp.route('/api/verificar-irrigacao-clima/lote', methods=['POST'])
+def verificar_irrigacao_clima_lote():
+    """
+    Decide a irrigação de todos os campos (ou dos informados) em uma passada
+    
+    POST /sensores/api/verificar-irrigacao-clima/lote
+    {
+        "campo_ids": ["..."],          (opcional, padrão: todos)
+        "produtor": "João Silva",      (opcional)
+        "cidade_padrao": "Fortaleza",  (opcional)
+        "gravar": true                 (opcional, grava as recomendações de irrigação)
+    }
+    """
+    from app.services.weather_service import WeatherService
+    
+    try:
+        dados = request.get_json(silent=True) or {}
+        campo_ids = dados.get('campo_ids')
+        if campo_ids is not None and not isinstance(campo_ids, list):
+            return jsonify({"erro": "campo_ids deve ser uma lista"}), 400
+        
+        weather_service = WeatherService(current_app.config['OPENWEATHER_API_KEY'])
+        resultado = weather_service.verificar_necessidade_irrigacao_em_lote(
+            get_sql_db(),
+            get_mongo_db(),
+            campo_ids=campo_ids,
+            nome_produtor=dados.get('produtor'),
+            cidade_padrao=dados.get('cidade_padrao', 'Fortaleza'),
+            gravar_recomendacoes=bool(dados.get('gravar', True))
+        )
+        return jsonify(resultado)
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
+
+@sensor_bp.route('/api/clima/cache', methods=['GET'])
+def estatisticas_cache_clima():
+    """Métricas do cache de respostas climáticas (acertos, falhas, agrupadas, taxa de acerto)"""
+    from app.services.weather_cache import get_weather_cache
+    
+    try:
+        return jsonify(get_weather_cache().stats())
+    except Exception as e:
+        return jsonify({"erro": str(e)}), 500
+
+
 @sensor_bp.route('/api/ativar-irrigacao/<campo_id>', methods=['POST'])
 def ativar_irrigacao(campo_id):
     """Ativa a irrigação para um campo específico"""
@@ -789,8 +936,7 @@ def ativar_irrigacao(campo_id):
     except Exception as e:
         return jsonify({"erro": str(e)}), 500
     
-import csv
-import tempfile
+import uuid
 from werkzeug.utils import secure_filename
 from flask import request, flash, redirect
 
@@ -844,244 +990,62 @@ def processar_upload_csv():
             flash('Selecione um sensor existente ou marque a opção para criar automaticamente', 'danger')
             return redirect(url_for('sensores.upload_csv_form'))
         
-        # Salvar arquivo temporariamente com correção
-        filename = secure_filename(arquivo.filename)
-        
-        # Criar arquivo temporário sem deletar automaticamente
-        import tempfile
-        temp_fd, temp_file_path = tempfile.mkstemp(suffix='.csv', text=True)
-        
-        # Fechar o file descriptor antes de usar o arquivo
-        os.close(temp_fd)
-        
-        # Salvar o conteúdo do arquivo
+        # Salvar o arquivo no diretório de uploads, visível ao worker (removido pelo job ao final da importação)
+        diretorio_uploads = current_app.config.get('CSV_IMPORT_UPLOAD_DIR', 'uploads/csv')
+        os.makedirs(diretorio_uploads, exist_ok=True)
+        temp_file_path = os.path.abspath(os.path.join(diretorio_uploads, f"{uuid.uuid4().hex}.csv"))
         arquivo.save(temp_file_path)
         
-        # Processar o arquivo CSV
-        sql_db = get_sql_db()
-        mongo_db = get_mongo_db()
-        
-        resultado = processar_arquivo_csv(
-            temp_file_path, 
-            sensor_id, 
-            campo_id,
-            separador,
-            criar_sensor_automatico,
-            sql_db, 
-            mongo_db
-        )
+        # Importar pela fila de jobs; o progresso é consultado pelo ID do job
+        job, _ = get_fila_jobs().enfileirar('importacao_csv', {
+            'caminho': temp_file_path,
+            'sensor_id': sensor_id,
+            'campo_id': campo_id,
+            'separador': separador,
+            'criar_sensor_automatico': criar_sensor_automatico
+        })
+        job_id = job['id']
+        temp_file_path = None
         
-        if resultado['sucesso']:
-            periodo_info = resultado.get('periodo_simulado', {})
-            mensagem_principal = f'Arquivo processado com sucesso! {resultado["registros_importados"]} registros importados.'
-            
-            if periodo_info:
-                mensagem_periodo = f' Período simulado: {periodo_info["inicio"]} até {periodo_info["fim"]} (intervalos de {periodo_info["intervalo"]}).'
-                flash(mensagem_principal + mensagem_periodo, 'success')
-            else:
-                flash(mensagem_principal, 'success')
-            
-            if resultado.get('registros_erro', 0) > 0:
-                flash(f'Atenção: {resultado["registros_erro"]} registros tiveram erro e foram ignorados.', 'warning')
-            if resultado.get('sensor_criado'):
-                flash(f'Sensor criado automaticamente com ID: {resultado["sensor_id"]}', 'info')
-        else:
-            flash(f'Erro ao processar arquivo: {resultado["erro"]}', 'danger')
+        if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+            return resposta_job_enfileirado(job)
         
-        return redirect(url_for('sensores.upload_csv_form'))
+        flash(f'Importação iniciada (job {job_id}). O progresso é exibido abaixo.', 'info')
+        return redirect(url_for('sensores.upload_csv_form', job=job_id))
         
     except Exception as e:
         flash(f'Erro inesperado: {str(e)}', 'danger')
         return redirect(url_for('sensores.upload_csv_form'))
     finally:
-        # Remover arquivo temporário de forma segura
+        # Remover arquivo temporário se a importação não chegou a ser iniciada
         if temp_file_path and os.path.exists(temp_file_path):
             try:
                 os.unlink(temp_file_path)
             except Exception as e:
                 print(f"Aviso: Não foi possível remover arquivo temporário: {e}")
 
-def processar_arquivo_csv(caminho_arquivo, sensor_id, campo_id, separador, criar_sensor_automatico, sql_db, mongo_db):
-    """Função para processar o arquivo CSV e importar os dados"""
-    try:
-        # Ler o arquivo CSV
-        dados = []
-        with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
-            # Detectar se tem cabeçalho
-            primeira_linha = arquivo.readline().strip()
-            arquivo.seek(0)
-            
-            # Se a primeira linha contém "timestamp" é um cabeçalho
-            tem_cabecalho = 'timestamp' in primeira_linha.lower()
-            
-            if separador == 'auto':
-                # Detectar separador automaticamente
-                if ';' in primeira_linha:
-                    separador = ';'
-                elif ',' in primeira_linha:
-                    separador = ','
-                else:
-                    separador = ';'  # padrão
-            
-            leitor = csv.reader(arquivo, delimiter=separador)
-            
-            if tem_cabecalho:
-                next(leitor)  # Pular cabeçalho
-            
-            for linha in leitor:
-                if len(linha) >= 6:  # Garantir que tem todas as colunas
-                    dados.append(linha)
-        
-        if not dados:
-            return {'sucesso': False, 'erro': 'Arquivo CSV vazio ou formato inválido'}
-        
-        # Verificar/criar sensor
-        sensor_criado = False
-        if not sensor_id or sensor_id == '':
-            if criar_sensor_automatico:
-                # Criar sensor automaticamente
-                tipo_sensor = 'S1'  # Padrão para multi-sensor
-                modelo_sensor = 'Multi-Sensor ESP32'
-                sensor_id = sql_db.adicionar_sensor(tipo_sensor, modelo_sensor)
-                
-                # Se temos um campo, associar o sensor ao campo
-                if campo_id:
-                    sql_db.adicionar_posicao_sensor(sensor_id, campo_id)
-                
-                sensor_criado = True
-            else:
-                return {'sucesso': False, 'erro': 'Sensor não especificado'}
-        else:
-            sensor_id = int(sensor_id)
-            # Verificar se o sensor existe
-            sensor = sql_db.obter_sensor(sensor_id)
-            if not sensor:
-                return {'sucesso': False, 'erro': f'Sensor com ID {sensor_id} não encontrado'}
-        
-        # Importar dados com timestamps simulados
-        registros_importados = 0
-        registros_erro = 0
-        
-        # Calcular timestamps simulados
-        # Começar da data/hora atual e retroceder 5 minutos por registro
-        data_fim = datetime.now()
-        total_registros = len(dados)
-        
-        print(f"Gerando timestamps simulados para {total_registros} registros")
-        print(f"Data final (mais recente): {data_fim}")
-        
-        # Calcular a data de início (total_registros * 5 minutos antes da data atual)
-        minutos_total = total_registros * 5
-        data_inicio = data_fim - timedelta(minutes=minutos_total)
-        print(f"Data inicial (mais antiga): {data_inicio}")
-        
-        for i, linha in enumerate(dados):
-            try:
-                if len(linha) < 6:
-                    registros_erro += 1
-                    continue
-                
-                # Parsing dos dados: timestamp;fosforo;potassio;ph;umidade;irrigacao
-                timestamp_original = linha[0]  # Manter para debug, mas não usar
-                fosforo = linha[1] == '1'
-                potassio = linha[2] == '1'
-                ph = float(linha[3])
-                umidade = float(linha[4])
-                irrigacao = linha[5] == '1'
-                
-                # Gerar timestamp simulado
-                # Começar da data mais antiga e adicionar 5 minutos por cada registro
-                data_hora_simulada = data_inicio + timedelta(minutes=i * 5)
-                
-                # Debug para os primeiros registros
-                if i < 3:
-                    print(f"Registro {i}: timestamp original={timestamp_original}, simulado={data_hora_simulada}")
-                
-                # Adicionar leitura de umidade
-                sql_db.adicionar_leitura(
-                    sensor_id=sensor_id,
-                    valor=umidade,
-                    unidade='%',
-                    data_hora=data_hora_simulada
-                )
-                
-                # Adicionar leitura de pH
-                sql_db.adicionar_leitura(
-                    sensor_id=sensor_id,
-                    valor=ph,
-                    unidade='pH',
-                    data_hora=data_hora_simulada
-                )
-                
-                # Adicionar leituras separadas para P e K (apenas se presentes)
-                if fosforo:
-                    sql_db.adicionar_leitura(
-                        sensor_id=sensor_id,
-                        valor=1,
-                        unidade='P_ppm',
-                        data_hora=data_hora_simulada
-                    )
-                
-                if potassio:
-                    sql_db.adicionar_leitura(
-                        sensor_id=sensor_id,
-                        valor=1,
-                        unidade='K_ppm',
-                        data_hora=data_hora_simulada
-                    )
-                
-                # Registrar estado de irrigação se necessário
-                if irrigacao and campo_id:
-                    try:
-                        # Calcular quantidade de água baseada na área do campo
-                        mongo_db = get_mongo_db()
-                        campo = mongo_db.obter_campo_por_id(campo_id)
-                        area_hectare = campo.get('campo', {}).get('area_total_hectare', 1) if campo else 1
-                        quantidade_agua = area_hectare * 150  # 150L por hectare
-                        
-                        sql_db.adicionar_aplicacao_recurso(
-                            campo_id=campo_id,
-                            tipo_recurso="água",
-                            quantidade=quantidade_agua,
-                            unidade="L",
-                            metodo_aplicacao="Sistema ESP32 Simulado",
-                            data_hora=data_hora_simulada
-                        )
-                    except Exception as e:
-                        print(f"Erro ao registrar irrigação: {e}")
-                        # Não falhar por causa da irrigação
-                
-                registros_importados += 1
-                
-            except Exception as e:
-                print(f"Erro ao processar linha {linha}: {str(e)}")
-                registros_erro += 1
-                continue
-        
-        print(f"Importação concluída: {registros_importados} registros importados")
-        
-        resultado = {
-            'sucesso': True,
-            'registros_importados': registros_importados,
-            'registros_erro': registros_erro,
-            'sensor_id': sensor_id,
-            'periodo_simulado': {
-                'inicio': data_inicio.strftime('%d/%m/%Y %H:%M'),
-                'fim': data_fim.strftime('%d/%m/%Y %H:%M'),
-                'intervalo': '5 minutos'
-            }
-        }
-        
-        if sensor_criado:
-            resultado['sensor_criado'] = True
-        
-        return resultado
-        
-    except Exception as e:
-        return {'sucesso': False, 'erro': str(e)}
-
+@sensor_bp.route('/api/importacoes/<job_id>')
+def status_importacao_csv(job_id):
+    """Progresso e resultado de uma importação de CSV"""
+    job = get_fila_jobs().obter(job_id, incluir_resultado=True)
+    if not job or job['tipo'] != 'importacao_csv':
+        return jsonify({"erro": "Importação não encontrada"}), 404
+    
+    resultado = job['resultado']
+    if job['status'] in ('erro', 'cancelado'):
+        resultado = {'sucesso': False, 'erro': job['erro'] or job['mensagem']}
+    return jsonify({
+        'id': job['id'],
+        'status': job['status'],
+        'linhas_processadas': job['detalhes'].get('linhas_processadas', 0),
+        'total_linhas': job['detalhes'].get('total_linhas'),
+        'progresso': job['progresso'],
+        'criado_em': job['criado_em'],
+        'iniciado_em': job['iniciado_em'],
+        'concluido_em': job['concluido_em'],
+        'resultado': resultado
+    })
 
-# @sensor_bp.route('/notebook-results')
 # def notebook_results():
 #     """Converte e exibe o notebook PBL como HTML"""
 #     try:
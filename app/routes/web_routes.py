@@ -1,5 +1,4 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, Response
-from app.services.db_service import DatabaseService
 from app.models.cultura import Cultura
 from app.models.campo import Campo
 import json
@@ -12,10 +11,15 @@ import webbrowser
 
 web_bp = Blueprint('web', __name__)
 
+# Obter instância de serviço (criada uma vez em create_app)
+def get_mongo_db():
+    from app import db_service
+    return db_service
+
 @web_bp.route('/')
 def index():
     """Página inicial"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     culturas = db_service.obter_todas_culturas()
     campos = db_service.obter_todos_campos()
     
@@ -28,7 +32,7 @@ def index():
 @web_bp.route('/culturas')
 def listar_culturas():
     """Lista todas as culturas"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     culturas = db_service.obter_todas_culturas()
     return render_template('culturas.html', culturas=culturas)
 
@@ -93,7 +97,7 @@ def adicionar_cultura():
                 fertilizantes_insumos=fertilizantes_insumos
             )
             
-            db_service = DatabaseService(current_app.config['MONGO_URI'])
+            db_service = get_mongo_db()
             db_service.adicionar_cultura(cultura)
             
             flash('Cultura adicionada com sucesso!', 'success')
@@ -106,7 +110,7 @@ def adicionar_cultura():
 @web_bp.route('/culturas/<cultura_id>')
 def visualizar_cultura(cultura_id):
     """Visualiza detalhes de uma cultura específica"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     cultura = db_service.obter_cultura_por_id(cultura_id)
     
     if not cultura:
@@ -118,7 +122,7 @@ def visualizar_cultura(cultura_id):
 @web_bp.route('/culturas/<cultura_id>/editar', methods=['GET', 'POST'])
 def editar_cultura(cultura_id):
     """Edita uma cultura existente"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     cultura = db_service.obter_cultura_por_id(cultura_id)
     
     if not cultura:
@@ -143,7 +147,7 @@ def editar_cultura(cultura_id):
 @web_bp.route('/culturas/<cultura_id>/remover', methods=['POST'])
 def remover_cultura(cultura_id):
     """Remove uma cultura"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         db_service.remover_cultura(cultura_id)
@@ -156,7 +160,7 @@ def remover_cultura(cultura_id):
 @web_bp.route('/campos')
 def listar_campos():
     """Lista todos os campos cadastrados"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     campos = db_service.obter_todos_campos()
     
     return render_template('campos.html', campos=campos)
@@ -164,7 +168,7 @@ def listar_campos():
 @web_bp.route('/campos/adicionar', methods=['GET', 'POST'])
 def adicionar_campo():
     """Adiciona um novo campo"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     culturas = db_service.obter_todas_culturas()
     
     if request.method == 'POST':
@@ -224,7 +228,7 @@ def adicionar_campo():
 @web_bp.route('/campos/<campo_id>')
 def visualizar_campo(campo_id):
     """Visualiza detalhes de um campo específico"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     campo = db_service.obter_campo_por_id(campo_id)
     
     if not campo:
@@ -240,7 +244,7 @@ def visualizar_campo(campo_id):
 @web_bp.route('/campos/<campo_id>/editar', methods=['GET', 'POST'])
 def editar_campo(campo_id):
     """Edita um campo existente"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     campo = db_service.obter_campo_por_id(campo_id)
     culturas = db_service.obter_todas_culturas()
     
@@ -266,7 +270,7 @@ def editar_campo(campo_id):
 @web_bp.route('/campos/<campo_id>/remover', methods=['POST'])
 def remover_campo(campo_id):
     """Remove um campo"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     
     try:
         db_service.remover_campo(campo_id)
@@ -279,7 +283,7 @@ def remover_campo(campo_id):
 @web_bp.route('/calculadora')
 def calculadora():
     """Página da calculadora interativa"""
-    db_service = DatabaseService(current_app.config['MONGO_URI'])
+    db_service = get_mongo_db()
     culturas = db_service.obter_todas_culturas()
     
     return render_template('calculadora.html', culturas=culturas)
@@ -0,0 +1,699 @@
+# app/scripts/benchmark_ml.py
+
+"""
+FarmTech Solutions
+Benchmarks do pipeline de Machine Learning
+
+Mede throughput das etapas do IrrigationPredictor com dados sintéticos,
+comparando com a implementação anterior quando ela existe.
+
+Uso:
+    python app/scripts/benchmark_ml.py features --rows 1000000
+    python app/scripts/benchmark_ml.py batch --items 500
+    python app/scripts/benchmark_ml.py confidence --items 500
+    python app/scripts/benchmark_ml.py climate --rows 1000000
+    python app/scripts/benchmark_ml.py coleta --sensors 20 --days 30
+    python app/scripts/benchmark_ml.py online --sensors 20 --days 30 --new-minutes 60
+    python app/scripts/benchmark_ml.py bundle --workers 4
+    python app/scripts/benchmark_ml.py bundle --trees 100 --rows 5000
+    python app/scripts/benchmark_ml.py compiled --items 2000
+"""
+
+import sys
+import os
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from app.ml.irrigation_predictor import IrrigationPredictor
+
+def gerar_dados_sinteticos(n, seed=42):
+    """Leituras sintéticas com clima, no formato usado em engineer_features"""
+    rng = np.random.default_rng(seed)
+    inicio = pd.Timestamp('2024-01-01').value // 10**6
+    return pd.DataFrame({
+        'timestamp': inicio + np.sort(rng.integers(0, 365 * 24 * 3600 * 1000, n)),
+        'umidade': rng.uniform(5, 95, n),
+        'ph': rng.uniform(4, 9, n),
+        'fosforo': rng.integers(0, 2, n),
+        'potassio': rng.integers(0, 2, n),
+        'temperature': rng.normal(27, 5, n),
+        'humidity_air': rng.uniform(30, 100, n),
+        'precipitation': np.where(rng.random(n) < 0.2, rng.exponential(3, n), 0.0),
+        'wind_speed': rng.uniform(0, 10, n),
+        'pressure': rng.normal(1013, 5, n)
+    })
+
+def cronometrar(funcao, *args, repeticoes=1):
+    """Executa a função e retorna (melhor tempo em segundos, último resultado)"""
+    melhor = float('inf')
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+def imprimir_resultado(nome, linhas, segundos):
+    print(f"  {nome:<28} {segundos:8.3f}s  {linhas / segundos:14,.0f} linhas/s")
+
+# ========== FEATURES ==========
+
+def engineer_features_anterior(predictor, data):
+    """Implementação anterior (apply por linha + LabelEncoder por chamada), mantida para comparação"""
+    from sklearn.preprocessing import LabelEncoder
+
+    def periodo_dia(hora):
+        if 5 <= hora < 12:
+            return 'manha'
+        elif 12 <= hora < 18:
+            return 'tarde'
+        elif 18 <= hora < 22:
+            return 'noite'
+        return 'madrugada'
+
+    def estacao(mes):
+        if mes in [12, 1, 2]:
+            return 'verao'
+        elif mes in [3, 4, 5]:
+            return 'outono'
+        elif mes in [6, 7, 8]:
+            return 'inverno'
+        return 'primavera'
+
+    def categoria_ph(ph):
+        if ph < 6.0:
+            return 'acido'
+        elif 6.0 <= ph <= 7.5:
+            return 'ideal'
+        return 'alcalino'
+
+    data = data.copy()
+    features = pd.DataFrame()
+    features['umidade_atual'] = data['umidade']
+    features['ph_atual'] = data['ph']
+    features['fosforo'] = data['fosforo'].astype(int)
+    features['potassio'] = data['potassio'].astype(int)
+    for feat in ['temperature', 'humidity_air', 'precipitation', 'wind_speed', 'pressure']:
+        features[feat] = data.get(feat, 0)
+    data['datetime'] = pd.to_datetime(data['timestamp'], unit='ms')
+    features['hora_do_dia'] = data['datetime'].dt.hour
+    features['dia_da_semana'] = data['datetime'].dt.dayofweek
+    features['mes_ano'] = data['datetime'].dt.month
+    features['umidade_tendencia'] = data['umidade'].rolling(window=3, min_periods=1).mean()
+    features['ph_tendencia'] = data['ph'].rolling(window=3, min_periods=1).mean()
+    features['umidade_variacao'] = data['umidade'].rolling(window=3, min_periods=1).std().fillna(0)
+    if 'temperature' in data.columns:
+        features['estresse_termico'] = (features['temperature'] > 30).astype(int)
+        features['temp_tendencia'] = data['temperature'].rolling(window=3, min_periods=1).mean()
+    if 'precipitation' in data.columns:
+        features['chuva_recente'] = (features['precipitation'] > 0).astype(int)
+        features['precipitacao_acumulada'] = data['precipitation'].rolling(window=6, min_periods=1).sum()
+    features['periodo_dia'] = features['hora_do_dia'].apply(periodo_dia)
+    features['estacao'] = features['mes_ano'].apply(estacao)
+    features['necessidade_nutrientes'] = (features['fosforo'] + features['potassio']).apply(
+        lambda x: 'alta' if x >= 2 else 'media' if x == 1 else 'baixa'
+    )
+    features['ph_categoria'] = features['ph_atual'].apply(categoria_ph)
+    for coluna in ['periodo_dia', 'estacao', 'necessidade_nutrientes', 'ph_categoria']:
+        features[f'{coluna}_encoded'] = LabelEncoder().fit_transform(features[coluna])
+    features = features.drop(['periodo_dia', 'estacao', 'necessidade_nutrientes', 'ph_categoria'], axis=1)
+    return features.fillna(0)
+
+def benchmark_features(args):
+    predictor = IrrigationPredictor()
+    dados = gerar_dados_sinteticos(args.rows)
+    print(f"engineer_features com {args.rows:,} linhas sintéticas")
+
+    tempo_novo, novo = cronometrar(predictor.engineer_features, dados, repeticoes=args.repeat)
+    imprimir_resultado("vetorizado (atual)", args.rows, tempo_novo)
+
+    if not args.skip_baseline:
+        tempo_anterior, anterior = cronometrar(engineer_features_anterior, predictor, dados)
+        imprimir_resultado("apply + LabelEncoder", args.rows, tempo_anterior)
+        print(f"  speedup: {tempo_anterior / tempo_novo:.1f}x")
+
+        # Com todas as categorias presentes, os códigos fixos coincidem com os do LabelEncoder
+        iguais = novo.shape == anterior.shape and np.allclose(
+            novo.to_numpy(dtype=float), anterior[novo.columns].to_numpy(dtype=float)
+        )
+        print(f"  saídas idênticas: {'sim' if iguais else 'NÃO'}")
+
+    # Uma linha deve gerar exatamente a linha correspondente do lote (exceto rolling)
+    linha = dados.iloc[[len(dados) // 2]]
+    unica = predictor.engineer_features(linha)
+    categoricas = [c for c in unica.columns if c.endswith('_encoded')]
+    consistente = (unica[categoricas].to_numpy() == novo.loc[linha.index, categoricas].to_numpy()).all()
+    print(f"  códigos de uma linha == lote: {'sim' if consistente else 'NÃO'}")
+
+# ========== PREDIÇÃO EM LOTE ==========
+
+def treinar_predictor_sintetico(linhas=2000, seed=42):
+    """Treina um IrrigationPredictor com dados sintéticos (sem banco nem clima)"""
+    dados = gerar_dados_sinteticos(linhas, seed)
+    dados['irrigacao'] = (dados['umidade'] < 40).astype(int)
+    predictor = IrrigationPredictor()
+    predictor.train_models(dados.to_dict('records'))
+    return predictor
+
+def benchmark_batch(args):
+    predictor = treinar_predictor_sintetico()
+    condicoes = gerar_dados_sinteticos(args.items, seed=7).to_dict('records')
+    print(f"predict_irrigation_batch com {args.items:,} condições")
+
+    tempo_lote, lote = cronometrar(predictor.predict_irrigation_batch, condicoes, repeticoes=args.repeat)
+    imprimir_resultado("lote vetorizado (atual)", args.items, tempo_lote)
+
+    tempo_um, _ = cronometrar(predictor.predict_irrigation_batch, condicoes[:1], repeticoes=args.repeat)
+    imprimir_resultado("lote com 1 condição", 1, tempo_um)
+
+    if not args.skip_baseline:
+        tempo_anterior, anterior = cronometrar(
+            lambda itens: [predictor.predict_irrigation_need(item) for item in itens], condicoes
+        )
+        imprimir_resultado("predict_irrigation_need x N", args.items, tempo_anterior)
+        print(f"  speedup: {tempo_anterior / tempo_lote:.1f}x")
+
+        campos = ['irrigation_needed', 'irrigation_probability', 'confidence', 'predicted_humidity_next_hour']
+        iguais = all(
+            np.isclose(novo[campo], antigo[campo])
+            for novo, antigo in zip(lote, anterior) for campo in campos
+        )
+        print(f"  saídas idênticas: {'sim' if iguais else 'NÃO'}")
+
+# ========== INTERVALOS DE CONFIANÇA ==========
+
+def intervalos_anterior(predictor, condicoes):
+    """Implementação anterior (predict_proba de cada árvore, uma linha por vez), mantida para comparação"""
+    resultados = []
+    for condicao in condicoes:
+        features = predictor.engineer_features(pd.DataFrame([condicao]))
+        features = features.reindex(columns=predictor.feature_columns, fill_value=0)
+        features_scaled = predictor.scaler.transform(features)
+        arvores = [arvore.predict_proba(features_scaled)[0][1] for arvore in predictor.irrigation_classifier.estimators_]
+        resultados.append((np.mean(arvores), np.std(arvores)))
+    return resultados
+
+def benchmark_confidence(args):
+    predictor = treinar_predictor_sintetico()
+    condicoes = gerar_dados_sinteticos(args.items, seed=7).to_dict('records')
+    print(f"predict_with_confidence_intervals_batch com {args.items:,} condições "
+          f"e {len(predictor.irrigation_classifier.estimators_)} árvores")
+
+    tempo_lote, lote = cronometrar(predictor.predict_with_confidence_intervals_batch, condicoes, repeticoes=args.repeat)
+    imprimir_resultado("lote vetorizado (atual)", args.items, tempo_lote)
+
+    if not args.skip_baseline:
+        tempo_anterior, anterior = cronometrar(intervalos_anterior, predictor, condicoes)
+        imprimir_resultado("árvore a árvore, por linha", args.items, tempo_anterior)
+        print(f"  speedup: {tempo_anterior / tempo_lote:.1f}x")
+
+        iguais = all(
+            np.isclose(novo['irrigation_probability'], media) and np.isclose(novo['prediction_std'], desvio)
+            for novo, (media, desvio) in zip(lote, anterior)
+        )
+        print(f"  saídas idênticas: {'sim' if iguais else 'NÃO'}")
+
+# ========== ENRIQUECIMENTO CLIMÁTICO ==========
+
+def gerar_clima_sintetico(inicio_ms, fim_ms, seed=42):
+    """Pontos climáticos horários cobrindo o período, no formato de get_historical_weather"""
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(inicio_ms, fim_ms + 3600000, 3600000)
+    return [
+        {'timestamp': int(ts), 'temperature': float(t), 'humidity_air': float(h),
+         'precipitation': float(p), 'wind_speed': float(w), 'pressure': float(pr)}
+        for ts, t, h, p, w, pr in zip(
+            timestamps, rng.normal(27, 5, len(timestamps)), rng.uniform(30, 100, len(timestamps)),
+            rng.exponential(1, len(timestamps)), rng.uniform(0, 10, len(timestamps)),
+            rng.normal(1013, 5, len(timestamps))
+        )
+    ]
+
+def merge_climate_anterior(sensor_data, climate_data):
+    """Implementação anterior (cada leitura percorre todo o clima), mantida para comparação"""
+    climate_index = {c['timestamp']: c for c in climate_data}
+    enriched_data = []
+    for sensor_point in sensor_data:
+        enriched_point = sensor_point.copy()
+        closest_climate = None
+        min_diff = float('inf')
+        for climate_timestamp, climate_point in climate_index.items():
+            diff = abs(climate_timestamp - sensor_point['timestamp'])
+            if diff < min_diff and diff <= 3600000:
+                min_diff = diff
+                closest_climate = climate_point
+        closest_climate = closest_climate or {}
+        for campo, padrao in IrrigationPredictor.CLIMATE_DEFAULTS.items():
+            enriched_point[campo] = closest_climate.get(campo, padrao)
+        enriched_data.append(enriched_point)
+    return enriched_data
+
+def benchmark_climate(args):
+    predictor = IrrigationPredictor()
+    # Leituras a cada 5 minutos, em janelas de 30 dias com falhas no clima
+    rng = np.random.default_rng(42)
+    inicio = pd.Timestamp('2024-01-01').value // 10**6
+    timestamps = inicio + np.arange(args.rows, dtype=np.int64) * 300000
+    leituras = pd.DataFrame({
+        'timestamp': timestamps,
+        'umidade': rng.uniform(5, 95, args.rows),
+        'ph': rng.uniform(4, 9, args.rows)
+    })
+    clima = gerar_clima_sintetico(int(timestamps[0]), int(timestamps[-1]))
+    clima = [ponto for i, ponto in enumerate(clima) if i % 50 != 0]  # lacunas: leituras sem clima próximo
+    print(f"merge_climate_data com {args.rows:,} leituras e {len(clima):,} pontos climáticos")
+
+    tempo_frame, _ = cronometrar(predictor.merge_climate_data, leituras, clima, repeticoes=args.repeat)
+    imprimir_resultado("searchsorted (DataFrame)", args.rows, tempo_frame)
+
+    registros = leituras.to_dict('records')
+    tempo_lista, resultado = cronometrar(predictor.merge_climate_data, registros, clima)
+    imprimir_resultado("searchsorted (lista)", args.rows, tempo_lista)
+
+    if not args.skip_baseline:
+        # O(N×M): mede uma amostra com o clima correspondente e extrapola
+        amostra = registros[:args.baseline_rows]
+        limite = amostra[-1]['timestamp'] + 3600000
+        clima_amostra = [ponto for ponto in clima if ponto['timestamp'] <= limite]
+        escala = (args.rows / len(amostra)) * (len(clima) / max(len(clima_amostra), 1))
+        tempo_anterior, anterior = cronometrar(merge_climate_anterior, amostra, clima_amostra)
+        print(f"  anterior (amostra de {len(amostra):,}) {tempo_anterior:8.3f}s  "
+              f"~{tempo_anterior * escala:,.0f}s estimados para {args.rows:,}")
+        print(f"  speedup estimado: {tempo_anterior * escala / tempo_frame:,.0f}x")
+
+        novo = predictor.merge_climate_data(amostra, clima_amostra)
+        iguais = all(
+            np.isclose(n[campo], a[campo])
+            for n, a in zip(novo, anterior) for campo in IrrigationPredictor.CLIMATE_DEFAULTS
+        )
+        print(f"  saídas idênticas na amostra: {'sim' if iguais else 'NÃO'}")
+
+# ========== COLETA DE DADOS DE TREINAMENTO ==========
+
+def coletar_treinamento_anterior(sql_db, days_back):
+    """Implementação anterior (uma consulta ORM por sensor, agrupamento pelo ms exato), mantida para comparação"""
+    from app.models.sensor_models import Sensor, LeituraSensor, expandir_leitura
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days_back)
+    all_data = []
+    session = sql_db.get_session()
+    try:
+        for sensor in session.query(Sensor).filter_by(ativo=True).all():
+            leituras = session.query(LeituraSensor).filter(
+                LeituraSensor.sensor_id == sensor.id,
+                LeituraSensor.data_hora >= start_date,
+                LeituraSensor.data_hora <= end_date
+            ).order_by(LeituraSensor.data_hora).all()
+
+            grouped_data = {}
+            for leitura in leituras:
+                timestamp = int(leitura.data_hora.timestamp() * 1000)
+                if timestamp not in grouped_data:
+                    grouped_data[timestamp] = {'timestamp': timestamp, 'umidade': 0, 'ph': 7.0,
+                                               'fosforo': 0, 'potassio': 0, 'irrigacao': 0}
+                if leitura.metrica and leitura.valor_numerico is not None:
+                    linhas = [(leitura.metrica, leitura.valor_numerico, leitura.unidade)]
+                else:
+                    try:
+                        linhas = expandir_leitura(leitura.valor, leitura.unidade)
+                    except (ValueError, SyntaxError):
+                        continue
+                for metrica, numero, _ in linhas:
+                    if metrica in grouped_data[timestamp] and numero is not None:
+                        grouped_data[timestamp][metrica] = numero
+            all_data.extend(grouped_data.values())
+    finally:
+        session.close()
+    return all_data
+
+def gerar_leituras_sinteticas(sensores, fim, por_sensor, seed=42, irrigacao=False):
+    """
+    Um registro a cada 5 minutos por sensor, terminando em fim; pH gravado alguns µs depois da umidade
+
+    Com irrigacao=True cada registro também tem o acionamento da bomba (umidade abaixo de 30%).
+    """
+    rng = np.random.default_rng(seed)
+    for sensor_id in sensores:
+        for i in range(por_sensor):
+            data_hora = fim - timedelta(minutes=5 * i) + timedelta(microseconds=int(rng.integers(0, 1000)))
+            umidade = float(rng.uniform(5, 95))
+            yield {'sensor_id': sensor_id, 'valor': umidade, 'unidade': '%', 'data_hora': data_hora}
+            yield {'sensor_id': sensor_id, 'valor': float(rng.uniform(4, 9)), 'unidade': 'pH',
+                   'data_hora': data_hora + timedelta(microseconds=int(rng.integers(1, 2000)))}
+            yield {'sensor_id': sensor_id, 'valor': {'P': int(rng.integers(0, 2)), 'K': int(rng.integers(0, 2))},
+                   'unidade': 'ppm', 'data_hora': data_hora}
+            if irrigacao:
+                yield {'sensor_id': sensor_id, 'valor': int(umidade < 30), 'unidade': 'irrigacao', 'data_hora': data_hora}
+
+def benchmark_coleta(args):
+    import tempfile
+    from app.services.sql_db_service import SQLDatabaseService
+    from app.services.carga_leituras import CarregadorLeituras
+    from app.ml.model_trainer import ModelTrainer
+
+    diretorio = tempfile.mkdtemp(prefix='farmtech_bench_')
+    sql_db = SQLDatabaseService(f"sqlite:///{os.path.join(diretorio, 'sensores.db')}")
+    sensores = [sql_db.adicionar_sensor('S1', 'Benchmark') for _ in range(args.sensors)]
+
+    por_sensor = args.days * 288
+    fim = datetime.now().replace(second=0, microsecond=0) - timedelta(minutes=1)
+    carga = CarregadorLeituras(sql_db, tamanho_lote=20000, reconstruir_agregados=False).carregar(
+        gerar_leituras_sinteticas(sensores, fim, por_sensor)
+    )
+    registros = args.sensors * por_sensor
+    print(f"Coleta de treinamento: {args.sensors} sensores, {registros:,} registros, {carga['linhas']:,} leituras")
+
+    trainer = ModelTrainer(sql_db)
+    tempo_novo, frame = cronometrar(trainer.collect_training_frame, args.days + 1, 1, repeticoes=args.repeat)
+    imprimir_resultado("read_sql + pivot", carga['linhas'], tempo_novo)
+    print(f"    registros montados: {len(frame):,}")
+
+    if not args.skip_baseline:
+        tempo_anterior, anterior = cronometrar(coletar_treinamento_anterior, sql_db, args.days + 1)
+        imprimir_resultado("anterior (ORM por sensor)", carga['linhas'], tempo_anterior)
+        print(f"    registros montados: {len(anterior):,} "
+              f"({len(anterior) - registros:,} registros partidos por timestamps diferentes)")
+        print(f"  speedup: {tempo_anterior / tempo_novo:,.1f}x")
+
+# ========== TREINO INCREMENTAL ==========
+
+def benchmark_online(args):
+    import tempfile
+    from app.services.sql_db_service import SQLDatabaseService
+    from app.services.carga_leituras import CarregadorLeituras
+    from app.ml.model_trainer import ModelTrainer
+    from app.ml.online_learning import OnlineTrainer
+
+    diretorio = tempfile.mkdtemp(prefix='farmtech_bench_')
+    sql_db = SQLDatabaseService(f"sqlite:///{os.path.join(diretorio, 'sensores.db')}")
+    sensores = [sql_db.adicionar_sensor('S1', 'Benchmark') for _ in range(args.sensors)]
+    carregador = CarregadorLeituras(sql_db, tamanho_lote=20000, reconstruir_agregados=False)
+
+    # Histórico até uma hora atrás; as leituras "novas" chegam depois
+    agora = datetime.now().replace(second=0, microsecond=0)
+    novos = args.new_minutes // 5
+    carga = carregador.carregar(gerar_leituras_sinteticas(
+        sensores, agora - timedelta(minutes=5 * novos + 1), args.days * 288, irrigacao=True
+    ))
+    print(f"Treino incremental: {args.sensors} sensores, {args.days} dias de histórico ({carga['linhas']:,} leituras)")
+
+    trainer = ModelTrainer(sql_db)
+
+    def retreino_completo():
+        frame = trainer.collect_training_frame(args.days + 1, 1)
+        return IrrigationPredictor().train_models(frame)
+
+    tempo_completo, _ = cronometrar(retreino_completo)
+    imprimir_resultado("retreino completo", args.sensors * args.days * 288, tempo_completo)
+
+    online = OnlineTrainer(sql_db, path_prefix=os.path.join(diretorio, 'models', 'farmtech_online'),
+                           bootstrap_days=args.days + 1)
+    tempo_inicial, inicial = cronometrar(online.update)
+    imprimir_resultado("incremental (1ª, histórico)", inicial['samples'], tempo_inicial)
+
+    carregador.carregar(gerar_leituras_sinteticas(sensores, agora - timedelta(minutes=1), novos, seed=7, irrigacao=True))
+    tempo_novo, atualizacao = cronometrar(online.update)
+    imprimir_resultado(f"incremental ({args.new_minutes} min novos)", atualizacao['samples'], tempo_novo)
+    if 'batch_accuracy' in atualizacao:
+        print(f"    acurácia nas leituras novas antes de aprender com elas: {atualizacao['batch_accuracy']:.3f}")
+    print(f"  speedup vs. retreino completo: {tempo_completo / tempo_novo:,.1f}x")
+
+# ========== BUNDLE DOS MODELOS ==========
+
+def memoria_processo():
+    """Rss e Pss do processo em KB (/proc/self/smaps_rollup; None fora do Linux)"""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            campos = dict(linha.split(':', 1) for linha in f if ':' in linha)
+    except OSError:
+        return None
+    return {chave: int(campos[chave].split()[0]) for chave in ('Rss', 'Pss')}
+
+def carregar_em_processo(prefixo, mmap_mode, condicoes, repeticoes, barreira, fila):
+    """
+    Um "worker": carrega os modelos e faz um lote de predições
+
+    A memória é medida com todos os processos carregados (Pss divide as
+    páginas compartilhadas entre eles); o tempo de carga é o melhor de
+    algumas repetições, já que os processos disputam a CPU.
+    """
+    import logging
+    import warnings
+
+    logging.disable(logging.INFO)
+    warnings.simplefilter('ignore')
+    # Todos começam a carga juntos, depois dos imports
+    barreira.wait()
+    antes = memoria_processo()
+    predictor = IrrigationPredictor()
+    predictor.load_models(prefixo, mmap_mode=mmap_mode)
+    predictor.predict_irrigation_batch(condicoes)
+    barreira.wait()
+    depois = memoria_processo()
+    barreira.wait()
+
+    segundos, _ = cronometrar(lambda: IrrigationPredictor().load_models(prefixo, mmap_mode=mmap_mode),
+                              repeticoes=repeticoes)
+    fila.put((segundos, antes, depois))
+
+def gravar_arquivos_separados(predictor, prefixo):
+    """Layout anterior ao bundle (três pickles e o metadata), mantido para comparação"""
+    import json
+    import joblib
+
+    joblib.dump(predictor.irrigation_classifier, f"{prefixo}_irrigation.pkl")
+    joblib.dump(predictor.humidity_regressor, f"{prefixo}_humidity.pkl")
+    joblib.dump(predictor.scaler, f"{prefixo}_scaler.pkl")
+    with open(f"{prefixo}_metadata.json", 'w') as f:
+        json.dump({'version': predictor.model_version, 'feature_columns': predictor.feature_columns,
+                   'category_codes': predictor.category_codes, 'metrics': predictor.model_metrics}, f)
+
+def benchmark_bundle(args):
+    import glob
+    import logging
+    import multiprocessing
+    import tempfile
+    import warnings
+
+    logging.disable(logging.INFO)
+    warnings.simplefilter('ignore')
+    if args.trees:
+        predictor = IrrigationPredictor()
+        for modelo in (predictor.irrigation_classifier, predictor.humidity_regressor):
+            modelo.set_params(n_estimators=args.trees, max_depth=None, min_samples_split=2, min_samples_leaf=1)
+        dados = gerar_dados_sinteticos(args.rows)
+        dados['irrigacao'] = (dados['umidade'] < 40).astype(int)
+        predictor.train_models(dados.to_dict('records'))
+        origem = f"floresta sintética com {args.trees} árvores sem limite de profundidade"
+    else:
+        predictor = IrrigationPredictor()
+        if not predictor.load_models(args.prefix):
+            print(f"Modelos não encontrados em {args.prefix} (use --trees para treinar uma floresta sintética)")
+            return
+        origem = f"modelos de {args.prefix}"
+
+    diretorio = tempfile.mkdtemp(prefix='farmtech_bundle_')
+    prefixos = {nome: os.path.join(diretorio, nome, 'farmtech') for nome in ('separados', 'bundle', 'compacto')}
+    for prefixo in prefixos.values():
+        os.makedirs(os.path.dirname(prefixo))
+    gravar_arquivos_separados(predictor, prefixos['separados'])
+    predictor.save_models(prefixos['bundle'])
+    predictor.save_models(prefixos['compacto'], compact=True)
+
+    print(f"Carga dos modelos ({origem}) em {args.workers} processos simultâneos")
+    for nome, prefixo in prefixos.items():
+        tamanho = sum(os.path.getsize(arquivo) for arquivo in glob.glob(f"{prefixo}_*"))
+        print(f"  arquivos {nome}: {tamanho / 1024:,.0f} KB")
+
+    condicoes = gerar_dados_sinteticos(args.items, seed=7).to_dict('records')
+    contexto = multiprocessing.get_context('spawn')
+    variantes = [
+        ('arquivos separados (atual)', prefixos['separados'], None),
+        ('bundle', prefixos['bundle'], None),
+        ('bundle + mmap', prefixos['bundle'], 'r'),
+        ('bundle compacto + mmap', prefixos['compacto'], 'r')
+    ]
+    for nome, prefixo, mmap_mode in variantes:
+        barreira = contexto.Barrier(args.workers)
+        fila = contexto.Queue()
+        processos = [
+            contexto.Process(target=carregar_em_processo, args=(prefixo, mmap_mode, condicoes, args.repeat, barreira, fila))
+            for _ in range(args.workers)
+        ]
+        for processo in processos:
+            processo.start()
+        medidas = [fila.get() for _ in processos]
+        for processo in processos:
+            processo.join()
+
+        carga = np.median([segundos for segundos, _, _ in medidas])
+        if medidas[0][1] is None:
+            print(f"  {nome:<28} carga {carga * 1000:8.1f} ms")
+            continue
+        rss = np.mean([depois['Rss'] - antes['Rss'] for _, antes, depois in medidas]) / 1024
+        pss = np.mean([depois['Pss'] - antes['Pss'] for _, antes, depois in medidas]) / 1024
+        print(f"  {nome:<28} carga {carga * 1000:8.1f} ms   RSS +{rss:7.1f} MB   PSS +{pss:7.1f} MB por worker")
+
+# ========== INFERÊNCIA COMPILADA ==========
+
+def latencias(funcao, itens):
+    """Latência de cada chamada (segundos)"""
+    tempos = np.empty(len(itens))
+    for posicao, item in enumerate(itens):
+        inicio = time.perf_counter()
+        funcao(item)
+        tempos[posicao] = time.perf_counter() - inicio
+    return tempos
+
+def imprimir_latencias(nome, tempos):
+    p50, p99 = np.percentile(tempos, [50, 99]) * 1e6
+    print(f"  {nome:<28} p50 {p50:9.1f} µs   p99 {p99:9.1f} µs")
+
+def benchmark_compiled(args):
+    import logging
+    from app.ml.model_bundle import compact_model
+
+    logging.disable(logging.INFO)
+    predictor = treinar_predictor_sintetico()
+    dados = gerar_dados_sinteticos(args.items, seed=7)
+    condicoes = dados.to_dict('records')
+
+    referencia = [predictor.predict_irrigation_need(condicao) for condicao in condicoes]
+    inicio = time.perf_counter()
+    if not predictor.enable_compiled_inference():
+        return
+    print(f"predict_irrigation_need de uma condição, {args.items:,} chamadas, "
+          f"{len(predictor.irrigation_classifier.estimators_)} árvores por modelo "
+          f"(engine montada em {time.perf_counter() - inicio:.2f}s)")
+    compilado = [predictor.predict_irrigation_need(condicao) for condicao in condicoes]
+
+    engine = predictor.compiled_engine
+    predictor.compiled_engine = None
+    tempos_sklearn = latencias(predictor.predict_irrigation_need, condicoes)
+    predictor.compiled_engine = engine
+    tempos_compilado = latencias(predictor.predict_irrigation_need, condicoes)
+    imprimir_latencias("scikit-learn + pandas", tempos_sklearn)
+    imprimir_latencias("compilado (Numba)", tempos_compilado)
+    imprimir_latencias("  só as árvores", latencias(
+        lambda linha: engine.predict_features(linha[np.newaxis, :]),
+        [engine.features_from_conditions(condicao) for condicao in condicoes]
+    ))
+    print(f"  speedup p50: {np.median(tempos_sklearn) / np.median(tempos_compilado):.1f}x")
+
+    campos = ['irrigation_needed', 'irrigation_probability', 'confidence', 'predicted_humidity_next_hour']
+    iguais = all(novo[campo] == antigo[campo] for novo, antigo in zip(compilado, referencia) for campo in campos)
+    print(f"  saídas idênticas (==): {'sim' if iguais else 'NÃO'}")
+
+    # Entradas exatamente sobre os thresholds incorporados ao scaler e um float acima
+    rng = np.random.default_rng(1)
+    brutas = np.array([engine.features_from_conditions(condicao) for condicao in condicoes])
+    floresta = compact_model(predictor.irrigation_classifier)
+    internos = np.flatnonzero(floresta.children_left >= 0)
+    nos = rng.choice(internos, min(len(internos), args.items), replace=False)
+    limites = engine._irrigation[2][nos]
+    fronteira = True
+    for valores in (limites, np.nextafter(limites, np.inf)):
+        linhas = brutas[rng.integers(0, len(brutas), len(nos))]
+        linhas[np.arange(len(nos)), floresta.feature[nos]] = valores
+        escaladas = predictor.scaler.transform(pd.DataFrame(linhas, columns=predictor.feature_columns))
+        proba, _, umidade = engine.predict_features(linhas)
+        fronteira &= np.array_equal(proba, predictor.irrigation_classifier.predict_proba(escaladas))
+        fronteira &= np.array_equal(umidade, predictor.humidity_regressor.predict(escaladas))
+    print(f"  idênticas nos thresholds ({len(nos):,} nós): {'sim' if fronteira else 'NÃO'}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do pipeline de ML da FarmTech')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    parser_features = subparsers.add_parser('features', help='Throughput de engineer_features')
+    parser_features.add_argument('--rows', type=int, default=1_000_000,
+                                 help='Linhas sintéticas (padrão: 1.000.000)')
+    parser_features.add_argument('--repeat', type=int, default=3,
+                                 help='Repetições da versão atual (vale o melhor tempo)')
+    parser_features.add_argument('--skip-baseline', action='store_true',
+                                 help='Não executar a implementação anterior (lenta)')
+    parser_features.set_defaults(funcao=benchmark_features)
+
+    parser_batch = subparsers.add_parser('batch', help='Predição em lote vs. uma chamada por condição')
+    parser_batch.add_argument('--items', type=int, default=500,
+                              help='Condições por lote (padrão: 500)')
+    parser_batch.add_argument('--repeat', type=int, default=3,
+                              help='Repetições da versão atual (vale o melhor tempo)')
+    parser_batch.add_argument('--skip-baseline', action='store_true',
+                              help='Não executar a predição item a item')
+    parser_batch.set_defaults(funcao=benchmark_batch)
+
+    parser_confidence = subparsers.add_parser('confidence', help='Intervalos de confiança em lote vs. por linha')
+    parser_confidence.add_argument('--items', type=int, default=500,
+                                   help='Condições por lote (padrão: 500)')
+    parser_confidence.add_argument('--repeat', type=int, default=3,
+                                   help='Repetições da versão atual (vale o melhor tempo)')
+    parser_confidence.add_argument('--skip-baseline', action='store_true',
+                                   help='Não executar a implementação anterior')
+    parser_confidence.set_defaults(funcao=benchmark_confidence)
+
+    parser_climate = subparsers.add_parser('climate', help='Join das leituras com o clima mais próximo')
+    parser_climate.add_argument('--rows', type=int, default=1_000_000,
+                                help='Leituras sintéticas (padrão: 1.000.000)')
+    parser_climate.add_argument('--repeat', type=int, default=3,
+                                help='Repetições da versão atual (vale o melhor tempo)')
+    parser_climate.add_argument('--baseline-rows', type=int, default=5000,
+                                help='Amostra medida na implementação anterior (padrão: 5000)')
+    parser_climate.add_argument('--skip-baseline', action='store_true',
+                                help='Não executar a implementação anterior')
+    parser_climate.set_defaults(funcao=benchmark_climate)
+
+    parser_coleta = subparsers.add_parser('coleta', help='Montagem dos dados de treinamento a partir do banco')
+    parser_coleta.add_argument('--sensors', type=int, default=20,
+                               help='Sensores sintéticos (padrão: 20)')
+    parser_coleta.add_argument('--days', type=int, default=30,
+                               help='Dias de leituras a cada 5 minutos (padrão: 30)')
+    parser_coleta.add_argument('--repeat', type=int, default=3,
+                               help='Repetições da versão atual (vale o melhor tempo)')
+    parser_coleta.add_argument('--skip-baseline', action='store_true',
+                               help='Não executar a implementação anterior')
+    parser_coleta.set_defaults(funcao=benchmark_coleta)
+
+    parser_online = subparsers.add_parser('online', help='Atualização incremental vs. retreino completo')
+    parser_online.add_argument('--sensors', type=int, default=20,
+                               help='Sensores sintéticos (padrão: 20)')
+    parser_online.add_argument('--days', type=int, default=30,
+                               help='Dias de histórico a cada 5 minutos (padrão: 30)')
+    parser_online.add_argument('--new-minutes', type=int, default=60,
+                               help='Minutos de leituras novas na atualização (padrão: 60)')
+    parser_online.set_defaults(funcao=benchmark_online)
+
+    parser_bundle = subparsers.add_parser('bundle', help='Carga e memória por worker: arquivos separados vs. bundle (mmap, compacto)')
+    parser_bundle.add_argument('--prefix', default='models/farmtech',
+                               help='Modelos usados quando --trees não é informado (padrão: models/farmtech)')
+    parser_bundle.add_argument('--trees', type=int, default=0,
+                               help='Treinar florestas sintéticas com N árvores em vez de usar --prefix')
+    parser_bundle.add_argument('--rows', type=int, default=20000,
+                               help='Linhas do treino sintético (padrão: 20.000)')
+    parser_bundle.add_argument('--workers', type=int, default=4,
+                               help='Processos carregando os modelos ao mesmo tempo (padrão: 4)')
+    parser_bundle.add_argument('--items', type=int, default=200,
+                               help='Condições preditas por processo após a carga (padrão: 200)')
+    parser_bundle.add_argument('--repeat', type=int, default=5,
+                               help='Cargas cronometradas por processo (vale o melhor tempo)')
+    parser_bundle.set_defaults(funcao=benchmark_bundle)
+
+    parser_compiled = subparsers.add_parser('compiled', help='Latência p50/p99 de uma condição: scikit-learn vs. Numba')
+    parser_compiled.add_argument('--items', type=int, default=2000,
+                                 help='Chamadas de uma condição (padrão: 2000)')
+    parser_compiled.set_defaults(funcao=benchmark_compiled)
+
+    args = parser.parse_args()
+    args.funcao(args)
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import Config
 from app.services.sql_db_service import SQLDatabaseService
+from app.models.sensor_models import METRICA_UMIDADE, METRICA_PH, METRICA_FOSFORO, METRICA_POTASSIO
 
 # Configuração da página
 st.set_page_config(
@@ -53,6 +54,10 @@ def obter_leituras(sensor_id, dias):
     data_fim = datetime.now()
     data_inicio = data_fim - timedelta(days=dias)
     
+    # Períodos maiores que um dia usam os agregados horários/diários
+    if dias > 1:
+        return obter_leituras_agregadas(sensor_id, data_inicio, data_fim)
+    
     leituras = sql_db.obter_leituras_por_sensor(sensor_id, data_inicio, data_fim, limite=1000)
     
     # Separar por tipo de unidade
@@ -104,6 +109,31 @@ def obter_leituras(sensor_id, dias):
         'nutrientes': pd.DataFrame(leituras_nutrientes)
     }
 
+# Obter série agregada (média por hora/dia) no mesmo formato das leituras
+def obter_leituras_agregadas(sensor_id, data_inicio, data_fim):
+    serie = sql_db.obter_serie_agregada(sensor_id, data_inicio, data_fim)
+    
+    leituras_umidade = []
+    leituras_ph = []
+    # P e K têm séries separadas; uma linha por balde, com NaN onde faltar uma delas
+    leituras_nutrientes = {}
+    
+    for ponto in serie:
+        if ponto['metrica'] == METRICA_UMIDADE:
+            leituras_umidade.append({'data_hora': ponto['inicio'], 'valor': ponto['media']})
+        elif ponto['metrica'] == METRICA_PH:
+            leituras_ph.append({'data_hora': ponto['inicio'], 'valor': ponto['media']})
+        elif ponto['metrica'] == METRICA_FOSFORO:
+            leituras_nutrientes.setdefault(ponto['inicio'], {'data_hora': ponto['inicio']})['P'] = ponto['media']
+        elif ponto['metrica'] == METRICA_POTASSIO:
+            leituras_nutrientes.setdefault(ponto['inicio'], {'data_hora': ponto['inicio']})['K'] = ponto['media']
+    
+    return {
+        'umidade': pd.DataFrame(leituras_umidade),
+        'ph': pd.DataFrame(leituras_ph),
+        'nutrientes': pd.DataFrame(list(leituras_nutrientes.values()))
+    }
+
 # Sidebar para seleção de filtros
 st.sidebar.header("Filtros")
 
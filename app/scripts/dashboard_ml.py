@@ -23,6 +23,9 @@ from app.services.sql_db_service import SQLDatabaseService
 from app.ml.irrigation_predictor import IrrigationPredictor
 from app.ml.model_trainer import ModelTrainer
 from app.services.climate_service import ClimateDataService
+from app.models.sensor_models import (
+    expandir_leitura, METRICA_UMIDADE, METRICA_PH, METRICA_FOSFORO, METRICA_POTASSIO, METRICA_IRRIGACAO
+)
 
 # ========== CONFIGURAÇÃO DA PÁGINA ==========
 st.set_page_config(
@@ -101,8 +104,6 @@ def obter_leituras_otimizado(sensor_id, dias):
     data_fim = datetime.now()
     data_inicio = data_fim - timedelta(days=dias)
     
-    leituras = sql_db.obter_leituras_por_sensor(sensor_id, data_inicio, data_fim, limite=2000)
-    
     # Processar dados
     dados_processados = {
         'umidade': [],
@@ -110,6 +111,30 @@ def obter_leituras_otimizado(sensor_id, dias):
         'nutrientes': [],
         'irrigacao': []
     }
+    # P e K chegam em leituras separadas; uma linha por instante com as duas colunas
+    nutrientes = {}
+    
+    # Períodos maiores que um dia usam os agregados horários/diários (média por balde)
+    if dias > 1:
+        leituras = []
+        for ponto in sql_db.obter_serie_agregada(sensor_id, data_inicio, data_fim):
+            data_point = {
+                'data_hora': ponto['inicio'],
+                'timestamp': int(ponto['inicio'].timestamp() * 1000)
+            }
+            metrica, numero = ponto['metrica'], ponto['media']
+            if metrica == METRICA_UMIDADE:
+                dados_processados['umidade'].append({**data_point, 'valor': numero})
+            elif metrica == METRICA_PH:
+                dados_processados['ph'].append({**data_point, 'valor': numero})
+            elif metrica == METRICA_FOSFORO:
+                nutrientes.setdefault(ponto['inicio'], data_point)['P'] = numero
+            elif metrica == METRICA_POTASSIO:
+                nutrientes.setdefault(ponto['inicio'], data_point)['K'] = numero
+            elif metrica == METRICA_IRRIGACAO:
+                dados_processados['irrigacao'].append({**data_point, 'valor': numero})
+    else:
+        leituras = sql_db.obter_leituras_por_sensor(sensor_id, data_inicio, data_fim, limite=2000)
     
     for leitura in leituras:
         data_point = {
@@ -117,28 +142,30 @@ def obter_leituras_otimizado(sensor_id, dias):
             'timestamp': int(leitura.data_hora.timestamp() * 1000)
         }
         
-        if leitura.unidade == '%':
-            dados_processados['umidade'].append({
-                **data_point,
-                'valor': float(leitura.valor)
-            })
-        elif leitura.unidade == 'pH':
-            dados_processados['ph'].append({
-                **data_point,
-                'valor': float(leitura.valor)
-            })
-        elif leitura.unidade == 'ppm':
+        # Usa a métrica tipada; linhas legadas (texto/JSON) são expandidas na hora
+        if leitura.metrica and leitura.valor_numerico is not None:
+            linhas = [(leitura.metrica, leitura.valor_numerico, leitura.unidade)]
+        else:
             try:
-                if leitura.valor.startswith('{'):
-                    nutrientes = json.loads(leitura.valor)
-                    dados_processados['nutrientes'].append({
-                        **data_point,
-                        'P': nutrientes.get('P', 0),
-                        'K': nutrientes.get('K', 0)
-                    })
-            except:
-                pass
-    
+                linhas = expandir_leitura(leitura.valor, leitura.unidade)
+            except (ValueError, SyntaxError):
+                continue
+        
+        for metrica, numero, _ in linhas:
+            if numero is None:
+                continue
+            if metrica == METRICA_UMIDADE:
+                dados_processados['umidade'].append({**data_point, 'valor': numero})
+            elif metrica == METRICA_PH:
+                dados_processados['ph'].append({**data_point, 'valor': numero})
+            elif metrica == METRICA_FOSFORO:
+                nutrientes.setdefault(leitura.data_hora, data_point)['P'] = numero
+            elif metrica == METRICA_POTASSIO:
+                nutrientes.setdefault(leitura.data_hora, data_point)['K'] = numero
+            elif metrica == METRICA_IRRIGACAO:
+                dados_processados['irrigacao'].append({**data_point, 'valor': numero})
+    
+    dados_processados['nutrientes'].extend(nutrientes.values())
     return {k: pd.DataFrame(v) for k, v in dados_processados.items()}
 
 def preparar_dados_ml(sensor_id, dias=30):
@@ -260,14 +287,14 @@ def dashboard_principal(sensor_id, periodo):
     
     with col3:
         if not dados['nutrientes'].empty:
-            p_atual = dados['nutrientes']['P'].iloc[-1] if 'P' in dados['nutrientes'].columns else 0
+            p_atual = ultimo_valor_nutriente(dados['nutrientes'], 'P')
             st.metric("🌱 Fósforo (P)", "Presente" if p_atual else "Ausente")
         else:
             st.metric("🌱 Fósforo (P)", "N/A")
     
     with col4:
         if not dados['nutrientes'].empty:
-            k_atual = dados['nutrientes']['K'].iloc[-1] if 'K' in dados['nutrientes'].columns else 0
+            k_atual = ultimo_valor_nutriente(dados['nutrientes'], 'K')
             st.metric("🌿 Potássio (K)", "Presente" if k_atual else "Ausente")
         else:
             st.metric("🌿 Potássio (K)", "N/A")
@@ -742,13 +769,18 @@ def obter_dados_atuais_sensor(sensor_id):
         resultado['ph'] = dados['ph']['valor'].iloc[-1]
     
     if not dados['nutrientes'].empty:
-        if 'P' in dados['nutrientes'].columns:
-            resultado['fosforo'] = dados['nutrientes']['P'].iloc[-1]
-        if 'K' in dados['nutrientes'].columns:
-            resultado['potassio'] = dados['nutrientes']['K'].iloc[-1]
+        resultado['fosforo'] = ultimo_valor_nutriente(dados['nutrientes'], 'P')
+        resultado['potassio'] = ultimo_valor_nutriente(dados['nutrientes'], 'K')
     
     return resultado
 
+def ultimo_valor_nutriente(nutrientes, coluna):
+    """Último valor registrado de P ou K (instantes sem a métrica ficam NaN)"""
+    if coluna not in nutrientes.columns:
+        return 0
+    valores = nutrientes[coluna].dropna()
+    return valores.iloc[-1] if not valores.empty else 0
+
 def treinar_modelo_ml(sensor_id, periodo):
     """Treina o modelo ML com dados disponíveis"""
     try:
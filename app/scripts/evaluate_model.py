@@ -10,6 +10,7 @@ import sys
 import os
 import logging
 from datetime import datetime, timedelta
+from itertools import groupby
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
 sys.path.insert(0, BASE_DIR)
@@ -18,6 +19,220 @@ from config import Config
 from app.services.sql_db_service import SQLDatabaseService
 from app.ml.irrigation_predictor import IrrigationPredictor
 
+def fill_actual_irrigation(sql_db, days_back=7):
+    """
+    Preenche o resultado real das predições registradas cujo horizonte já passou
+    
+    Só predições com sensor_id. O resultado é True se o sensor registrou
+    irrigação (leitura válida da métrica irrigacao com valor > 0) entre
+    prediction_time e prediction_time + horizon_hours, e False se só
+    registrou leituras de irrigação com valor 0. Sem leituras de irrigação no
+    horizonte o resultado continua desconhecido (NULL) e a predição fica de
+    fora do drift.
+    
+    Returns:
+        int: predições atualizadas
+    """
+    import numpy as np
+    from sqlalchemy import update, bindparam
+    from app.models.sensor_models import MLPrediction, LeituraSensor, METRICA_IRRIGACAO
+    
+    now = datetime.now()
+    session = sql_db.get_session()
+    try:
+        pending = [
+            row for row in session.query(
+                MLPrediction.id, MLPrediction.sensor_id, MLPrediction.prediction_time, MLPrediction.horizon_hours
+            ).filter(
+                MLPrediction.sensor_id.isnot(None),
+                MLPrediction.actual_irrigation.is_(None),
+                MLPrediction.prediction_time >= now - timedelta(days=days_back)
+            ).all()
+            if row.prediction_time + timedelta(hours=row.horizon_hours) <= now
+        ]
+        if not pending:
+            return 0
+        
+        # Leituras de irrigação dos sensores no período, uma única consulta
+        readings = session.query(
+            LeituraSensor.sensor_id, LeituraSensor.data_hora, LeituraSensor.valor_numerico
+        ).filter(
+            LeituraSensor.sensor_id.in_({row.sensor_id for row in pending}),
+            LeituraSensor.metrica == METRICA_IRRIGACAO,
+            LeituraSensor.valido == True,
+            LeituraSensor.data_hora >= min(row.prediction_time for row in pending),
+            LeituraSensor.data_hora <= max(row.prediction_time + timedelta(hours=row.horizon_hours) for row in pending)
+        ).order_by(LeituraSensor.sensor_id, LeituraSensor.data_hora).all()
+        
+        # Por sensor: horários ordenados e contagem acumulada de irrigações
+        by_sensor = {}
+        for sensor_id, sensor_readings in groupby(readings, key=lambda row: row.sensor_id):
+            sensor_readings = list(sensor_readings)
+            times = np.array([row.data_hora for row in sensor_readings], dtype='datetime64[us]')
+            irrigated = np.array([(row.valor_numerico or 0) > 0 for row in sensor_readings])
+            by_sensor[sensor_id] = (times, np.concatenate([[0], np.cumsum(irrigated)]))
+        
+        updates = []
+        for row in pending:
+            if row.sensor_id not in by_sensor:
+                continue
+            times, irrigated_count = by_sensor[row.sensor_id]
+            start = np.searchsorted(times, np.datetime64(row.prediction_time, 'us'), side='left')
+            end = np.searchsorted(
+                times, np.datetime64(row.prediction_time + timedelta(hours=row.horizon_hours), 'us'), side='right'
+            )
+            if end > start:
+                updates.append({'prediction_id': row.id, 'actual': bool(irrigated_count[end] > irrigated_count[start])})
+        
+        if updates:
+            table = MLPrediction.__table__
+            session.execute(
+                update(table).where(table.c.id == bindparam('prediction_id')).values(actual_irrigation=bindparam('actual')),
+                updates
+            )
+            session.commit()
+        return len(updates)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def compute_drift_evaluation(sql_db, days_back=7):
+    """
+    Compara as predições dos últimos dias com os resultados reais
+    
+    Também executada pelo worker de jobs (tipo "drift" em app/services/tarefas.py).
+    
+    Returns:
+        dict: métricas, detecção de drift e matriz de confusão (None se não há
+              predições com resultado real no período)
+    """
+    from sqlalchemy import text
+    
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days_back)
+    
+    session = sql_db.get_session()
+    try:
+        # Query para buscar predições históricas vs resultados reais
+        query = text("""
+            SELECT 
+                p.predicted_irrigation,
+                p.irrigation_probability,
+                p.confidence,
+                p.actual_irrigation,
+                p.prediction_time,
+                s.tipo as sensor_tipo
+            FROM ml_predictions p
+            JOIN sensor s ON p.sensor_id = s.id
+            WHERE p.prediction_time >= :start_date 
+                AND p.prediction_time <= :end_date
+                AND p.actual_irrigation IS NOT NULL
+            ORDER BY p.prediction_time
+        """)
+        
+        predictions_data = session.execute(query, {
+            'start_date': start_date,
+            'end_date': end_date
+        }).fetchall()
+    finally:
+        session.close()
+    
+    if not predictions_data:
+        return None
+    
+    # Calcular métricas de drift
+    correct_predictions = 0
+    total_predictions = len(predictions_data)
+    
+    true_positives = 0
+    false_positives = 0
+    true_negatives = 0
+    false_negatives = 0
+    
+    probability_errors = []
+    
+    for row in predictions_data:
+        predicted = bool(row.predicted_irrigation)
+        actual = bool(row.actual_irrigation)
+        probability = float(row.irrigation_probability)
+        
+        # Accuracy
+        if predicted == actual:
+            correct_predictions += 1
+        
+        # Confusion matrix
+        if predicted and actual:
+            true_positives += 1
+        elif predicted and not actual:
+            false_positives += 1
+        elif not predicted and actual:
+            false_negatives += 1
+        else:
+            true_negatives += 1
+        
+        # Probability calibration
+        expected_prob = 1.0 if actual else 0.0
+        probability_errors.append(abs(probability - expected_prob))
+    
+    # Calcular métricas finais
+    accuracy = correct_predictions / total_predictions
+    
+    # Precision, Recall, F1
+    precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
+    recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
+    f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    
+    # Calibração de probabilidade (Brier Score)
+    brier_score = sum(probability_errors) / len(probability_errors) if probability_errors else 1.0
+    
+    # Limiares para detecção de drift
+    accuracy_threshold = 0.75  # Mínimo aceitável
+    brier_threshold = 0.25     # Máximo aceitável para Brier Score
+    
+    # Avaliação de drift
+    drift_detected = False
+    drift_reasons = []
+    
+    if accuracy < accuracy_threshold:
+        drift_detected = True
+        drift_reasons.append(f"Acurácia baixa: {accuracy:.3f} < {accuracy_threshold}")
+    
+    if brier_score > brier_threshold:
+        drift_detected = True
+        drift_reasons.append(f"Calibração pobre: {brier_score:.3f} > {brier_threshold}")
+    
+    if f1_score < 0.7:
+        drift_detected = True
+        drift_reasons.append(f"F1-Score baixo: {f1_score:.3f}")
+    
+    return {
+        'evaluation_date': datetime.now().isoformat(),
+        'period_start': start_date.isoformat(),
+        'period_end': end_date.isoformat(),
+        'total_predictions': total_predictions,
+        'accuracy': accuracy,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1_score,
+        'brier_score': brier_score,
+        'drift_detected': drift_detected,
+        'drift_reasons': drift_reasons,
+        'confusion_matrix': {
+            'true_positives': true_positives,
+            'false_positives': false_positives,
+            'true_negatives': true_negatives,
+            'false_negatives': false_negatives
+        }
+    }
+
+def save_drift_evaluation(drift_evaluation):
+    """Salva a avaliação no arquivo de log de avaliações"""
+    os.makedirs('logs', exist_ok=True)
+    with open('logs/model_drift_evaluation.json', 'w') as f:
+        json.dump(drift_evaluation, f, indent=2)
+
 def evaluate_model_drift():
     """
     Avalia drift do modelo comparando predições com resultados reais
@@ -32,159 +247,38 @@ def evaluate_model_drift():
             logger.error("Modelo não encontrado")
             return False
         
-        # Conectar ao banco
+        # Buscar predições e resultados reais dos últimos 7 dias
         sql_db = SQLDatabaseService(Config.SQL_DATABASE_URI)
-        session = sql_db.get_session()
+        filled = fill_actual_irrigation(sql_db, days_back=7)
+        logger.info(f"Resultado real preenchido em {filled} predições")
+        drift_evaluation = compute_drift_evaluation(sql_db, days_back=7)
         
-        # Buscar predições e resultados reais dos últimos 7 dias
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=7)
+        if drift_evaluation is None:
+            logger.warning("Nenhuma predição histórica encontrada para avaliação")
+            return False
         
-        try:
-            # Query para buscar predições históricas vs resultados reais
-            from sqlalchemy import text
-            
-            query = text("""
-                SELECT 
-                    p.predicted_irrigation,
-                    p.irrigation_probability,
-                    p.confidence,
-                    p.actual_irrigation,
-                    p.prediction_time,
-                    s.tipo as sensor_tipo
-                FROM ml_predictions p
-                JOIN sensor s ON p.sensor_id = s.id
-                WHERE p.prediction_time >= :start_date 
-                    AND p.prediction_time <= :end_date
-                    AND p.actual_irrigation IS NOT NULL
-                ORDER BY p.prediction_time
-            """)
-            
-            result = session.execute(query, {
-                'start_date': start_date,
-                'end_date': end_date
-            })
-            
-            predictions_data = result.fetchall()
-            
-            if not predictions_data:
-                logger.warning("Nenhuma predição histórica encontrada para avaliação")
-                return False
-            
-            # Calcular métricas de drift
-            correct_predictions = 0
-            total_predictions = len(predictions_data)
-            
-            true_positives = 0
-            false_positives = 0
-            true_negatives = 0
-            false_negatives = 0
-            
-            probability_errors = []
-            
-            for row in predictions_data:
-                predicted = bool(row.predicted_irrigation)
-                actual = bool(row.actual_irrigation)
-                probability = float(row.irrigation_probability)
-                
-                # Accuracy
-                if predicted == actual:
-                    correct_predictions += 1
-                
-                # Confusion matrix
-                if predicted and actual:
-                    true_positives += 1
-                elif predicted and not actual:
-                    false_positives += 1
-                elif not predicted and actual:
-                    false_negatives += 1
-                else:
-                    true_negatives += 1
-                
-                # Probability calibration
-                expected_prob = 1.0 if actual else 0.0
-                probability_errors.append(abs(probability - expected_prob))
-            
-            # Calcular métricas finais
-            accuracy = correct_predictions / total_predictions
-            
-            # Precision, Recall, F1
-            precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-            recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-            f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-            
-            # Calibração de probabilidade (Brier Score)
-            brier_score = sum(probability_errors) / len(probability_errors) if probability_errors else 1.0
-            
-            # Limiares para detecção de drift
-            accuracy_threshold = 0.75  # Mínimo aceitável
-            brier_threshold = 0.25     # Máximo aceitável para Brier Score
-            
-            # Avaliação de drift
-            drift_detected = False
-            drift_reasons = []
-            
-            if accuracy < accuracy_threshold:
-                drift_detected = True
-                drift_reasons.append(f"Acurácia baixa: {accuracy:.3f} < {accuracy_threshold}")
-            
-            if brier_score > brier_threshold:
-                drift_detected = True
-                drift_reasons.append(f"Calibração pobre: {brier_score:.3f} > {brier_threshold}")
-            
-            if f1_score < 0.7:
-                drift_detected = True
-                drift_reasons.append(f"F1-Score baixo: {f1_score:.3f}")
-            
-            # Log dos resultados
-            logger.info("=== AVALIAÇÃO DE DRIFT DO MODELO ===")
-            logger.info(f"Período: {start_date.date()} a {end_date.date()}")
-            logger.info(f"Total de predições avaliadas: {total_predictions}")
-            logger.info(f"Acurácia: {accuracy:.3f}")
-            logger.info(f"Precisão: {precision:.3f}")
-            logger.info(f"Recall: {recall:.3f}")
-            logger.info(f"F1-Score: {f1_score:.3f}")
-            logger.info(f"Brier Score: {brier_score:.3f}")
-            
-            if drift_detected:
-                logger.warning("🚨 DRIFT DETECTADO!")
-                for reason in drift_reasons:
-                    logger.warning(f"  - {reason}")
-                logger.warning("Recomendação: Executar retreinamento do modelo")
-            else:
-                logger.info("✅ Modelo estável - sem drift detectado")
-            
-            # Salvar resultados da avaliação
-            drift_evaluation = {
-                'evaluation_date': datetime.now().isoformat(),
-                'period_start': start_date.isoformat(),
-                'period_end': end_date.isoformat(),
-                'total_predictions': total_predictions,
-                'accuracy': accuracy,
-                'precision': precision,
-                'recall': recall,
-                'f1_score': f1_score,
-                'brier_score': brier_score,
-                'drift_detected': drift_detected,
-                'drift_reasons': drift_reasons,
-                'confusion_matrix': {
-                    'true_positives': true_positives,
-                    'false_positives': false_positives,
-                    'true_negatives': true_negatives,
-                    'false_negatives': false_negatives
-                }
-            }
-            
-            # Salvar em arquivo de log de avaliações
-            import json
-            os.makedirs('logs', exist_ok=True)
-            with open('logs/model_drift_evaluation.json', 'w') as f:
-                json.dump(drift_evaluation, f, indent=2)
-            
-            return not drift_detected  # True se modelo está OK
-            
-        finally:
-            session.close()
+        # Log dos resultados
+        logger.info("=== AVALIAÇÃO DE DRIFT DO MODELO ===")
+        logger.info(f"Período: {drift_evaluation['period_start'][:10]} a {drift_evaluation['period_end'][:10]}")
+        logger.info(f"Total de predições avaliadas: {drift_evaluation['total_predictions']}")
+        logger.info(f"Acurácia: {drift_evaluation['accuracy']:.3f}")
+        logger.info(f"Precisão: {drift_evaluation['precision']:.3f}")
+        logger.info(f"Recall: {drift_evaluation['recall']:.3f}")
+        logger.info(f"F1-Score: {drift_evaluation['f1_score']:.3f}")
+        logger.info(f"Brier Score: {drift_evaluation['brier_score']:.3f}")
+        
+        if drift_evaluation['drift_detected']:
+            logger.warning("🚨 DRIFT DETECTADO!")
+            for reason in drift_evaluation['drift_reasons']:
+                logger.warning(f"  - {reason}")
+            logger.warning("Recomendação: Executar retreinamento do modelo")
+        else:
+            logger.info("✅ Modelo estável - sem drift detectado")
+        
+        # Salvar resultados da avaliação
+        save_drift_evaluation(drift_evaluation)
+        
+        return not drift_evaluation['drift_detected']  # True se modelo está OK
             
     except Exception as e:
         logger.error(f"Erro na avaliação de drift: {str(e)}")
@@ -0,0 +1,259 @@
+# app/scripts/explicar_consultas.py
+
+"""
+FarmTech Solutions
+Consultor de índices: EXPLAIN das principais consultas da aplicação
+
+Executa EXPLAIN nas consultas quentes do SQLDatabaseService (leituras por sensor,
+estatísticas, sensores por campo, aplicações de recurso, alertas, janelas de
+treinamento) e aponta varreduras completas de tabela. Com --semear, popula antes
+o banco com um volume grande de dados sintéticos, para que o otimizador tome as
+mesmas decisões que tomaria em produção.
+
+Retorna código de saída 1 quando alguma consulta faz varredura completa.
+
+Uso:
+    python app/scripts/explicar_consultas.py
+    python app/scripts/explicar_consultas.py --uri sqlite:///tmp/farmtech_explain.db --semear 1000000
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from sqlalchemy import create_engine, select, insert, func, text
+
+from config import Config
+from app.models.sensor_models import (
+    Base, Sensor, PosicaoSensor, LeituraSensor, AplicacaoRecurso, RecomendacaoAutomatica, AlertaSensor
+)
+
+TAMANHO_LOTE = 5000
+
+def semear_dados(engine, total_leituras, total_sensores, total_campos):
+    """Popula o banco com sensores, posições, leituras e registros de campo sintéticos"""
+    print(f"Semeando {total_leituras} leituras para {total_sensores} sensores em {total_campos} campos...")
+    inicio = time.time()
+    agora = datetime.now()
+    campos = [f"campo_{i:04d}" for i in range(total_campos)]
+    unidades = ['%', 'pH', 'P_ppm', 'K_ppm']
+    metricas = {'%': 'umidade', 'pH': 'ph', 'P_ppm': 'fosforo', 'K_ppm': 'potassio'}
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Sensor.__table__).values([
+                {'tipo': random.choice(['S1', 'S2', 'S3']), 'modelo': 'ESP32', 'ativo': True}
+                for _ in range(total_sensores)
+            ])
+        )
+        primeiro_id = conn.execute(select(func.max(Sensor.id))).scalar() - total_sensores + 1
+        sensor_ids = list(range(primeiro_id, primeiro_id + total_sensores))
+
+        conn.execute(insert(PosicaoSensor.__table__).values([
+            {'sensor_id': sensor_id, 'campo_id': campos[i % total_campos],
+             'latitude': -3.7 + random.random(), 'longitude': -38.5 + random.random()}
+            for i, sensor_id in enumerate(sensor_ids)
+        ]))
+
+    for deslocamento in range(0, total_leituras, TAMANHO_LOTE):
+        linhas = []
+        for _ in range(min(TAMANHO_LOTE, total_leituras - deslocamento)):
+            unidade = random.choice(unidades)
+            numero = round(random.uniform(0, 100), 2)
+            linhas.append({
+                'sensor_id': random.choice(sensor_ids),
+                'data_hora': agora - timedelta(minutes=random.randint(0, 60 * 24 * 365)),
+                'valor': str(numero),
+                'valor_numerico': numero,
+                'metrica': metricas[unidade],
+                'unidade': unidade,
+                'valido': random.random() > 0.02
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(LeituraSensor.__table__).values(linhas))
+
+    registros_campo = max(total_leituras // 100, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(AplicacaoRecurso.__table__).values([
+            {'campo_id': random.choice(campos), 'tipo_recurso': 'agua', 'quantidade': random.uniform(100, 1000),
+             'unidade': 'L', 'data_hora': agora - timedelta(hours=random.randint(0, 24 * 365))}
+            for _ in range(min(registros_campo, TAMANHO_LOTE))
+        ]))
+        conn.execute(insert(RecomendacaoAutomatica.__table__).values([
+            {'campo_id': random.choice(campos), 'tipo_recurso': 'agua', 'quantidade_recomendada': 500,
+             'unidade': 'L', 'data_hora': agora - timedelta(hours=random.randint(0, 24 * 365))}
+            for _ in range(min(registros_campo, TAMANHO_LOTE))
+        ]))
+        conn.execute(insert(AlertaSensor.__table__).values([
+            {'sensor_id': random.choice(sensor_ids), 'tipo': 'umidade_baixa', 'mensagem': 'Umidade abaixo do ideal',
+             'resolvido': random.random() > 0.2, 'data_hora': agora - timedelta(hours=random.randint(0, 24 * 365))}
+            for _ in range(min(registros_campo, TAMANHO_LOTE))
+        ]))
+
+    print(f"Dados semeados em {time.time() - inicio:.1f}s")
+
+def atualizar_estatisticas(engine):
+    """Atualiza as estatísticas do otimizador depois de uma carga grande"""
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            conn.execute(text("ANALYZE"))
+        elif engine.dialect.name in ('mysql', 'mariadb'):
+            for tabela in Base.metadata.sorted_tables:
+                conn.execute(text(f"ANALYZE TABLE {tabela.name}"))
+        elif engine.dialect.name == 'postgresql':
+            conn.execute(text("ANALYZE"))
+
+def consultas_principais(engine):
+    """
+    Monta as consultas quentes da aplicação, com parâmetros tirados do próprio banco
+
+    Returns:
+        list: tuplas (nome, statement)
+    """
+    with engine.connect() as conn:
+        sensor_id = conn.execute(select(func.min(Sensor.id))).scalar() or 1
+        campo_id = conn.execute(select(func.min(PosicaoSensor.campo_id))).scalar() or 'campo'
+
+    fim = datetime.now()
+    inicio = fim - timedelta(days=7)
+
+    return [
+        # SQLDatabaseService.obter_leituras_por_sensor
+        ('leituras_por_sensor', select(LeituraSensor).where(
+            LeituraSensor.sensor_id == sensor_id,
+            LeituraSensor.valido == True,
+            LeituraSensor.data_hora >= inicio,
+            LeituraSensor.data_hora <= fim
+        ).order_by(LeituraSensor.data_hora.desc()).limit(100)),
+
+        # SQLDatabaseService.calcular_estatisticas_leituras
+        ('estatisticas_leituras', select(
+            LeituraSensor.unidade,
+            func.count(),
+            func.sum(LeituraSensor.valor_numerico),
+            func.min(LeituraSensor.valor_numerico),
+            func.max(LeituraSensor.valor_numerico)
+        ).where(
+            LeituraSensor.sensor_id == sensor_id,
+            LeituraSensor.valido == True,
+            LeituraSensor.data_hora >= inicio,
+            LeituraSensor.data_hora <= fim
+        ).group_by(LeituraSensor.unidade)),
+
+        # SQLDatabaseService.obter_sensores_por_campo
+        ('sensores_por_campo', select(PosicaoSensor.sensor_id).where(PosicaoSensor.campo_id == campo_id)),
+
+        # SQLDatabaseService.obter_aplicacoes_recurso
+        ('aplicacoes_por_campo', select(AplicacaoRecurso).where(
+            AplicacaoRecurso.campo_id == campo_id,
+            AplicacaoRecurso.data_hora >= inicio,
+            AplicacaoRecurso.data_hora <= fim
+        ).order_by(AplicacaoRecurso.data_hora.desc())),
+
+        # Recomendações recentes de um campo
+        ('recomendacoes_por_campo', select(RecomendacaoAutomatica).where(
+            RecomendacaoAutomatica.campo_id == campo_id,
+            RecomendacaoAutomatica.data_hora >= inicio
+        ).order_by(RecomendacaoAutomatica.data_hora.desc())),
+
+        # sensor_routes.detalhe_sensor (alertas ativos)
+        ('alertas_ativos_sensor', select(AlertaSensor).where(
+            AlertaSensor.sensor_id == sensor_id,
+            AlertaSensor.resolvido == False
+        ).order_by(AlertaSensor.data_hora.desc())),
+
+        # ModelTrainer.collect_training_data (janela de todos os sensores)
+        ('janela_treinamento', select(
+            LeituraSensor.sensor_id, LeituraSensor.data_hora, LeituraSensor.metrica, LeituraSensor.valor_numerico
+        ).where(
+            LeituraSensor.data_hora >= fim - timedelta(days=1),
+            LeituraSensor.data_hora <= fim
+        )),
+    ]
+
+def explicar(conn, dialeto, sql):
+    """
+    Executa o EXPLAIN adequado ao banco
+
+    Returns:
+        tuple: (linhas do plano em texto, tabelas com varredura completa)
+    """
+    if dialeto == 'sqlite':
+        linhas = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        plano = [linha[3] for linha in linhas]
+        varreduras = [
+            detalhe.split()[2] if detalhe.startswith('SCAN TABLE') else detalhe.split()[1]
+            for detalhe in plano
+            if detalhe.startswith('SCAN') and 'USING' not in detalhe
+        ]
+        return plano, varreduras
+
+    if dialeto in ('mysql', 'mariadb'):
+        linhas = conn.execute(text(f"EXPLAIN {sql}")).mappings().fetchall()
+        plano = [
+            f"{linha['table']}: type={linha['type']} key={linha['key']} rows={linha['rows']} extra={linha['Extra']}"
+            for linha in linhas
+        ]
+        varreduras = [linha['table'] for linha in linhas if linha['type'] == 'ALL']
+        return plano, varreduras
+
+    if dialeto == 'postgresql':
+        plano = [linha[0] for linha in conn.execute(text(f"EXPLAIN {sql}")).fetchall()]
+        varreduras = [
+            detalhe.split('Seq Scan on ')[1].split()[0]
+            for detalhe in plano if 'Seq Scan on ' in detalhe
+        ]
+        return plano, varreduras
+
+    raise ValueError(f"Banco não suportado para EXPLAIN: {dialeto}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Executar EXPLAIN nas consultas principais e apontar varreduras completas')
+    parser.add_argument('--uri', type=str, default=None,
+                       help='URI do banco (padrão: SQL_DATABASE_URI da configuração)')
+    parser.add_argument('--semear', type=int, default=0,
+                       help='Quantidade de leituras sintéticas a inserir antes da análise (use um banco descartável)')
+    parser.add_argument('--sensores', type=int, default=200,
+                       help='Sensores criados ao semear (padrão: 200)')
+    parser.add_argument('--campos', type=int, default=50,
+                       help='Campos usados ao semear (padrão: 50)')
+    args = parser.parse_args()
+
+    print("=== FarmTech Solutions - Consultor de índices ===")
+    engine = create_engine(args.uri or Config.SQL_DATABASE_URI)
+    Base.metadata.create_all(engine)
+
+    if args.semear:
+        semear_dados(engine, args.semear, args.sensores, args.campos)
+        atualizar_estatisticas(engine)
+
+    dialeto = engine.dialect.name
+    problemas = 0
+
+    with engine.connect() as conn:
+        for nome, consulta in consultas_principais(engine):
+            sql = str(consulta.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            plano, varreduras = explicar(conn, dialeto, sql)
+
+            status = "OK" if not varreduras else f"VARREDURA COMPLETA em {', '.join(varreduras)}"
+            print(f"\n[{nome}] {status}")
+            for linha in plano:
+                print(f"    {linha}")
+
+            if varreduras:
+                problemas += 1
+
+    print(f"\n{problemas} consulta(s) com varredura completa.")
+    if problemas:
+        print("Execute app/scripts/migrar_indices.py para criar os índices declarados nos modelos.")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
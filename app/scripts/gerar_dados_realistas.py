@@ -2,6 +2,7 @@
 
 import sys
 import os
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -12,6 +13,7 @@ sys.path.insert(0, BASE_DIR)
 
 from config import Config
 from app.services.sql_db_service import SQLDatabaseService
+from app.services.carga_leituras import CarregadorLeituras
 
 def gerar_dados_super_realistas():
     """Gera dados com MÁXIMA diversidade e situações reais complexas"""
@@ -243,8 +245,8 @@ def decidir_irrigacao_complexa(umidade, ph, fosforo, potassio, hora, scenario):
     
     return 1 if probability > threshold else 0
 
-def inserir_dados_diversos(data):
-    """Insere os dados diversos no banco"""
+def inserir_dados_diversos(data, tamanho_lote=5000, metodo='auto', desativar_indices=False):
+    """Insere os dados diversos no banco (carga em lotes)"""
     
     print("\n💾 Inserindo dados diversos no banco...")
     
@@ -254,62 +256,66 @@ def inserir_dados_diversos(data):
     try:
         from sqlalchemy import text
         
-        # Limpar dados antigos
+        # Limpar dados antigos (leituras e agregados do sensor)
         print("🧹 Limpando dados antigos...")
         session.execute(text("DELETE FROM leitura_sensor WHERE sensor_id = 1"))
+        session.execute(text("DELETE FROM agregado_leitura WHERE sensor_id = 1"))
         session.commit()
-        
-        # Inserir leituras diversas
-        print("📝 Inserindo leituras diversas...")
-        
-        for i, record in enumerate(data):
-            # Inserir umidade
-            session.execute(text("""
-                INSERT INTO leitura_sensor (sensor_id, valor, unidade, data_hora) 
-                VALUES (1, :valor, '%', :data_hora)
-            """), {
-                "valor": str(record['umidade']),
-                "data_hora": record['datetime']
-            })
-            
-            # Inserir pH
-            session.execute(text("""
-                INSERT INTO leitura_sensor (sensor_id, valor, unidade, data_hora) 
-                VALUES (1, :valor, 'pH', :data_hora)
-            """), {
-                "valor": str(record['ph']),
-                "data_hora": record['datetime']
-            })
-            
-            # Inserir nutrientes
-            nutrientes = {"P": record['fosforo'], "K": record['potassio']}
-            session.execute(text("""
-                INSERT INTO leitura_sensor (sensor_id, valor, unidade, data_hora) 
-                VALUES (1, :valor, 'ppm', :data_hora)
-            """), {
-                "valor": str(nutrientes),
-                "data_hora": record['datetime']
-            })
-            
-            if (i + 1) % 200 == 0:
-                print(f"   📊 Inseridos {i + 1}/{len(data)} registros...")
-        
-        session.commit()
-        print(f"✅ {len(data)} registros diversos inseridos!")
-        
-        # Verificar
-        result = session.execute(text("SELECT COUNT(*) FROM leitura_sensor WHERE sensor_id = 1"))
-        total = result.fetchone()[0]
-        print(f"📊 Total leituras: {total}")
-        
     except Exception as e:
         print(f"❌ Erro: {str(e)}")
         session.rollback()
         raise
     finally:
         session.close()
+    
+    # Inserir leituras diversas
+    print(f"📝 Inserindo leituras diversas (lotes de {tamanho_lote} linhas)...")
+    
+    def leituras():
+        for record in data:
+            yield {'sensor_id': 1, 'valor': record['umidade'], 'unidade': '%', 'data_hora': record['datetime']}
+            yield {'sensor_id': 1, 'valor': record['ph'], 'unidade': 'pH', 'data_hora': record['datetime']}
+            nutrientes = {"P": int(record['fosforo']), "K": int(record['potassio'])}
+            yield {'sensor_id': 1, 'valor': nutrientes, 'unidade': 'ppm', 'data_hora': record['datetime']}
+    
+    def progresso(parcial):
+        print(f"   📊 Inseridas {parcial['linhas']} linhas ({parcial['linhas_por_segundo']} linhas/s)...")
+    
+    carregador = CarregadorLeituras(
+        sql_db,
+        tamanho_lote=tamanho_lote,
+        metodo=metodo,
+        desativar_indices=desativar_indices,
+        progresso=progresso
+    )
+    resultado = carregador.carregar(leituras())
+    
+    print(f"✅ {len(data)} registros diversos inseridos! {resultado['linhas']} linhas em {resultado['segundos_carga']:.1f}s "
+          f"({resultado['linhas_por_segundo']} linhas/s, método {resultado['metodo']}); "
+          f"total com agregados: {resultado['segundos']:.1f}s")
+    
+    # Verificar
+    session = sql_db.get_session()
+    try:
+        from sqlalchemy import text
+        result = session.execute(text("SELECT COUNT(*) FROM leitura_sensor WHERE sensor_id = 1"))
+        total = result.fetchone()[0]
+        print(f"📊 Total leituras: {total}")
+    finally:
+        session.close()
+    
+    return resultado
 
 def main():
+    parser = argparse.ArgumentParser(description='Gerar dados realistas de sensores e carregá-los no banco')
+    parser.add_argument('--lote', type=int, default=5000,
+                       help='Linhas gravadas por lote/transação (padrão: 5000)')
+    parser.add_argument('--metodo', choices=['auto', 'executemany', 'load_data'], default='auto',
+                       help='auto: LOAD DATA LOCAL INFILE no MySQL, executemany nos demais bancos')
+    parser.add_argument('--sem-indices', action='store_true',
+                       help='Remover os índices de leitura_sensor durante a carga e recriá-los ao final')
+    args = parser.parse_args()
+    
     print("🌱 FarmTech Solutions - Gerador de Dados SUPER Realistas")
     print("=" * 60)
     
@@ -318,7 +324,7 @@ def main():
         data = gerar_dados_super_realistas()
         
         # Inserir no banco
-        inserir_dados_diversos(data)
+        inserir_dados_diversos(data, args.lote, args.metodo, args.sem_indices)
         
         print("\n🎉 Dados super realistas criados!")
         print("🚀 Execute: python app/scripts/train_model.py --days 60 --min-samples 50")
@@ -2,44 +2,37 @@
 import sys
 import os
 import csv
-import time
-import sqlite3
+import argparse
 from datetime import datetime
 
 # Adicionar o diretório raiz ao path para importar módulos da aplicação
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
 
 from config import Config
 from app.services.sql_db_service import SQLDatabaseService
+from app.services.carga_leituras import CarregadorLeituras
 
 def ler_arquivo_csv(caminho_arquivo):
-    """Lê um arquivo CSV com dados do ESP32"""
-    dados = []
-    with open(caminho_arquivo, 'r') as arquivo:
+    """Lê um arquivo CSV com dados do ESP32, linha a linha (gerador)"""
+    with open(caminho_arquivo, 'r', newline='') as arquivo:
         leitor = csv.reader(arquivo)
         # Pular a primeira linha se for cabeçalho
         cabecalho = next(leitor, None)
-        if cabecalho and cabecalho[0] == 'timestamp':
-            # É um cabeçalho, continuar
-            pass
-        else:
-            # Não é um cabeçalho, adicionar aos dados
-            dados.append(cabecalho)
+        if cabecalho and cabecalho[0] != 'timestamp':
+            # Não é um cabeçalho, faz parte dos dados
+            yield cabecalho
         
         # Ler o restante do arquivo
-        for linha in leitor:
-            dados.append(linha)
-    
-    return dados
+        yield from leitor
 
-def importar_dados_para_db(dados, sensor_id, sql_db_service):
-    """Importa os dados para o banco de dados SQL"""
-    print(f"Importando {len(dados)} registros para o sensor ID {sensor_id}...")
-    
+def gerar_leituras(dados, sensor_id, estatisticas):
+    """Converte as linhas do CSV nas leituras de umidade, pH e nutrientes"""
     for linha in dados:
         try:
             if len(linha) != 6:
                 print(f"Linha ignorada (formato inválido): {linha}")
+                estatisticas['invalidas'] += 1
                 continue
                 
             timestamp = int(linha[0])
@@ -47,53 +40,60 @@ def importar_dados_para_db(dados, sensor_id, sql_db_service):
             potassio = linha[2] == '1'
             ph = float(linha[3])
             umidade = float(linha[4])
-            irrigacao = linha[5] == '1'
             
             # Criar data/hora a partir do timestamp
             data_hora = datetime.fromtimestamp(timestamp/1000 if timestamp > 1000000000000 else timestamp)
-            
-            # Registrar leituras
-            nutrientes = {
-                'P': 1 if fosforo else 0,
-                'K': 1 if potassio else 0
-            }
-            
-            # Adicionar cada leitura com seu timestamp correto
-            sql_db_service.adicionar_leitura(
-                sensor_id=sensor_id,
-                valor=umidade,
-                unidade='%',
-                data_hora=data_hora
-            )
-            
-            sql_db_service.adicionar_leitura(
-                sensor_id=sensor_id,
-                valor=ph,
-                unidade='pH',
-                data_hora=data_hora
-            )
-            
-            sql_db_service.adicionar_leitura(
-                sensor_id=sensor_id,
-                valor=str(nutrientes),
-                unidade='ppm',
-                data_hora=data_hora
-            )
-            
-            print(f"Registro importado: {data_hora} - Umidade: {umidade}%, pH: {ph}")
-            
         except Exception as e:
             print(f"Erro ao importar linha {linha}: {str(e)}")
+            estatisticas['invalidas'] += 1
+            continue
+        
+        nutrientes = {
+            'P': 1 if fosforo else 0,
+            'K': 1 if potassio else 0
+        }
+        yield {'sensor_id': sensor_id, 'valor': umidade, 'unidade': '%', 'data_hora': data_hora}
+        yield {'sensor_id': sensor_id, 'valor': ph, 'unidade': 'pH', 'data_hora': data_hora}
+        yield {'sensor_id': sensor_id, 'valor': nutrientes, 'unidade': 'ppm', 'data_hora': data_hora}
+
+def importar_dados_para_db(dados, sensor_id, sql_db_service, tamanho_lote=5000, metodo='auto', desativar_indices=False):
+    """Importa os dados para o banco de dados SQL em lotes"""
+    print(f"Importando registros para o sensor ID {sensor_id} (lotes de {tamanho_lote} linhas)...")
     
-    print("Importação concluída!")
+    def progresso(parcial):
+        print(f"  {parcial['linhas']} linhas gravadas ({parcial['linhas_por_segundo']} linhas/s)")
+    
+    estatisticas = {'invalidas': 0}
+    carregador = CarregadorLeituras(
+        sql_db_service,
+        tamanho_lote=tamanho_lote,
+        metodo=metodo,
+        desativar_indices=desativar_indices,
+        progresso=progresso
+    )
+    resultado = carregador.carregar(gerar_leituras(dados, sensor_id, estatisticas))
+    
+    print(f"Importação concluída! {resultado['linhas']} linhas gravadas em {resultado['segundos_carga']:.1f}s "
+          f"({resultado['linhas_por_segundo']} linhas/s, método {resultado['metodo']}); "
+          f"total com agregados: {resultado['segundos']:.1f}s")
+    if estatisticas['invalidas']:
+        print(f"{estatisticas['invalidas']} linha(s) do CSV ignorada(s)")
+    return resultado
 
 def main():
-    if len(sys.argv) < 3:
-        print("Uso: python importar_dados_esp32.py <caminho_arquivo_csv> <sensor_id>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Importar um arquivo CSV do ESP32 para o banco de sensores')
+    parser.add_argument('caminho_arquivo', help='Arquivo CSV (timestamp,fosforo,potassio,ph,umidade,irrigacao)')
+    parser.add_argument('sensor_id', type=int, help='ID do sensor que recebe as leituras')
+    parser.add_argument('--lote', type=int, default=5000,
+                       help='Linhas gravadas por lote/transação (padrão: 5000)')
+    parser.add_argument('--metodo', choices=['auto', 'executemany', 'load_data'], default='auto',
+                       help='auto: LOAD DATA LOCAL INFILE no MySQL, executemany nos demais bancos')
+    parser.add_argument('--sem-indices', action='store_true',
+                       help='Remover os índices de leitura_sensor durante a carga e recriá-los ao final')
+    args = parser.parse_args()
     
-    caminho_arquivo = sys.argv[1]
-    sensor_id = int(sys.argv[2])
+    caminho_arquivo = args.caminho_arquivo
+    sensor_id = args.sensor_id
     
     if not os.path.exists(caminho_arquivo):
         print(f"Arquivo não encontrado: {caminho_arquivo}")
@@ -120,7 +120,7 @@ def main():
     
     # Ler e importar os dados
     dados = ler_arquivo_csv(caminho_arquivo)
-    importar_dados_para_db(dados, sensor_id, sql_db)
+    importar_dados_para_db(dados, sensor_id, sql_db, args.lote, args.metodo, args.sem_indices)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,96 @@
+# app/scripts/migrar_indices.py
+
+"""
+FarmTech Solutions
+Migração dos índices compostos do banco de sensores
+
+Cria em bancos já existentes os índices declarados em app/models/sensor_models.py
+(Base.metadata.create_all só cria índices junto com tabelas novas). Índices que
+já existem são ignorados, então o script pode ser executado várias vezes.
+Índices sobre colunas que o banco ainda não tem (metrica/valor_numerico em
+bancos antigos) são pulados: rode antes app/scripts/migrar_leituras_tipadas.py.
+
+Uso:
+    python app/scripts/migrar_indices.py
+    python app/scripts/migrar_indices.py --dry-run
+"""
+
+import sys
+import os
+import argparse
+import time
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from sqlalchemy import create_engine, inspect
+
+from config import Config
+from app.models.sensor_models import Base
+
+def indices_pendentes(engine):
+    """
+    Lista os índices declarados nos modelos que ainda não existem no banco
+
+    Returns:
+        tuple: (índices a criar, índices pulados por usarem colunas que o banco ainda não tem)
+    """
+    inspetor = inspect(engine)
+    tabelas = set(inspetor.get_table_names())
+    pendentes = []
+    sem_colunas = []
+
+    for tabela in Base.metadata.sorted_tables:
+        if tabela.name not in tabelas:
+            continue
+        existentes = {indice['name'] for indice in inspetor.get_indexes(tabela.name)}
+        colunas = {coluna['name'] for coluna in inspetor.get_columns(tabela.name)}
+        for indice in sorted(tabela.indexes, key=lambda i: i.name):
+            if indice.name in existentes:
+                continue
+            if any(coluna.name not in colunas for coluna in indice.columns):
+                sem_colunas.append(indice)
+            else:
+                pendentes.append(indice)
+
+    return pendentes, sem_colunas
+
+def main():
+    parser = argparse.ArgumentParser(description='Criar índices compostos em bancos existentes')
+    parser.add_argument('--uri', type=str, default=None,
+                       help='URI do banco (padrão: SQL_DATABASE_URI da configuração)')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Apenas listar os índices que seriam criados')
+    args = parser.parse_args()
+
+    print("=== FarmTech Solutions - Migração de índices ===")
+    engine = create_engine(args.uri or Config.SQL_DATABASE_URI)
+
+    pendentes, sem_colunas = indices_pendentes(engine)
+    for indice in sem_colunas:
+        colunas = ', '.join(coluna.name for coluna in indice.columns)
+        print(f"  [pulado] {indice.name} ON {indice.table.name} ({colunas}): coluna inexistente no banco")
+    if sem_colunas:
+        print("Execute app/scripts/migrar_leituras_tipadas.py antes para criar as colunas novas.")
+
+    if not pendentes:
+        if not sem_colunas:
+            print("Todos os índices já existem.")
+        return
+
+    for indice in pendentes:
+        colunas = ', '.join(coluna.name for coluna in indice.columns)
+        if args.dry_run:
+            print(f"  [dry-run] {indice.name} ON {indice.table.name} ({colunas})")
+            continue
+
+        inicio = time.time()
+        indice.create(bind=engine)
+        print(f"  {indice.name} ON {indice.table.name} ({colunas}) criado em {time.time() - inicio:.1f}s")
+
+    if not args.dry_run:
+        print(f"\n{len(pendentes)} índice(s) criado(s).")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+# app/scripts/migrar_leituras_tipadas.py
+
+"""
+FarmTech Solutions
+Migração das leituras para armazenamento numérico tipado
+
+Adiciona as colunas valor_numerico/metrica em leitura_sensor (se ainda não
+existirem) e converte as linhas antigas em lotes. Payloads de nutrientes em
+JSON/str(dict) são divididos em uma linha de fósforo e outra de potássio.
+
+A migração é retomável: só processa linhas com metrica nula, e cada lote é
+confirmado em uma transação própria. Pode ser interrompida e executada de novo.
+Ao final os agregados horários/diários do período migrado são reconstruídos
+(--sem-agregados pula esse passo; depois rode app/scripts/reconstruir_agregados.py).
+
+Uso:
+    python app/scripts/migrar_leituras_tipadas.py
+    python app/scripts/migrar_leituras_tipadas.py --lote 5000 --limite 100000
+    python app/scripts/migrar_leituras_tipadas.py --sem-agregados
+"""
+
+import sys
+import os
+import argparse
+import time
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from sqlalchemy import inspect, text, select, update, insert, bindparam
+
+from config import Config
+from app.services.sql_db_service import SQLDatabaseService
+from app.models.sensor_models import LeituraSensor, expandir_leitura, METRICA_OUTRA
+
+def garantir_colunas(engine):
+    """Cria as colunas e o índice novos em bancos criados antes da mudança"""
+    inspetor = inspect(engine)
+    colunas = {coluna['name'] for coluna in inspetor.get_columns('leitura_sensor')}
+    indices = {indice['name'] for indice in inspetor.get_indexes('leitura_sensor')}
+
+    with engine.begin() as conn:
+        if 'valor_numerico' not in colunas:
+            print("Adicionando coluna leitura_sensor.valor_numerico...")
+            conn.execute(text("ALTER TABLE leitura_sensor ADD COLUMN valor_numerico FLOAT"))
+        if 'metrica' not in colunas:
+            print("Adicionando coluna leitura_sensor.metrica...")
+            conn.execute(text("ALTER TABLE leitura_sensor ADD COLUMN metrica VARCHAR(20)"))
+        if 'ix_leitura_sensor_metrica' not in indices:
+            print("Criando índice ix_leitura_sensor_metrica...")
+            conn.execute(text("CREATE INDEX ix_leitura_sensor_metrica ON leitura_sensor (metrica)"))
+
+def migrar_lote(conn, linhas):
+    """
+    Converte um lote de leituras
+
+    A primeira linha gerada por expandir_leitura reaproveita a leitura original
+    (o texto em valor é preservado); linhas extras (potássio de um payload P/K)
+    são inseridas. Valores que não podem ser interpretados ficam com metrica
+    'outra' e valor_numerico nulo, para não serem selecionados de novo. As
+    atualizações do lote vão em um único UPDATE executemany.
+
+    Returns:
+        tuple: (atualizadas, inseridas, invalidas)
+    """
+    tabela = LeituraSensor.__table__
+    atualizacoes = []
+    novas = []
+    invalidas = 0
+
+    for linha in linhas:
+        try:
+            expandidas = expandir_leitura(linha.valor, linha.unidade)
+        except (ValueError, SyntaxError):
+            expandidas = []
+
+        if not expandidas:
+            invalidas += 1
+            atualizacoes.append({'b_id': linha.id, 'b_metrica': METRICA_OUTRA,
+                                 'b_valor_numerico': None, 'b_unidade': linha.unidade})
+            continue
+
+        metrica, numero, unidade = expandidas[0]
+        atualizacoes.append({'b_id': linha.id, 'b_metrica': metrica,
+                             'b_valor_numerico': numero, 'b_unidade': unidade})
+        for metrica, numero, unidade in expandidas[1:]:
+            novas.append({
+                'sensor_id': linha.sensor_id,
+                'data_hora': linha.data_hora,
+                'valor': str(numero),
+                'valor_numerico': numero,
+                'metrica': metrica,
+                'unidade': unidade,
+                'valido': linha.valido
+            })
+
+    if atualizacoes:
+        conn.execute(
+            update(tabela).where(tabela.c.id == bindparam('b_id')).values(
+                metrica=bindparam('b_metrica'),
+                valor_numerico=bindparam('b_valor_numerico'),
+                unidade=bindparam('b_unidade')
+            ),
+            atualizacoes
+        )
+    if novas:
+        conn.execute(insert(tabela), novas)
+
+    return len(linhas), len(novas), invalidas
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrar leituras para valores numéricos tipados')
+    parser.add_argument('--lote', type=int, default=2000,
+                       help='Leituras convertidas por transação (padrão: 2000)')
+    parser.add_argument('--limite', type=int, default=None,
+                       help='Número máximo de leituras a converter nesta execução')
+    parser.add_argument('--sem-agregados', action='store_true',
+                       help='Não reconstruir os agregados do período migrado ao final')
+    args = parser.parse_args()
+
+    print("=== FarmTech Solutions - Migração de leituras tipadas ===")
+    sql_db = SQLDatabaseService(Config.SQL_DATABASE_URI)
+    engine = sql_db.engine
+
+    garantir_colunas(engine)
+
+    tabela = LeituraSensor.__table__
+    ultimo_id = 0
+    total = inseridas_total = invalidas_total = 0
+    periodo = {}  # sensor_id -> [menor data_hora, maior data_hora] das leituras convertidas
+    inicio = time.time()
+
+    while args.limite is None or total < args.limite:
+        tamanho = args.lote if args.limite is None else min(args.lote, args.limite - total)
+
+        with engine.begin() as conn:
+            linhas = conn.execute(
+                select(tabela.c.id, tabela.c.sensor_id, tabela.c.data_hora, tabela.c.valor,
+                       tabela.c.unidade, tabela.c.valido)
+                .where(tabela.c.metrica.is_(None), tabela.c.id > ultimo_id)
+                .order_by(tabela.c.id)
+                .limit(tamanho)
+            ).fetchall()
+
+            if not linhas:
+                break
+
+            atualizadas, inseridas, invalidas = migrar_lote(conn, linhas)
+
+        ultimo_id = linhas[-1].id
+        for linha in linhas:
+            limites = periodo.setdefault(linha.sensor_id, [linha.data_hora, linha.data_hora])
+            limites[0] = min(limites[0], linha.data_hora)
+            limites[1] = max(limites[1], linha.data_hora)
+        total += atualizadas
+        inseridas_total += inseridas
+        invalidas_total += invalidas
+
+        decorrido = time.time() - inicio
+        taxa = total / decorrido if decorrido > 0 else 0
+        print(f"  {total} leituras convertidas (último id {ultimo_id}, {taxa:.0f} linhas/s)")
+
+    # Estatísticas e relatórios leem os agregados: refaz os do período migrado com os valores tipados
+    if periodo and not args.sem_agregados:
+        print("Reconstruindo agregados do período migrado...")
+        for sensor_id, (menor, maior) in periodo.items():
+            sql_db.reconstruir_agregados(inicio=menor, fim=maior, sensor_id=sensor_id)
+
+    decorrido = time.time() - inicio
+    print(f"\nMigração concluída em {decorrido:.1f}s")
+    print(f"  Leituras convertidas: {total}")
+    print(f"  Linhas de nutrientes adicionadas: {inseridas_total}")
+    print(f"  Leituras inválidas (metrica='{METRICA_OUTRA}'): {invalidas_total}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# app/scripts/online_update.py
+
+"""
+FarmTech Solutions
+Atualização incremental dos modelos de Machine Learning
+
+Consome as leituras gravadas desde o último checkpoint e atualiza os modelos
+incrementais (ver app/ml/online_learning.py). Sem --interval executa uma vez;
+com --interval repete a atualização a cada N segundos (serviço ml-online do
+docker-compose).
+
+Uso:
+    python app/scripts/online_update.py
+    python app/scripts/online_update.py --interval 900
+    python app/scripts/online_update.py --time-bucket 5min --epochs 3
+"""
+
+import sys
+import os
+import argparse
+import logging
+import time
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from config import Config
+from app.services.sql_db_service import SQLDatabaseService
+from app.ml.online_learning import OnlineTrainer
+
+def main():
+    parser = argparse.ArgumentParser(description='Atualizar os modelos ML com as leituras novas (treino incremental)')
+    parser.add_argument('--interval', type=int, default=0,
+                       help='Segundos entre atualizações; 0 executa uma única vez (padrão: 0)')
+    parser.add_argument('--prefix', type=str, default=Config.ML_ONLINE_MODEL_PATH_PREFIX,
+                       help=f'Prefixo do checkpoint (padrão: {Config.ML_ONLINE_MODEL_PATH_PREFIX})')
+    parser.add_argument('--time-bucket', type=str, default='1min',
+                       help='Intervalo que agrupa as leituras de um sensor em um registro (padrão: 1min)')
+    parser.add_argument('--bootstrap-days', type=int, default=30,
+                       help='Dias de histórico na primeira atualização, sem checkpoint (padrão: 30)')
+    parser.add_argument('--min-samples', type=int, default=10,
+                       help='Registros mínimos por atualização (padrão: 10)')
+    parser.add_argument('--epochs', type=int, default=1,
+                       help='Passadas sobre as leituras novas (padrão: 1)')
+    args = parser.parse_args()
+
+    os.makedirs('logs', exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('logs/model_online.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+    logger = logging.getLogger(__name__)
+
+    sql_db = SQLDatabaseService(Config.SQL_DATABASE_URI)
+    trainer = OnlineTrainer(
+        sql_db,
+        path_prefix=args.prefix,
+        time_bucket=args.time_bucket,
+        bootstrap_days=args.bootstrap_days,
+        min_samples=args.min_samples,
+        epochs=args.epochs
+    )
+
+    while True:
+        inicio = time.monotonic()
+        try:
+            resultado = trainer.update()
+            if resultado['updated']:
+                logger.info(f"Checkpoint {resultado['version']}: {resultado['samples']} registros novos "
+                            f"(ids {resultado['after_id']}..{resultado['until_id']}) em {resultado['seconds']:.2f}s")
+                if 'batch_accuracy' in resultado:
+                    logger.info(f"Antes da atualização - acurácia: {resultado['batch_accuracy']:.3f}, "
+                                f"MAE umidade: {resultado['batch_humidity_mae']:.3f}")
+            else:
+                logger.info(f"Nenhuma atualização: {resultado.get('reason', 'sem registros aproveitáveis')}")
+        except Exception as e:
+            logger.error(f"Erro na atualização incremental: {str(e)}", exc_info=True)
+            if not args.interval:
+                return 1
+
+        if not args.interval:
+            return 0
+        time.sleep(max(args.interval - (time.monotonic() - inicio), 0))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# app/scripts/reconstruir_agregados.py
+
+"""
+FarmTech Solutions
+Reconstrução (backfill) dos agregados horários e diários das leituras
+
+Os agregados são mantidos incrementalmente pela ingestão; este script os
+recalcula a partir das leituras brutas, para dados históricos ou importados
+diretamente no banco. Períodos são alinhados a dias inteiros.
+
+Execute depois de app/scripts/migrar_leituras_tipadas.py: só leituras com
+valor numérico tipado entram nos agregados.
+
+Uso:
+    python app/scripts/reconstruir_agregados.py
+    python app/scripts/reconstruir_agregados.py --inicio 2024-01-01 --fim 2024-03-31 --sensor 3
+"""
+
+import sys
+import os
+import argparse
+import time
+from datetime import datetime
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from config import Config
+from app.services.sql_db_service import SQLDatabaseService
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstruir os agregados horários e diários das leituras')
+    parser.add_argument('--inicio', type=str, default=None,
+                       help='Data inicial (AAAA-MM-DD); padrão: todo o histórico')
+    parser.add_argument('--fim', type=str, default=None,
+                       help='Data final, inclusiva (AAAA-MM-DD); padrão: até a leitura mais recente')
+    parser.add_argument('--sensor', type=int, default=None,
+                       help='Reconstruir apenas um sensor')
+    parser.add_argument('--lote', type=int, default=20000,
+                       help='Leituras lidas por lote (padrão: 20000)')
+    args = parser.parse_args()
+
+    inicio = datetime.strptime(args.inicio, '%Y-%m-%d') if args.inicio else None
+    fim = datetime.strptime(args.fim, '%Y-%m-%d') if args.fim else None
+
+    print("=== FarmTech Solutions - Reconstrução de agregados ===")
+    sql_db = SQLDatabaseService(Config.SQL_DATABASE_URI)
+
+    inicio_execucao = time.time()
+    resultado = sql_db.reconstruir_agregados(inicio=inicio, fim=fim, sensor_id=args.sensor, lote=args.lote)
+    decorrido = time.time() - inicio_execucao
+
+    taxa = resultado['leituras'] / decorrido if decorrido > 0 else 0
+    print(f"Leituras processadas: {resultado['leituras']} ({taxa:.0f} linhas/s)")
+    print(f"Agregados gravados: {resultado['agregados']}")
+    print(f"Concluído em {decorrido:.1f}s")
+
+if __name__ == '__main__':
+    main()
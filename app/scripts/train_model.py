@@ -10,6 +10,7 @@ incluindo coleta de dados, enriquecimento climático e avaliação.
 Uso:
     python app/scripts/train_model.py
     python app/scripts/train_model.py --days 60 --min-samples 100
+    python app/scripts/train_model.py --search --cv 5 --jobs -1
 """
 
 import sys
@@ -31,6 +32,7 @@ from config import Config
 from app.services.sql_db_service import SQLDatabaseService
 from app.ml.irrigation_predictor import IrrigationPredictor
 from app.ml.model_trainer import ModelTrainer
+from app.ml.model_search import ModelSearch
 from app.services.climate_service import ClimateDataService
 
 def setup_logging():
@@ -48,7 +50,7 @@ def setup_logging():
     os.makedirs('logs', exist_ok=True)
     os.makedirs('models', exist_ok=True)
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Treinar modelos ML para FarmTech Solutions')
     parser.add_argument('--days', type=int, default=30, 
                        help='Dias de dados históricos para treinamento (padrão: 30)')
@@ -56,12 +58,22 @@ def main():
                        help='Número mínimo de amostras necessárias (padrão: 50)')
     parser.add_argument('--location', type=str, default='-3.763081,-38.524465',
                        help='Coordenadas lat,lon para dados climáticos (padrão: São Paulo)')
+    parser.add_argument('--time-bucket', type=str, default='1min',
+                       help='Intervalo que agrupa as leituras de um sensor em um registro (padrão: 1min)')
     parser.add_argument('--save-models', action='store_true', default=True,
                        help='Salvar modelos treinados em disco')
     parser.add_argument('--evaluate-only', action='store_true',
                        help='Apenas avaliar modelos existentes')
+    parser.add_argument('--search', action='store_true',
+                       help='Escolher os modelos por busca de hiperparâmetros com validação cruzada')
+    parser.add_argument('--cv', type=int, default=5,
+                       help='Folds da validação cruzada na busca (padrão: 5)')
+    parser.add_argument('--jobs', type=int, default=-1,
+                       help='Processos usados pela busca (padrão: -1, todos os núcleos)')
+    parser.add_argument('--compact', action='store_true', default=Config.ML_MODEL_COMPACT,
+                       help='Salvar as florestas no formato compacto do bundle (padrão: ML_MODEL_COMPACT)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Configurar logging
     setup_logging()
@@ -95,46 +107,14 @@ def main():
         
         # Processo completo de treinamento
         logger.info("Iniciando processo de treinamento completo...")
-        
-        # 1. Coletar dados de treinamento
-        logger.info(f"Coletando dados dos últimos {args.days} dias...")
-        training_data = trainer.collect_training_data(args.days, args.min_samples)
-        
-        if not training_data:
-            logger.error(f"Dados insuficientes: precisa de pelo menos {args.min_samples} amostras")
+        metrics = train_and_save(
+            trainer, predictor, args.days, args.min_samples, (lat, lon), args.time_bucket,
+            search=args.search, cv=args.cv, jobs=args.jobs, save=args.save_models,
+            compact=args.compact, logger=logger
+        )
+        if metrics is None:
             return 1
         
-        logger.info(f"Coletados {len(training_data)} registros para treinamento")
-        
-        # 2. Enriquecer com dados climáticos
-        logger.info("Enriquecendo dados com informações climáticas...")
-        enriched_data = predictor.enrich_with_climate_data(training_data, lat, lon)
-        
-        if not enriched_data:
-            logger.warning("Não foi possível enriquecer com dados climáticos, usando apenas dados dos sensores")
-            enriched_data = training_data
-        
-        # 3. Treinar modelos
-        logger.info("Iniciando treinamento dos modelos ML...")
-        metrics = predictor.train_models(enriched_data)
-        
-        # 4. Exibir resultados
-        logger.info("=== RESULTADOS DO TREINAMENTO ===")
-        logger.info(f"Acurácia Irrigação: {metrics['irrigation_accuracy']:.3f}")
-        logger.info(f"MAE Umidade: {metrics['humidity_mae']:.3f}")
-        logger.info(f"CV Irrigação: {metrics['irrigation_cv_mean']:.3f} ± {metrics['irrigation_cv_std']:.3f}")
-        logger.info(f"CV Umidade: {metrics['humidity_cv_mean']:.3f} ± {metrics['humidity_cv_std']:.3f}")
-        logger.info(f"Amostras de Treino: {metrics['training_samples']}")
-        
-        # 5. Salvar modelos se solicitado
-        if args.save_models:
-            logger.info("Salvando modelos treinados...")
-            success = predictor.save_models()
-            if success:
-                logger.info("Modelos salvos com sucesso!")
-            else:
-                logger.error("Erro ao salvar modelos")
-        
         # 6. Teste de predição
         logger.info("Executando teste de predição...")
         test_prediction(predictor, logger)
@@ -150,12 +130,94 @@ def main():
         logger.error(f"Erro durante treinamento: {str(e)}", exc_info=True)
         return 1
 
+def train_and_save(trainer, predictor, days, min_samples, location, time_bucket='1min',
+                   search=False, cv=5, jobs=-1, save=True, path_prefix='models/farmtech',
+                   compact=False, logger=None, progress=None):
+    """
+    Coleta, enriquece com clima, treina (ou executa a busca) e salva os modelos
+    
+    Usado pelo script e pelo worker de jobs (tipo "retreino" em app/services/tarefas.py).
+    
+    Args:
+        progress: função opcional chamada como progress(fração, mensagem) entre as etapas
+    
+    Returns:
+        dict: métricas do treinamento (None se não há dados suficientes)
+    """
+    logger = logger or logging.getLogger(__name__)
+    progress = progress or (lambda fraction, message: None)
+    lat, lon = location
+    
+    # 1. Coletar dados de treinamento
+    progress(0.0, "Coletando dados de treinamento")
+    logger.info(f"Coletando dados dos últimos {days} dias...")
+    training_data = trainer.collect_training_frame(days, min_samples, time_bucket)
+    
+    if training_data.empty:
+        logger.error(f"Dados insuficientes: precisa de pelo menos {min_samples} amostras")
+        return None
+    
+    logger.info(f"Coletados {len(training_data)} registros para treinamento")
+    
+    # 2. Enriquecer com dados climáticos
+    progress(0.2, "Enriquecendo com dados climáticos")
+    logger.info("Enriquecendo dados com informações climáticas...")
+    enriched_data = predictor.enrich_with_climate_data(training_data, lat, lon)
+    
+    if enriched_data is None or len(enriched_data) == 0:
+        logger.warning("Não foi possível enriquecer com dados climáticos, usando apenas dados dos sensores")
+        enriched_data = training_data
+    
+    # 3. Treinar modelos
+    progress(0.3, "Treinando modelos")
+    if search:
+        logger.info("Iniciando busca de hiperparâmetros...")
+        report = ModelSearch(predictor, cv=cv, n_jobs=jobs).run(enriched_data)
+        log_search_report(report, logger)
+        metrics = report['metrics']
+    else:
+        logger.info("Iniciando treinamento dos modelos ML...")
+        metrics = predictor.train_models(enriched_data)
+    
+    # 4. Exibir resultados
+    logger.info("=== RESULTADOS DO TREINAMENTO ===")
+    logger.info(f"Acurácia Irrigação: {metrics['irrigation_accuracy']:.3f}")
+    logger.info(f"MAE Umidade: {metrics['humidity_mae']:.3f}")
+    logger.info(f"CV Irrigação: {metrics['irrigation_cv_mean']:.3f} ± {metrics['irrigation_cv_std']:.3f}")
+    logger.info(f"CV Umidade: {metrics['humidity_cv_mean']:.3f} ± {metrics['humidity_cv_std']:.3f}")
+    logger.info(f"Amostras de Treino: {metrics['training_samples']}")
+    
+    # 5. Salvar modelos se solicitado
+    if save:
+        progress(0.9, "Salvando modelos")
+        logger.info("Salvando modelos treinados...")
+        success = predictor.save_models(path_prefix, compact=compact)
+        if success:
+            logger.info("Modelos salvos com sucesso!")
+        else:
+            logger.error("Erro ao salvar modelos")
+    
+    return metrics
+
+def log_search_report(report, logger):
+    """Exibe os candidatos da busca (pontuação média nos folds e tempo total de ajuste)"""
+    logger.info(f"=== BUSCA DE HIPERPARÂMETROS ({report['fits']} ajustes, {report['n_jobs']} processos, "
+                f"{report['seconds']:.1f}s) ===")
+    for task, label in (('irrigation', 'Irrigação (acurácia)'), ('humidity', 'Umidade (MAE)')):
+        logger.info(f"{label}:")
+        for candidate in report['candidates'][task]:
+            score = candidate['score_mean'] if task == 'irrigation' else -candidate['score_mean']
+            logger.info(f"  {score:.4f} ± {candidate['score_std']:.4f}  {candidate['seconds']:7.2f}s  "
+                        f"{candidate['family']} {candidate['params']}")
+        best = report['best'][task]
+        logger.info(f"  Vencedor: {best['family']} {best['params']}")
+
 def evaluate_existing_models(predictor, trainer, days, logger):
     """Avalia modelos existentes com dados de teste"""
     try:
         # Coletar dados de teste
-        test_data = trainer.collect_training_data(days, min_samples=10)
-        if not test_data:
+        test_data = trainer.collect_training_frame(days, min_samples=10)
+        if test_data.empty:
             logger.error("Dados insuficientes para avaliação")
             return
         
@@ -0,0 +1,67 @@
+# app/scripts/varredura_irrigacao.py
+
+"""
+FarmTech Solutions
+Varredura de irrigação de toda a frota de campos
+
+Avalia todos os campos (ou os informados) com a mesma regra da rota
+/sensores/api/verificar-irrigacao-clima/<campo_id>, em uma única passada, e
+grava as recomendações de irrigação em lote. Pensado para execução agendada
+(cron), por exemplo a cada hora.
+
+Uso:
+    python app/scripts/varredura_irrigacao.py
+    python app/scripts/varredura_irrigacao.py --produtor "João Silva" --sem-gravar
+    python app/scripts/varredura_irrigacao.py --campos id1 id2 id3
+"""
+
+import sys
+import os
+import argparse
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from config import Config
+from app.services.db_service import DatabaseService
+from app.services.sql_db_service import SQLDatabaseService
+from app.services.weather_service import WeatherService
+
+def main():
+    parser = argparse.ArgumentParser(description='Decidir a irrigação de todos os campos em uma passada')
+    parser.add_argument('--campos', nargs='+', default=None,
+                       help='IDs dos campos (padrão: todos)')
+    parser.add_argument('--produtor', type=str, default=None,
+                       help='Apenas os campos de um produtor')
+    parser.add_argument('--cidade-padrao', type=str, default='Fortaleza',
+                       help='Município usado para campos sem localização')
+    parser.add_argument('--sem-gravar', action='store_true',
+                       help='Apenas exibir as decisões, sem gravar recomendações')
+    args = parser.parse_args()
+
+    print("=== FarmTech Solutions - Varredura de irrigação ===")
+    mongo_db = DatabaseService(Config.MONGO_URI)
+    sql_db = SQLDatabaseService(Config.SQL_DATABASE_URI)
+    weather_service = WeatherService(Config.OPENWEATHER_API_KEY)
+
+    resultado = weather_service.verificar_necessidade_irrigacao_em_lote(
+        sql_db,
+        mongo_db,
+        campo_ids=args.campos,
+        nome_produtor=args.produtor,
+        cidade_padrao=args.cidade_padrao,
+        gravar_recomendacoes=not args.sem_gravar
+    )
+
+    for decisao in resultado['decisoes']:
+        marcador = 'IRRIGAR' if decisao['irrigar'] else '-'
+        print(f"  {decisao['campo_id']:<26} {decisao['cidade']:<20} {marcador:<8} {decisao['motivo']}")
+
+    resumo = resultado['resumo']
+    print(f"\n{resumo['campos']} campo(s), {resumo['irrigar']} para irrigar, "
+          f"{resumo['recomendacoes_gravadas']} recomendação(ões) gravada(s), "
+          f"{resumo['cidades_consultadas']} município(s) consultado(s) em {resumo['duracao_segundos']}s")
+
+if __name__ == '__main__':
+    main()
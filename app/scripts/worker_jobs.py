@@ -0,0 +1,115 @@
+# app/scripts/worker_jobs.py
+
+"""
+FarmTech Solutions
+Worker da fila de jobs em segundo plano
+
+Executa os jobs gravados na tabela job pela aplicação (retreino, importação
+de CSV, relatórios e avaliação de drift; ver app/services/tarefas.py) em um
+pool de processos separado do servidor web. Cada processo reserva um job por
+vez; processos que terminam inesperadamente são reiniciados.
+
+Uso:
+    python app/scripts/worker_jobs.py
+    python app/scripts/worker_jobs.py --processos 4
+"""
+
+import sys
+import os
+import argparse
+import logging
+import signal
+import socket
+import multiprocessing
+
+# Configuração de path
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, BASE_DIR)
+
+from config import Config
+
+class ServicosWorker:
+    """Serviços de banco de um processo do worker (MongoDB conectado só quando um job precisa)"""
+
+    def __init__(self):
+        from app.services.sql_db_service import SQLDatabaseService
+
+        self.sql_db = SQLDatabaseService(Config.SQL_DATABASE_URI, pool_size=2, max_overflow=2)
+        self._mongo_db = None
+
+    @property
+    def mongo_db(self):
+        if self._mongo_db is None:
+            from app.services.db_service import DatabaseService
+            self._mongo_db = DatabaseService(Config.MONGO_URI, max_pool_size=5)
+        return self._mongo_db
+
+def configurar_logging():
+    os.makedirs('logs', exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('logs/worker_jobs.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+def processo_worker(indice, parar):
+    """Laço de um processo do pool"""
+    from app.services.fila_jobs import FilaJobs, executar_worker
+    from app.services.tarefas import TAREFAS
+
+    configurar_logging()
+    # Encerramento é coordenado pelo processo principal (evento parar)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    servicos = ServicosWorker()
+    executar_worker(
+        FilaJobs(servicos.sql_db), TAREFAS, servicos,
+        nome=f"{socket.gethostname()}:{os.getpid()}:{indice}",
+        intervalo=Config.JOBS_POLL_INTERVAL,
+        parar=parar
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker da fila de jobs da FarmTech')
+    parser.add_argument('--processos', type=int, default=Config.JOBS_WORKERS,
+                       help=f'Processos no pool (padrão: {Config.JOBS_WORKERS})')
+    args = parser.parse_args()
+
+    configurar_logging()
+    logger = logging.getLogger(__name__)
+
+    contexto = multiprocessing.get_context('spawn')
+    parar = contexto.Event()
+
+    def encerrar(signum, frame):
+        logger.info("Encerrando: aguardando os jobs em execução...")
+        parar.set()
+
+    signal.signal(signal.SIGINT, encerrar)
+    signal.signal(signal.SIGTERM, encerrar)
+
+    def iniciar(indice):
+        processo = contexto.Process(target=processo_worker, args=(indice, parar), name=f"worker-{indice}")
+        processo.start()
+        return processo
+
+    processos = [iniciar(indice) for indice in range(max(args.processos, 1))]
+    logger.info(f"Worker de jobs iniciado com {len(processos)} processo(s)")
+
+    while not parar.is_set():
+        parar.wait(5)
+        for indice, processo in enumerate(processos):
+            if not processo.is_alive() and not parar.is_set():
+                logger.warning(f"Processo {processo.name} terminou (código {processo.exitcode}); reiniciando")
+                processos[indice] = iniciar(indice)
+
+    for processo in processos:
+        processo.join()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+# app/services/carga_leituras.py
+
+"""
+Carga em massa de leituras de sensores (scripts offline)
+
+Usado pelos scripts de importação e de geração de dados para popular o banco
+com volumes grandes (ex.: um ano de leituras para testes de carga). As
+leituras são normalizadas em linhas tipadas (expandir_leitura) e gravadas em
+lotes de tamanho configurável, uma transação por lote:
+
+    - executemany: INSERT compilado uma vez e enviado pelo driver em lotes
+      (INSERT multi-linha no MySQL/PostgreSQL, executemany nativo no SQLite)
+    - load_data (MySQL): cada lote vira um arquivo temporário carregado com
+      LOAD DATA LOCAL INFILE; se o servidor não permitir, volta para executemany
+
+Opcionalmente os índices secundários de leitura_sensor (exceto os que
+sustentam chaves estrangeiras) são removidos antes da carga e recriados ao
+final (mais rápido que mantê-los linha a linha), e os agregados
+horários/diários do período carregado são reconstruídos.
+"""
+
+import os
+import time
+import tempfile
+import logging
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, inspect, text
+
+from app.models.sensor_models import LeituraSensor, expandir_leitura
+
+logger = logging.getLogger(__name__)
+
+COLUNAS = ('sensor_id', 'data_hora', 'valor', 'valor_numerico', 'metrica', 'unidade', 'valido')
+
+class CarregadorLeituras:
+
+    def __init__(self, sql_db, tamanho_lote=5000, metodo='auto', desativar_indices=False,
+                 reconstruir_agregados=True, progresso=None):
+        """
+        Args:
+            sql_db: SQLDatabaseService do banco de destino
+            tamanho_lote: linhas tipadas por lote/transação
+            metodo: 'auto' (load_data no MySQL, executemany nos demais), 'executemany' ou 'load_data'
+            desativar_indices: remover os índices secundários durante a carga e recriá-los ao final
+            reconstruir_agregados: recalcular os agregados do período carregado ao final
+            progresso: função opcional chamada após cada lote com as estatísticas parciais
+        """
+        self.sql_db = sql_db
+        self.engine = sql_db.engine
+        self.tamanho_lote = max(int(tamanho_lote), 1)
+        self.dialeto = self.engine.dialect.name
+        if metodo == 'auto':
+            metodo = 'load_data' if self.dialeto in ('mysql', 'mariadb') else 'executemany'
+        if metodo == 'load_data' and self.dialeto not in ('mysql', 'mariadb'):
+            raise ValueError(f"LOAD DATA LOCAL INFILE não é suportado pelo banco {self.dialeto}")
+        self.metodo = metodo
+        self.desativar_indices = desativar_indices
+        self.reconstruir_agregados = reconstruir_agregados
+        self.progresso = progresso
+        self._engine_load_data = None
+
+    def _linhas_tipadas(self, leituras, stats):
+        """Converte leituras (valor/unidade como na API) em linhas da tabela leitura_sensor"""
+        agora = datetime.now()
+        for leitura in leituras:
+            stats['leituras'] += 1
+            try:
+                tipadas = expandir_leitura(leitura['valor'], leitura['unidade'])
+            except (ValueError, SyntaxError) as e:
+                stats['ignoradas'] += 1
+                logger.warning(f"Leitura ignorada ({leitura}): {str(e)}")
+                continue
+
+            data_hora = leitura.get('data_hora') or agora
+            sensor_id = int(leitura['sensor_id'])
+            for metrica, numero, unidade in tipadas:
+                yield {
+                    'sensor_id': sensor_id,
+                    'data_hora': data_hora,
+                    'valor': str(numero),
+                    'valor_numerico': numero,
+                    'metrica': metrica,
+                    'unidade': unidade,
+                    'valido': leitura.get('valido', True)
+                }
+
+    def _gravar_executemany(self, linhas):
+        with self.engine.begin() as conn:
+            conn.execute(insert(LeituraSensor.__table__), linhas)
+
+    def _gravar_load_data(self, linhas):
+        """Grava o lote com LOAD DATA LOCAL INFILE (arquivo TSV temporário)"""
+        if self._engine_load_data is None:
+            # O cliente precisa habilitar local_infile explicitamente
+            self._engine_load_data = create_engine(self.engine.url, connect_args={'local_infile': 1})
+
+        def campo(valor):
+            if valor is None:
+                return '\\N'
+            if isinstance(valor, bool):
+                return '1' if valor else '0'
+            if isinstance(valor, datetime):
+                return valor.strftime('%Y-%m-%d %H:%M:%S.%f')
+            return str(valor).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+        fd, caminho = tempfile.mkstemp(suffix='.tsv', text=True)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as arquivo:
+                for linha in linhas:
+                    arquivo.write('\t'.join(campo(linha[coluna]) for coluna in COLUNAS) + '\n')
+
+            with self._engine_load_data.begin() as conn:
+                conn.execute(text(
+                    f"LOAD DATA LOCAL INFILE :caminho INTO TABLE {LeituraSensor.__tablename__} "
+                    f"CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                    f"({', '.join(COLUNAS)})"
+                ), {'caminho': caminho})
+        finally:
+            os.unlink(caminho)
+
+    def _gravar_lote(self, linhas):
+        if self.metodo == 'load_data':
+            try:
+                self._gravar_load_data(linhas)
+                return
+            except Exception as e:
+                # Ex.: local_infile desabilitado no servidor
+                logger.warning(f"LOAD DATA LOCAL INFILE indisponível, usando executemany: {str(e)}")
+                self.metodo = 'executemany'
+        self._gravar_executemany(linhas)
+
+    def _indices_secundarios(self):
+        """
+        Índices declarados em leitura_sensor que existem no banco e podem ser removidos
+
+        Ficam de fora os que começam pelas colunas de uma chave estrangeira: no
+        MySQL eles sustentam a FK e não podem ser removidos (erro 1553).
+        """
+        tabela = LeituraSensor.__table__
+        existentes = {indice['name'] for indice in inspect(self.engine).get_indexes(tabela.name)}
+        chaves_estrangeiras = [[coluna.name for coluna in fk.columns] for fk in tabela.foreign_key_constraints]
+
+        def sustenta_fk(indice):
+            colunas = [coluna.name for coluna in indice.columns]
+            return any(colunas[:len(fk)] == fk for fk in chaves_estrangeiras)
+
+        return [indice for indice in tabela.indexes if indice.name in existentes and not sustenta_fk(indice)]
+
+    def carregar(self, leituras):
+        """
+        Grava as leituras em lotes
+
+        Args:
+            leituras: iterável (pode ser um gerador) de dicts com sensor_id, valor,
+                      unidade, data_hora e valido (opcional)
+
+        Returns:
+            dict: leituras lidas, ignoradas, linhas gravadas, lotes, método, tempo da carga
+                  (segundos_carga, base de linhas_por_segundo) e tempo total com os agregados
+        """
+        stats = {'leituras': 0, 'ignoradas': 0, 'linhas': 0, 'lotes': 0, 'metodo': self.metodo}
+        periodo = {}  # sensor_id -> [menor data_hora, maior data_hora]
+        inicio = time.perf_counter()
+
+        removidos = []  # só os efetivamente removidos são recriados
+        try:
+            for indice in self._indices_secundarios() if self.desativar_indices else []:
+                indice.drop(bind=self.engine)
+                removidos.append(indice)
+            if removidos:
+                logger.info(f"{len(removidos)} índice(s) removido(s) durante a carga")
+
+            lote = []
+            for linha in self._linhas_tipadas(leituras, stats):
+                lote.append(linha)
+                limites = periodo.setdefault(linha['sensor_id'], [linha['data_hora'], linha['data_hora']])
+                limites[0] = min(limites[0], linha['data_hora'])
+                limites[1] = max(limites[1], linha['data_hora'])
+
+                if len(lote) >= self.tamanho_lote:
+                    self._concluir_lote(lote, stats, inicio)
+                    lote = []
+            if lote:
+                self._concluir_lote(lote, stats, inicio)
+        finally:
+            for indice in removidos:
+                inicio_indice = time.perf_counter()
+                indice.create(bind=self.engine)
+                logger.info(f"Índice {indice.name} recriado em {time.perf_counter() - inicio_indice:.1f}s")
+
+        stats['segundos_carga'] = round(time.perf_counter() - inicio, 3)
+
+        if self.reconstruir_agregados:
+            for sensor_id, (menor, maior) in periodo.items():
+                self.sql_db.reconstruir_agregados(inicio=menor, fim=maior, sensor_id=sensor_id)
+
+        stats['metodo'] = self.metodo
+        stats['segundos'] = round(time.perf_counter() - inicio, 3)
+        stats['linhas_por_segundo'] = round(stats['linhas'] / stats['segundos_carga'], 1) if stats['segundos_carga'] else None
+        return stats
+
+    def _concluir_lote(self, lote, stats, inicio):
+        self._gravar_lote(lote)
+        stats['linhas'] += len(lote)
+        stats['lotes'] += 1
+        if self.progresso:
+            decorrido = time.perf_counter() - inicio
+            self.progresso(dict(stats, segundos=round(decorrido, 3),
+                                linhas_por_segundo=round(stats['linhas'] / decorrido, 1) if decorrido else None))
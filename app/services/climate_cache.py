@@ -0,0 +1,164 @@
+# app/services/climate_cache.py
+
+"""
+Cache persistente do histórico climático, por dia
+
+Guarda em SQLite (um arquivo por diretório de cache, compartilhado entre o app
+Flask e os scripts de treino/avaliação/dashboard) os pontos horários de cada
+dia, indexados por coordenadas arredondadas e data. Assim janelas que se
+sobrepõem reaproveitam os dias já baixados e só os dias ausentes são buscados.
+
+Dias buscados pouco depois de acontecerem (o arquivo do Open-Meteo ainda pode
+estar incompleto) expiram após um TTL e são buscados de novo; dias antigos não
+mudam e nunca expiram. O tamanho total é limitado, removendo primeiro os dias
+acessados há mais tempo.
+"""
+
+import os
+import json
+import sqlite3
+import time
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+
+class ClimateHistoryCache:
+
+    def __init__(self, directory, recent_days=7, recent_ttl_hours=6, max_megabytes=200, coordinate_precision=2):
+        """
+        Args:
+            directory: diretório do arquivo SQLite (criado se não existir)
+            recent_days: dias buscados até N dias após a data são considerados provisórios
+            recent_ttl_hours: validade dos dias provisórios
+            max_megabytes: tamanho máximo dos dados guardados
+            coordinate_precision: casas decimais das coordenadas na chave (2 ≈ 1 km)
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, 'climate_history.sqlite3')
+        self.recent_days = recent_days
+        self.recent_ttl = recent_ttl_hours * 3600
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self.coordinate_precision = coordinate_precision
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS climate_day (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    day TEXT NOT NULL,
+                    points TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (lat, lon, day)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_climate_day_accessed ON climate_day (accessed_at)")
+
+    @contextmanager
+    def _connect(self):
+        # Uma conexão por operação: seguro entre threads e entre processos (WAL)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _key(self, lat, lon):
+        return round(float(lat), self.coordinate_precision), round(float(lon), self.coordinate_precision)
+
+    def _is_fresh(self, day, fetched_at, now):
+        """Dias buscados muito perto da própria data expiram após o TTL"""
+        final_after = datetime.combine(date.fromisoformat(day) + timedelta(days=self.recent_days), datetime.min.time())
+        if fetched_at >= final_after.timestamp():
+            return True
+        return now - fetched_at < self.recent_ttl
+
+    def get_days(self, lat, lon, days: Iterable[date]) -> Dict[date, List[Dict]]:
+        """
+        Pontos guardados e ainda válidos para os dias pedidos
+
+        Returns:
+            dict: dia -> lista de pontos (dias ausentes ou expirados não aparecem)
+        """
+        lat_key, lon_key = self._key(lat, lon)
+        day_keys = [d.isoformat() for d in days]
+        if not day_keys:
+            return {}
+
+        now = time.time()
+        found = {}
+        with self._connect() as conn:
+            # Lotes abaixo do limite de parâmetros do SQLite
+            for offset in range(0, len(day_keys), 500):
+                chunk = day_keys[offset:offset + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT day, points, fetched_at FROM climate_day "
+                    f"WHERE lat = ? AND lon = ? AND day IN ({placeholders})",
+                    [lat_key, lon_key, *chunk]
+                ).fetchall()
+                for day, points, fetched_at in rows:
+                    if self._is_fresh(day, fetched_at, now):
+                        found[date.fromisoformat(day)] = json.loads(points)
+
+            if found:
+                conn.executemany(
+                    "UPDATE climate_day SET accessed_at = ? WHERE lat = ? AND lon = ? AND day = ?",
+                    [(now, lat_key, lon_key, d.isoformat()) for d in found]
+                )
+
+        return found
+
+    def put_days(self, lat, lon, points_by_day: Dict[date, List[Dict]]):
+        """Grava (ou substitui) os pontos de cada dia e aplica o limite de tamanho"""
+        if not points_by_day:
+            return
+
+        lat_key, lon_key = self._key(lat, lon)
+        now = time.time()
+        rows = []
+        for day, points in points_by_day.items():
+            payload = json.dumps(points, separators=(',', ':'))
+            rows.append((lat_key, lon_key, day.isoformat(), payload, len(payload), now, now))
+
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO climate_day (lat, lon, day, points, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        self.evict()
+
+    def evict(self):
+        """Remove os dias acessados há mais tempo até o total ficar em 90% do limite"""
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM climate_day").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            cursor = conn.execute("SELECT rowid, size FROM climate_day ORDER BY accessed_at")
+            to_delete = []
+            for rowid, size in cursor:
+                if total <= target:
+                    break
+                to_delete.append((rowid,))
+                total -= size
+                removed += 1
+            conn.executemany("DELETE FROM climate_day WHERE rowid = ?", to_delete)
+
+        self.logger.info(f"Cache climático: {removed} dia(s) removido(s) por limite de tamanho")
+        return removed
+
+    def stats(self):
+        """Dias guardados e tamanho total em bytes"""
+        with self._connect() as conn:
+            days, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM climate_day").fetchone()
+        return {'days': days, 'bytes': size, 'max_bytes': self.max_bytes, 'path': self.path}
@@ -1,11 +1,32 @@
 # app/services/climate_service.py
 
-import requests
 import json
 from datetime import datetime, timedelta
 import logging
 from typing import Dict, List, Optional
 import os
+import threading
+
+from app.services.climate_cache import ClimateHistoryCache
+from app.services.weather_client import get_json, get_json_cached, fetch_many
+from app.services.weather_cache import location_key
+
+# Cache em disco compartilhado por todas as instâncias do processo (uma por diretório)
+_history_caches = {}
+_history_caches_lock = threading.Lock()
+
+def get_history_cache(directory=None):
+    """Cache persistente do histórico climático, configurado pelas variáveis CLIMATE_CACHE_*"""
+    directory = directory or os.getenv('CLIMATE_CACHE_DIR') or 'cache/climate'
+    with _history_caches_lock:
+        if directory not in _history_caches:
+            _history_caches[directory] = ClimateHistoryCache(
+                directory,
+                recent_days=int(os.getenv('CLIMATE_CACHE_RECENT_DAYS') or 7),
+                recent_ttl_hours=float(os.getenv('CLIMATE_CACHE_RECENT_TTL_HOURS') or 6),
+                max_megabytes=float(os.getenv('CLIMATE_CACHE_MAX_MB') or 200)
+            )
+        return _history_caches[directory]
 
 class ClimateDataService:
     """
@@ -13,19 +34,35 @@ class ClimateDataService:
     Suporta OpenWeatherMap (já usado) e Open-Meteo (gratuito para histórico)
     """
     
-    def __init__(self, openweather_api_key=None):
+    OPEN_METEO_HOURLY = {
+        'temperature_2m': 'temperature',
+        'relativehumidity_2m': 'humidity_air',
+        'precipitation': 'precipitation',
+        'windspeed_10m': 'wind_speed',
+        'pressure_msl': 'pressure',
+        'soil_temperature_0cm': 'soil_temperature',
+        'soil_moisture_0_1cm': 'soil_moisture_ref'
+    }
+    
+    def __init__(self, openweather_api_key=None, open_meteo_base_url=None, cache_dir=None):
         self.openweather_api_key = openweather_api_key or os.getenv('OPENWEATHER_API_KEY')
-        self.open_meteo_base_url = "https://archive-api.open-meteo.com/v1/archive"
-        self.openweather_base_url = "https://api.openweathermap.org/data/2.5"
+        self.open_meteo_base_url = (
+            open_meteo_base_url or os.getenv('OPEN_METEO_ARCHIVE_URL') or "https://archive-api.open-meteo.com/v1/archive"
+        )
+        self.openweather_base_url = os.getenv('OPENWEATHER_BASE_URL') or "https://api.openweathermap.org/data/2.5"
         self.logger = logging.getLogger(__name__)
         
-        # Cache para evitar requisições desnecessárias
-        self._cache = {}
+        # Histórico por dia em disco, compartilhado entre processos
+        self.history_cache = get_history_cache(cache_dir)
     
     def get_historical_weather(self, lat: float, lon: float, start_date: datetime, end_date: datetime) -> List[Dict]:
         """
         Obtém dados climáticos históricos usando Open-Meteo API (gratuita)
         
+        Os dias já guardados no cache em disco são servidos de lá; apenas os
+        dias ausentes (ou provisórios e expirados) são buscados, em um pedido
+        por intervalo contíguo.
+        
         Args:
             lat: Latitude
             lon: Longitude
@@ -35,68 +72,84 @@ class ClimateDataService:
         Returns:
             Lista de dados climáticos por data
         """
+        days = [start_date.date() + timedelta(days=i) for i in range((end_date.date() - start_date.date()).days + 1)]
+        
         try:
-            # Cache key
-            cache_key = f"historical_{lat}_{lon}_{start_date.date()}_{end_date.date()}"
-            if cache_key in self._cache:
-                return self._cache[cache_key]
-            
-            # Parâmetros para Open-Meteo
-            params = {
-                "latitude": lat,
-                "longitude": lon,
-                "start_date": start_date.strftime("%Y-%m-%d"),
-                "end_date": end_date.strftime("%Y-%m-%d"),
-                "hourly": [
-                    "temperature_2m",
-                    "relativehumidity_2m", 
-                    "precipitation",
-                    "windspeed_10m",
-                    "pressure_msl",
-                    "soil_temperature_0cm",
-                    "soil_moisture_0_1cm"
-                ],
-                "timezone": "America/Sao_Paulo"  # Ajustar conforme localização
-            }
-            
-            response = requests.get(self.open_meteo_base_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Processar dados
-            historical_data = []
-            hourly = data.get('hourly', {})
-            times = hourly.get('time', [])
+            points_by_day = self.history_cache.get_days(lat, lon, days)
+        except Exception as e:
+            self.logger.warning(f"Cache climático indisponível: {str(e)}")
+            points_by_day = {}
+        
+        missing = [day for day in days if day not in points_by_day]
+        for first_day, last_day in self._contiguous_ranges(missing):
+            try:
+                fetched = self._fetch_open_meteo(lat, lon, first_day, last_day)
+            except Exception as e:
+                self.logger.error(f"Erro ao obter dados históricos: {str(e)}")
+                continue
             
-            for i, time_str in enumerate(times):
-                timestamp = datetime.fromisoformat(time_str.replace('T', ' '))
-                
-                weather_point = {
-                    'timestamp': int(timestamp.timestamp() * 1000),
-                    'datetime': timestamp,
-                    'temperature': hourly.get('temperature_2m', [])[i] if i < len(hourly.get('temperature_2m', [])) else None,
-                    'humidity_air': hourly.get('relativehumidity_2m', [])[i] if i < len(hourly.get('relativehumidity_2m', [])) else None,
-                    'precipitation': hourly.get('precipitation', [])[i] if i < len(hourly.get('precipitation', [])) else None,
-                    'wind_speed': hourly.get('windspeed_10m', [])[i] if i < len(hourly.get('windspeed_10m', [])) else None,
-                    'pressure': hourly.get('pressure_msl', [])[i] if i < len(hourly.get('pressure_msl', [])) else None,
-                    'soil_temperature': hourly.get('soil_temperature_0cm', [])[i] if i < len(hourly.get('soil_temperature_0cm', [])) else None,
-                    'soil_moisture_ref': hourly.get('soil_moisture_0_1cm', [])[i] if i < len(hourly.get('soil_moisture_0_1cm', [])) else None
-                }
-                
+            try:
+                self.history_cache.put_days(lat, lon, fetched)
+            except Exception as e:
+                self.logger.warning(f"Não foi possível gravar o cache climático: {str(e)}")
+            points_by_day.update(fetched)
+        
+        historical_data = []
+        for day in days:
+            for point in points_by_day.get(day, []):
+                historical_data.append({**point, 'datetime': datetime.fromtimestamp(point['timestamp'] / 1000)})
+        
+        self.logger.info(
+            f"{len(historical_data)} pontos climáticos históricos "
+            f"({len(days) - len(missing)} dia(s) do cache, {len(missing)} buscado(s))"
+        )
+        return historical_data
+    
+    @staticmethod
+    def _contiguous_ranges(days):
+        """Agrupa dias ordenados em intervalos contíguos (primeiro, último)"""
+        ranges = []
+        for day in days:
+            if ranges and day == ranges[-1][1] + timedelta(days=1):
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        return [tuple(r) for r in ranges]
+    
+    def _fetch_open_meteo(self, lat, lon, first_day, last_day):
+        """
+        Busca um intervalo de dias no Open-Meteo
+        
+        Returns:
+            dict: dia -> lista de pontos horários (sem valores nulos)
+        """
+        params = {
+            "latitude": lat,
+            "longitude": lon,
+            "start_date": first_day.strftime("%Y-%m-%d"),
+            "end_date": last_day.strftime("%Y-%m-%d"),
+            "hourly": list(self.OPEN_METEO_HOURLY),
+            "timezone": "America/Sao_Paulo"  # Ajustar conforme localização
+        }
+        
+        hourly = get_json(self.open_meteo_base_url, params, endpoint='archive').get('hourly', {})
+        times = hourly.get('time', [])
+        series = {
+            field: hourly.get(api_name) or []
+            for api_name, field in self.OPEN_METEO_HOURLY.items()
+        }
+        
+        points_by_day = {}
+        for i, time_str in enumerate(times):
+            timestamp = datetime.fromisoformat(time_str.replace('T', ' '))
+            weather_point = {'timestamp': int(timestamp.timestamp() * 1000)}
+            for field, values in series.items():
                 # Filtrar valores None
-                weather_point = {k: v for k, v in weather_point.items() if v is not None}
-                historical_data.append(weather_point)
-            
-            # Cache por 1 hora
-            self._cache[cache_key] = historical_data
-            
-            self.logger.info(f"Coletados {len(historical_data)} pontos climáticos históricos")
-            return historical_data
-            
-        except Exception as e:
-            self.logger.error(f"Erro ao obter dados históricos: {str(e)}")
-            return []
+                if i < len(values) and values[i] is not None:
+                    weather_point[field] = values[i]
+            points_by_day.setdefault(timestamp.date(), []).append(weather_point)
+        
+        return points_by_day
     
     def get_current_weather(self, lat: float, lon: float) -> Dict:
         """
@@ -107,30 +160,11 @@ class ClimateDataService:
                 self.logger.warning("OpenWeather API key não configurada")
                 return {}
             
-            url = f"{self.openweather_base_url}/weather"
-            params = {
-                "lat": lat,
-                "lon": lon,
-                "appid": self.openweather_api_key,
-                "units": "metric",
-                "lang": "pt_br"
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            return {
-                'temperature': data['main']['temp'],
-                'humidity_air': data['main']['humidity'],
-                'pressure': data['main']['pressure'],
-                'wind_speed': data['wind']['speed'],
-                'precipitation': data.get('rain', {}).get('1h', 0),  # Chuva última hora
-                'weather_condition': data['weather'][0]['main'],
-                'description': data['weather'][0]['description'],
-                'timestamp': int(datetime.now().timestamp() * 1000)
-            }
+            params = self._current_params(lat, lon)
+            data = get_json_cached(
+                f"{self.openweather_base_url}/weather", params, 'current', self._cache_key('current', params)
+            )
+            return self._parse_current(data)
             
         except Exception as e:
             self.logger.error(f"Erro ao obter clima atual: {str(e)}")
@@ -144,35 +178,112 @@ class ClimateDataService:
             if not self.openweather_api_key:
                 return []
             
-            url = f"{self.openweather_base_url}/forecast"
-            params = {
-                "lat": lat,
-                "lon": lon,
-                "appid": self.openweather_api_key,
-                "units": "metric",
-                "cnt": min(hours // 3, 40)  # API retorna de 3 em 3 horas, max 40 pontos
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            forecast_data = []
-            for item in data.get('list', []):
-                forecast_point = {
-                    'timestamp': item['dt'] * 1000,
-                    'temperature': item['main']['temp'],
-                    'humidity_air': item['main']['humidity'],
-                    'pressure': item['main']['pressure'],
-                    'precipitation': item.get('rain', {}).get('3h', 0),
-                    'wind_speed': item['wind']['speed'],
-                    'weather_condition': item['weather'][0]['main']
-                }
-                forecast_data.append(forecast_point)
-            
-            return forecast_data
+            params = self._forecast_params(lat, lon, hours)
+            data = get_json_cached(
+                f"{self.openweather_base_url}/forecast", params, 'forecast',
+                self._cache_key('forecast', params)
+            )
+            return self._parse_forecast(data)
             
         except Exception as e:
             self.logger.error(f"Erro ao obter previsão: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+    
+    def get_weather_for_locations(self, locations, forecast_hours: int = 24, max_workers=None) -> Dict:
+        """
+        Clima atual e previsão de vários locais em paralelo
+        
+        Coordenadas próximas (mesma chave do cache de clima) são consultadas uma
+        vez, e respostas recentes vêm do cache.
+        
+        Args:
+            locations: lista de tuplas (lat, lon)
+            forecast_hours: horizonte da previsão
+            
+        Returns:
+            dict: (lat, lon) -> {'current': dict, 'forecast': list}; vazios quando a chamada falha
+        """
+        if not self.openweather_api_key:
+            self.logger.warning("OpenWeather API key não configurada")
+            return {(lat, lon): {'current': {}, 'forecast': []} for lat, lon in locations}
+        
+        calls = {}
+        cache_keys = {}
+        for lat, lon in locations:
+            current_params = self._current_params(lat, lon)
+            forecast_params = self._forecast_params(lat, lon, forecast_hours)
+            calls[(lat, lon, 'current')] = (
+                f"{self.openweather_base_url}/weather", current_params, 'current'
+            )
+            calls[(lat, lon, 'forecast')] = (
+                f"{self.openweather_base_url}/forecast", forecast_params, 'forecast'
+            )
+            cache_keys[(lat, lon, 'current')] = self._cache_key('current', current_params)
+            cache_keys[(lat, lon, 'forecast')] = self._cache_key('forecast', forecast_params)
+        
+        results = fetch_many(calls, max_workers=max_workers, cache_keys=cache_keys)
+        
+        weather = {}
+        for (lat, lon, kind), data in results.items():
+            entry = weather.setdefault((lat, lon), {'current': {}, 'forecast': []})
+            try:
+                if data is not None:
+                    entry[kind] = self._parse_current(data) if kind == 'current' else self._parse_forecast(data)
+            except (KeyError, IndexError, TypeError) as e:
+                self.logger.error(f"Resposta climática inválida para {lat},{lon}: {str(e)}")
+        return weather
+    
+    def _cache_key(self, kind, params):
+        """
+        Chave do cache de clima derivada dos parâmetros enviados (mesmo formato
+        de WeatherService._chave_cache, então as respostas são compartilhadas)
+        """
+        key = f"openweather:{kind}:{location_key((params['lat'], params['lon']))}:{params['units']}:{params['lang']}"
+        return f"{key}:{params['cnt']}" if 'cnt' in params else key
+    
+    def _current_params(self, lat, lon):
+        return {
+            "lat": round(float(lat), 4),
+            "lon": round(float(lon), 4),
+            "appid": self.openweather_api_key,
+            "units": "metric",
+            "lang": "pt_br"
+        }
+    
+    def _forecast_params(self, lat, lon, hours):
+        return {
+            "lat": round(float(lat), 4),
+            "lon": round(float(lon), 4),
+            "appid": self.openweather_api_key,
+            "units": "metric",
+            "lang": "pt_br",
+            "cnt": min(hours // 3, 40)  # API retorna de 3 em 3 horas, max 40 pontos
+        }
+    
+    def _parse_current(self, data):
+        return {
+            'temperature': data['main']['temp'],
+            'humidity_air': data['main']['humidity'],
+            'pressure': data['main']['pressure'],
+            'wind_speed': data['wind']['speed'],
+            'precipitation': data.get('rain', {}).get('1h', 0),  # Chuva última hora
+            'weather_condition': data['weather'][0]['main'],
+            'description': data['weather'][0]['description'],
+            'timestamp': int(datetime.now().timestamp() * 1000)
+        }
+    
+    def _parse_forecast(self, data):
+        forecast_data = []
+        for item in data.get('list', []):
+            forecast_point = {
+                'timestamp': item['dt'] * 1000,
+                'temperature': item['main']['temp'],
+                'humidity_air': item['main']['humidity'],
+                'pressure': item['main']['pressure'],
+                'precipitation': item.get('rain', {}).get('3h', 0),
+                'wind_speed': item['wind']['speed'],
+                'weather_condition': item['weather'][0]['main']
+            }
+            forecast_data.append(forecast_point)
+        
+        return forecast_data
@@ -1,11 +1,55 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
 from bson import ObjectId
 from app.models.cultura import Cultura
 from app.models.campo import Campo
+import threading
+
+class MonitorPoolMongo(monitoring.ConnectionPoolListener):
+    """Contabiliza conexões do pool do MongoClient a partir dos eventos CMAP"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.abertas = 0
+        self.em_uso = 0
+        self.falhas_checkout = 0
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.abertas += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.abertas = max(self.abertas - 1, 0)
+    
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.em_uso += 1
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.em_uso = max(self.em_uso - 1, 0)
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.falhas_checkout += 1
+    
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
 
 class DatabaseService:
-    def __init__(self, mongo_uri):
-        self.client = MongoClient(mongo_uri)
+    def __init__(self, mongo_uri, max_pool_size=50, min_pool_size=0):
+        self.monitor_pool = MonitorPoolMongo()
+        self.max_pool_size = max_pool_size
+        self.client = MongoClient(
+            mongo_uri,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            event_listeners=[self.monitor_pool]
+        )
         self.db = self.client.get_database()
         
         # Coleções
@@ -26,6 +70,17 @@ class DatabaseService:
             feijao = Cultura.from_dict(Cultura.get_feijao_caupi_default())
             self.culturas.insert_one(feijao.to_dict())
     
+    def status_pool(self):
+        """Retorna a ocupação do pool de conexões do MongoClient"""
+        monitor = self.monitor_pool
+        return {
+            'max_pool_size': self.max_pool_size,
+            'abertas': monitor.abertas,
+            'em_uso': monitor.em_uso,
+            'falhas_checkout': monitor.falhas_checkout,
+            'saturacao': round(monitor.em_uso / self.max_pool_size, 3) if self.max_pool_size else 0.0
+        }
+    
     # Métodos para culturas
     def obter_todas_culturas(self):
         """Retorna todas as culturas do banco de dados"""
@@ -68,6 +123,10 @@ class DatabaseService:
         campo = self.campos.find_one({"_id": campo_id})
         return campo if campo else None
     
+    def obter_campos_por_ids(self, campo_ids, projecao=None):
+        """Retorna vários campos em uma única consulta ($in), na ordem do banco"""
+        return list(self.campos.find({"_id": {"$in": list(campo_ids)}}, projecao))
+    
     def obter_campos_por_produtor(self, nome_produtor):
         """Retorna todos os campos de um produtor específico"""
         return list(self.campos.find({"nome_produtor": nome_produtor}))
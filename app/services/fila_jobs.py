@@ -0,0 +1,446 @@
+# app/services/fila_jobs.py
+
+"""
+Fila de jobs em segundo plano persistida no banco relacional
+
+Trabalhos pesados (retreino de modelos, importação de CSV, relatórios e
+avaliação de drift) não rodam nos workers do Flask: a rota grava um job na
+tabela job e responde na hora com o ID; um processo separado
+(app/scripts/worker_jobs.py) reserva os jobs pendentes e os executa.
+
+    - deduplicação: jobs idênticos (mesmo tipo e parâmetros) ainda ativos não
+      são duplicados; o pedido repetido recebe o job existente. A coluna
+      chave_ativa é única, então dois pedidos simultâneos não passam juntos
+    - reserva: UPDATE condicional (status ainda pendente), seguro com vários
+      processos de worker, em qualquer banco suportado
+    - progresso e heartbeat: o job informa fração concluída, mensagem e
+      detalhes; uma thread mantém atualizado_em enquanto ele executa e jobs
+      sem heartbeat (worker encerrado no meio) são marcados como erro
+    - cancelamento: job pendente é cancelado na hora; em execução, o pedido
+      é registrado e o job para no próximo ponto de verificação
+
+As funções de cada tipo de job ficam em app/services/tarefas.py.
+
+Configuração pelo ambiente (padrões em config.Config):
+    JOBS_WORKERS, JOBS_POLL_INTERVAL, JOBS_HEARTBEAT_SECONDS, JOBS_STALE_SECONDS, JOBS_RETENTION_DAYS
+"""
+
+import os
+import json
+import uuid
+import time
+import socket
+import hashlib
+import threading
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.models.sensor_models import (
+    Job, JOB_PENDENTE, JOB_EXECUTANDO, JOB_CONCLUIDO, JOB_ERRO, JOB_CANCELADO, JOB_ATIVOS
+)
+
+logger = logging.getLogger(__name__)
+
+class JobCancelado(Exception):
+    """Levantada no ponto de verificação de um job cujo cancelamento foi pedido"""
+
+def chave_job(tipo, parametros):
+    """Identifica jobs idênticos: hash do tipo e dos parâmetros normalizados"""
+    texto = json.dumps([tipo, parametros or {}], sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+def _para_json(valor):
+    """JSON dos parâmetros/resultados (tipos do numpy viram tipos nativos)"""
+    return json.dumps(valor, default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+
+def _de_json(texto):
+    return json.loads(texto) if texto else None
+
+def job_para_dict(job, incluir_resultado=False):
+    """Representação de um job para as rotas de status"""
+    dados = {
+        'id': job.id,
+        'tipo': job.tipo,
+        'parametros': _de_json(job.parametros),
+        'status': job.status,
+        'progresso': job.progresso,
+        'mensagem': job.mensagem,
+        'detalhes': _de_json(job.detalhes) or {},
+        'erro': job.erro,
+        'cancelamento_solicitado': job.cancelamento_solicitado,
+        'worker': job.worker,
+        'criado_em': job.criado_em.isoformat() if job.criado_em else None,
+        'executar_apos': job.executar_apos.isoformat() if job.executar_apos else None,
+        'iniciado_em': job.iniciado_em.isoformat() if job.iniciado_em else None,
+        'concluido_em': job.concluido_em.isoformat() if job.concluido_em else None
+    }
+    if incluir_resultado:
+        dados['resultado'] = _de_json(job.resultado)
+    return dados
+
+class FilaJobs:
+
+    def __init__(self, sql_db):
+        self.sql_db = sql_db
+
+    # ========== LADO DA APLICAÇÃO ==========
+
+    def enfileirar(self, tipo, parametros=None, executar_apos=None, deduplicar=True):
+        """
+        Grava um job pendente
+
+        Args:
+            tipo: tipo registrado em app/services/tarefas.py
+            parametros: dict serializável em JSON
+            executar_apos: não executar antes deste horário (padrão: agora)
+            deduplicar: devolver o job ativo idêntico em vez de criar outro
+
+        Returns:
+            tuple: (job como dict, True se foi criado ou False se já existia)
+        """
+        parametros = parametros or {}
+        chave = chave_job(tipo, parametros)
+        agora = datetime.now()
+        executar_apos = executar_apos or agora
+
+        session = self.sql_db.get_session()
+        try:
+            job = Job(
+                id=uuid.uuid4().hex,
+                tipo=tipo,
+                parametros=_para_json(parametros),
+                chave=chave,
+                chave_ativa=chave if deduplicar else None,
+                status=JOB_PENDENTE,
+                progresso=0.0,
+                criado_em=agora,
+                executar_apos=executar_apos
+            )
+            session.add(job)
+            try:
+                session.commit()
+                logger.info(f"Job {job.id} ({tipo}) enfileirado")
+                return job_para_dict(job), True
+            except IntegrityError:
+                session.rollback()
+
+            # Já existe um job idêntico ativo
+            existente = session.execute(select(Job).where(Job.chave_ativa == chave)).scalar_one_or_none()
+            if existente is None:
+                # Terminou entre o INSERT e a consulta: tenta de novo
+                return self.enfileirar(tipo, parametros, executar_apos, deduplicar)
+            if existente.status == JOB_PENDENTE and executar_apos < existente.executar_apos:
+                # Pedido imediato antecipa o job agendado
+                existente.executar_apos = executar_apos
+                session.commit()
+            return job_para_dict(existente), False
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def obter(self, job_id, incluir_resultado=False):
+        """Job como dict (ou None se não existe)"""
+        session = self.sql_db.get_session()
+        try:
+            job = session.get(Job, job_id)
+            return job_para_dict(job, incluir_resultado) if job else None
+        finally:
+            session.close()
+
+    def listar(self, status=None, tipo=None, limite=50):
+        """Jobs mais recentes primeiro, opcionalmente filtrados"""
+        session = self.sql_db.get_session()
+        try:
+            query = select(Job).order_by(Job.criado_em.desc()).limit(limite)
+            if status:
+                query = query.where(Job.status == status)
+            if tipo:
+                query = query.where(Job.tipo == tipo)
+            return [job_para_dict(job) for job in session.execute(query).scalars()]
+        finally:
+            session.close()
+
+    def cancelar(self, job_id):
+        """
+        Cancela um job pendente ou pede o cancelamento de um em execução
+
+        Returns:
+            dict: estado do job após o pedido (ou None se não existe)
+        """
+        session = self.sql_db.get_session()
+        try:
+            job = session.get(Job, job_id)
+            if job is None:
+                return None
+            if job.status == JOB_PENDENTE:
+                job.status = JOB_CANCELADO
+                job.chave_ativa = None
+                job.concluido_em = datetime.now()
+                job.mensagem = 'Cancelado antes de iniciar'
+            elif job.status == JOB_EXECUTANDO:
+                job.cancelamento_solicitado = True
+            session.commit()
+            return job_para_dict(job)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    # ========== LADO DO WORKER ==========
+
+    def reservar(self, worker, tentativas=5):
+        """
+        Reserva o próximo job pendente para este worker
+
+        Returns:
+            tuple: (id, tipo, parâmetros) ou None se não há job para executar
+        """
+        session = self.sql_db.get_session()
+        try:
+            for _ in range(tentativas):
+                agora = datetime.now()
+                job_id = session.execute(
+                    select(Job.id)
+                    .where(Job.status == JOB_PENDENTE, Job.executar_apos <= agora)
+                    .order_by(Job.executar_apos, Job.criado_em)
+                    .limit(1)
+                ).scalar()
+                if job_id is None:
+                    session.commit()
+                    return None
+
+                # Só um worker consegue mudar o status de pendente para executando
+                reservado = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JOB_PENDENTE)
+                    .values(status=JOB_EXECUTANDO, worker=worker, iniciado_em=agora, atualizado_em=agora)
+                ).rowcount
+                session.commit()
+                if reservado == 1:
+                    job = session.get(Job, job_id)
+                    return job.id, job.tipo, _de_json(job.parametros) or {}
+            return None
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def registrar_progresso(self, job_id, progresso=None, mensagem=None, detalhes=None):
+        """
+        Atualiza progresso/heartbeat do job em execução
+
+        Returns:
+            bool: True se o cancelamento foi pedido
+        """
+        valores = {'atualizado_em': datetime.now()}
+        if progresso is not None:
+            valores['progresso'] = min(max(float(progresso), 0.0), 1.0)
+        if mensagem is not None:
+            valores['mensagem'] = str(mensagem)[:255]
+        if detalhes is not None:
+            valores['detalhes'] = _para_json(detalhes)
+
+        session = self.sql_db.get_session()
+        try:
+            session.execute(update(Job).where(Job.id == job_id, Job.status == JOB_EXECUTANDO).values(**valores))
+            session.commit()
+            return bool(session.execute(select(Job.cancelamento_solicitado).where(Job.id == job_id)).scalar())
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def finalizar(self, job_id, status, resultado=None, erro=None, mensagem=None):
+        """Grava o estado final do job e libera a chave de deduplicação"""
+        valores = {
+            'status': status,
+            'chave_ativa': None,
+            'concluido_em': datetime.now(),
+            'atualizado_em': datetime.now()
+        }
+        if status == JOB_CONCLUIDO:
+            valores['progresso'] = 1.0
+        if resultado is not None:
+            valores['resultado'] = _para_json(resultado)
+        if erro is not None:
+            valores['erro'] = str(erro)
+        if mensagem is not None:
+            valores['mensagem'] = str(mensagem)[:255]
+
+        session = self.sql_db.get_session()
+        try:
+            session.execute(update(Job).where(Job.id == job_id).values(**valores))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def recuperar_interrompidos(self, limite_segundos=None):
+        """Marca como erro os jobs em execução sem heartbeat recente (worker encerrado no meio)"""
+        limite_segundos = limite_segundos or int(os.getenv('JOBS_STALE_SECONDS') or 120)
+        limite = datetime.now() - timedelta(seconds=limite_segundos)
+        session = self.sql_db.get_session()
+        try:
+            quantidade = session.execute(
+                update(Job)
+                .where(Job.status == JOB_EXECUTANDO, Job.atualizado_em < limite)
+                .values(status=JOB_ERRO, chave_ativa=None, concluido_em=datetime.now(),
+                        erro='Execução interrompida (worker sem resposta)')
+            ).rowcount
+            session.commit()
+            if quantidade:
+                logger.warning(f"{quantidade} job(s) interrompido(s) marcado(s) como erro")
+            return quantidade
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def limpar_antigos(self, dias=None):
+        """Remove jobs finalizados há mais de JOBS_RETENTION_DAYS dias"""
+        dias = dias or int(os.getenv('JOBS_RETENTION_DAYS') or 7)
+        session = self.sql_db.get_session()
+        try:
+            quantidade = session.execute(
+                delete(Job).where(Job.status.notin_(JOB_ATIVOS),
+                                  Job.concluido_em < datetime.now() - timedelta(days=dias))
+            ).rowcount
+            session.commit()
+            return quantidade
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+class ContextoJob:
+    """
+    Passado à função do job: serviços, parâmetros e registro de progresso
+
+    Enquanto o job executa, uma thread envia heartbeats e consulta o pedido
+    de cancelamento; progresso() e verificar_cancelamento() levantam
+    JobCancelado quando ele foi pedido.
+    """
+
+    def __init__(self, fila, job_id, servicos, intervalo_heartbeat=None):
+        self.fila = fila
+        self.job_id = job_id
+        self.servicos = servicos
+        self.intervalo_heartbeat = intervalo_heartbeat or float(os.getenv('JOBS_HEARTBEAT_SECONDS') or 15)
+        self._cancelado = False
+        self._parar = threading.Event()
+        self._thread = None
+
+    @property
+    def sql_db(self):
+        return self.servicos.sql_db
+
+    @property
+    def mongo_db(self):
+        return self.servicos.mongo_db
+
+    @property
+    def cancelado(self):
+        return self._cancelado
+
+    def progresso(self, fracao=None, mensagem=None, **detalhes):
+        """Registra o progresso (fração de 0 a 1, mensagem e detalhes do tipo)"""
+        self._cancelado = self.fila.registrar_progresso(self.job_id, fracao, mensagem, detalhes or None) or self._cancelado
+        self.verificar_cancelamento()
+
+    def verificar_cancelamento(self):
+        if self._cancelado:
+            raise JobCancelado()
+
+    def __enter__(self):
+        def heartbeat():
+            while not self._parar.wait(self.intervalo_heartbeat):
+                try:
+                    self._cancelado = self.fila.registrar_progresso(self.job_id) or self._cancelado
+                except Exception as e:
+                    logger.warning(f"Heartbeat do job {self.job_id} falhou: {str(e)}")
+
+        self._thread = threading.Thread(target=heartbeat, name=f"heartbeat-{self.job_id[:8]}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        return False
+
+def executar_job(fila, job_id, tipo, parametros, tarefas, servicos):
+    """Executa um job reservado e grava o resultado, erro ou cancelamento"""
+    funcao = tarefas.get(tipo)
+    if funcao is None:
+        fila.finalizar(job_id, JOB_ERRO, erro=f"Tipo de job desconhecido: {tipo}")
+        return JOB_ERRO
+
+    inicio = time.perf_counter()
+    logger.info(f"Job {job_id} ({tipo}) iniciado")
+    try:
+        with ContextoJob(fila, job_id, servicos) as contexto:
+            resultado = funcao(parametros, contexto)
+    except JobCancelado:
+        fila.finalizar(job_id, JOB_CANCELADO, mensagem='Cancelado durante a execução')
+        logger.info(f"Job {job_id} ({tipo}) cancelado")
+        return JOB_CANCELADO
+    except Exception as e:
+        logger.error(f"Job {job_id} ({tipo}) falhou: {str(e)}", exc_info=True)
+        fila.finalizar(job_id, JOB_ERRO, erro=str(e))
+        return JOB_ERRO
+
+    fila.finalizar(job_id, JOB_CONCLUIDO, resultado=resultado, mensagem='Concluído')
+    logger.info(f"Job {job_id} ({tipo}) concluído em {time.perf_counter() - inicio:.1f}s")
+    return JOB_CONCLUIDO
+
+def executar_worker(fila, tarefas, servicos, nome=None, intervalo=None, parar=None, max_jobs=None):
+    """
+    Laço de um processo de worker: reserva e executa jobs até parar ser sinalizado
+
+    Args:
+        intervalo: segundos de espera quando a fila está vazia (padrão: JOBS_POLL_INTERVAL)
+        parar: threading.Event/multiprocessing.Event que encerra o laço
+        max_jobs: encerrar depois de executar este número de jobs (testes e benchmarks)
+    """
+    nome = nome or f"{socket.gethostname()}:{os.getpid()}"
+    intervalo = intervalo or float(os.getenv('JOBS_POLL_INTERVAL') or 2.0)
+    parar = parar or threading.Event()
+    executados = 0
+    proxima_manutencao = 0.0
+
+    logger.info(f"Worker {nome} aguardando jobs")
+    while not parar.is_set():
+        if time.monotonic() >= proxima_manutencao:
+            try:
+                fila.recuperar_interrompidos()
+                fila.limpar_antigos()
+            except Exception as e:
+                logger.warning(f"Manutenção da fila falhou: {str(e)}")
+            proxima_manutencao = time.monotonic() + 60
+
+        try:
+            reservado = fila.reservar(nome)
+        except Exception as e:
+            logger.error(f"Erro ao consultar a fila: {str(e)}")
+            reservado = None
+
+        if reservado is None:
+            parar.wait(intervalo)
+            continue
+
+        executar_job(fila, *reservado, tarefas, servicos)
+        executados += 1
+        if max_jobs and executados >= max_jobs:
+            break
@@ -0,0 +1,199 @@
+# app/services/importacao_csv.py
+
+"""
+Importação de arquivos CSV do ESP32 em streaming
+
+O arquivo é lido em blocos de linhas (nunca inteiro em memória). Cada bloco
+vira um único INSERT multi-linha de leituras (mais as aplicações de água das
+linhas com irrigação) dentro de uma transação própria, então uma falha perde
+apenas aquele bloco. O campo é consultado uma vez por importação.
+
+A importação roda como job da fila (tipo importacao_csv, ver
+app/services/tarefas.py): a rota de upload grava o arquivo em
+CSV_IMPORT_UPLOAD_DIR e enfileira o job, e o worker informa o progresso a
+cada bloco. Um cancelamento interrompe a importação entre blocos; os blocos
+já gravados permanecem.
+
+Formato esperado (cabeçalho opcional): timestamp;fosforo;potassio;ph;umidade;irrigacao
+
+Configuração pelo ambiente (padrões em config.Config):
+    CSV_IMPORT_CHUNK_SIZE, CSV_IMPORT_UPLOAD_DIR
+"""
+
+import os
+import csv
+import logging
+from datetime import datetime, timedelta
+
+from app.services.fila_jobs import JobCancelado
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_SIMULADO = timedelta(minutes=5)
+LITROS_POR_HECTARE = 150
+
+def _detectar_formato(caminho_arquivo, separador):
+    """Separador efetivo e presença de cabeçalho, pela primeira linha"""
+    with open(caminho_arquivo, 'r', encoding='utf-8') as arquivo:
+        primeira_linha = arquivo.readline().strip()
+
+    if separador == 'auto':
+        if ';' in primeira_linha:
+            separador = ';'
+        elif ',' in primeira_linha:
+            separador = ','
+        else:
+            separador = ';'  # padrão
+
+    return separador, 'timestamp' in primeira_linha.lower()
+
+def _ler_linhas(caminho_arquivo, separador, tem_cabecalho):
+    """Gera as linhas com todas as colunas, sem carregar o arquivo"""
+    with open(caminho_arquivo, 'r', encoding='utf-8', newline='') as arquivo:
+        leitor = csv.reader(arquivo, delimiter=separador)
+        if tem_cabecalho:
+            next(leitor, None)
+        for linha in leitor:
+            if len(linha) >= 6:
+                yield linha
+
+def _converter_linha(linha, sensor_id, data_hora, campo_id, quantidade_agua):
+    """Leituras (e aplicação de água, se houver irrigação) de uma linha do CSV"""
+    # timestamp;fosforo;potassio;ph;umidade;irrigacao (o timestamp original é relativo e não é usado)
+    fosforo = linha[1] == '1'
+    potassio = linha[2] == '1'
+    ph = float(linha[3])
+    umidade = float(linha[4])
+    irrigacao = linha[5] == '1'
+
+    leituras = [
+        {'sensor_id': sensor_id, 'valor': umidade, 'unidade': '%', 'data_hora': data_hora},
+        {'sensor_id': sensor_id, 'valor': ph, 'unidade': 'pH', 'data_hora': data_hora}
+    ]
+    if fosforo:
+        leituras.append({'sensor_id': sensor_id, 'valor': 1, 'unidade': 'P_ppm', 'data_hora': data_hora})
+    if potassio:
+        leituras.append({'sensor_id': sensor_id, 'valor': 1, 'unidade': 'K_ppm', 'data_hora': data_hora})
+
+    aplicacao = None
+    if irrigacao and campo_id:
+        aplicacao = {
+            'campo_id': campo_id,
+            'tipo_recurso': "água",
+            'quantidade': quantidade_agua,
+            'unidade': "L",
+            'metodo_aplicacao': "Sistema ESP32 Simulado",
+            'data_hora': data_hora
+        }
+    return leituras, aplicacao
+
+def processar_arquivo_csv(caminho_arquivo, sensor_id, campo_id, separador, criar_sensor_automatico,
+                          sql_db, mongo_db, tamanho_bloco=None, progresso=None):
+    """
+    Importa o arquivo CSV com timestamps simulados (5 minutos entre registros, terminando agora)
+
+    Args:
+        tamanho_bloco: linhas por transação (padrão: CSV_IMPORT_CHUNK_SIZE)
+        progresso: função opcional chamada após cada bloco com (linhas_processadas, total_linhas)
+
+    Returns:
+        dict: sucesso, registros_importados, registros_erro, sensor_id, periodo_simulado
+              e sensor_criado (ou sucesso False e erro)
+    """
+    tamanho_bloco = tamanho_bloco or int(os.getenv('CSV_IMPORT_CHUNK_SIZE') or 500)
+    try:
+        separador, tem_cabecalho = _detectar_formato(caminho_arquivo, separador)
+
+        # Primeira passada só conta as linhas: o período simulado depende do total
+        total_registros = sum(1 for _ in _ler_linhas(caminho_arquivo, separador, tem_cabecalho))
+        if not total_registros:
+            return {'sucesso': False, 'erro': 'Arquivo CSV vazio ou formato inválido'}
+
+        # Verificar/criar sensor
+        sensor_criado = False
+        if not sensor_id:
+            if not criar_sensor_automatico:
+                return {'sucesso': False, 'erro': 'Sensor não especificado'}
+            sensor_id = sql_db.adicionar_sensor('S1', 'Multi-Sensor ESP32')
+            if campo_id:
+                sql_db.adicionar_posicao_sensor(sensor_id, campo_id)
+            sensor_criado = True
+        else:
+            sensor_id = int(sensor_id)
+            if not sql_db.obter_sensor(sensor_id):
+                return {'sucesso': False, 'erro': f'Sensor com ID {sensor_id} não encontrado'}
+
+        # Quantidade de água por irrigação, pela área do campo (uma consulta por importação)
+        quantidade_agua = LITROS_POR_HECTARE
+        if campo_id:
+            try:
+                campo = mongo_db.obter_campo_por_id(campo_id)
+                area_hectare = campo.get('campo', {}).get('area_total_hectare', 1) if campo else 1
+                quantidade_agua = area_hectare * LITROS_POR_HECTARE
+            except Exception as e:
+                logger.warning(f"Não foi possível obter a área do campo {campo_id}: {str(e)}")
+
+        data_fim = datetime.now()
+        data_inicio = data_fim - INTERVALO_SIMULADO * total_registros
+
+        registros_importados = 0
+        registros_erro = 0
+        processadas = 0
+        leituras, aplicacoes, linhas_bloco = [], [], 0
+
+        def gravar_bloco():
+            nonlocal registros_importados, registros_erro
+            if not linhas_bloco:
+                return
+            try:
+                sql_db.adicionar_leituras_em_lote(leituras, aplicacoes)
+                registros_importados += linhas_bloco
+            except Exception as e:
+                logger.error(f"Erro ao gravar bloco de {linhas_bloco} registros: {str(e)}")
+                registros_erro += linhas_bloco
+
+        for i, linha in enumerate(_ler_linhas(caminho_arquivo, separador, tem_cabecalho)):
+            try:
+                leituras_linha, aplicacao = _converter_linha(
+                    linha, sensor_id, data_inicio + INTERVALO_SIMULADO * i, campo_id, quantidade_agua
+                )
+                leituras.extend(leituras_linha)
+                if aplicacao:
+                    aplicacoes.append(aplicacao)
+                linhas_bloco += 1
+            except (ValueError, IndexError) as e:
+                logger.warning(f"Linha {i + 1} ignorada ({separador.join(linha)}): {str(e)}")
+                registros_erro += 1
+
+            processadas += 1
+            if processadas % tamanho_bloco == 0:
+                gravar_bloco()
+                leituras, aplicacoes, linhas_bloco = [], [], 0
+                if progresso:
+                    progresso(processadas, total_registros)
+
+        gravar_bloco()
+        if progresso:
+            progresso(processadas, total_registros)
+
+        logger.info(f"Importação concluída: {registros_importados} registros importados, {registros_erro} com erro")
+
+        resultado = {
+            'sucesso': True,
+            'registros_importados': registros_importados,
+            'registros_erro': registros_erro,
+            'sensor_id': sensor_id,
+            'periodo_simulado': {
+                'inicio': data_inicio.strftime('%d/%m/%Y %H:%M'),
+                'fim': data_fim.strftime('%d/%m/%Y %H:%M'),
+                'intervalo': '5 minutos'
+            }
+        }
+        if sensor_criado:
+            resultado['sensor_criado'] = True
+        return resultado
+
+    except JobCancelado:
+        raise
+    except Exception as e:
+        return {'sucesso': False, 'erro': str(e)}
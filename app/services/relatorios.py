@@ -0,0 +1,114 @@
+# app/services/relatorios.py
+
+"""
+Relatórios de sensores e campos
+
+Montados pelo worker de jobs (tipos relatorio_sensor e relatorio_campo em
+app/services/tarefas.py); as rotas de relatório só enfileiram o job e a
+página acompanha o progresso até o resultado ficar disponível.
+"""
+
+from datetime import datetime, timedelta
+
+def gerar_relatorio_sensor(sql_db, sensor_id, dias=30):
+    """
+    Leituras e estatísticas de um sensor nos últimos dias
+
+    Raises:
+        LookupError: sensor não encontrado
+    """
+    sensor = sql_db.obter_sensor(sensor_id)
+    if not sensor:
+        raise LookupError("Sensor não encontrado")
+
+    data_fim = datetime.now()
+    data_inicio = data_fim - timedelta(days=dias)
+
+    # Obter leituras do período
+    leituras = sql_db.obter_leituras_por_sensor(sensor_id, data_inicio, data_fim)
+
+    # Calcular estatísticas
+    estatisticas = sql_db.calcular_estatisticas_leituras(sensor_id, data_inicio, data_fim)
+
+    # Gerar histórico reaproveitando as estatísticas agregadas pelo banco
+    sql_db.gerar_historico(sensor_id, data_inicio, data_fim, estatisticas)
+
+    # Formatar dados para o relatório
+    dados_leituras = []
+    for leitura in leituras:
+        dados_leituras.append({
+            "id": leitura.id,
+            "data_hora": leitura.data_hora.isoformat(),
+            "valor": leitura.valor,
+            "unidade": leitura.unidade
+        })
+
+    return {
+        "sensor": {
+            "id": sensor.id,
+            "tipo": sensor.tipo,
+            "modelo": sensor.modelo
+        },
+        "periodo": {
+            "inicio": data_inicio.isoformat(),
+            "fim": data_fim.isoformat(),
+            "dias": dias
+        },
+        "estatisticas": estatisticas,
+        "leituras": dados_leituras
+    }
+
+def gerar_relatorio_campo(sql_db, mongo_db, campo_id, dias=30):
+    """
+    Sensores (com estatísticas) e aplicações de recursos de um campo nos últimos dias
+
+    Raises:
+        LookupError: campo não encontrado
+    """
+    campo = mongo_db.obter_campo_por_id(campo_id)
+    if not campo:
+        raise LookupError("Campo não encontrado")
+
+    data_fim = datetime.now()
+    data_inicio = data_fim - timedelta(days=dias)
+
+    # Obter sensores do campo com as estatísticas do período (uma consulta para todos)
+    sensores = sql_db.obter_sensores_por_campo(campo_id, data_inicio, data_fim)
+
+    # Obter aplicações de recursos no período
+    aplicacoes = sql_db.obter_aplicacoes_recurso(campo_id, inicio=data_inicio, fim=data_fim)
+
+    # Formatar dados para o relatório
+    dados_sensores = []
+    for sensor in sensores:
+        dados_sensores.append({
+            "id": sensor.id,
+            "tipo": sensor.tipo,
+            "estatisticas": sensor.estatisticas
+        })
+
+    dados_aplicacoes = []
+    for aplicacao in aplicacoes:
+        dados_aplicacoes.append({
+            "id": aplicacao.id,
+            "data_hora": aplicacao.data_hora.isoformat(),
+            "tipo_recurso": aplicacao.tipo_recurso,
+            "quantidade": aplicacao.quantidade,
+            "unidade": aplicacao.unidade
+        })
+
+    return {
+        "campo": {
+            "id": campo_id,
+            "nome_produtor": campo.get('nome_produtor', ''),
+            "cultura_plantada": campo.get('campo', {}).get('cultura_plantada', ''),
+            "area_hectare": campo.get('campo', {}).get('area_total_hectare', 0)
+        },
+        "periodo": {
+            "inicio": data_inicio.isoformat(),
+            "fim": data_fim.isoformat(),
+            "dias": dias
+        },
+        "sensores": dados_sensores,
+        "aplicacoes": dados_aplicacoes
+    }
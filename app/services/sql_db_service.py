@@ -1,14 +1,46 @@
 # app/services/sql_db_service.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, delete, select, union_all, and_, or_, cast, case, func, Integer, Numeric
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy_utils import database_exists, create_database
-from app.models.sensor_models import Base, Sensor, PosicaoSensor, LeituraSensor, AplicacaoRecurso, RecomendacaoAutomatica, AlertaSensor, HistoricoSensor
-from datetime import datetime, timedelta
-import statistics
+from app.models.sensor_models import Base, Sensor, PosicaoSensor, LeituraSensor, AplicacaoRecurso, RecomendacaoAutomatica, AlertaSensor, HistoricoSensor, AgregadoLeitura
+from app.models.sensor_models import expandir_leitura, METRICA_OUTRA, METRICA_UMIDADE, GRANULARIDADE_HORA, GRANULARIDADE_DIA
+from app.models.sensor_models import UNIDADE_POR_METRICA, METRICA_PRINCIPAL_POR_TIPO
+from dataclasses import dataclass, field
+from datetime import datetime, date, timedelta
+import ast
+import json
+import math
+
+@dataclass
+class SensorCampo:
+    """Sensor instalado em um campo, já desacoplado da sessão (seguro após session.close())"""
+    id: int
+    tipo: str
+    modelo: str = None
+    data_instalacao: date = None
+    ativo: bool = True
+    ultima_manutencao: datetime = None
+    campo_id: str = None
+    latitude: float = None
+    longitude: float = None
+    profundidade: float = None
+    estatisticas: dict = None  # Como calcular_estatisticas_leituras, com mediana_medias_horarias no lugar de mediana
+    ultimas_leituras: list = field(default_factory=list)  # LeituraSensor mais recentes por métrica (desanexadas)
 
 class SQLDatabaseService:
-    def __init__(self, database_uri):
-        self.engine = create_engine(database_uri)
+    def __init__(self, database_uri, pool_size=10, max_overflow=20, pool_timeout=30, pool_recycle=1800):
+        engine_options = {'pool_pre_ping': True}
+        
+        # SQLite usa pools próprios que não aceitam dimensionamento
+        if not database_uri.startswith('sqlite'):
+            engine_options.update(
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=pool_timeout,
+                pool_recycle=pool_recycle
+            )
+        
+        self.engine = create_engine(database_uri, **engine_options)
         
         # Criar banco de dados se não existir
         if not database_exists(self.engine.url):
@@ -23,6 +55,29 @@ class SQLDatabaseService:
     def get_session(self):
         return self.Session()
     
+    def remover_sessao(self):
+        """Devolve a conexão da sessão da thread atual ao pool"""
+        self.Session.remove()
+    
+    def status_pool(self):
+        """Retorna a ocupação do pool de conexões do SQLAlchemy"""
+        pool = self.engine.pool
+        if not hasattr(pool, 'checkedout'):
+            return {'tipo': type(pool).__name__}
+        
+        tamanho = pool.size()
+        em_uso = pool.checkedout()
+        capacidade = tamanho + max(pool._max_overflow, 0)
+        return {
+            'tipo': type(pool).__name__,
+            'tamanho': tamanho,
+            'max_overflow': pool._max_overflow,
+            'em_uso': em_uso,
+            'disponiveis': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'saturacao': round(em_uso / capacidade, 3) if capacidade else 0.0
+        }
+    
     # Métodos para Sensores
     def adicionar_sensor(self, tipo, modelo=None, data_instalacao=None):
         """Adiciona um novo sensor ao banco de dados"""
@@ -62,15 +117,226 @@ class SQLDatabaseService:
         finally:
             session.close()
     
-    def obter_sensores_por_campo(self, campo_id):
-        """Obtém todos os sensores instalados em um determinado campo"""
+    def obter_sensores_por_campo(self, campo_id, inicio=None, fim=None, ultimas_leituras=0):
+        """
+        Obtém os sensores ativos instalados em um campo como DTOs desacoplados
+        
+        Posição, sensor e (com inicio/fim) as estatísticas do período vêm de uma
+        única consulta, agregada no banco para todos os sensores do campo, com
+        contagem, média, extremos e desvio iguais aos de
+        calcular_estatisticas_leituras (exceto leituras legadas em JSON não
+        migradas). No lugar da mediana vem 'mediana_medias_horarias', a mediana
+        das médias horárias dos agregados (uma segunda consulta). Com ultimas_leituras, as N leituras mais recentes de cada
+        métrica de cada sensor também vêm de uma consulta só. O número de consultas não depende
+        do número de sensores.
+        
+        Args:
+            inicio, fim (datetime): período das estatísticas (opcional)
+            ultimas_leituras (int): quantidade de leituras recentes por métrica de cada sensor (0 = nenhuma)
+        
+        Returns:
+            list: SensorCampo ordenados por ID
+        """
+        session = self.get_session()
+        try:
+            consulta = select(
+                Sensor.id, Sensor.tipo, Sensor.modelo, Sensor.data_instalacao, Sensor.ativo,
+                Sensor.ultima_manutencao, PosicaoSensor.campo_id, PosicaoSensor.latitude,
+                PosicaoSensor.longitude, PosicaoSensor.profundidade
+            ).select_from(PosicaoSensor).join(Sensor, Sensor.id == PosicaoSensor.sensor_id).where(
+                PosicaoSensor.campo_id == campo_id, Sensor.ativo == True
+            )
+            
+            com_estatisticas = inicio is not None and fim is not None
+            if com_estatisticas:
+                estatisticas = self._subconsulta_estatisticas_campo(campo_id, inicio, fim)
+                consulta = consulta.add_columns(
+                    estatisticas.c.unidade, estatisticas.c.contagem, estatisticas.c.soma,
+                    estatisticas.c.soma_quadrados, estatisticas.c.minimo, estatisticas.c.maximo).outerjoin(estatisticas, estatisticas.c.sensor_id == Sensor.id)
+            
+            sensores = {}
+            grupos = {}
+            for linha in session.execute(consulta.order_by(Sensor.id)):
+                if linha.id not in sensores:
+                    sensores[linha.id] = SensorCampo(
+                        id=linha.id, tipo=linha.tipo, modelo=linha.modelo,
+                        data_instalacao=linha.data_instalacao, ativo=linha.ativo,
+                        ultima_manutencao=linha.ultima_manutencao, campo_id=linha.campo_id,
+                        latitude=linha.latitude, longitude=linha.longitude, profundidade=linha.profundidade
+                    )
+                if com_estatisticas and linha.contagem:
+                    grupos.setdefault(linha.id, {})[linha.unidade] = {
+                        'contagem': int(linha.contagem),
+                        'soma': float(linha.soma),
+                        'soma_quadrados': float(linha.soma_quadrados),
+                        'min': float(linha.minimo),
+                        'max': float(linha.maximo),
+                        'baldes': []
+                    }
+            
+            # Mediana aproximada pelas médias horárias dos agregados (segunda consulta)
+            if grupos:
+                medias_horarias = session.execute(select(
+                    AgregadoLeitura.sensor_id, AgregadoLeitura.unidade, AgregadoLeitura.soma, AgregadoLeitura.contagem
+                ).where(
+                    AgregadoLeitura.sensor_id.in_(list(grupos)),
+                    AgregadoLeitura.granularidade == GRANULARIDADE_HORA,
+                    AgregadoLeitura.inicio >= self._inicio_balde(inicio, GRANULARIDADE_HORA),
+                    AgregadoLeitura.inicio <= fim,
+                    AgregadoLeitura.contagem > 0
+                ))
+                for sensor_id, unidade, soma, contagem in medias_horarias:
+                    grupo = grupos[sensor_id].get(unidade)
+                    if grupo is not None:
+                        grupo['baldes'].append((soma / contagem, soma / contagem, contagem))
+            
+            for sensor_id, grupos_sensor in grupos.items():
+                estatisticas_sensor = self._montar_estatisticas(grupos_sensor, sensores[sensor_id].tipo)
+                # A mediana aqui vem das médias horárias, não das leituras: nome próprio para não
+                # ser confundida com a de calcular_estatisticas_leituras
+                for resumo in [estatisticas_sensor, *estatisticas_sensor['por_unidade'].values()]:
+                    resumo['mediana_medias_horarias'] = resumo.pop('mediana')
+                sensores[sensor_id].estatisticas = estatisticas_sensor
+            
+            if ultimas_leituras and sensores:
+                for leitura in self._ultimas_leituras_por_sensor(session, list(sensores), ultimas_leituras):
+                    sensores[leitura.sensor_id].ultimas_leituras.append(leitura)
+            
+            return list(sensores.values())
+        finally:
+            session.close()
+    
+    def obter_media_umidade_por_campo(self, inicio, fim, campo_ids=None):
+        """
+        Média de umidade dos sensores S1 ativos de cada campo no período, em uma consulta
+        
+        Args:
+            inicio, fim (datetime): período das leituras
+            campo_ids (list): restringir a estes campos (None = todos)
+        
+        Returns:
+            dict: campo_id -> {'media', 'sensores', 'leituras'}
+        """
         session = self.get_session()
         try:
-            posicoes = session.query(PosicaoSensor).filter_by(campo_id=campo_id).all()
-            return [posicao.sensor for posicao in posicoes if posicao.sensor.ativo]
+            consulta = select(
+                PosicaoSensor.campo_id,
+                func.avg(LeituraSensor.valor_numerico),
+                func.count(func.distinct(LeituraSensor.sensor_id)),
+                func.count()
+            ).select_from(PosicaoSensor).join(
+                Sensor, Sensor.id == PosicaoSensor.sensor_id
+            ).join(
+                LeituraSensor, LeituraSensor.sensor_id == PosicaoSensor.sensor_id
+            ).where(
+                Sensor.tipo == 'S1',
+                Sensor.ativo == True,
+                LeituraSensor.metrica == METRICA_UMIDADE,
+                LeituraSensor.valido == True,
+                LeituraSensor.valor_numerico.isnot(None),
+                LeituraSensor.data_hora >= inicio,
+                LeituraSensor.data_hora <= fim
+            ).group_by(PosicaoSensor.campo_id)
+            
+            if campo_ids is not None:
+                consulta = consulta.where(PosicaoSensor.campo_id.in_(list(campo_ids)))
+            
+            return {
+                campo_id: {'media': float(media), 'sensores': int(sensores), 'leituras': int(leituras)}
+                for campo_id, media, sensores, leituras in session.execute(consulta)
+            }
         finally:
             session.close()
     
+    def _subconsulta_estatisticas_campo(self, campo_id, inicio, fim):
+        """
+        Subconsulta com contagem, somas e extremos por sensor/unidade do campo no período
+        
+        Para períodos longos, as horas completas vêm dos agregados horários e só
+        as bordas são lidas das leituras brutas (UNION ALL reagrupado no banco).
+        Nas leituras brutas vale a mesma regra de _agregar_leituras: linhas não
+        migradas têm o texto convertido no banco, e só as legadas em JSON
+        (nutrientes) ficam de fora.
+        """
+        sensores_campo = select(PosicaoSensor.sensor_id).where(PosicaoSensor.campo_id == campo_id)
+        eh_json = and_(LeituraSensor.valor_numerico.is_(None), LeituraSensor.valor.like('{%'))
+        valor = func.coalesce(LeituraSensor.valor_numerico, cast(LeituraSensor.valor, Numeric(20, 6)))
+        
+        def brutas(*filtros_tempo):
+            return select(
+                LeituraSensor.sensor_id.label('sensor_id'),
+                LeituraSensor.unidade.label('unidade'),
+                func.count().label('contagem'),
+                func.sum(valor).label('soma'),
+                func.sum(valor * valor).label('soma_quadrados'),
+                func.min(valor).label('minimo'),
+                func.max(valor).label('maximo')
+            ).where(
+                LeituraSensor.sensor_id.in_(sensores_campo),
+                LeituraSensor.valido == True,
+                ~eh_json,
+                *filtros_tempo
+            ).group_by(LeituraSensor.sensor_id, LeituraSensor.unidade)
+        
+        hora_inicio = self._inicio_balde(inicio, GRANULARIDADE_HORA)
+        if hora_inicio < inicio:
+            hora_inicio += timedelta(hours=1)
+        hora_fim = self._inicio_balde(fim, GRANULARIDADE_HORA)
+        
+        if fim - inicio > self.JANELA_MINIMA_AGREGADOS and hora_inicio < hora_fim:
+            horarias = select(
+                AgregadoLeitura.sensor_id.label('sensor_id'),
+                AgregadoLeitura.unidade.label('unidade'),
+                func.sum(AgregadoLeitura.contagem).label('contagem'),
+                func.sum(AgregadoLeitura.soma).label('soma'),
+                func.sum(AgregadoLeitura.soma_quadrados).label('soma_quadrados'),
+                func.min(AgregadoLeitura.minimo).label('minimo'),
+                func.max(AgregadoLeitura.maximo).label('maximo')
+            ).where(
+                AgregadoLeitura.sensor_id.in_(sensores_campo),
+                AgregadoLeitura.granularidade == GRANULARIDADE_HORA,
+                AgregadoLeitura.inicio >= hora_inicio,
+                AgregadoLeitura.inicio < hora_fim
+            ).group_by(AgregadoLeitura.sensor_id, AgregadoLeitura.unidade)
+            
+            partes = union_all(
+                horarias,
+                brutas(LeituraSensor.data_hora >= inicio, LeituraSensor.data_hora < hora_inicio),
+                brutas(LeituraSensor.data_hora >= hora_fim, LeituraSensor.data_hora <= fim)
+            ).subquery()
+        else:
+            partes = brutas(LeituraSensor.data_hora >= inicio, LeituraSensor.data_hora <= fim).subquery()
+        
+        return select(
+            partes.c.sensor_id,
+            partes.c.unidade,
+            func.sum(partes.c.contagem).label('contagem'),
+            func.sum(partes.c.soma).label('soma'),
+            func.sum(partes.c.soma_quadrados).label('soma_quadrados'),
+            func.min(partes.c.minimo).label('minimo'),
+            func.max(partes.c.maximo).label('maximo')
+        ).group_by(partes.c.sensor_id, partes.c.unidade).subquery()
+    
+    def _ultimas_leituras_por_sensor(self, session, sensor_ids, limite):
+        """
+        As N leituras válidas mais recentes de cada métrica de cada sensor, em uma consulta (ROW_NUMBER)
+        
+        Um nó ESP32 grava umidade, pH, P, K e irrigação no mesmo sensor_id; particionar
+        só por sensor faria uma métrica frequente esconder as demais.
+        """
+        posicao = func.row_number().over(
+            partition_by=(LeituraSensor.sensor_id, LeituraSensor.metrica),
+            order_by=(LeituraSensor.data_hora.desc(), LeituraSensor.id.desc())
+        ).label('posicao')
+        recentes = select(LeituraSensor.id, posicao).where(
+            LeituraSensor.sensor_id.in_(sensor_ids),
+            LeituraSensor.valido == True
+        ).subquery()
+        
+        return session.query(LeituraSensor).join(recentes, recentes.c.id == LeituraSensor.id).filter(
+            recentes.c.posicao <= limite
+        ).order_by(LeituraSensor.sensor_id, LeituraSensor.data_hora.desc()).all()
+    
     def atualizar_sensor(self, sensor_id, **kwargs):
         """Atualiza as propriedades de um sensor"""
         session = self.get_session()
@@ -134,7 +400,7 @@ class SQLDatabaseService:
     #         session.close()
     
     def adicionar_leitura(self, sensor_id, valor, unidade, data_hora=None, valido=True):
-        """Adiciona uma nova leitura de sensor"""
+        """Adiciona uma nova leitura de sensor (payloads de nutrientes viram leituras de P e K)"""
         session = self.get_session()
         try:
             # Obter o tipo de sensor
@@ -142,60 +408,35 @@ class SQLDatabaseService:
             
             if not sensor:
                 raise ValueError(f"Sensor com ID {sensor_id} não encontrado")
-                
-            # Para sensores de nutrientes (S3), extrair valores do JSON
-            if sensor.tipo == 'S3' and isinstance(valor, str) and (valor.startswith('{') or unidade == 'ppm'):
-                try:
-                    import json
-                    nutrientes = json.loads(valor)
-                    
-                    # Armazenar as leituras separadamente
-                    if 'P' in nutrientes:
-                        nova_leitura_p = LeituraSensor(
-                            sensor_id=sensor_id,
-                            data_hora=data_hora or datetime.now(),
-                            valor=float(nutrientes['P']),
-                            unidade='P_ppm',
-                            valido=valido
-                        )
-                        session.add(nova_leitura_p)
-                    
-                    if 'K' in nutrientes:
-                        nova_leitura_k = LeituraSensor(
-                            sensor_id=sensor_id,
-                            data_hora=data_hora or datetime.now(),
-                            valor=float(nutrientes['K']),
-                            unidade='K_ppm',
-                            valido=valido
-                        )
-                        session.add(nova_leitura_k)
-                    
-                    session.commit()
-                    return True
-                    
-                except (json.JSONDecodeError, ValueError) as e:
-                    session.rollback()
-                    raise ValueError(f"Erro ao processar dados JSON: {str(e)}")
             
-            # Para outros sensores, armazenar o valor diretamente
-            else:
-                # Converter para float se for string
-                if isinstance(valor, str):
-                    try:
-                        valor = float(valor)
-                    except ValueError:
-                        raise ValueError(f"Valor inválido para o sensor: {valor}")
-                
-                nova_leitura = LeituraSensor(
+            # Normalizar em linhas tipadas (valor numérico + métrica)
+            try:
+                linhas = expandir_leitura(valor, unidade)
+            except (ValueError, SyntaxError) as e:
+                raise ValueError(f"Erro ao processar leitura: {str(e)}")
+            
+            novas_leituras = [
+                LeituraSensor(
                     sensor_id=sensor_id,
                     data_hora=data_hora or datetime.now(),
-                    valor=valor,
-                    unidade=unidade,
+                    valor=str(numero),
+                    valor_numerico=numero,
+                    metrica=metrica,
+                    unidade=unidade_linha,
                     valido=valido
                 )
-                session.add(nova_leitura)
-                session.commit()
-                return nova_leitura.id
+                for metrica, numero, unidade_linha in linhas
+            ]
+            session.add_all(novas_leituras)
+            self._acumular_agregados(session, [
+                {'sensor_id': l.sensor_id, 'data_hora': l.data_hora, 'metrica': l.metrica,
+                 'unidade': l.unidade, 'valor_numerico': l.valor_numerico, 'valido': l.valido}
+                for l in novas_leituras
+            ])
+            session.commit()
+            
+            # Leituras compostas (nutrientes) mantêm o retorno anterior
+            return novas_leituras[0].id if len(novas_leituras) == 1 else True
         
         except Exception as e:
             session.rollback()
@@ -203,6 +444,76 @@ class SQLDatabaseService:
         finally:
             session.close()
     
+    def adicionar_leituras_em_lote(self, leituras, aplicacoes=None):
+        """
+        Adiciona várias leituras em lote, em uma única transação
+
+        Args:
+            leituras (list): dicts com sensor_id, valor, unidade, data_hora e valido (opcional)
+            aplicacoes (list): aplicações de recurso gravadas na mesma transação (opcional),
+                               dicts com campo_id, tipo_recurso, quantidade, unidade,
+                               metodo_aplicacao e data_hora
+
+        Returns:
+            dict: quantidades inseridas e IDs de sensores inexistentes (leituras ignoradas)
+        """
+        if not leituras and not aplicacoes:
+            return {'inseridas': 0, 'aplicacoes_inseridas': 0, 'sensores_invalidos': []}
+
+        session = self.get_session()
+        try:
+            # Validar todos os sensores com uma única consulta
+            sensor_ids = {int(l['sensor_id']) for l in leituras}
+            existentes = {
+                row[0] for row in session.query(Sensor.id).filter(Sensor.id.in_(sensor_ids)).all()
+            }
+
+            agora = datetime.now()
+            linhas = []
+            for l in leituras:
+                if int(l['sensor_id']) not in existentes:
+                    continue
+                for metrica, numero, unidade in expandir_leitura(l['valor'], l['unidade']):
+                    linhas.append({
+                        'sensor_id': int(l['sensor_id']),
+                        'data_hora': l.get('data_hora') or agora,
+                        'valor': str(numero),
+                        'valor_numerico': numero,
+                        'metrica': metrica,
+                        'unidade': unidade,
+                        'valido': l.get('valido', True)
+                    })
+
+            # executemany: SQL compilado uma vez (cache) e enviado pelo driver em INSERTs multi-linha
+            if linhas:
+                session.execute(insert(LeituraSensor.__table__), linhas)
+                self._acumular_agregados(session, linhas)
+            if aplicacoes:
+                session.execute(insert(AplicacaoRecurso.__table__), [
+                    {
+                        'campo_id': str(a['campo_id']),
+                        'data_hora': a.get('data_hora') or agora,
+                        'tipo_recurso': a['tipo_recurso'],
+                        'quantidade': a['quantidade'],
+                        'unidade': a['unidade'],
+                        'metodo_aplicacao': a.get('metodo_aplicacao')
+                    }
+                    for a in aplicacoes
+                ])
+            if linhas or aplicacoes:
+                session.commit()
+
+            return {
+                'inseridas': len(linhas),
+                'aplicacoes_inseridas': len(aplicacoes or []),
+                'sensores_invalidos': sorted(sensor_ids - existentes)
+            }
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+
     def obter_leituras_por_sensor(self, sensor_id, inicio=None, fim=None, limite=100):
         """Obtém leituras de um sensor em um período"""
         session = self.get_session()
@@ -218,60 +529,465 @@ class SQLDatabaseService:
         finally:
             session.close()
     
+    # Número de faixas do histograma usado para aproximar a mediana no banco
+    BALDES_MEDIANA = 256
+    
+    # Janelas maiores que isso leem os agregados horários/diários em vez das leituras brutas
+    JANELA_MINIMA_AGREGADOS = timedelta(days=1)
+    
     def calcular_estatisticas_leituras(self, sensor_id, inicio, fim):
-        """Calcula estatísticas para as leituras de um sensor em um período"""
+        """
+        Calcula estatísticas para as leituras de um sensor em um período
+        
+        Contagem, média, mínimo, máximo e desvio padrão são agregados pelo banco,
+        agrupados por unidade; a mediana é aproximada por um histograma também
+        calculado no banco. Só as leituras legadas em JSON são lidas em Python.
+        Períodos maiores que um dia usam os agregados (AgregadoLeitura) para as
+        horas/dias completos e as leituras brutas apenas nas bordas.
+        
+        Os valores gerais são os da unidade principal do sensor (ver
+        _montar_estatisticas); as demais ficam só em 'por_unidade'.
+        """
         session = self.get_session()
         try:
-            leituras = session.query(LeituraSensor).filter_by(
-                sensor_id=sensor_id, 
-                valido=True
-            ).filter(
-                LeituraSensor.data_hora >= inicio,
-                LeituraSensor.data_hora <= fim
-            ).all()
+            tipo = session.query(Sensor.tipo).filter(Sensor.id == sensor_id).scalar()
+            if fim - inicio > self.JANELA_MINIMA_AGREGADOS:
+                grupos, legadas = self._agregar_com_agregados(session, sensor_id, inicio, fim)
+            else:
+                grupos, legadas = self._agregar_leituras(session, sensor_id, inicio, fim)
+        finally:
+            session.close()
+        
+        if not grupos and not legadas:
+            return None
+        
+        for unidade, texto in legadas:
+            valor_legado = self._media_valor_legado(texto)
+            if valor_legado is None:
+                continue
+            grupo = grupos.setdefault(unidade, {
+                'contagem': 0, 'soma': 0.0, 'soma_quadrados': 0.0,
+                'min': valor_legado, 'max': valor_legado, 'baldes': []
+            })
+            grupo['contagem'] += 1
+            grupo['soma'] += valor_legado
+            grupo['soma_quadrados'] += valor_legado * valor_legado
+            grupo['min'] = min(grupo['min'], valor_legado)
+            grupo['max'] = max(grupo['max'], valor_legado)
+            grupo['baldes'].append((valor_legado, valor_legado, 1))
+        
+        if not grupos:
+            return {
+                'media': 0,
+                'mediana': 0,
+                'min': 0,
+                'max': 0,
+                'desvio_padrao': 0,
+                'contagem': 0
+            }
+        
+        return self._montar_estatisticas(grupos, tipo)
+    
+    def _montar_estatisticas(self, grupos, tipo=None):
+        """
+        Estatísticas gerais da unidade principal do sensor, mais o detalhamento por unidade
+        
+        Unidades diferentes (ex.: % e ppm de um multi-sensor) não são somadas. A
+        unidade principal vem do tipo do sensor (METRICA_PRINCIPAL_POR_TIPO);
+        sem leituras nela, vale a unidade com mais leituras.
+        """
+        unidade = UNIDADE_POR_METRICA.get(METRICA_PRINCIPAL_POR_TIPO.get(tipo))
+        if unidade not in grupos:
+            unidade = max(grupos, key=lambda u: grupos[u]['contagem'])
+        
+        estatisticas = self._resumir_grupo(grupos[unidade])
+        estatisticas['unidade'] = unidade
+        estatisticas['por_unidade'] = {u: self._resumir_grupo(g) for u, g in grupos.items()}
+        return estatisticas
+    
+    def _agregar_leituras(self, session, sensor_id, inicio, fim, fim_exclusivo=False):
+        """
+        Agrega as leituras brutas de um período no banco
+        
+        Returns:
+            tuple: (grupos por unidade com somas, extremos e histograma, leituras legadas em JSON)
+        """
+        filtros = (
+            LeituraSensor.sensor_id == sensor_id,
+            LeituraSensor.valido == True,
+            LeituraSensor.data_hora >= inicio,
+            LeituraSensor.data_hora < fim if fim_exclusivo else LeituraSensor.data_hora <= fim
+        )
+        # Linhas migradas usam a coluna tipada; as antigas ainda são convertidas no banco
+        eh_json = and_(LeituraSensor.valor_numerico.is_(None), LeituraSensor.valor.like('{%'))
+        valor = func.coalesce(LeituraSensor.valor_numerico, cast(LeituraSensor.valor, Numeric(20, 6)))
+        
+        # 1. Agregados por unidade (uma linha por unidade)
+        grupos = {}
+        agregados = session.query(
+            LeituraSensor.unidade,
+            func.count(),
+            func.sum(valor),
+            func.sum(valor * valor),
+            func.min(valor),
+            func.max(valor)
+        ).filter(*filtros, ~eh_json).group_by(LeituraSensor.unidade).all()
+        
+        for unidade, contagem, soma, soma_quadrados, minimo, maximo in agregados:
+            grupos[unidade] = {
+                'contagem': int(contagem),
+                'soma': float(soma),
+                'soma_quadrados': float(soma_quadrados),
+                'min': float(minimo),
+                'max': float(maximo),
+                'baldes': []
+            }
+        
+        # 2. Histograma por unidade para a mediana aproximada
+        if grupos:
+            larguras = {
+                u: ((g['max'] - g['min']) / self.BALDES_MEDIANA) or 1.0
+                for u, g in grupos.items()
+            }
+            minimo_unidade = case({u: g['min'] for u, g in grupos.items()}, value=LeituraSensor.unidade)
+            largura_unidade = case(larguras, value=LeituraSensor.unidade)
+            posicao = (valor - minimo_unidade) / largura_unidade
+            # No SQLite o CAST trunca (= floor para posições >= 0); no MySQL o CAST arredonda
+            balde = cast(posicao, Integer) if self.engine.dialect.name == 'sqlite' else func.floor(posicao)
             
-            if not leituras:
-                return None
+            histograma = session.query(
+                LeituraSensor.unidade, balde, func.count()
+            ).filter(*filtros, ~eh_json, LeituraSensor.unidade.in_(list(grupos))).group_by(
+                LeituraSensor.unidade, balde
+            ).all()
             
-            # Converter valores de texto para float quando possível
-            valores = []
-            for leitura in leituras:
-                try:
-                    # Verificar se o valor é um JSON
-                    if leitura.valor.startswith('{') and leitura.valor.endswith('}'):
-                        import json
-                        # Para valores JSON (sensores de nutrientes), usar a média dos valores
-                        dados_json = json.loads(leitura.valor)
-                        valores_numericos = [float(v) for v in dados_json.values()]
-                        # Adicionar a média dos valores no JSON
-                        valores.append(sum(valores_numericos) / len(valores_numericos))
-                    else:
-                        # Para valores simples, converter para float
-                        valores.append(float(leitura.valor))
-                except (ValueError, json.JSONDecodeError, TypeError, AttributeError):
-                    # Se não for possível converter, ignorar este valor
-                    continue
+            for unidade, indice, contagem in histograma:
+                indice = min(max(int(indice), 0), self.BALDES_MEDIANA - 1)
+                inicio_balde = grupos[unidade]['min'] + indice * larguras[unidade]
+                grupos[unidade]['baldes'].append((inicio_balde, inicio_balde + larguras[unidade], int(contagem)))
+        
+        # 3. Fallback em Python apenas para leituras legadas em JSON
+        legadas = session.query(LeituraSensor.unidade, LeituraSensor.valor).filter(*filtros, eh_json).all()
+        return grupos, legadas
+    
+    def _agregar_com_agregados(self, session, sensor_id, inicio, fim):
+        """
+        Agrega um período longo combinando agregados diários, horários e leituras brutas
+        
+        Dias completos vêm dos agregados diários, horas completas restantes dos
+        horários e as frações de hora nas bordas das leituras brutas. Na mediana,
+        cada agregado entra como sua média ponderada pela contagem.
+        """
+        hora_inicio = self._inicio_balde(inicio, GRANULARIDADE_HORA)
+        if hora_inicio < inicio:
+            hora_inicio += timedelta(hours=1)
+        hora_fim = self._inicio_balde(fim, GRANULARIDADE_HORA)
+        
+        if hora_inicio >= hora_fim:
+            return self._agregar_leituras(session, sensor_id, inicio, fim)
+        
+        dia_inicio = self._inicio_balde(hora_inicio, GRANULARIDADE_DIA)
+        if dia_inicio < hora_inicio:
+            dia_inicio += timedelta(days=1)
+        dia_fim = self._inicio_balde(hora_fim, GRANULARIDADE_DIA)
+        
+        if dia_inicio < dia_fim:
+            cobertura = or_(
+                and_(AgregadoLeitura.granularidade == GRANULARIDADE_DIA,
+                     AgregadoLeitura.inicio >= dia_inicio, AgregadoLeitura.inicio < dia_fim),
+                and_(AgregadoLeitura.granularidade == GRANULARIDADE_HORA,
+                     or_(and_(AgregadoLeitura.inicio >= hora_inicio, AgregadoLeitura.inicio < dia_inicio),
+                         and_(AgregadoLeitura.inicio >= dia_fim, AgregadoLeitura.inicio < hora_fim)))
+            )
+        else:
+            cobertura = and_(AgregadoLeitura.granularidade == GRANULARIDADE_HORA,
+                             AgregadoLeitura.inicio >= hora_inicio, AgregadoLeitura.inicio < hora_fim)
+        
+        baldes = session.query(
+            AgregadoLeitura.unidade,
+            AgregadoLeitura.contagem,
+            AgregadoLeitura.soma,
+            AgregadoLeitura.soma_quadrados,
+            AgregadoLeitura.minimo,
+            AgregadoLeitura.maximo
+        ).filter(AgregadoLeitura.sensor_id == sensor_id, AgregadoLeitura.contagem > 0, cobertura).all()
+        
+        grupos = {}
+        for unidade, contagem, soma, soma_quadrados, minimo, maximo in baldes:
+            self._mesclar_grupo(grupos, unidade, {
+                'contagem': contagem, 'soma': soma, 'soma_quadrados': soma_quadrados,
+                'min': minimo, 'max': maximo, 'baldes': [(soma / contagem, soma / contagem, contagem)]
+            })
+        
+        legadas = []
+        for borda_inicio, borda_fim, exclusivo in ((inicio, hora_inicio, True), (hora_fim, fim, False)):
+            grupos_borda, legadas_borda = self._agregar_leituras(
+                session, sensor_id, borda_inicio, borda_fim, fim_exclusivo=exclusivo
+            )
+            for unidade, grupo in grupos_borda.items():
+                self._mesclar_grupo(grupos, unidade, grupo)
+            legadas.extend(legadas_borda)
+        
+        return grupos, legadas
+    
+    @staticmethod
+    def _mesclar_grupo(grupos, unidade, grupo):
+        """Soma um grupo parcial (contagem, somas, extremos, baldes) ao grupo da unidade"""
+        atual = grupos.get(unidade)
+        if atual is None:
+            grupos[unidade] = {**grupo, 'baldes': list(grupo['baldes'])}
+            return
+        atual['contagem'] += grupo['contagem']
+        atual['soma'] += grupo['soma']
+        atual['soma_quadrados'] += grupo['soma_quadrados']
+        atual['min'] = min(atual['min'], grupo['min'])
+        atual['max'] = max(atual['max'], grupo['max'])
+        atual['baldes'].extend(grupo['baldes'])
+    
+    @staticmethod
+    def _media_valor_legado(texto):
+        """Converte uma leitura legada em JSON (ou str(dict)) na média de seus valores"""
+        try:
+            try:
+                dados = json.loads(texto)
+            except json.JSONDecodeError:
+                # Leituras antigas gravadas com str(dict): {'P': 1, 'K': 0}
+                dados = ast.literal_eval(texto)
+            valores = [float(v) for v in dados.values()]
+            return sum(valores) / len(valores) if valores else None
+        except (ValueError, TypeError, SyntaxError, AttributeError):
+            return None
+    
+    @staticmethod
+    def _resumir_grupo(grupo):
+        """Converte somas agregadas e histograma em média, mediana e desvio padrão"""
+        n = grupo['contagem']
+        media = grupo['soma'] / n
+        variancia = (grupo['soma_quadrados'] - n * media * media) / (n - 1) if n > 1 else 0.0
+        
+        # Mediana: interpolação linear dentro do balde que contém a posição central
+        mediana = media
+        alvo = n / 2
+        acumulado = 0
+        for inicio_balde, fim_balde, contagem in sorted(grupo['baldes']):
+            if acumulado + contagem >= alvo:
+                mediana = inicio_balde + (alvo - acumulado) / contagem * (fim_balde - inicio_balde)
+                break
+            acumulado += contagem
+        
+        return {
+            'media': media,
+            'mediana': min(max(mediana, grupo['min']), grupo['max']),
+            'min': grupo['min'],
+            'max': grupo['max'],
+            'desvio_padrao': math.sqrt(max(variancia, 0.0)),
+            'contagem': n
+        }
+    
+    # Métodos para Agregados (rollups horários e diários)
+    @staticmethod
+    def _inicio_balde(data_hora, granularidade):
+        """Trunca um horário para o início do balde da granularidade"""
+        if granularidade == GRANULARIDADE_DIA:
+            return data_hora.replace(hour=0, minute=0, second=0, microsecond=0)
+        return data_hora.replace(minute=0, second=0, microsecond=0)
+    
+    def _acumular_agregados(self, session, linhas):
+        """
+        Soma leituras recém-inseridas aos agregados horários e diários
+        
+        Executado na mesma transação do INSERT das leituras. Cada balde é
+        atualizado com um upsert atômico (contagem/somas incrementadas, mínimo e
+        máximo combinados), então inserções concorrentes não perdem contagens.
+        
+        Args:
+            linhas (list): dicts com sensor_id, data_hora, metrica, unidade, valor_numerico e valido
+        """
+        baldes = {}
+        for linha in linhas:
+            numero = linha.get('valor_numerico')
+            if numero is None or not linha.get('valido', True):
+                continue
+            for granularidade in (GRANULARIDADE_HORA, GRANULARIDADE_DIA):
+                chave = (
+                    linha['sensor_id'],
+                    granularidade,
+                    self._inicio_balde(linha['data_hora'], granularidade),
+                    linha.get('metrica') or METRICA_OUTRA,
+                    linha['unidade']
+                )
+                balde = baldes.get(chave)
+                if balde is None:
+                    baldes[chave] = {'contagem': 1, 'soma': numero, 'soma_quadrados': numero * numero,
+                                     'minimo': numero, 'maximo': numero}
+                else:
+                    balde['contagem'] += 1
+                    balde['soma'] += numero
+                    balde['soma_quadrados'] += numero * numero
+                    balde['minimo'] = min(balde['minimo'], numero)
+                    balde['maximo'] = max(balde['maximo'], numero)
+        
+        if not baldes:
+            return
+        
+        valores = [
+            {'sensor_id': sensor_id, 'granularidade': granularidade, 'inicio': inicio,
+             'metrica': metrica, 'unidade': unidade, **balde}
+            for (sensor_id, granularidade, inicio, metrica, unidade), balde in baldes.items()
+        ]
+        self._upsert_agregados(session, valores)
+    
+    def _upsert_agregados(self, session, valores):
+        """INSERT ... ON CONFLICT/ON DUPLICATE KEY que acumula os valores nos baldes existentes
+
+        Executado como executemany (SQL compilado uma vez e reaproveitado pelo cache)
+        """
+        tabela = AgregadoLeitura.__table__
+        dialeto = self.engine.dialect.name
+        
+        if dialeto in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert as insert_dialeto
+            comando = insert_dialeto(tabela)
+            novo = comando.inserted
+            session.execute(comando.on_duplicate_key_update(
+                contagem=tabela.c.contagem + novo.contagem,
+                soma=tabela.c.soma + novo.soma,
+                soma_quadrados=tabela.c.soma_quadrados + novo.soma_quadrados,
+                minimo=func.least(tabela.c.minimo, novo.minimo),
+                maximo=func.greatest(tabela.c.maximo, novo.maximo)
+            ), valores)
+            return
+        
+        if dialeto in ('sqlite', 'postgresql'):
+            if dialeto == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+                menor, maior = func.min, func.max  # min/max escalares com dois argumentos
+            else:
+                from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+                menor, maior = func.least, func.greatest
+            comando = insert_dialeto(tabela)
+            novo = comando.excluded
+            session.execute(comando.on_conflict_do_update(
+                index_elements=['sensor_id', 'granularidade', 'inicio', 'metrica', 'unidade'],
+                set_={
+                    'contagem': tabela.c.contagem + novo.contagem,
+                    'soma': tabela.c.soma + novo.soma,
+                    'soma_quadrados': tabela.c.soma_quadrados + novo.soma_quadrados,
+                    'minimo': menor(tabela.c.minimo, novo.minimo),
+                    'maximo': maior(tabela.c.maximo, novo.maximo)
+                }
+            ), valores)
+            return
+        
+        # Outros bancos: leitura e atualização balde a balde com bloqueio de linha
+        for valor in valores:
+            agregado = session.query(AgregadoLeitura).filter_by(
+                sensor_id=valor['sensor_id'], granularidade=valor['granularidade'], inicio=valor['inicio'],
+                metrica=valor['metrica'], unidade=valor['unidade']
+            ).with_for_update().first()
+            if agregado is None:
+                session.add(AgregadoLeitura(**valor))
+                continue
+            agregado.contagem += valor['contagem']
+            agregado.soma += valor['soma']
+            agregado.soma_quadrados += valor['soma_quadrados']
+            agregado.minimo = min(agregado.minimo, valor['minimo'])
+            agregado.maximo = max(agregado.maximo, valor['maximo'])
+    
+    def obter_serie_agregada(self, sensor_id, inicio, fim, granularidade=None):
+        """
+        Obtém a série agregada (média, mínimo, máximo por balde) de um sensor
+        
+        Args:
+            granularidade (str): 'hora' ou 'dia'; por padrão, 'hora' até 7 dias e 'dia' acima disso
+        
+        Returns:
+            list: dicts com inicio, metrica, unidade, contagem, media, min e max, ordenados por inicio
+        """
+        if granularidade is None:
+            granularidade = GRANULARIDADE_HORA if fim - inicio <= timedelta(days=7) else GRANULARIDADE_DIA
+        
+        session = self.get_session()
+        try:
+            agregados = session.query(AgregadoLeitura).filter(
+                AgregadoLeitura.sensor_id == sensor_id,
+                AgregadoLeitura.granularidade == granularidade,
+                AgregadoLeitura.inicio >= self._inicio_balde(inicio, granularidade),
+                AgregadoLeitura.inicio <= fim,
+                AgregadoLeitura.contagem > 0
+            ).order_by(AgregadoLeitura.inicio).all()
             
-            if not valores:
-                return {
-                    'media': 0,
-                    'mediana': 0,
-                    'min': 0,
-                    'max': 0,
-                    'desvio_padrao': 0,
-                    'contagem': 0
+            return [
+                {
+                    'inicio': a.inicio,
+                    'metrica': a.metrica,
+                    'unidade': a.unidade,
+                    'contagem': a.contagem,
+                    'media': a.media,
+                    'min': a.minimo,
+                    'max': a.maximo
                 }
+                for a in agregados
+            ]
+        finally:
+            session.close()
+    
+    def reconstruir_agregados(self, inicio=None, fim=None, sensor_id=None, lote=20000):
+        """
+        Recalcula os agregados a partir das leituras brutas (backfill)
+        
+        O período é alinhado a dias inteiros. Os agregados do período são
+        apagados e o maior ID de leitura é fixado na mesma transação; as
+        leituras até esse ID são relidas em lotes (paginação por ID), e as que
+        chegarem depois já são acumuladas pela ingestão normal.
+        
+        Returns:
+            dict: leituras processadas e agregados gravados
+        """
+        tabela = LeituraSensor.__table__
+        filtros = [tabela.c.valido == True, tabela.c.valor_numerico.isnot(None)]
+        filtros_agregados = []
+        if inicio is not None:
+            inicio = self._inicio_balde(inicio, GRANULARIDADE_DIA)
+            filtros.append(tabela.c.data_hora >= inicio)
+            filtros_agregados.append(AgregadoLeitura.inicio >= inicio)
+        if fim is not None:
+            fim = self._inicio_balde(fim, GRANULARIDADE_DIA) + timedelta(days=1)
+            filtros.append(tabela.c.data_hora < fim)
+            filtros_agregados.append(AgregadoLeitura.inicio < fim)
+        if sensor_id is not None:
+            filtros.append(tabela.c.sensor_id == sensor_id)
+            filtros_agregados.append(AgregadoLeitura.sensor_id == sensor_id)
+        
+        session = self.get_session()
+        try:
+            session.execute(delete(AgregadoLeitura.__table__).where(*filtros_agregados))
+            id_limite = session.execute(select(func.max(tabela.c.id))).scalar() or 0
+            session.commit()
             
-            import statistics
+            processadas = 0
+            ultimo_id = 0
+            while True:
+                linhas = session.execute(
+                    select(tabela.c.id, tabela.c.sensor_id, tabela.c.data_hora, tabela.c.metrica,
+                           tabela.c.unidade, tabela.c.valor_numerico)
+                    .where(*filtros, tabela.c.id > ultimo_id, tabela.c.id <= id_limite)
+                    .order_by(tabela.c.id)
+                    .limit(lote)
+                ).mappings().all()
+                if not linhas:
+                    break
+                
+                self._acumular_agregados(session, linhas)
+                session.commit()
+                processadas += len(linhas)
+                ultimo_id = linhas[-1]['id']
             
-            return {
-                'media': statistics.mean(valores),
-                'mediana': statistics.median(valores) if len(valores) > 0 else 0,
-                'min': min(valores) if valores else 0,
-                'max': max(valores) if valores else 0,
-                'desvio_padrao': statistics.stdev(valores) if len(valores) > 1 else 0,
-                'contagem': len(valores)
-            }
+            total = session.query(func.count(AgregadoLeitura.id)).filter(*filtros_agregados).scalar()
+            return {'leituras': processadas, 'agregados': total}
+        except Exception as e:
+            session.rollback()
+            raise e
         finally:
             session.close()
     
@@ -337,6 +1053,64 @@ class SQLDatabaseService:
         finally:
             session.close()
     
+    def adicionar_recomendacoes_em_lote(self, recomendacoes, retornar_ids=True):
+        """
+        Adiciona várias recomendações automáticas em uma única transação
+        
+        Args:
+            recomendacoes (list): tuplas (campo_id, tipo_recurso, quantidade_recomendada, unidade, baseado_em)
+            retornar_ids (bool): obter os IDs gerados; sem eles a gravação é um
+                único executemany em qualquer banco (com eles, só onde há
+                INSERT ... RETURNING em lote, como SQLite e PostgreSQL; nos
+                demais, um INSERT por linha). None = só quando for em lote.
+        
+        Returns:
+            list: IDs das recomendações, na mesma ordem (vazia quando não retornados)
+        """
+        if not recomendacoes:
+            return []
+        
+        agora = datetime.now()
+        linhas = [
+            {
+                'campo_id': campo_id,
+                'data_hora': agora,
+                'tipo_recurso': tipo_recurso,
+                'quantidade_recomendada': quantidade_recomendada,
+                'unidade': unidade,
+                'baseado_em': baseado_em,
+                'aplicada': False
+            }
+            for campo_id, tipo_recurso, quantidade_recomendada, unidade, baseado_em in recomendacoes
+        ]
+        
+        if retornar_ids is None:
+            retornar_ids = self.engine.dialect.insert_executemany_returning
+        
+        session = self.get_session()
+        try:
+            if not retornar_ids:
+                session.execute(insert(RecomendacaoAutomatica), linhas)
+                ids = []
+            elif self.engine.dialect.insert_executemany_returning:
+                # Um INSERT ... VALUES (...), (...) RETURNING: as chaves autoincrementais
+                # crescem na ordem das linhas, então ordenar os IDs devolve a ordem original
+                ids = sorted(session.scalars(
+                    insert(RecomendacaoAutomatica).returning(RecomendacaoAutomatica.id), linhas
+                ))
+            else:
+                novas = [RecomendacaoAutomatica(**linha) for linha in linhas]
+                session.add_all(novas)
+                session.flush()
+                ids = [recomendacao.id for recomendacao in novas]
+            session.commit()
+            return ids
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
     def marcar_recomendacao_aplicada(self, recomendacao_id):
         """Marca uma recomendação como aplicada"""
         session = self.get_session()
@@ -394,27 +1168,33 @@ class SQLDatabaseService:
             session.close()
     
     # Métodos para Histórico
-    def gerar_historico(self, sensor_id, data_inicio, data_fim):
-        """Gera um registro histórico para um período"""
-        estatisticas = self.calcular_estatisticas_leituras(sensor_id, data_inicio, data_fim)
+    def gerar_historico(self, sensor_id, data_inicio, data_fim, estatisticas=None):
+        """Gera um registro histórico para um período (reaproveita estatísticas já calculadas)"""
+        if estatisticas is None:
+            estatisticas = self.calcular_estatisticas_leituras(sensor_id, data_inicio, data_fim)
         
         if not estatisticas:
             return None
         
+        data_inicio = data_inicio.date() if isinstance(data_inicio, datetime) else data_inicio
+        data_fim = data_fim.date() if isinstance(data_fim, datetime) else data_fim
+        
         session = self.get_session()
         try:
-            novo_historico = HistoricoSensor(
-                sensor_id=sensor_id,
-                data_inicio=data_inicio.date() if isinstance(data_inicio, datetime) else data_inicio,
-                data_fim=data_fim.date() if isinstance(data_fim, datetime) else data_fim,
-                media_leituras=estatisticas['media'],
-                min_leitura=estatisticas['min'],
-                max_leitura=estatisticas['max'],
-                desvio_padrao=estatisticas['desvio_padrao']
-            )
-            session.add(novo_historico)
+            # Um registro por sensor e período: relatórios repetidos atualizam o existente
+            historico = session.query(HistoricoSensor).filter_by(
+                sensor_id=sensor_id, data_inicio=data_inicio, data_fim=data_fim
+            ).first()
+            if historico is None:
+                historico = HistoricoSensor(sensor_id=sensor_id, data_inicio=data_inicio, data_fim=data_fim)
+                session.add(historico)
+            
+            historico.media_leituras = estatisticas['media']
+            historico.min_leitura = estatisticas['min']
+            historico.max_leitura = estatisticas['max']
+            historico.desvio_padrao = estatisticas['desvio_padrao']
             session.commit()
-            return novo_historico.id
+            return historico.id
         except Exception as e:
             session.rollback()
             raise e
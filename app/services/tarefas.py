@@ -0,0 +1,148 @@
+# app/services/tarefas.py
+
+"""
+Tipos de job executados pelo worker (app/scripts/worker_jobs.py)
+
+Cada função recebe (parametros, contexto) e devolve o resultado do job, um
+dict serializável em JSON. O contexto (ContextoJob) dá acesso aos serviços
+de banco e registra o progresso; progresso() também é o ponto onde um
+cancelamento pedido interrompe o job.
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+def executar_retreino(parametros, contexto):
+    """
+    Retreinamento dos modelos
+
+    Parâmetros: mode ('full' ou 'incremental'), days_back, min_samples, time_bucket,
+    location ('lat,lon'), search, cv, jobs
+    """
+    from config import Config
+
+    if parametros.get('mode', 'full') == 'incremental':
+        from app.ml.online_learning import OnlineTrainer
+
+        contexto.progresso(0.0, "Atualização incremental")
+        trainer = OnlineTrainer(
+            contexto.sql_db,
+            path_prefix=Config.ML_ONLINE_MODEL_PATH_PREFIX,
+            time_bucket=parametros.get('time_bucket', '1min')
+        )
+        return trainer.update()
+
+    from app.ml.irrigation_predictor import IrrigationPredictor
+    from app.ml.model_trainer import ModelTrainer
+    from app.scripts.train_model import train_and_save
+
+    lat, lon = map(float, parametros.get('location', '-3.763081,-38.524465').split(','))
+    metrics = train_and_save(
+        ModelTrainer(contexto.sql_db),
+        IrrigationPredictor(),
+        int(parametros.get('days_back', 30)),
+        int(parametros.get('min_samples', 50)),
+        (lat, lon),
+        parametros.get('time_bucket', '1min'),
+        search=bool(parametros.get('search', False)),
+        cv=int(parametros.get('cv', 5)),
+        jobs=int(parametros.get('jobs', -1)),
+        path_prefix=Config.ML_MODEL_PATH_PREFIX,
+        compact=Config.ML_MODEL_COMPACT,
+        logger=logger,
+        progress=contexto.progresso
+    )
+    if metrics is None:
+        raise ValueError(f"Dados insuficientes: precisa de pelo menos {parametros.get('min_samples', 50)} amostras")
+    return metrics
+
+def executar_importacao_csv(parametros, contexto):
+    """
+    Importação de um CSV do ESP32 já gravado em CSV_IMPORT_UPLOAD_DIR
+
+    Parâmetros: caminho, sensor_id, campo_id, separador, criar_sensor_automatico
+    O arquivo é removido ao final (também em erro ou cancelamento).
+    """
+    from app.services.importacao_csv import processar_arquivo_csv
+
+    caminho = parametros['caminho']
+
+    def progresso(processadas, total):
+        contexto.progresso(
+            processadas / total if total else 1.0,
+            f"{processadas} de {total} registros processados",
+            linhas_processadas=processadas,
+            total_linhas=total
+        )
+
+    try:
+        return processar_arquivo_csv(
+            caminho,
+            parametros.get('sensor_id'),
+            parametros.get('campo_id'),
+            parametros.get('separador', ';'),
+            parametros.get('criar_sensor_automatico', False),
+            contexto.sql_db,
+            contexto.mongo_db,
+            progresso=progresso
+        )
+    finally:
+        if os.path.exists(caminho):
+            try:
+                os.unlink(caminho)
+            except OSError as e:
+                logger.warning(f"Não foi possível remover arquivo importado: {e}")
+
+def executar_relatorio_sensor(parametros, contexto):
+    """Parâmetros: sensor_id, dias"""
+    from app.services.relatorios import gerar_relatorio_sensor
+
+    contexto.progresso(0.0, "Gerando relatório do sensor")
+    return gerar_relatorio_sensor(contexto.sql_db, int(parametros['sensor_id']), int(parametros.get('dias', 30)))
+
+def executar_relatorio_campo(parametros, contexto):
+    """Parâmetros: campo_id, dias"""
+    from app.services.relatorios import gerar_relatorio_campo
+
+    contexto.progresso(0.0, "Gerando relatório do campo")
+    return gerar_relatorio_campo(contexto.sql_db, contexto.mongo_db, parametros['campo_id'],
+                                 int(parametros.get('dias', 30)))
+
+def executar_drift(parametros, contexto):
+    """
+    Avaliação de drift das predições com resultado real
+
+    Antes preenche o resultado real das predições registradas cujo horizonte
+    já passou (evaluate_model.fill_actual_irrigation).
+
+    Parâmetros: days_back, retrain_on_drift (enfileira um retreino completo se houver drift)
+    """
+    from app.scripts.evaluate_model import fill_actual_irrigation, compute_drift_evaluation, save_drift_evaluation
+    from app.services.fila_jobs import FilaJobs
+
+    days_back = int(parametros.get('days_back', 7))
+    contexto.progresso(0.0, "Preenchendo resultado real das predições")
+    preenchidas = fill_actual_irrigation(contexto.sql_db, days_back=days_back)
+
+    contexto.progresso(0.5, "Avaliando predições")
+    avaliacao = compute_drift_evaluation(contexto.sql_db, days_back=days_back)
+    if avaliacao is None:
+        return {'total_predictions': 0, 'drift_detected': None, 'actual_filled': preenchidas,
+                'message': 'Nenhuma predição com resultado real no período'}
+
+    avaliacao['actual_filled'] = preenchidas
+    save_drift_evaluation(avaliacao)
+    if avaliacao['drift_detected'] and parametros.get('retrain_on_drift'):
+        job, _ = FilaJobs(contexto.sql_db).enfileirar('retreino', {'mode': 'full'})
+        avaliacao['retrain_job_id'] = job['id']
+    return avaliacao
+
+TAREFAS = {
+    'retreino': executar_retreino,
+    'importacao_csv': executar_importacao_csv,
+    'relatorio_sensor': executar_relatorio_sensor,
+    'relatorio_campo': executar_relatorio_campo,
+    'drift': executar_drift
+}
@@ -0,0 +1,214 @@
+# app/services/weather_cache.py
+
+"""
+Cache de curta duração das respostas das APIs de clima
+
+O clima muda na escala de minutos e muitos campos ficam no mesmo município,
+então as respostas de clima atual e previsão são guardadas por alguns minutos
+com chave pela cidade normalizada ou pelas coordenadas arredondadas.
+
+Backends:
+    - memória: LRU por processo, com expiração por entrada
+    - redis: compartilhado entre processos e instâncias (serviço redis do docker-compose)
+
+Requisições simultâneas para a mesma chave são agrupadas: só a primeira chama a
+API, as demais esperam pelo mesmo resultado. Falhas não são guardadas.
+
+Configuração pelo ambiente (padrões em config.Config):
+    WEATHER_CACHE_BACKEND (memory|redis), WEATHER_CACHE_REDIS_URL,
+    WEATHER_CACHE_TTL_CURRENT, WEATHER_CACHE_TTL_FORECAST, WEATHER_CACHE_MAX_ENTRIES
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class MemoryBackend:
+    """LRU em memória com expiração por entrada"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+class RedisBackend:
+    """Backend Redis (valores em JSON, expiração pelo próprio Redis)"""
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='farmtech:weather:'):
+        import redis
+
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client.ping()
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            logger.warning(f"Cache de clima (redis) indisponível: {str(e)}")
+            return _MISSING
+        return _MISSING if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.setex(self.prefix + key, max(int(ttl), 1), json.dumps(value))
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar no cache de clima (redis): {str(e)}")
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+
+class _InFlight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class WeatherCache:
+    """Cache TTL com agrupamento de requisições simultâneas e métricas de acerto"""
+
+    def __init__(self, backend, ttl_current=300, ttl_forecast=1800):
+        self.backend = backend
+        self.ttls = {'current': ttl_current, 'forecast': ttl_forecast}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    def _count(self, metric):
+        with self._lock:
+            self._stats[metric] += 1
+
+    def get_or_fetch(self, key, fetch, kind='current'):
+        """
+        Valor da chave no cache ou obtido por fetch() (e guardado pelo TTL do tipo)
+
+        Exceções de fetch() são repassadas a todos que aguardavam a chave e
+        nada é guardado.
+        """
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            self._count('hits')
+            return value
+
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+
+        if not leader:
+            # Mesma chave já sendo buscada por outra thread
+            self._count('coalesced')
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        self._count('misses')
+        try:
+            call.value = fetch()
+            if call.value is not None:
+                self.backend.set(key, call.value, self.ttls.get(kind, self.ttls['current']))
+            return call.value
+        except Exception as e:
+            self._count('errors')
+            call.error = e
+            raise
+        finally:
+            call.event.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        """Métricas de uso desde o início do processo"""
+        with self._lock:
+            stats = dict(self._stats)
+        served = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['requests'] = served
+        # Agrupadas também evitam chamada à API
+        stats['hit_rate'] = round((stats['hits'] + stats['coalesced']) / served, 4) if served else None
+        stats['backend'] = self.backend.name
+        stats['ttl_seconds'] = dict(self.ttls)
+        try:
+            stats['entries'] = self.backend.size()
+        except Exception:
+            stats['entries'] = None
+        return stats
+
+def location_key(location):
+    """
+    Chave normalizada do local
+
+    Cidades: sem acentos, minúsculas e espaços simples ("São  Paulo" == "sao paulo").
+    Coordenadas: arredondadas a 2 casas (~1 km), agrupando campos vizinhos.
+    """
+    if isinstance(location, (list, tuple)):
+        return f"{round(float(location[0]), 2):.2f},{round(float(location[1]), 2):.2f}"
+    text = unicodedata.normalize('NFKD', str(location)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(text.lower().split())
+
+_weather_cache = None
+_weather_cache_lock = threading.Lock()
+
+def get_weather_cache():
+    """Cache de clima do processo, criado na primeira chamada conforme o ambiente"""
+    global _weather_cache
+    with _weather_cache_lock:
+        if _weather_cache is None:
+            backend = None
+            if (os.getenv('WEATHER_CACHE_BACKEND') or 'memory') == 'redis':
+                try:
+                    backend = RedisBackend(os.getenv('WEATHER_CACHE_REDIS_URL') or 'redis://localhost:6379/0')
+                except Exception as e:
+                    logger.warning(f"Redis indisponível para o cache de clima, usando memória: {str(e)}")
+            if backend is None:
+                backend = MemoryBackend(int(os.getenv('WEATHER_CACHE_MAX_ENTRIES') or 2048))
+
+            _weather_cache = WeatherCache(
+                backend,
+                ttl_current=int(os.getenv('WEATHER_CACHE_TTL_CURRENT') or 300),
+                ttl_forecast=int(os.getenv('WEATHER_CACHE_TTL_FORECAST') or 1800)
+            )
+        return _weather_cache
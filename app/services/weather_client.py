@@ -0,0 +1,124 @@
+# app/services/weather_client.py
+
+"""
+Cliente HTTP compartilhado pelas integrações climáticas
+
+Uma única requests.Session por processo (keep-alive e pool de conexões por
+host), com timeout por endpoint, retentativas com backoff exponencial para
+erros transitórios (conexão, 429 e 5xx, respeitando Retry-After) e uma API de
+fan-out que executa várias chamadas em paralelo, com limite de concorrência e
+sem repetir chamadas idênticas.
+
+Configuração pelo ambiente (padrões em config.Config):
+    WEATHER_HTTP_POOL_SIZE, WEATHER_HTTP_RETRIES, WEATHER_HTTP_BACKOFF, WEATHER_HTTP_MAX_WORKERS
+"""
+
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.services.weather_cache import get_weather_cache
+
+logger = logging.getLogger(__name__)
+
+# (conexão, leitura) em segundos, por tipo de endpoint
+TIMEOUTS = {
+    'current': (3.05, 10),
+    'forecast': (3.05, 10),
+    'archive': (3.05, 30),
+    'default': (3.05, 15)
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_weather_session():
+    """Session compartilhada pelo processo, criada na primeira chamada"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = int(os.getenv('WEATHER_HTTP_POOL_SIZE') or 20)
+            retry = Retry(
+                total=int(os.getenv('WEATHER_HTTP_RETRIES') or 3),
+                backoff_factor=float(os.getenv('WEATHER_HTTP_BACKOFF') or 0.5),
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+def get_json(url, params=None, endpoint='default'):
+    """GET com a session compartilhada e o timeout do endpoint; lança exceção em erro HTTP"""
+    response = get_weather_session().get(url, params=params, timeout=TIMEOUTS.get(endpoint, TIMEOUTS['default']))
+    response.raise_for_status()
+    return response.json()
+
+def get_json_cached(url, params, endpoint, cache_key):
+    """
+    get_json atrás do cache de clima (TTL por endpoint, chamadas simultâneas agrupadas)
+
+    cache_key deve identificar o local normalizado e os parâmetros que mudam a resposta.
+    """
+    return get_weather_cache().get_or_fetch(cache_key, lambda: get_json(url, params, endpoint), kind=endpoint)
+
+def _request_key(url, params):
+    """Chave que identifica chamadas idênticas (mesma URL e mesmos parâmetros)"""
+    items = []
+    for name, value in sorted((params or {}).items()):
+        items.append((name, tuple(value) if isinstance(value, (list, tuple)) else value))
+    return url, tuple(items)
+
+def fetch_many(calls, max_workers=None, cache_keys=None):
+    """
+    Executa várias chamadas GET em paralelo
+
+    Chamadas idênticas são feitas uma só vez e o resultado é repetido para
+    todas as chaves que a pediram. Falhas são isoladas por chamada.
+
+    Args:
+        calls: dict chave -> (url, params, endpoint)
+        max_workers: limite de chamadas simultâneas (padrão: WEATHER_HTTP_MAX_WORKERS)
+        cache_keys: dict opcional chave -> chave do cache de clima (ver get_json_cached);
+                    chamadas com a mesma chave de cache também são deduplicadas
+
+    Returns:
+        dict: chave -> JSON da resposta, ou None se a chamada falhou
+    """
+    if not calls:
+        return {}
+
+    cache_keys = cache_keys or {}
+
+    def dedupe_key(key, url, params):
+        return ('cache', cache_keys[key]) if key in cache_keys else _request_key(url, params)
+
+    unique = {}
+    for key, (url, params, endpoint) in calls.items():
+        unique.setdefault(dedupe_key(key, url, params), (url, params, endpoint, cache_keys.get(key)))
+
+    def run(call):
+        url, params, endpoint, cache_key = call
+        try:
+            if cache_key is not None:
+                return get_json_cached(url, params, endpoint, cache_key)
+            return get_json(url, params, endpoint)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Erro na chamada {url}: {str(e)}")
+            return None
+
+    workers = max_workers or int(os.getenv('WEATHER_HTTP_MAX_WORKERS') or 8)
+    with ThreadPoolExecutor(max_workers=min(workers, len(unique))) as executor:
+        results = dict(zip(unique, executor.map(run, unique.values())))
+
+    return {key: results[dedupe_key(key, url, params)] for key, (url, params, _) in calls.items()}
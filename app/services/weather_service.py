@@ -1,56 +1,102 @@
 # app/services/weather_service.py
 import requests
 import json
+import os
 from datetime import datetime
 
+from app.services.weather_client import get_json_cached, fetch_many
+from app.services.weather_cache import location_key
+
 class WeatherService:
-    def __init__(self, api_key, lang='pt_br', units='metric'):
+    def __init__(self, api_key, lang='pt_br', units='metric', base_url=None):
         self.api_key = api_key
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.base_url = base_url or os.getenv('OPENWEATHER_BASE_URL') or "https://api.openweathermap.org/data/2.5"
         self.lang = lang
         self.units = units
     
-    def obter_clima_atual(self, cidade):
-        """Obtém dados do clima atual para uma cidade"""
-        url = f"{self.base_url}/weather"
+    def _parametros_local(self, local):
+        """Parâmetros de localização: nome da cidade ou tupla (lat, lon)"""
         params = {
-            'q': cidade,
             'appid': self.api_key,
             'lang': self.lang,
             'units': self.units
         }
-        
+        if isinstance(local, (list, tuple)):
+            # Coordenadas arredondadas (~11 m): pontos praticamente iguais viram a mesma chamada
+            params['lat'] = round(float(local[0]), 4)
+            params['lon'] = round(float(local[1]), 4)
+        else:
+            params['q'] = local
+        return params
+    
+    def _chave_cache(self, tipo, local, cnt=None):
+        """Chave do cache de clima: local normalizado e parâmetros que mudam a resposta"""
+        chave = f"openweather:{tipo}:{location_key(local)}:{self.units}:{self.lang}"
+        return f"{chave}:{cnt}" if cnt is not None else chave
+    
+    def obter_clima_atual(self, cidade):
+        """Obtém dados do clima atual para uma cidade (ou tupla lat, lon)"""
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()  # Lança exceção para códigos de erro HTTP
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return get_json_cached(
+                f"{self.base_url}/weather", self._parametros_local(cidade), 'current',
+                self._chave_cache('current', cidade)
+            )
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"Erro ao obter dados climáticos: {str(e)}")
             return None
     
     def obter_previsao(self, cidade, cnt=5):
         """Obtém previsão do tempo para uma cidade (cnt = número de previsões)"""
-        url = f"{self.base_url}/forecast"
-        params = {
-            'q': cidade,
-            'appid': self.api_key,
-            'lang': self.lang,
-            'units': self.units,
-            'cnt': cnt  # Número de previsões (máximo 40, uma a cada 3 horas por 5 dias)
-        }
+        params = self._parametros_local(cidade)
+        params['cnt'] = cnt  # Número de previsões (máximo 40, uma a cada 3 horas por 5 dias)
         
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return get_json_cached(
+                f"{self.base_url}/forecast", params, 'forecast', self._chave_cache('forecast', cidade, cnt)
+            )
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"Erro ao obter previsão do tempo: {str(e)}")
             return None
     
+    def obter_clima_em_lote(self, locais, cnt=5, max_workers=None):
+        """
+        Clima atual e previsão de vários locais em paralelo
+        
+        Locais repetidos (mesma cidade ou mesmas coordenadas arredondadas) são
+        consultados uma única vez, e respostas recentes vêm do cache de clima.
+        
+        Args:
+            locais: lista de nomes de cidade ou tuplas (lat, lon)
+            cnt: número de previsões por local
+            
+        Returns:
+            dict: local -> {'atual': dict ou None, 'previsao': dict ou None}
+        """
+        chamadas = {}
+        chaves_cache = {}
+        for local in locais:
+            chave = tuple(local) if isinstance(local, list) else local
+            params_previsao = self._parametros_local(local)
+            params_previsao['cnt'] = cnt
+            chamadas[(chave, 'atual')] = (f"{self.base_url}/weather", self._parametros_local(local), 'current')
+            chamadas[(chave, 'previsao')] = (f"{self.base_url}/forecast", params_previsao, 'forecast')
+            chaves_cache[(chave, 'atual')] = self._chave_cache('current', local)
+            chaves_cache[(chave, 'previsao')] = self._chave_cache('forecast', local, cnt)
+        
+        resultados = fetch_many(chamadas, max_workers=max_workers, cache_keys=chaves_cache)
+        
+        clima = {}
+        for (chave, tipo), dados in resultados.items():
+            clima.setdefault(chave, {})[tipo] = dados
+        return clima
+    
     def verificar_necessidade_irrigacao(self, campo_id, cidade, sql_db, mongo_db):
         """
         Verifica se é necessário irrigar com base nos dados climáticos
         e leituras dos sensores
+        
+        A umidade é a média de todos os sensores S1 ativos do campo
+        (obter_media_umidade_por_campo), como em verificar_necessidade_irrigacao_em_lote.
         """
         # Obter dados do campo
         campo = mongo_db.obter_campo_por_id(campo_id)
@@ -60,42 +106,127 @@ class WeatherService:
                 'motivo': 'Campo não encontrado'
             }
         
-        # Obter sensores do campo
-        sensores = sql_db.obter_sensores_por_campo(campo_id)
+        # Umidade média dos sensores S1 do campo nas últimas 6 horas (mesma consulta da versão em lote)
+        from datetime import timedelta
+        data_fim = datetime.now()
+        umidade = sql_db.obter_media_umidade_por_campo(
+            data_fim - timedelta(hours=6), data_fim, [campo_id]
+        ).get(campo_id)
+        media_umidade = umidade['media'] if umidade else None
+        
+        # Clima atual e previsão (próximas 15 horas) em paralelo
+        clima = self.obter_clima_em_lote([cidade], cnt=5)[cidade]
+        clima_atual = clima['atual']
+        previsao = clima['previsao']
+        return self._decidir_irrigacao(media_umidade, clima_atual, previsao)
+    
+    def verificar_necessidade_irrigacao_em_lote(self, sql_db, mongo_db, campo_ids=None, nome_produtor=None,
+                                                cidade_padrao='Fortaleza', gravar_recomendacoes=True, horas=6):
+        """
+        Decide a irrigação de todos os campos (ou de um subconjunto) em uma passada
         
-        # Verificar leituras recentes de umidade (se existirem)
-        sensor_umidade = next((s for s in sensores if s.tipo == 'S1'), None)
-        media_umidade = None
+        Mesma regra de verificar_necessidade_irrigacao, com custo quase
+        independente do número de campos: os campos vêm do MongoDB em uma
+        consulta, a umidade média dos sensores S1 de todos os campos em uma
+        consulta SQL, o clima é buscado uma vez por município (em paralelo e com
+        cache) e as recomendações de irrigação são gravadas em lote.
         
-        if sensor_umidade:
-            from datetime import datetime, timedelta
-            data_fim = datetime.now()
-            data_inicio = data_fim - timedelta(hours=6)  # Últimas 6 horas
-            leituras = sql_db.obter_leituras_por_sensor(sensor_umidade.id, data_inicio, data_fim)
+        Args:
+            campo_ids: campos a avaliar (None = todos, ou os do produtor)
+            nome_produtor: restringir aos campos de um produtor
+            cidade_padrao: município usado quando o campo não tem localização
+            gravar_recomendacoes: gravar as decisões de irrigar como RecomendacaoAutomatica
+            horas: janela das leituras de umidade
+        
+        Returns:
+            dict: decisões por campo e resumo da execução
+        """
+        import time
+        from datetime import timedelta
+        
+        inicio_execucao = time.perf_counter()
+        projecao = {'nome_produtor': 1, 'localizacao': 1, 'campo.area_total_hectare': 1}
+        
+        if campo_ids is not None:
+            campos = mongo_db.obter_campos_por_ids(campo_ids, projecao)
+        elif nome_produtor:
+            campos = mongo_db.obter_campos_por_produtor(nome_produtor)
+        else:
+            campos = list(mongo_db.campos.find({}, projecao))
+        
+        if nome_produtor and campo_ids is not None:
+            campos = [c for c in campos if c.get('nome_produtor') == nome_produtor]
+        
+        fim = datetime.now()
+        umidade_por_campo = sql_db.obter_media_umidade_por_campo(
+            fim - timedelta(hours=horas), fim, [c['_id'] for c in campos]
+        ) if campos else {}
+        
+        # Clima uma vez por município distinto
+        cidade_por_campo = {
+            c['_id']: (c.get('localizacao') or {}).get('municipio') or cidade_padrao for c in campos
+        }
+        clima_por_cidade = self.obter_clima_em_lote(set(cidade_por_campo.values()), cnt=5) if campos else {}
+        
+        decisoes = []
+        recomendacoes = []
+        for campo in campos:
+            campo_id = campo['_id']
+            umidade = umidade_por_campo.get(campo_id)
+            media_umidade = umidade['media'] if umidade else None
+            clima = clima_por_cidade.get(cidade_por_campo[campo_id], {})
             
-            if leituras:
-                # Calcular média das leituras de umidade
-                valores_umidade = []
-                for leitura in leituras:
-                    try:
-                        valores_umidade.append(float(leitura.valor))
-                    except (ValueError, TypeError):
-                        continue
-                
-                if valores_umidade:
-                    media_umidade = sum(valores_umidade) / len(valores_umidade)
-        
-        # Obter dados climáticos atuais
-        clima_atual = self.obter_clima_atual(cidade)
+            decisao = self._decidir_irrigacao(media_umidade, clima.get('atual'), clima.get('previsao'))
+            decisao.update({
+                'campo_id': campo_id,
+                'cidade': cidade_por_campo[campo_id],
+                'media_umidade': media_umidade,
+                'recomendacao_id': None
+            })
+            decisoes.append(decisao)
+            
+            if decisao['irrigar']:
+                area_hectare = (campo.get('campo') or {}).get('area_total_hectare', 0) or 0
+                if media_umidade is not None and media_umidade < 30:
+                    agua_recomendada = (30 - media_umidade) * area_hectare * 1000  # Litros
+                else:
+                    agua_recomendada = area_hectare * 10000  # 10.000 litros por hectare (exemplo)
+                recomendacoes.append((decisao, (campo_id, "água", agua_recomendada, "L", decisao['motivo'])))
+        
+        if gravar_recomendacoes and recomendacoes:
+            ids = sql_db.adicionar_recomendacoes_em_lote(
+                [linha for _, linha in recomendacoes], retornar_ids=None
+            )
+            for (decisao, _), recomendacao_id in zip(recomendacoes, ids):
+                decisao['recomendacao_id'] = recomendacao_id
+        
+        return {
+            'decisoes': decisoes,
+            'resumo': {
+                'campos': len(decisoes),
+                'irrigar': sum(1 for d in decisoes if d['irrigar']),
+                'recomendacoes_gravadas': len(recomendacoes) if gravar_recomendacoes else 0,
+                'cidades_consultadas': len(clima_por_cidade),
+                'campos_com_umidade': len(umidade_por_campo),
+                'duracao_segundos': round(time.perf_counter() - inicio_execucao, 3)
+            }
+        }
+    
+    def _decidir_irrigacao(self, media_umidade, clima_atual, previsao):
+        """
+        Decide a irrigação a partir da umidade média do solo (ou None) e do clima
+        
+        Args:
+            media_umidade: média recente de umidade do solo (%) ou None sem leituras
+            clima_atual: resposta do clima atual (OpenWeather) ou None
+            previsao: resposta da previsão (OpenWeather) ou None
+        """
         if not clima_atual:
             return {
                 'irrigar': media_umidade is not None and media_umidade < 30,  # Usar apenas dados do sensor
                 'motivo': 'Dados climáticos não disponíveis'
             }
         
-        # Obter previsão do tempo (próximas 15 horas)
-        previsao = self.obter_previsao(cidade, cnt=5)
-        
         # Extrair dados relevantes
         temperatura_atual = clima_atual.get('main', {}).get('temp', 0)
         umidade_ar = clima_atual.get('main', {}).get('humidity', 0)
@@ -174,4 +305,4 @@ class WeatherService:
                 'condicao': condicao_atual,
                 'descricao': descricao_atual
             }
-        }
\ No newline at end of file
+        }
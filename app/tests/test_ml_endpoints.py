@@ -83,9 +83,9 @@ def test_train_endpoint():
         
         print(f"Status Code: {response.status_code}")
         
-        if response.status_code == 200:
+        if response.status_code == 202:
             data = response.json()
-            print("✅ Treinamento iniciado:")
+            print("✅ Treinamento enfileirado:")
             print(json.dumps(data, indent=2))
         else:
             print(f"❌ Erro {response.status_code}: {response.text}")